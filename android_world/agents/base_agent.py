@@ -21,6 +21,7 @@ import time
 from typing import Any
 
 from android_world.env import interface
+from android_world.utils import tracing
 
 
 @dataclasses.dataclass()
@@ -107,7 +108,8 @@ class EnvironmentInteractingAgent(abc.ABC):
       logging.info('Fetched after %.1f seconds.', time.time() - start)
       return state
     else:
-      time.sleep(self._transition_pause)
+      with tracing.span('agent.transition_pause'):
+        time.sleep(self._transition_pause)
       logging.info(
           'Pausing {:2.1f} seconds before grabbing state.'.format(
               self._transition_pause
@@ -126,6 +128,18 @@ class EnvironmentInteractingAgent(abc.ABC):
       Done and agent & observation data.
     """
 
+  def episode_finished(self, goal: str, is_successful: float | None) -> None:
+    """Called once the task of an episode has been evaluated.
+
+    Agents that learn from earlier episodes (e.g. by caching plans) can use
+    this to keep only what the task's own success check confirmed.
+
+    Args:
+      goal: The goal of the episode.
+      is_successful: The task's success score, or None if running or
+        evaluating the episode raised an exception.
+    """
+
   @property
   def name(self) -> str:
     return self._name
@@ -0,0 +1,247 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Local OpenAI-compatible chat completions server with canned responses.
+
+Used to benchmark and regression-test the non-LLM part of agents (prompt
+building, image encoding, parsing, env I/O) without network access. Point
+`OPENAI_API_URL` at `FakeLlmServer.url` and the agents talk to it like to the
+real API.
+
+See scripts/run_offline_benchmark.py for running episodes against it, or for
+serving it standalone.
+"""
+
+from collections.abc import Sequence
+import dataclasses
+import http.server
+import itertools
+import json
+import random
+import threading
+import time
+from typing import Any
+
+from absl import logging
+from android_world.agents import prompt_utils
+
+# Parses as a valid action for M3A and T3A, and is harmless as a summary.
+DEFAULT_RESPONSE = (
+    'Reason: Waiting for the screen.\nAction: {"action_type": "wait"}'
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class LatencyModel:
+  """Distribution of the simulated time to answer a request.
+
+  Attributes:
+    base_sec: Fixed latency added to every request.
+    jitter_sec: Scale of the random part of the latency.
+    distribution: Distribution of the random part; 'uniform' draws from [0,
+      jitter_sec], 'exponential' has mean jitter_sec, which gives the long tail
+      seen with real endpoints.
+  """
+
+  base_sec: float = 0.0
+  jitter_sec: float = 0.0
+  distribution: str = 'uniform'
+
+  def sample(self, rng: random.Random) -> float:
+    if self.jitter_sec <= 0:
+      return self.base_sec
+    if self.distribution == 'uniform':
+      return self.base_sec + rng.uniform(0, self.jitter_sec)
+    if self.distribution == 'exponential':
+      return self.base_sec + rng.expovariate(1 / self.jitter_sec)
+    raise ValueError(f'Unknown latency distribution: {self.distribution}')
+
+
+def load_responses(path: str) -> list[str]:
+  """Loads recorded responses.
+
+  Args:
+    path: Either a JSON file with a list of strings, or a JSON-lines file with
+      one `{"content": ...}` object per line.
+
+  Returns:
+    The responses, in the order they should be served.
+  """
+  with open(path) as f:
+    text = f.read()
+  if text.lstrip().startswith('['):
+    return json.loads(text)
+  return [json.loads(line)['content'] for line in text.splitlines() if line]
+
+
+def _response_content(raw_response: Any) -> str | None:
+  """Extracts the message content of a recorded OpenAI response."""
+  try:
+    return raw_response.json()['choices'][0]['message']['content']
+  except Exception:  # pylint: disable=broad-exception-caught
+    return None
+
+
+def responses_from_episode(episode_data: dict[str, list[Any]]) -> list[str]:
+  """Extracts the LLM responses of a recorded M3A or T3A episode.
+
+  Args:
+    episode_data: The `episode_data` of an episode.
+
+  Returns:
+    The action selection and summary responses, in the order they were
+    received.
+  """
+  responses = []
+  num_steps = len(episode_data.get('action_output', []))
+  for i in range(num_steps):
+    action_output = episode_data['action_output'][i]
+    if action_output:
+      responses.append(action_output)
+    summary_responses = episode_data.get('summary_raw_response')
+    if summary_responses and i < len(summary_responses):
+      summary = _response_content(summary_responses[i])
+      if summary is not None:
+        responses.append(summary)
+  return responses
+
+
+def _prompt_tokens(messages: list[dict[str, Any]]) -> int:
+  return prompt_utils.estimate_tokens(prompt_utils.prompt_text(messages))
+
+
+class FakeLlmServer:
+  """Serves `/chat/completions` from a fixed list of responses.
+
+  Responses are returned in order and cycled, regardless of the request
+  content. The server runs in a background thread and handles requests
+  concurrently, so parallel runs see independent latencies.
+  """
+
+  def __init__(
+      self,
+      responses: Sequence[str] = (DEFAULT_RESPONSE,),
+      latency: LatencyModel = LatencyModel(),
+      host: str = '127.0.0.1',
+      port: int = 0,
+      seed: int | None = None,
+  ):
+    """Initializes the server.
+
+    Args:
+      responses: Responses to serve, cycled.
+      latency: Simulated response latency.
+      host: Host to bind to.
+      port: Port to bind to; 0 picks a free port.
+      seed: Seed for the latency jitter.
+    """
+    if not responses:
+      raise ValueError('At least one response is required.')
+    self._responses = itertools.cycle(list(responses))
+    self._latency = latency
+    self._rng = random.Random(seed)
+    self._lock = threading.Lock()
+    self.num_requests = 0
+    self.total_latency_sec = 0.0
+    self._httpd = http.server.ThreadingHTTPServer(
+        (host, port), self._make_handler()
+    )
+    self._httpd.daemon_threads = True
+    self._thread = None
+
+  @property
+  def url(self) -> str:
+    """URL of the chat completions endpoint."""
+    host, port = self._httpd.server_address[:2]
+    return f'http://{host}:{port}/v1/chat/completions'
+
+  def start(self) -> 'FakeLlmServer':
+    self._thread = threading.Thread(
+        target=self._httpd.serve_forever, name='fake_llm_server', daemon=True
+    )
+    self._thread.start()
+    return self
+
+  def stop(self) -> None:
+    self._httpd.shutdown()
+    self._httpd.server_close()
+    if self._thread is not None:
+      self._thread.join()
+
+  def __enter__(self) -> 'FakeLlmServer':
+    return self.start()
+
+  def __exit__(self, *exc_info) -> None:
+    self.stop()
+
+  def _next(self) -> tuple[str, float]:
+    with self._lock:
+      self.num_requests += 1
+      latency = self._latency.sample(self._rng)
+      self.total_latency_sec += latency
+      return next(self._responses), latency
+
+  def complete(self, payload: dict[str, Any]) -> dict[str, Any]:
+    """Returns the response body for a chat completions request."""
+    content, latency = self._next()
+    time.sleep(latency)
+    prompt_tokens = _prompt_tokens(payload.get('messages', []))
+    completion_tokens = prompt_utils.estimate_tokens(content)
+    return {
+        'id': f'chatcmpl-fake-{self.num_requests}',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': payload.get('model', 'fake'),
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content},
+            'finish_reason': 'stop',
+        }],
+        'usage': {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+        },
+    }
+
+  def _make_handler(self) -> type[http.server.BaseHTTPRequestHandler]:
+    server = self
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+      """Handles chat completions requests."""
+
+      def do_POST(self):  # pylint: disable=invalid-name
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+          self._send(404, {'error': {'message': f'Unknown path {self.path}'}})
+          return
+        try:
+          length = int(self.headers.get('Content-Length', 0))
+          payload = json.loads(self.rfile.read(length))
+        except ValueError as e:
+          self._send(400, {'error': {'message': f'Invalid request: {e}'}})
+          return
+        self._send(200, server.complete(payload))
+
+      def _send(self, status: int, body: dict[str, Any]) -> None:
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+      def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logging.debug(format, *args)
+
+    return Handler
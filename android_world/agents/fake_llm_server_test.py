@@ -0,0 +1,90 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import random
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+from android_world.agents import fake_llm_server
+from android_world.agents import infer
+import numpy as np
+import requests
+
+
+class FakeLlmServerTest(absltest.TestCase):
+
+  def test_serves_responses_in_order(self):
+    with fake_llm_server.FakeLlmServer(['a', 'b']) as server:
+      with mock.patch.dict(
+          os.environ,
+          {'OPENAI_API_KEY': 'fake_api_key', 'OPENAI_API_URL': server.url},
+      ):
+        llm = infer.Gpt4Wrapper('fake-model')
+        outputs = [
+            llm.predict('prompt')[0],
+            llm.predict_mm('prompt', [np.zeros((4, 4, 3), np.uint8)])[0],
+            llm.predict('prompt')[0],
+        ]
+
+    self.assertEqual(outputs, ['a', 'b', 'a'])
+    self.assertEqual(server.num_requests, 3)
+
+  def test_unknown_path(self):
+    with fake_llm_server.FakeLlmServer() as server:
+      response = requests.post(
+          server.url.replace('chat/completions', 'embeddings'), json={}
+      )
+
+    self.assertEqual(response.status_code, 404)
+
+  def test_latency_model(self):
+    rng = random.Random(0)
+
+    self.assertEqual(fake_llm_server.LatencyModel(0.5).sample(rng), 0.5)
+    latency = fake_llm_server.LatencyModel(0.5, 0.1).sample(rng)
+    self.assertBetween(latency, 0.5, 0.6)
+    with self.assertRaises(ValueError):
+      fake_llm_server.LatencyModel(0.5, 0.1, 'normal').sample(rng)
+
+  def test_load_responses(self):
+    temp_dir = tempfile.mkdtemp()
+    list_file = os.path.join(temp_dir, 'responses.json')
+    with open(list_file, 'w') as f:
+      json.dump(['a', 'b'], f)
+    lines_file = os.path.join(temp_dir, 'responses.jsonl')
+    with open(lines_file, 'w') as f:
+      f.write('{"content": "a"}\n{"content": "b"}\n')
+
+    self.assertEqual(fake_llm_server.load_responses(list_file), ['a', 'b'])
+    self.assertEqual(fake_llm_server.load_responses(lines_file), ['a', 'b'])
+
+  def test_responses_from_episode(self):
+    summary_response = requests.Response()
+    summary_response._content = (
+        b'{"choices": [{"message": {"content": "summary"}}]}'
+    )
+
+    responses = fake_llm_server.responses_from_episode({
+        'action_output': ['action 1', 'action 2'],
+        'summary_raw_response': [summary_response, None],
+    })
+
+    self.assertEqual(responses, ['action 1', 'summary', 'action 2'])
+
+
+if __name__ == '__main__':
+  absltest.main()
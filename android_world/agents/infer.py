@@ -18,14 +18,17 @@ import abc
 import base64
 import io
 import os
-import time
 from typing import Any, Optional
+from absl import logging
 import google.generativeai as genai
 from google.generativeai import types
 from google.generativeai.types import answer_types
 from google.generativeai.types import content_types
 from google.generativeai.types import generation_types
 from google.generativeai.types import safety_types
+from android_world.agents import llm_retry
+from android_world.agents import llm_scheduler
+from android_world.agents import prompt_utils
 import numpy as np
 from PIL import Image
 import requests
@@ -111,6 +114,7 @@ class GeminiGcpWrapper(LlmWrapper, MultimodalLlmWrapper):
       temperature: float = 0.0,
       top_p: float = 0.95,
       enable_safety_checks: bool = True,
+      retry_policy: llm_retry.RetryPolicy | None = None,
   ):
     if 'GCP_API_KEY' not in os.environ:
       raise RuntimeError('GCP API key not set.')
@@ -128,6 +132,9 @@ class GeminiGcpWrapper(LlmWrapper, MultimodalLlmWrapper):
       max_retry = 3
       print('Max_retry must be positive. Reset it to 3')
     self.max_retry = min(max_retry, 5)
+    self.retry_policy = retry_policy or llm_retry.RetryPolicy(
+        max_attempts=self.max_retry
+    )
 
   def predict(
       self,
@@ -156,27 +163,28 @@ class GeminiGcpWrapper(LlmWrapper, MultimodalLlmWrapper):
       enable_safety_checks: bool = True,
       generation_config: generation_types.GenerationConfigType | None = None,
   ) -> tuple[str, Optional[bool], Any]:
-    counter = self.max_retry
-    retry_delay = 1.0
     output = None
-    while counter > 0:
-      try:
-        output = self.llm.generate_content(
-            [text_prompt] + [Image.fromarray(image) for image in images],
-            safety_settings=None
-            if enable_safety_checks
-            else SAFETY_SETTINGS_BLOCK_NONE,
-            generation_config=generation_config,
-        )
-        return output.text, True, output
-      except Exception as e:  # pylint: disable=broad-exception-caught
-        counter -= 1
-        print('Error calling LLM, will retry in {retry_delay} seconds')
-        print(e)
-        if counter > 0:
-          # Expo backoff
-          time.sleep(retry_delay)
-          retry_delay *= 2
+
+    def attempt() -> str:
+      nonlocal output
+      output = self.llm.generate_content(
+          [prompt_utils.strip_cache_breakpoints(text_prompt)]
+          + [Image.fromarray(image) for image in images],
+          safety_settings=None
+          if enable_safety_checks
+          else SAFETY_SETTINGS_BLOCK_NONE,
+          generation_config=generation_config,
+      )
+      # Raises if the response has no text, e.g. it was blocked.
+      return output.text
+
+    try:
+      text = llm_retry.call_with_retry(
+          attempt, self.retry_policy, llm_retry.circuit_breaker('gemini')
+      )
+      return text, True, output
+    except Exception as e:  # pylint: disable=broad-exception-caught
+      logging.warning('Error calling LLM: %s', e)
 
     if (output is not None) and (not self.is_safe(output)):
       return ERROR_CALLING_LLM, False, output
@@ -202,28 +210,26 @@ class GeminiGcpWrapper(LlmWrapper, MultimodalLlmWrapper):
     Raises:
       RuntimeError:
     """
-    counter = self.max_retry
-    retry_delay = 1.0
     response = None
     if isinstance(contents, list):
       contents = self.convert_content(contents)
-    while counter > 0:
-      try:
-        response = self.llm.generate_content(
-            contents=contents,
-            safety_settings=safety_settings,
-            generation_config=generation_config,
-        )
-        return response.text, response
-      except Exception as e:  # pylint: disable=broad-exception-caught
-        counter -= 1
-        print('Error calling LLM, will retry in {retry_delay} seconds')
-        print(e)
-        if counter > 0:
-          # Expo backoff
-          time.sleep(retry_delay)
-          retry_delay *= 2
-    raise RuntimeError(f'Error calling LLM. {response}.')
+
+    def attempt() -> str:
+      nonlocal response
+      response = self.llm.generate_content(
+          contents=contents,
+          safety_settings=safety_settings,
+          generation_config=generation_config,
+      )
+      return response.text
+
+    try:
+      text = llm_retry.call_with_retry(
+          attempt, self.retry_policy, llm_retry.circuit_breaker('gemini')
+      )
+    except Exception as e:  # pylint: disable=broad-exception-caught
+      raise RuntimeError(f'Error calling LLM. {response}.') from e
+    return text, response
 
   def convert_content(
       self,
@@ -250,15 +256,24 @@ class Gpt4Wrapper(LlmWrapper, MultimodalLlmWrapper):
     max_retry: Max number of retries when some error happens.
     temperature: The temperature parameter in LLM to control result stability.
     model: GPT model to use based on if it is multimodal.
+    enable_cache_control: Whether to split the prompt at its cache breakpoints
+      and mark the leading segments as cacheable. Only useful for endpoints
+      that accept `cache_control` on content blocks; otherwise the breakpoints
+      are removed.
+    scheduler: If provided, requests go through this scheduler, which can be
+      shared by agents running in parallel to stay within rate limits.
+    retry_policy: How failed requests are retried. Defaults to `max_retry`
+      attempts with jittered exponential backoff.
   """
 
-  RETRY_WAITING_SECONDS = 20
-
   def __init__(
       self,
       model_name: str,
       max_retry: int = 3,
       temperature: float = 0.0,
+      enable_cache_control: bool = False,
+      scheduler: llm_scheduler.LlmScheduler | None = None,
+      retry_policy: llm_retry.RetryPolicy | None = None,
   ):
     if 'OPENAI_API_KEY' not in os.environ:
       raise RuntimeError('OpenAI API key not set.')
@@ -274,6 +289,11 @@ class Gpt4Wrapper(LlmWrapper, MultimodalLlmWrapper):
     self.max_retry = min(max_retry, 5)
     self.temperature = temperature
     self.model = model_name
+    self.enable_cache_control = enable_cache_control
+    self.scheduler = scheduler
+    self.retry_policy = retry_policy or llm_retry.RetryPolicy(
+        max_attempts=self.max_retry
+    )
 
   @classmethod
   def encode_image(cls, image: np.ndarray) -> str:
@@ -285,6 +305,33 @@ class Gpt4Wrapper(LlmWrapper, MultimodalLlmWrapper):
   ) -> tuple[str, Optional[bool], Any]:
     return self.predict_mm(text_prompt, [])
 
+  def _text_content(self, text_prompt: str) -> list[dict[str, Any]]:
+    """Builds the text content blocks for a prompt."""
+    if not self.enable_cache_control:
+      return [{
+          'type': 'text',
+          'text': prompt_utils.strip_cache_breakpoints(text_prompt),
+      }]
+    segments = prompt_utils.split_cache_segments(text_prompt)
+    content = [{'type': 'text', 'text': segment} for segment in segments]
+    for block in content[:-1]:
+      block['cache_control'] = {'type': 'ephemeral'}
+    return content
+
+  def _post(
+      self, headers: dict[str, str], payload: dict[str, Any]
+  ) -> requests.Response:
+    def post() -> requests.Response:
+      return requests.post(self.openai_api_url, headers=headers, json=payload)
+
+    if self.scheduler is None:
+      return post()
+    return self.scheduler.call(
+        post,
+        tokens=llm_scheduler.estimate_request_tokens(payload),
+        key=llm_scheduler.request_key(payload),
+    )
+
   def predict_mm(
       self, text_prompt: str, images: list[np.ndarray]
   ) -> tuple[str, Optional[bool], Any]:
@@ -298,9 +345,7 @@ class Gpt4Wrapper(LlmWrapper, MultimodalLlmWrapper):
         'temperature': self.temperature,
         'messages': [{
             'role': 'user',
-            'content': [
-                {'type': 'text', 'text': text_prompt},
-            ],
+            'content': self._text_content(text_prompt),
         }],
         'max_tokens': 1000,
     }
@@ -315,36 +360,22 @@ class Gpt4Wrapper(LlmWrapper, MultimodalLlmWrapper):
           },
       })
 
-    counter = self.max_retry
-    wait_seconds = self.RETRY_WAITING_SECONDS
-    while counter > 0:
-      try:
-
-        # print("payload  \n\n", payload)
-        response = requests.post(
-            # 'https://api.openai.com/v1/chat/completions',
-            self.openai_api_url,
-            headers=headers,
-            json=payload,
-        )
-        # print("response \n\n", response.json())
-        if response.ok and 'choices' in response.json():
-          return (
-              response.json()['choices'][0]['message']['content'],
-              None,
-              response,
-          )
-        print(
-            'Error calling OpenAI API with error message: '
-            + response.json()['error']['message']
-        )
-        time.sleep(wait_seconds)
-        wait_seconds *= 2
-      except Exception as e:  # pylint: disable=broad-exception-caught
-        # Want to catch all exceptions happened during LLM calls.
-        time.sleep(wait_seconds)
-        wait_seconds *= 2
-        counter -= 1
-        print('Error calling LLM, will retry soon...')
-        print(e)
+    def attempt() -> requests.Response:
+      response = self._post(headers, payload)
+      if response.ok and 'choices' in response.json():
+        return response
+      raise llm_retry.LlmRequestError.from_response(response)
+
+    try:
+      response = llm_retry.call_with_retry(
+          attempt, self.retry_policy, llm_retry.circuit_breaker('openai')
+      )
+      return (
+          response.json()['choices'][0]['message']['content'],
+          None,
+          response,
+      )
+    except Exception as e:  # pylint: disable=broad-exception-caught
+      # Want to catch all exceptions happened during LLM calls.
+      logging.warning('Error calling OpenAI API: %s', e)
     return ERROR_CALLING_LLM, None, None
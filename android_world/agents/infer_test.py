@@ -17,6 +17,8 @@ import time
 from unittest import mock
 from absl.testing import absltest
 from android_world.agents import infer
+from android_world.agents import llm_retry
+from android_world.agents import prompt_utils
 import google.ai.generativelanguage as glm
 import google.generativeai as genai
 from google.generativeai.types import answer_types
@@ -31,7 +33,9 @@ class InferTest(absltest.TestCase):
     self.mock_post = mock.patch.object(requests, "post").start()
     self.mock_sleep = mock.patch.object(time, "sleep").start()
     os.environ["OPENAI_API_KEY"] = "fake_api_key"
+    os.environ["OPENAI_API_URL"] = "fake_api_url"
     os.environ["GCP_API_KEY"] = "fake_api_key"
+    llm_retry.reset_circuit_breakers()
 
   def tearDown(self):
     super().tearDown()
@@ -131,6 +135,49 @@ class InferTest(absltest.TestCase):
     gpt4v.predict_mm("fake prompt", [])
     self.mock_sleep.assert_called_once()
 
+  def test_gpt4v_gives_up_on_persistent_errors(self):
+    gpt4v = infer.Gpt4Wrapper(model_name="gpt-4-turbo-2024-04-09")
+
+    mock_429_response = requests.Response()
+    mock_429_response.status_code = 429
+    mock_429_response._content = (
+        b'{"error": {"message": "Error 429: rate limit reached."}}'
+    )
+    self.mock_post.return_value = mock_429_response
+
+    text_output, _, _ = gpt4v.predict_mm("fake prompt", [])
+    self.assertEqual(text_output, infer.ERROR_CALLING_LLM)
+    self.assertEqual(self.mock_post.call_count, gpt4v.max_retry)
+
+  def test_gpt4v_cache_control(self):
+    mock_200_response = requests.Response()
+    mock_200_response.status_code = 200
+    mock_200_response._content = (
+        b'{"choices": [{"message": {"content": "ok."}}]}'
+    )
+    self.mock_post.return_value = mock_200_response
+    prompt = f"static{prompt_utils.CACHE_BREAKPOINT}step"
+
+    infer.Gpt4Wrapper(model_name="gpt-4o").predict(prompt)
+    content = self.mock_post.call_args.kwargs["json"]["messages"][0]["content"]
+    self.assertEqual(content, [{"type": "text", "text": "staticstep"}])
+
+    infer.Gpt4Wrapper(model_name="gpt-4o", enable_cache_control=True).predict(
+        prompt
+    )
+    content = self.mock_post.call_args.kwargs["json"]["messages"][0]["content"]
+    self.assertEqual(
+        content,
+        [
+            {
+                "type": "text",
+                "text": "static",
+                "cache_control": {"type": "ephemeral"},
+            },
+            {"type": "text", "text": "step"},
+        ],
+    )
+
 
 if __name__ == "__main__":
   absltest.main()
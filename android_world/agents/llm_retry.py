@@ -0,0 +1,335 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Retry policy shared by the LLM wrappers.
+
+Failed calls are retried with jittered exponential backoff, honoring
+`Retry-After` when the backend sends it. Client errors are not retried. A
+process-wide circuit breaker per backend stops calling a backend that keeps
+failing, and an optional deadline bounds the time spent on the calls of an
+agent step, so that episodes fail fast instead of waiting out outages.
+"""
+
+from collections.abc import Iterator
+import contextlib
+import dataclasses
+import email.utils
+import enum
+import random
+import threading
+import time
+from typing import Any, Callable, TypeVar
+
+from absl import logging
+from android_world.utils import metrics
+import requests
+
+_T = TypeVar('_T')
+
+
+class ErrorKind(enum.Enum):
+  """Classes of errors, which decide whether and how a call is retried."""
+
+  RATE_LIMIT = 'rate_limit'
+  SERVER = 'server'
+  NETWORK = 'network'
+  CLIENT = 'client'
+  UNKNOWN = 'unknown'
+
+
+# Errors that indicate the backend is unhealthy; they trip the circuit breaker.
+_BACKEND_ERRORS = (ErrorKind.SERVER, ErrorKind.NETWORK)
+
+
+class LlmRequestError(Exception):
+  """An LLM backend answered a request with an error."""
+
+  def __init__(
+      self,
+      message: str,
+      kind: ErrorKind,
+      retry_after_sec: float | None = None,
+  ):
+    super().__init__(message)
+    self.kind = kind
+    self.retry_after_sec = retry_after_sec
+
+  @classmethod
+  def from_response(cls, response: requests.Response) -> 'LlmRequestError':
+    """Creates the error for an HTTP response that has no usable result."""
+    try:
+      message = response.json()['error']['message']
+    except Exception:  # pylint: disable=broad-exception-caught
+      message = response.text[:200]
+    if response.ok:
+      kind = ErrorKind.UNKNOWN
+    else:
+      kind = classify_status(response.status_code)
+    return cls(
+        f'HTTP {response.status_code}: {message}',
+        kind,
+        parse_retry_after(response.headers.get('Retry-After')),
+    )
+
+
+class CircuitOpenError(Exception):
+  """The circuit breaker is open, so the backend is not called."""
+
+
+class DeadlineExceededError(Exception):
+  """There is no time left to retry within the deadline."""
+
+
+def classify_status(status_code: int) -> ErrorKind:
+  """Classifies an HTTP error status code."""
+  if status_code == 429:
+    return ErrorKind.RATE_LIMIT
+  if status_code == 408:
+    return ErrorKind.NETWORK
+  if status_code >= 500:
+    return ErrorKind.SERVER
+  if status_code >= 400:
+    return ErrorKind.CLIENT
+  return ErrorKind.UNKNOWN
+
+
+def classify_error(error: Exception) -> ErrorKind:
+  """Classifies an exception raised by an LLM call."""
+  if isinstance(error, LlmRequestError):
+    return error.kind
+  if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+    return ErrorKind.NETWORK
+  # Google API exceptions carry the HTTP status code.
+  code = getattr(error, 'code', None)
+  if isinstance(code, int):
+    return classify_status(code)
+  return ErrorKind.UNKNOWN
+
+
+def parse_retry_after(value: str | None) -> float | None:
+  """Parses a Retry-After header, given in seconds or as an HTTP date."""
+  if not value:
+    return None
+  try:
+    return max(0.0, float(value))
+  except ValueError:
+    pass
+  try:
+    date = email.utils.parsedate_to_datetime(value)
+  except (TypeError, ValueError):
+    return None
+  return max(0.0, date.timestamp() - time.time())
+
+
+@dataclasses.dataclass(frozen=True)
+class RetryPolicy:
+  """How failed LLM calls are retried.
+
+  Attributes:
+    max_attempts: Max number of attempts, including the first one.
+    initial_delay_sec: Upper bound of the first backoff delay.
+    max_delay_sec: Upper bound of any backoff delay.
+    multiplier: Growth of the delay bound per attempt.
+    deadline_sec: Max time for all attempts of one call; None for no limit.
+  """
+
+  max_attempts: int = 3
+  initial_delay_sec: float = 1.0
+  max_delay_sec: float = 30.0
+  multiplier: float = 2.0
+  deadline_sec: float | None = None
+
+  def backoff(
+      self,
+      attempt: int,
+      retry_after_sec: float | None = None,
+      rng: random.Random | None = None,
+  ) -> float:
+    """Returns the delay before the next attempt.
+
+    Uses "full jitter": a uniform delay up to the exponential bound, so that
+    clients that failed together do not retry together.
+
+    Args:
+      attempt: Number of attempts made so far, starting at 1.
+      retry_after_sec: Delay requested by the backend, if any.
+      rng: Random number generator.
+
+    Returns:
+      The delay in seconds.
+    """
+    bound = min(
+        self.max_delay_sec,
+        self.initial_delay_sec * self.multiplier ** (attempt - 1),
+    )
+    delay = (rng or random).uniform(0, bound)
+    if retry_after_sec is not None:
+      delay = max(delay, retry_after_sec)
+    return delay
+
+
+class CircuitBreaker:
+  """Stops calling a backend after consecutive failures.
+
+  After `failure_threshold` consecutive backend failures, calls fail
+  immediately for `reset_timeout_sec`. Then one trial call is let through; its
+  success closes the circuit again.
+  """
+
+  def __init__(
+      self,
+      failure_threshold: int = 5,
+      reset_timeout_sec: float = 60.0,
+      clock: Callable[[], float] = time.monotonic,
+  ):
+    self.failure_threshold = failure_threshold
+    self.reset_timeout_sec = reset_timeout_sec
+    self._clock = clock
+    self._lock = threading.Lock()
+    self._failures = 0
+    self._opened_at = None
+
+  def allow(self) -> bool:
+    """Returns whether a call may be made now."""
+    with self._lock:
+      if self._opened_at is None:
+        return True
+      if self._clock() - self._opened_at >= self.reset_timeout_sec:
+        # Half open: let one call through and restart the timeout.
+        self._opened_at = self._clock()
+        return True
+      return False
+
+  def record_success(self) -> None:
+    with self._lock:
+      self._failures = 0
+      self._opened_at = None
+
+  def record_failure(self) -> None:
+    with self._lock:
+      self._failures += 1
+      if self._failures >= self.failure_threshold:
+        if self._opened_at is None:
+          logging.warning(
+              'LLM backend failed %d times in a row, pausing calls for %.0fs.',
+              self._failures,
+              self.reset_timeout_sec,
+          )
+        self._opened_at = self._clock()
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def circuit_breaker(backend: str) -> CircuitBreaker:
+  """Returns the process-wide circuit breaker for a backend."""
+  with _breakers_lock:
+    if backend not in _breakers:
+      _breakers[backend] = CircuitBreaker()
+    return _breakers[backend]
+
+
+def reset_circuit_breakers() -> None:
+  """Forgets the state of all circuit breakers."""
+  with _breakers_lock:
+    _breakers.clear()
+
+
+_context = threading.local()
+
+
+@contextlib.contextmanager
+def deadline(seconds: float | None) -> Iterator[None]:
+  """Bounds the time LLM calls made in this thread may spend retrying.
+
+  Used to give each agent step a deadline. Nested deadlines can only shorten
+  the outer one.
+
+  Args:
+    seconds: Time from now; None for no deadline.
+
+  Yields:
+    None.
+  """
+  previous = getattr(_context, 'deadline', None)
+  if seconds is not None:
+    new = time.monotonic() + seconds
+    _context.deadline = new if previous is None else min(previous, new)
+  try:
+    yield
+  finally:
+    _context.deadline = previous
+
+
+def call_with_retry(
+    fn: Callable[[], _T],
+    policy: RetryPolicy,
+    breaker: CircuitBreaker | None = None,
+    sleep: Callable[[float], Any] | None = None,
+) -> _T:
+  """Calls fn, retrying failures according to the policy.
+
+  Args:
+    fn: Makes one attempt; raises on failure.
+    policy: The retry policy.
+    breaker: Circuit breaker of the backend called by fn.
+    sleep: Used to wait between attempts; defaults to time.sleep.
+
+  Returns:
+    The result of the first successful attempt.
+
+  Raises:
+    CircuitOpenError: If the breaker does not allow calls.
+    DeadlineExceededError: If the deadline passed before a successful attempt.
+    Exception: The error of the last attempt, if it is not retryable or there
+      are no attempts left.
+  """
+  sleep = sleep or time.sleep
+  end = getattr(_context, 'deadline', None)
+  if policy.deadline_sec is not None:
+    policy_end = time.monotonic() + policy.deadline_sec
+    end = policy_end if end is None else min(end, policy_end)
+
+  attempt = 0
+  while True:
+    if end is not None and time.monotonic() >= end:
+      raise DeadlineExceededError('Deadline passed before calling the LLM.')
+    if breaker is not None and not breaker.allow():
+      raise CircuitOpenError('LLM backend circuit breaker is open.')
+    attempt += 1
+    start = time.perf_counter()
+    try:
+      result = fn()
+    except Exception as e:  # pylint: disable=broad-exception-caught
+      metrics.LLM_LATENCY.observe(time.perf_counter() - start, outcome='error')
+      kind = classify_error(e)
+      if breaker is not None and kind in _BACKEND_ERRORS:
+        breaker.record_failure()
+      if kind == ErrorKind.CLIENT or attempt >= policy.max_attempts:
+        raise
+      delay = policy.backoff(attempt, getattr(e, 'retry_after_sec', None))
+      if end is not None and time.monotonic() + delay > end:
+        raise DeadlineExceededError(
+            f'No time left to retry after {kind.value} error: {e}'
+        ) from e
+      logging.warning(
+          'Error calling LLM (%s): %s. Retrying in %.1fs.', kind.value, e, delay
+      )
+      sleep(delay)
+      continue
+    metrics.LLM_LATENCY.observe(time.perf_counter() - start, outcome='ok')
+    if breaker is not None:
+      breaker.record_success()
+    return result
@@ -0,0 +1,148 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+from unittest import mock
+
+from absl.testing import absltest
+from android_world.agents import llm_retry
+import requests
+
+
+def _response(status_code: int, retry_after: str | None = None):
+  response = requests.Response()
+  response.status_code = status_code
+  response._content = b'{"error": {"message": "failed"}}'
+  if retry_after is not None:
+    response.headers['Retry-After'] = retry_after
+  return response
+
+
+class LlmRetryTest(absltest.TestCase):
+
+  def test_classify(self):
+    classify = llm_retry.classify_error
+    for status_code, kind in (
+        (429, llm_retry.ErrorKind.RATE_LIMIT),
+        (503, llm_retry.ErrorKind.SERVER),
+        (400, llm_retry.ErrorKind.CLIENT),
+    ):
+      error = llm_retry.LlmRequestError.from_response(_response(status_code))
+      self.assertEqual(classify(error), kind)
+    self.assertEqual(
+        classify(requests.ConnectionError()), llm_retry.ErrorKind.NETWORK
+    )
+    self.assertEqual(classify(ValueError()), llm_retry.ErrorKind.UNKNOWN)
+
+  def test_retry_after(self):
+    error = llm_retry.LlmRequestError.from_response(_response(429, '7'))
+
+    self.assertEqual(error.retry_after_sec, 7.0)
+    self.assertEqual(str(error), 'HTTP 429: failed')
+    self.assertIsNone(llm_retry.parse_retry_after('soon'))
+    self.assertEqual(
+        llm_retry.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0
+    )
+
+  def test_backoff(self):
+    policy = llm_retry.RetryPolicy(initial_delay_sec=1.0, max_delay_sec=3.0)
+    rng = random.Random(0)
+
+    for attempt in range(1, 6):
+      self.assertBetween(
+          policy.backoff(attempt, rng=rng), 0, min(3.0, 2 ** (attempt - 1))
+      )
+    self.assertEqual(policy.backoff(1, retry_after_sec=10, rng=rng), 10)
+
+  def test_retries_until_success(self):
+    fn = mock.Mock(
+        side_effect=[
+            llm_retry.LlmRequestError('busy', llm_retry.ErrorKind.SERVER),
+            'ok',
+        ]
+    )
+    sleep = mock.Mock()
+
+    result = llm_retry.call_with_retry(
+        fn, llm_retry.RetryPolicy(), llm_retry.CircuitBreaker(), sleep
+    )
+
+    self.assertEqual(result, 'ok')
+    sleep.assert_called_once()
+
+  def test_does_not_retry_client_errors(self):
+    fn = mock.Mock(
+        side_effect=llm_retry.LlmRequestError('bad', llm_retry.ErrorKind.CLIENT)
+    )
+
+    with self.assertRaises(llm_retry.LlmRequestError):
+      llm_retry.call_with_retry(fn, llm_retry.RetryPolicy(), sleep=mock.Mock())
+    fn.assert_called_once()
+
+  def test_gives_up_after_max_attempts(self):
+    fn = mock.Mock(side_effect=ValueError('no text'))
+
+    with self.assertRaises(ValueError):
+      llm_retry.call_with_retry(
+          fn, llm_retry.RetryPolicy(max_attempts=3), sleep=mock.Mock()
+      )
+    self.assertEqual(fn.call_count, 3)
+
+  def test_deadline(self):
+    fn = mock.Mock(
+        side_effect=llm_retry.LlmRequestError(
+            'slow down', llm_retry.ErrorKind.RATE_LIMIT, retry_after_sec=60
+        )
+    )
+    sleep = mock.Mock()
+
+    with llm_retry.deadline(5):
+      with self.assertRaises(llm_retry.DeadlineExceededError):
+        llm_retry.call_with_retry(fn, llm_retry.RetryPolicy(), sleep=sleep)
+    fn.assert_called_once()
+    sleep.assert_not_called()
+
+  def test_circuit_breaker(self):
+    now = [0.0]
+    breaker = llm_retry.CircuitBreaker(
+        failure_threshold=2, reset_timeout_sec=10, clock=lambda: now[0]
+    )
+    fn = mock.Mock(side_effect=requests.ConnectionError())
+
+    # The breaker opens after the second failure and stops the retries.
+    with self.assertRaises(llm_retry.CircuitOpenError):
+      llm_retry.call_with_retry(
+          fn, llm_retry.RetryPolicy(max_attempts=5), breaker, sleep=mock.Mock()
+      )
+    self.assertEqual(fn.call_count, 2)
+    with self.assertRaises(llm_retry.CircuitOpenError):
+      llm_retry.call_with_retry(fn, llm_retry.RetryPolicy(), breaker)
+
+    now[0] = 10.0
+    self.assertEqual(
+        llm_retry.call_with_retry(
+            lambda: 'ok', llm_retry.RetryPolicy(), breaker
+        ),
+        'ok',
+    )
+    self.assertTrue(breaker.allow())
+
+  def test_circuit_breaker_is_shared(self):
+    self.assertIs(
+        llm_retry.circuit_breaker('openai'), llm_retry.circuit_breaker('openai')
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
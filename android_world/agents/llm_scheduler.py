@@ -0,0 +1,332 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Shared scheduler for LLM requests issued by concurrently running agents.
+
+Agents running in parallel threads submit their requests to one scheduler,
+which keeps the provider rate limits (requests and tokens per minute), runs up
+to a fixed number of requests concurrently, shares the result of identical
+in-flight requests and, when requests queue up, serves the episodes that are
+closest to their step budget first.
+"""
+
+from collections.abc import Iterator
+import concurrent.futures
+import contextlib
+import dataclasses
+import hashlib
+import heapq
+import itertools
+import json
+import sys
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+from android_world.agents import prompt_utils
+from android_world.utils import metrics
+
+# Rough cost of one high detail image in OpenAI's token accounting.
+_TOKENS_PER_IMAGE = 765
+
+_context = threading.local()
+
+
+@contextlib.contextmanager
+def steps_remaining(n: int) -> Iterator[None]:
+  """Tags LLM requests made in this thread with the episode's remaining steps.
+
+  Requests from episodes with fewer remaining steps are dispatched first.
+
+  Args:
+    n: Number of steps left in the episode's budget.
+
+  Yields:
+    None.
+  """
+  previous = getattr(_context, 'steps_remaining', None)
+  _context.steps_remaining = n
+  try:
+    yield
+  finally:
+    _context.steps_remaining = previous
+
+
+def current_priority() -> int:
+  """Returns the priority of requests made in this thread; lower goes first."""
+  n = getattr(_context, 'steps_remaining', None)
+  return sys.maxsize if n is None else n
+
+
+def estimate_request_tokens(payload: dict[str, Any]) -> int:
+  """Estimates what a chat completions request counts against token limits.
+
+  Like the OpenAI rate limiter, this counts the requested max output tokens.
+
+  Args:
+    payload: The request body.
+
+  Returns:
+    The estimated number of tokens.
+  """
+  messages = payload.get('messages', [])
+  num_images = sum(
+      1
+      for message in messages
+      if not isinstance(message['content'], str)
+      for item in message['content']
+      if item.get('type') == 'image_url'
+  )
+  return (
+      prompt_utils.estimate_tokens(prompt_utils.prompt_text(messages))
+      + num_images * _TOKENS_PER_IMAGE
+      + payload.get('max_tokens', 0)
+  )
+
+
+def request_key(payload: dict[str, Any]) -> str | None:
+  """Returns a key under which identical requests can share a response.
+
+  Only deterministic requests (temperature 0) share responses; with a positive
+  temperature identical requests are meant to sample different candidates.
+
+  Args:
+    payload: The request body.
+
+  Returns:
+    The key, or None if the request should not be shared.
+  """
+  if payload.get('temperature', 1.0) != 0:
+    return None
+  data = json.dumps(payload, sort_keys=True).encode('utf-8')
+  return hashlib.sha256(data).hexdigest()
+
+
+class TokenBucket:
+  """Token bucket refilled continuously at a fixed rate. Not thread-safe."""
+
+  def __init__(
+      self,
+      rate_per_sec: float,
+      capacity: float,
+      clock: Callable[[], float] = time.monotonic,
+  ):
+    self.rate_per_sec = rate_per_sec
+    self.capacity = capacity
+    self._clock = clock
+    self._tokens = capacity
+    self._last = clock()
+
+  def _refill(self) -> None:
+    now = self._clock()
+    self._tokens = min(
+        self.capacity, self._tokens + (now - self._last) * self.rate_per_sec
+    )
+    self._last = now
+
+  def wait_time(self, amount: float) -> float:
+    """Returns seconds until `amount` tokens are available."""
+    self._refill()
+    amount = min(amount, self.capacity)
+    if self._tokens >= amount:
+      return 0.0
+    return (amount - self._tokens) / self.rate_per_sec
+
+  def consume(self, amount: float) -> None:
+    self._refill()
+    self._tokens -= min(amount, self.capacity)
+
+
+@dataclasses.dataclass(frozen=True)
+class RateLimits:
+  """Provider limits enforced by the scheduler.
+
+  Attributes:
+    requests_per_minute: Max requests started per minute; None for no limit.
+    tokens_per_minute: Max tokens (prompt plus max output) per minute; None
+      for no limit.
+    max_concurrency: Max number of requests in flight.
+  """
+
+  requests_per_minute: float | None = None
+  tokens_per_minute: float | None = None
+  max_concurrency: int = 8
+
+
+@dataclasses.dataclass
+class SchedulerStats:
+  """Counters describing how requests were scheduled.
+
+  Attributes:
+    submitted: Requests submitted.
+    coalesced: Requests that shared the result of an identical request.
+    dispatched: Requests sent to the backend.
+    queue_seconds: Total time requests spent waiting to be dispatched.
+  """
+
+  submitted: int = 0
+  coalesced: int = 0
+  dispatched: int = 0
+  queue_seconds: float = 0.0
+
+
+@dataclasses.dataclass(order=True)
+class _Request:
+  priority: int
+  seq: int
+  fn: Callable[[], Any] = dataclasses.field(compare=False)
+  tokens: int = dataclasses.field(compare=False)
+  key: Hashable | None = dataclasses.field(compare=False)
+  future: concurrent.futures.Future[Any] = dataclasses.field(compare=False)
+  submit_time: float = dataclasses.field(compare=False)
+
+
+class LlmScheduler:
+  """Dispatches LLM requests within rate limits, by priority."""
+
+  def __init__(
+      self,
+      limits: RateLimits = RateLimits(),
+      clock: Callable[[], float] = time.monotonic,
+  ):
+    self.limits = limits
+    self._clock = clock
+    if limits.requests_per_minute:
+      self._requests_bucket = TokenBucket(
+          limits.requests_per_minute / 60, limits.requests_per_minute, clock
+      )
+    else:
+      self._requests_bucket = None
+    if limits.tokens_per_minute:
+      self._tokens_bucket = TokenBucket(
+          limits.tokens_per_minute / 60, limits.tokens_per_minute, clock
+      )
+    else:
+      self._tokens_bucket = None
+    self._queue: list[_Request] = []
+    self._in_flight: dict[Hashable, concurrent.futures.Future[Any]] = {}
+    self._seq = itertools.count()
+    self._cv = threading.Condition()
+    self._slots = threading.Semaphore(limits.max_concurrency)
+    self._executor = concurrent.futures.ThreadPoolExecutor(
+        limits.max_concurrency, thread_name_prefix='llm_scheduler'
+    )
+    self._closed = False
+    self.stats = SchedulerStats()
+    self._dispatcher = threading.Thread(
+        target=self._dispatch_loop, name='llm_scheduler_dispatch', daemon=True
+    )
+    self._dispatcher.start()
+
+  def submit(
+      self,
+      fn: Callable[[], Any],
+      tokens: int = 0,
+      key: Hashable | None = None,
+      priority: int | None = None,
+  ) -> concurrent.futures.Future[Any]:
+    """Schedules a request.
+
+    Args:
+      fn: Sends the request and returns its result.
+      tokens: Tokens the request counts against the token limit.
+      key: If given, requests with the same key that are queued or in flight
+        share one call to the backend.
+      priority: Lower values are dispatched first. Defaults to the remaining
+        steps set with `steps_remaining`.
+
+    Returns:
+      Future for the result of `fn`.
+    """
+    with self._cv:
+      if self._closed:
+        raise RuntimeError('Scheduler is closed.')
+      self.stats.submitted += 1
+      if key is not None and key in self._in_flight:
+        self.stats.coalesced += 1
+        return self._in_flight[key]
+      future = concurrent.futures.Future()
+      if key is not None:
+        self._in_flight[key] = future
+      heapq.heappush(
+          self._queue,
+          _Request(
+              priority=current_priority() if priority is None else priority,
+              seq=next(self._seq),
+              fn=fn,
+              tokens=tokens,
+              key=key,
+              future=future,
+              submit_time=self._clock(),
+          ),
+      )
+      metrics.QUEUE_DEPTH.set(len(self._queue), queue='llm_scheduler')
+      self._cv.notify()
+      return future
+
+  def call(self, fn: Callable[[], Any], **kwargs) -> Any:
+    """Submits a request and waits for its result."""
+    return self.submit(fn, **kwargs).result()
+
+  def _wait_time(self, tokens: int) -> float:
+    wait = 0.0
+    if self._requests_bucket is not None:
+      wait = max(wait, self._requests_bucket.wait_time(1))
+    if self._tokens_bucket is not None:
+      wait = max(wait, self._tokens_bucket.wait_time(tokens))
+    return wait
+
+  def _dispatch_loop(self) -> None:
+    while True:
+      with self._cv:
+        while not self._queue and not self._closed:
+          self._cv.wait()
+        if not self._queue:
+          return
+        wait = self._wait_time(self._queue[0].tokens)
+        if wait > 0:
+          # Woken up early if a more urgent request arrives.
+          self._cv.wait(timeout=wait)
+          continue
+        request = heapq.heappop(self._queue)
+        metrics.QUEUE_DEPTH.set(len(self._queue), queue='llm_scheduler')
+        if self._requests_bucket is not None:
+          self._requests_bucket.consume(1)
+        if self._tokens_bucket is not None:
+          self._tokens_bucket.consume(request.tokens)
+        self.stats.dispatched += 1
+        self.stats.queue_seconds += self._clock() - request.submit_time
+      self._slots.acquire()
+      self._executor.submit(self._run, request)
+
+  def _run(self, request: _Request) -> None:
+    try:
+      if request.future.set_running_or_notify_cancel():
+        try:
+          request.future.set_result(request.fn())
+        except Exception as e:  # pylint: disable=broad-exception-caught
+          request.future.set_exception(e)
+    finally:
+      self._slots.release()
+      if request.key is not None:
+        with self._cv:
+          self._in_flight.pop(request.key, None)
+
+  def close(self) -> None:
+    """Dispatches the queued requests, then stops the scheduler."""
+    with self._cv:
+      self._closed = True
+      self._cv.notify()
+    self._dispatcher.join()
+    self._executor.shutdown(wait=True)
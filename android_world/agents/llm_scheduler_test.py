@@ -0,0 +1,134 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+from absl.testing import absltest
+from android_world.agents import llm_scheduler
+
+
+class TokenBucketTest(absltest.TestCase):
+
+  def test_refills_over_time(self):
+    now = [0.0]
+    bucket = llm_scheduler.TokenBucket(10, 20, clock=lambda: now[0])
+
+    self.assertEqual(bucket.wait_time(20), 0.0)
+    bucket.consume(20)
+    self.assertAlmostEqual(bucket.wait_time(5), 0.5)
+    now[0] = 0.5
+    self.assertEqual(bucket.wait_time(5), 0.0)
+    # Requests larger than the capacity only wait for a full bucket.
+    self.assertAlmostEqual(bucket.wait_time(100), 1.5)
+
+
+class LlmSchedulerTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.release = threading.Event()
+    self.order = []
+
+  def _blocking(self):
+    self.release.wait()
+    return 'blocked'
+
+  def _record(self, value):
+    def fn():
+      self.order.append(value)
+      return value
+
+    return fn
+
+  def test_dispatches_by_priority(self):
+    scheduler = llm_scheduler.LlmScheduler(
+        llm_scheduler.RateLimits(max_concurrency=1)
+    )
+    blocked = scheduler.submit(self._blocking, priority=0)
+    time.sleep(0.05)
+    later = scheduler.submit(self._record(5), priority=5)
+    with llm_scheduler.steps_remaining(1):
+      sooner = scheduler.submit(self._record(1))
+    self.release.set()
+
+    self.assertEqual(blocked.result(), 'blocked')
+    self.assertEqual(later.result(), 5)
+    self.assertEqual(sooner.result(), 1)
+    self.assertEqual(self.order, [1, 5])
+    scheduler.close()
+
+  def test_coalesces_identical_requests(self):
+    scheduler = llm_scheduler.LlmScheduler()
+    calls = []
+
+    def fn():
+      calls.append(1)
+      self.release.wait()
+      return 'ok'
+
+    first = scheduler.submit(fn, key='same')
+    second = scheduler.submit(fn, key='same')
+    self.release.set()
+
+    self.assertIs(first, second)
+    self.assertEqual(first.result(), 'ok')
+    self.assertLen(calls, 1)
+    self.assertEqual(scheduler.stats.coalesced, 1)
+    scheduler.close()
+
+  def test_enforces_token_limit(self):
+    scheduler = llm_scheduler.LlmScheduler(
+        llm_scheduler.RateLimits(tokens_per_minute=6000)
+    )
+    start = time.monotonic()
+    scheduler.call(self._record(1), tokens=6000)
+    scheduler.call(self._record(2), tokens=30)
+
+    self.assertGreaterEqual(time.monotonic() - start, 0.25)
+    self.assertEqual(self.order, [1, 2])
+    scheduler.close()
+
+  def test_propagates_exceptions(self):
+    scheduler = llm_scheduler.LlmScheduler()
+
+    def fail():
+      raise ValueError('boom')
+
+    with self.assertRaisesRegex(ValueError, 'boom'):
+      scheduler.call(fail)
+    scheduler.close()
+
+  def test_request_helpers(self):
+    payload = {
+        'temperature': 0.0,
+        'max_tokens': 100,
+        'messages': [{
+            'role': 'user',
+            'content': [
+                {'type': 'text', 'text': 'abcd' * 10},
+                {'type': 'image_url', 'image_url': {'url': 'data:'}},
+            ],
+        }],
+    }
+
+    self.assertEqual(llm_scheduler.estimate_request_tokens(payload), 875)
+    self.assertIsNotNone(llm_scheduler.request_key(payload))
+    self.assertIsNone(
+        llm_scheduler.request_key(payload | {'temperature': 0.7})
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -21,9 +21,11 @@ from android_world.agents import agent_utils
 from android_world.agents import base_agent
 from android_world.agents import infer
 from android_world.agents import m3a_utils
+from android_world.agents import prompt_utils
 from android_world.env import interface
 from android_world.env import json_action
 from android_world.env import representation_utils
+from android_world.utils import tracing
 
 PROMPT_PREFIX = (
     'You are an agent who can operate an Android phone on behalf of a user.'
@@ -169,6 +171,33 @@ ACTION_SELECTION_PROMPT_TEMPLATE = (
 )
 
 
+# Same content as above, but ordered from least to most frequently changing
+# (static instructions, then per-task content, then per-step content) so that
+# consecutive prompts share a long prefix for provider-side prompt caching.
+CACHE_FRIENDLY_ACTION_SELECTION_PROMPT_TEMPLATE = (
+    PROMPT_PREFIX
+    + '\n'
+    + GUIDANCE
+    + '{cache_breakpoint}'
+    + '\nThe current user goal/request is: {goal}\n'
+    + '{additional_guidelines}'
+    + '{cache_breakpoint}'
+    + '\nHere is a history of what you have done so far:\n{history}\n\n'
+    'The current screenshot and the same screenshot with bounding boxes'
+    ' and labels added are also given to you.\n'
+    'Here is a list of detailed'
+    ' information for some of the UI elements (notice that some elements in'
+    ' this list may not be visible in the current screen and so you can not'
+    ' interact with it, can try to scroll the screen to reveal it first),'
+    ' the numeric indexes are'
+    ' consistent with the ones in the labeled screenshot:\n{ui_elements}\n'
+    '\nNow output an action from the above list in the correct JSON format,'
+    ' following the reason why you do that. Your answer should look like:\n'
+    'Reason: ...\nAction: {{"action_type":...}}\n\n'
+    'Your Answer:\n'
+)
+
+
 SUMMARY_PROMPT_TEMPLATE = (
     PROMPT_PREFIX
     + '\nThe (overall) user goal/request is: {goal}\n'
@@ -202,69 +231,76 @@ SUMMARY_PROMPT_TEMPLATE = (
 
 
 def _generate_ui_element_description(
-    ui_element: representation_utils.UIElement, index: int
+    ui_element: representation_utils.UIElement,
+    index: int,
+    compact_flags: bool = False,
 ) -> str:
   """Generate a description for a given UI element with important information.
 
   Args:
     ui_element: UI elements for the current screen.
     index: The numeric index for the UI element.
+    compact_flags: Whether to omit boolean flags that are False.
 
   Returns:
     The description for the UI element.
   """
-  element_description = f'UI element {index}: {{"index": {index}, '
+  fields = [f'"index": {index}']
   if ui_element.text:
-    element_description += f'"text": "{ui_element.text}", '
+    fields.append(f'"text": "{ui_element.text}"')
   if ui_element.content_description:
-    element_description += (
-        f'"content_description": "{ui_element.content_description}", '
+    fields.append(
+        f'"content_description": "{ui_element.content_description}"'
     )
   if ui_element.hint_text:
-    element_description += f'"hint_text": "{ui_element.hint_text}", '
+    fields.append(f'"hint_text": "{ui_element.hint_text}"')
   if ui_element.tooltip:
-    element_description += f'"tooltip": "{ui_element.tooltip}", '
-  element_description += (
-      f'"is_clickable": {"True" if ui_element.is_clickable else "False"}, '
-  )
-  element_description += (
-      '"is_long_clickable":'
-      f' {"True" if ui_element.is_long_clickable else "False"}, '
-  )
-  element_description += (
-      f'"is_editable": {"True" if ui_element.is_editable else "False"}, '
-  )
-  if ui_element.is_scrollable:
-    element_description += '"is_scrollable": True, '
-  if ui_element.is_focusable:
-    element_description += '"is_focusable": True, '
-  element_description += (
-      f'"is_selected": {"True" if ui_element.is_selected else "False"}, '
-  )
-  element_description += (
-      f'"is_checked": {"True" if ui_element.is_checked else "False"}, '
-  )
-  return element_description[:-2] + '}'
+    fields.append(f'"tooltip": "{ui_element.tooltip}"')
+  flags = [
+      ('is_clickable', ui_element.is_clickable, True),
+      ('is_long_clickable', ui_element.is_long_clickable, True),
+      ('is_editable', ui_element.is_editable, True),
+      ('is_scrollable', ui_element.is_scrollable, False),
+      ('is_focusable', ui_element.is_focusable, False),
+      ('is_selected', ui_element.is_selected, True),
+      ('is_checked', ui_element.is_checked, True),
+  ]
+  for name, value, always_shown in flags:
+    if value:
+      fields.append(f'"{name}": True')
+    elif always_shown and not compact_flags:
+      fields.append(f'"{name}": False')
+  return f'UI element {index}: {{{", ".join(fields)}}}'
 
 
 def _generate_ui_elements_description_list(
     ui_elements: list[representation_utils.UIElement],
     screen_width_height_px: tuple[int, int],
+    prompt_budget: prompt_utils.PromptBudget | None = None,
 ) -> str:
   """Generate concise information for a list of UIElement.
 
   Args:
     ui_elements: UI elements for the current screen.
     screen_width_height_px: The height and width of the screen in pixels.
+    prompt_budget: If provided, controls how the list is compacted.
 
   Returns:
     Concise information for each UIElement.
   """
-  tree_info = ''
-  for index, ui_element in enumerate(ui_elements):
-    if m3a_utils.validate_ui_element(ui_element, screen_width_height_px):
-      tree_info += _generate_ui_element_description(ui_element, index) + '\n'
-  return tree_info
+  selected = prompt_utils.select_ui_elements(
+      ui_elements,
+      screen_width_height_px,
+      drop_duplicates=bool(
+          prompt_budget and prompt_budget.drop_duplicate_elements
+      ),
+  )
+  compact_flags = bool(prompt_budget and prompt_budget.compact_flags)
+  return ''.join(
+      _generate_ui_element_description(ui_element, index, compact_flags)
+      + '\n'
+      for index, ui_element in selected
+  )
 
 
 def _action_selection_prompt(
@@ -272,6 +308,8 @@ def _action_selection_prompt(
     history: list[str],
     ui_elements: str,
     additional_guidelines: list[str] | None = None,
+    prompt_budget: prompt_utils.PromptBudget | None = None,
+    cache_friendly: bool = False,
 ) -> str:
   """Generate the prompt for the action selection.
 
@@ -280,26 +318,50 @@ def _action_selection_prompt(
     history: Summaries for previous steps.
     ui_elements: A list of descriptions for the UI elements.
     additional_guidelines: Task specific guidelines.
+    prompt_budget: If provided, older history is windowed and the prompt is
+      truncated to fit in the budget.
+    cache_friendly: Whether to use the prompt layout that puts static content
+      first, with cache breakpoints after the static and per-task parts.
 
   Returns:
     The text prompt for action selection that will be sent to gpt4v.
   """
-  if history:
-    history = '\n'.join(history)
-  else:
-    history = 'You just started, no action has been performed yet.'
-
   extra_guidelines = ''
   if additional_guidelines:
-    extra_guidelines = 'For The Current Task:\n'
-    for guideline in additional_guidelines:
-      extra_guidelines += f'- {guideline}\n'
+    extra_guidelines = 'For The Current Task:\n' + ''.join(
+        f'- {guideline}\n' for guideline in additional_guidelines
+    )
 
-  return ACTION_SELECTION_PROMPT_TEMPLATE.format(
-      goal=goal,
-      history=history,
-      ui_elements=ui_elements if ui_elements else 'Not available',
-      additional_guidelines=extra_guidelines,
+  if cache_friendly:
+    template = CACHE_FRIENDLY_ACTION_SELECTION_PROMPT_TEMPLATE.replace(
+        '{cache_breakpoint}', prompt_utils.CACHE_BREAKPOINT
+    )
+  else:
+    template = ACTION_SELECTION_PROMPT_TEMPLATE
+
+  def render(history: list[str], ui_element_lines: list[str]) -> str:
+    return template.format(
+        goal=goal,
+        history='\n'.join(history)
+        if history
+        else 'You just started, no action has been performed yet.',
+        ui_elements=''.join(line + '\n' for line in ui_element_lines)
+        if ui_element_lines
+        else 'Not available',
+        additional_guidelines=extra_guidelines,
+    )
+
+  if prompt_budget is None:
+    return render(history, ui_elements.splitlines())
+  return prompt_utils.fit_to_budget(
+      render,
+      prompt_utils.window_history(
+          history,
+          prompt_budget.max_history_entries,
+          prompt_budget.summary_chars,
+      ),
+      ui_elements.splitlines(),
+      prompt_budget,
   )
 
 
@@ -340,6 +402,8 @@ class M3A(base_agent.EnvironmentInteractingAgent):
       llm: infer.MultimodalLlmWrapper,
       name: str = 'M3A',
       wait_after_action_seconds: float = 2.0,
+      prompt_budget: prompt_utils.PromptBudget | None = None,
+      cache_friendly_prompts: bool = False,
   ):
     """Initializes a M3A Agent.
 
@@ -349,12 +413,19 @@ class M3A(base_agent.EnvironmentInteractingAgent):
       name: The agent name.
       wait_after_action_seconds: Seconds to wait for the screen to stablize
         after executing an action
+      prompt_budget: If provided, compacts the UI element lists and history in
+        prompts and bounds the action selection prompt size.
+      cache_friendly_prompts: Whether to lay out action selection prompts so
+        that consecutive steps share a long prefix, with cache breakpoints
+        that the LLM wrapper can turn into provider cache control.
     """
     super().__init__(env, name)
     self.llm = llm
     self.history = []
     self.additional_guidelines = None
     self.wait_after_action_seconds = wait_after_action_seconds
+    self.prompt_budget = prompt_budget
+    self.cache_friendly_prompts = cache_friendly_prompts
 
   def set_task_guidelines(self, task_guidelines: list[str]) -> None:
     self.additional_guidelines = task_guidelines
@@ -390,7 +461,7 @@ class M3A(base_agent.EnvironmentInteractingAgent):
     before_ui_elements = state.ui_elements
     step_data['before_ui_elements'] = before_ui_elements
     before_ui_elements_list = _generate_ui_elements_description_list(
-        before_ui_elements, logical_screen_size
+        before_ui_elements, logical_screen_size, self.prompt_budget
     )
     step_data['raw_screenshot'] = state.pixels.copy()
     before_screenshot = state.pixels.copy()
@@ -414,15 +485,18 @@ class M3A(base_agent.EnvironmentInteractingAgent):
         ],
         before_ui_elements_list,
         self.additional_guidelines,
+        self.prompt_budget,
+        self.cache_friendly_prompts,
     )
     step_data['action_prompt'] = action_prompt
-    action_output, is_safe, raw_response = self.llm.predict_mm(
-        action_prompt,
-        [
-            step_data['raw_screenshot'],
-            before_screenshot,
-        ],
-    )
+    with tracing.span('agent.llm.action_selection'):
+      action_output, is_safe, raw_response = self.llm.predict_mm(
+          action_prompt,
+          [
+              step_data['raw_screenshot'],
+              before_screenshot,
+          ],
+      )
 
     if is_safe == False:  # pylint: disable=singleton-comparison
       #  is_safe could be None
@@ -541,7 +615,7 @@ Action: {{"action_type": "status", "goal_status": "infeasible"}}"""
     physical_frame_boundary = self.env.physical_frame_boundary
     after_ui_elements = state.ui_elements
     after_ui_elements_list = _generate_ui_elements_description_list(
-        after_ui_elements, logical_screen_size
+        after_ui_elements, logical_screen_size, self.prompt_budget
     )
     after_screenshot = state.pixels.copy()
     for index, ui_element in enumerate(after_ui_elements):
@@ -568,13 +642,14 @@ Action: {{"action_type": "status", "goal_status": "infeasible"}}"""
         before_ui_elements_list,
         after_ui_elements_list,
     )
-    summary, is_safe, raw_response = self.llm.predict_mm(
-        summary_prompt,
-        [
-            before_screenshot,
-            after_screenshot,
-        ],
-    )
+    with tracing.span('agent.llm.summary'):
+      summary, is_safe, raw_response = self.llm.predict_mm(
+          summary_prompt,
+          [
+              before_screenshot,
+              after_screenshot,
+          ],
+      )
 
     if is_safe == False:  # pylint: disable=singleton-comparison
       #  is_safe could be None
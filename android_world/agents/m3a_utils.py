@@ -420,6 +420,10 @@ def generate_eval_html_report(
   Notice that the task_results MUST be obtained by the suite_utils.run function
   (or loaded using Checkpointer) with one of the supported agent type.
 
+  All results and screenshots are held in memory and inlined in one string; for
+  large runs, use `html_report.write_report`, which streams a run's checkpoint
+  directory.
+
   Sample usage:
     # import webbrowser
     # agent = m3a.M3A(...)
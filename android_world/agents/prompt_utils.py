@@ -0,0 +1,298 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Utilities for assembling size-bounded agent prompts."""
+
+import dataclasses
+from typing import Any, Callable
+
+from android_world.agents import m3a_utils
+from android_world.env import representation_utils
+
+# Rough average for English text and JSON-ish element descriptions; good
+# enough to keep prompts within budget without depending on a tokenizer.
+_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+  """Returns a cheap estimate of the number of tokens in text."""
+  return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+
+
+@dataclasses.dataclass(frozen=True)
+class PromptBudget:
+  """Controls how agent prompts are compacted.
+
+  Attributes:
+    max_tokens: Upper bound for the size of a rendered prompt. If None, no
+      truncation happens and only the compaction options below apply.
+    compact_flags: Whether to omit boolean flags that are False from UI element
+      descriptions.
+    drop_duplicate_elements: Whether to drop UI elements that have the same
+      content and bounding box as an earlier element.
+    max_history_entries: Number of most recent history entries kept verbatim.
+      Older entries are shortened to `summary_chars`. If None, all entries are
+      kept verbatim.
+    summary_chars: Max number of characters kept for older history entries.
+    token_counter: Function used to measure prompt size.
+  """
+
+  max_tokens: int | None = None
+  compact_flags: bool = True
+  drop_duplicate_elements: bool = True
+  max_history_entries: int | None = None
+  summary_chars: int = 80
+  token_counter: Callable[[str], int] = estimate_tokens
+
+
+def _element_key(
+    ui_element: representation_utils.UIElement,
+) -> tuple[object, ...]:
+  bbox = ui_element.bbox_pixels
+  return (
+      ui_element.text,
+      ui_element.content_description,
+      ui_element.hint_text,
+      ui_element.tooltip,
+      ui_element.class_name,
+      (bbox.x_min, bbox.x_max, bbox.y_min, bbox.y_max) if bbox else None,
+  )
+
+
+def select_ui_elements(
+    ui_elements: list[representation_utils.UIElement],
+    screen_width_height_px: tuple[int, int],
+    drop_duplicates: bool = False,
+) -> list[tuple[int, representation_utils.UIElement]]:
+  """Selects the UI elements worth describing in a prompt.
+
+  Args:
+    ui_elements: UI elements for the current screen.
+    screen_width_height_px: The logical screen size.
+    drop_duplicates: Whether to drop elements with the same content and bounding
+      box as an earlier element.
+
+  Returns:
+    (index, element) pairs for elements that are visible on screen. The index
+    is the position in `ui_elements`, so it stays consistent with the marks
+    drawn on the screenshot.
+  """
+  selected = []
+  seen = set()
+  for index, ui_element in enumerate(ui_elements):
+    if not m3a_utils.validate_ui_element(ui_element, screen_width_height_px):
+      continue
+    if drop_duplicates:
+      key = _element_key(ui_element)
+      if key in seen:
+        continue
+      seen.add(key)
+    selected.append((index, ui_element))
+  return selected
+
+
+def window_history(
+    history: list[str],
+    max_entries: int | None,
+    summary_chars: int = 80,
+) -> list[str]:
+  """Keeps recent history entries verbatim and shortens older ones.
+
+  Args:
+    history: History entries, oldest first.
+    max_entries: Number of most recent entries to keep verbatim. If None, the
+      history is returned unchanged.
+    summary_chars: Max number of characters kept for older entries.
+
+  Returns:
+    The windowed history.
+  """
+  if max_entries is None or len(history) <= max_entries:
+    return list(history)
+  cutoff = len(history) - max_entries
+  windowed = []
+  for entry in history[:cutoff]:
+    if len(entry) > summary_chars:
+      entry = entry[:summary_chars].rstrip() + '...'
+    windowed.append(entry)
+  windowed.extend(history[cutoff:])
+  return windowed
+
+
+def fit_to_budget(
+    render: Callable[[list[str], list[str]], str],
+    history: list[str],
+    element_lines: list[str],
+    budget: PromptBudget,
+) -> str:
+  """Renders a prompt, dropping content until it fits in the token budget.
+
+  Content is dropped in order of decreasing staleness: oldest history entries
+  first (the latest one is kept as long as possible), then trailing UI
+  elements, then the remaining history entry.
+
+  Args:
+    render: Renders the prompt from history entries and UI element lines.
+    history: History entries, oldest first.
+    element_lines: One description line per UI element.
+    budget: The budget to enforce.
+
+  Returns:
+    The rendered prompt. It may still exceed the budget if the fixed part of
+    the prompt alone does not fit.
+  """
+  if budget.max_tokens is None:
+    return render(history, element_lines)
+  count = budget.token_counter
+  available = budget.max_tokens - count(render([], []))
+  # Each kept line also costs a separator.
+  history_costs = [count(entry) + 1 for entry in history]
+  element_costs = [count(line) + 1 for line in element_lines]
+  total = sum(history_costs) + sum(element_costs)
+
+  n_history_dropped = 0
+  while total > available and len(history) - n_history_dropped > 1:
+    total -= history_costs[n_history_dropped]
+    n_history_dropped += 1
+
+  n_elements = len(element_lines)
+  while total > available and n_elements > 0:
+    n_elements -= 1
+    total -= element_costs[n_elements]
+
+  if total > available and n_history_dropped < len(history):
+    n_history_dropped = len(history)
+
+  kept_history = history[n_history_dropped:]
+  if n_history_dropped:
+    kept_history = [
+        f'({n_history_dropped} earlier steps omitted)'
+    ] + kept_history
+  kept_elements = element_lines[:n_elements]
+  if n_elements < len(element_lines):
+    kept_elements = kept_elements + [
+        f'({len(element_lines) - n_elements} more UI elements omitted)'
+    ]
+  return render(kept_history, kept_elements)
+
+
+# Marks the end of a prompt segment that stays the same across calls, so that
+# LLM wrappers can emit provider-side cache control for everything before it.
+# Wrappers that do not support caching remove it.
+CACHE_BREAKPOINT = '<|cache_breakpoint|>'
+
+
+def strip_cache_breakpoints(text: str) -> str:
+  """Removes cache breakpoint markers from a prompt."""
+  return text.replace(CACHE_BREAKPOINT, '')
+
+
+def split_cache_segments(text: str) -> list[str]:
+  """Splits a prompt at its cache breakpoints, dropping empty segments."""
+  return [segment for segment in text.split(CACHE_BREAKPOINT) if segment]
+
+
+@dataclasses.dataclass(frozen=True)
+class PrefixReuseStats:
+  """How much of each prompt is shared with the prompt before it.
+
+  Attributes:
+    num_prompts: Number of prompts measured.
+    total_chars: Total size of all prompts but the first.
+    reused_chars: Characters at the start of each prompt (but the first) that
+      are identical to the start of the previous prompt.
+  """
+
+  num_prompts: int
+  total_chars: int
+  reused_chars: int
+
+  @property
+  def reuse_ratio(self) -> float:
+    return self.reused_chars / self.total_chars if self.total_chars else 0.0
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+  n = min(len(a), len(b))
+  i = 0
+  # Compare in blocks first; prompts share long prefixes.
+  block = 1024
+  while i + block <= n and a[i : i + block] == b[i : i + block]:
+    i += block
+  while i < n and a[i] == b[i]:
+    i += 1
+  return i
+
+
+def prefix_reuse_stats(prompts: list[str]) -> PrefixReuseStats:
+  """Measures prefix reuse between consecutive prompts.
+
+  This approximates how much of a run could be served from a provider-side
+  prompt cache, which only matches on exact prefixes.
+
+  Args:
+    prompts: Prompts in the order they were sent.
+
+  Returns:
+    The reuse statistics.
+  """
+  prompts = [strip_cache_breakpoints(prompt) for prompt in prompts]
+  total, reused = 0, 0
+  for previous, current in zip(prompts, prompts[1:]):
+    total += len(current)
+    reused += _common_prefix_length(previous, current)
+  return PrefixReuseStats(len(prompts), total, reused)
+
+
+def prompt_text(prompt: Any) -> str:
+  """Returns the text of a prompt string or chat messages payload."""
+  if isinstance(prompt, str):
+    return prompt
+  parts = []
+  for message in prompt:
+    content = message['content']
+    if isinstance(content, str):
+      parts.append(content)
+      continue
+    parts.extend(
+        item['text'] for item in content if item.get('type') == 'text'
+    )
+  return '\n'.join(parts)
+
+
+def episode_prompts(
+    episode_data: dict[str, list[Any]],
+    keys: tuple[str, ...] = (
+        'action_prompt',
+        'action_gen_payload',
+    ),
+) -> list[str]:
+  """Extracts the action selection prompts from recorded episode data.
+
+  Args:
+    episode_data: The `episode_data` of an episode, mapping step data keys to
+      one value per step.
+    keys: Step data keys holding the prompts; the first one present is used.
+      Values can be prompt strings (M3A, T3A) or chat messages payloads
+      (SeeAct).
+
+  Returns:
+    One prompt per step that has one.
+  """
+  for key in keys:
+    if key in episode_data:
+      return [
+          prompt_text(prompt) for prompt in episode_data[key] if prompt
+      ]
+  return []
@@ -0,0 +1,179 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from absl.testing import absltest
+from android_world.agents import m3a
+from android_world.agents import prompt_utils
+from android_world.agents import t3a
+from android_world.env import representation_utils
+
+
+def _element(text: str, y_min: int = 0, **kwargs):
+  return representation_utils.UIElement(
+      text=text,
+      is_visible=True,
+      bbox_pixels=representation_utils.BoundingBox(0, 50, y_min, y_min + 10),
+      **kwargs,
+  )
+
+
+def _render(history: list[str], element_lines: list[str]) -> str:
+  return 'PREFIX\n' + '\n'.join(history) + '\n' + '\n'.join(element_lines)
+
+
+class PromptUtilsTest(absltest.TestCase):
+
+  def test_estimate_tokens(self):
+    self.assertEqual(prompt_utils.estimate_tokens(''), 0)
+    self.assertEqual(prompt_utils.estimate_tokens('abcd'), 1)
+    self.assertEqual(prompt_utils.estimate_tokens('abcde'), 2)
+
+  def test_select_ui_elements_keeps_original_indices(self):
+    elements = [
+        _element('a'),
+        _element('off screen', y_min=500),
+        _element('b', y_min=20),
+        _element('a'),
+    ]
+
+    selected = prompt_utils.select_ui_elements(elements, (100, 100))
+    self.assertEqual([index for index, _ in selected], [0, 2, 3])
+
+    selected = prompt_utils.select_ui_elements(
+        elements, (100, 100), drop_duplicates=True
+    )
+    self.assertEqual([index for index, _ in selected], [0, 2])
+
+  def test_window_history(self):
+    history = ['a' * 100, 'b' * 100, 'c']
+
+    self.assertEqual(prompt_utils.window_history(history, None), history)
+    self.assertEqual(
+        prompt_utils.window_history(history, 1, summary_chars=5),
+        ['aaaaa...', 'bbbbb...', 'c'],
+    )
+
+  def test_fit_to_budget_without_limit(self):
+    prompt = prompt_utils.fit_to_budget(
+        _render, ['h1'], ['e1'], prompt_utils.PromptBudget()
+    )
+    self.assertEqual(prompt, _render(['h1'], ['e1']))
+
+  def test_fit_to_budget_drops_old_history_first(self):
+    history = ['x' * 40 for _ in range(10)]
+    elements = ['e' * 8 for _ in range(3)]
+    budget = prompt_utils.PromptBudget(max_tokens=40)
+
+    prompt = prompt_utils.fit_to_budget(_render, history, elements, budget)
+
+    self.assertIn('(8 earlier steps omitted)', prompt)
+    self.assertEqual(prompt.count('e' * 8), 3)
+    self.assertLessEqual(prompt_utils.estimate_tokens(prompt), 45)
+
+  def test_fit_to_budget_drops_trailing_elements(self):
+    elements = [f'element {i:03d}' for i in range(100)]
+    budget = prompt_utils.PromptBudget(max_tokens=50)
+
+    prompt = prompt_utils.fit_to_budget(_render, ['latest'], elements, budget)
+
+    self.assertIn('latest', prompt)
+    self.assertIn('element 000', prompt)
+    self.assertNotIn('element 099', prompt)
+    self.assertIn('more UI elements omitted', prompt)
+
+  def test_m3a_compact_description(self):
+    elements = [_element('ok', is_clickable=True, is_checked=False)]
+
+    full = m3a._generate_ui_elements_description_list(elements, (100, 100))
+    compact = m3a._generate_ui_elements_description_list(
+        elements, (100, 100), prompt_utils.PromptBudget()
+    )
+
+    self.assertIn('"is_checked": False', full)
+    self.assertEqual(
+        compact,
+        'UI element 0: {"index": 0, "text": "ok", "is_clickable": True}\n',
+    )
+
+  def test_t3a_compact_description(self):
+    elements = [_element('ok', is_clickable=False)]
+
+    compact = t3a._generate_ui_elements_description_list_full(
+        elements, (100, 100), prompt_utils.PromptBudget()
+    )
+
+    self.assertNotIn('None', compact)
+    self.assertNotIn('is_clickable', compact)
+    self.assertStartsWith(compact, "UI element 0: UIElement(text='ok'")
+
+  def test_cache_segments(self):
+    breakpoint = prompt_utils.CACHE_BREAKPOINT
+    text = f'static{breakpoint}task{breakpoint}'
+
+    self.assertEqual(prompt_utils.strip_cache_breakpoints(text), 'statictask')
+    self.assertEqual(
+        prompt_utils.split_cache_segments(text), ['static', 'task']
+    )
+
+  def test_prefix_reuse_stats(self):
+    stats = prompt_utils.prefix_reuse_stats(['abcd', 'abxy', 'abxyz'])
+
+    self.assertEqual(stats.num_prompts, 3)
+    self.assertEqual(stats.total_chars, 9)
+    self.assertEqual(stats.reused_chars, 6)
+    self.assertAlmostEqual(stats.reuse_ratio, 6 / 9)
+    self.assertEqual(prompt_utils.prefix_reuse_stats(['a']).reuse_ratio, 0.0)
+
+  def test_episode_prompts_from_messages(self):
+    messages = [
+        {'role': 'system', 'content': [{'type': 'text', 'text': 'sys'}]},
+        {
+            'role': 'user',
+            'content': [
+                {'type': 'text', 'text': 'user'},
+                {'type': 'image_url', 'image_url': {'url': 'data:'}},
+            ],
+        },
+    ]
+
+    prompts = prompt_utils.episode_prompts(
+        {'action_gen_payload': [messages, None]}
+    )
+
+    self.assertEqual(prompts, ['sys\nuser'])
+
+  def test_cache_friendly_layout_shares_longer_prefix(self):
+    elements = [_element('ok')]
+
+    def prompts(cache_friendly: bool) -> list[str]:
+      return [
+          m3a._action_selection_prompt(
+              'goal',
+              [f'Step {i}' for i in range(step)],
+              m3a._generate_ui_elements_description_list(elements, (100, 100)),
+              cache_friendly=cache_friendly,
+          )
+          for step in range(3)
+      ]
+
+    default = prompt_utils.prefix_reuse_stats(prompts(False))
+    cache_friendly = prompt_utils.prefix_reuse_stats(prompts(True))
+
+    self.assertGreater(cache_friendly.reuse_ratio, default.reuse_ratio)
+    static_segment = prompt_utils.split_cache_segments(prompts(True)[0])[0]
+    self.assertNotIn('The current user goal/request', static_segment)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -3,22 +3,140 @@ import os
 import subprocess
 import tempfile
 from datetime import datetime
-import select
+import codecs
+import collections
+import concurrent.futures
+import hashlib
+import json
+import selectors
+import threading
 import time
 import re
 
-# 根据操作系统选择不同的模块
-if os.name == 'posix':
-    import fcntl
-else:
-    import msvcrt
+from .task_events import EVENT_FD_ENV, SCRIPT_HELPERS, TaskEventRecorder, step_labels_by_line
+from .warm_worker import get_warm_worker
+
+# warm worker 中单个任务默认的最长执行时间（秒），避免 worker 无响应时一直等待
+_WARM_WORKER_TASK_TIMEOUT = 1800
+
+# 生成任务内容时的占位符，替换为脚本内容与步骤标签
+_SCRIPT_CONTENT_MARKER = "__RUYI_SCRIPT_CONTENT__"
+_STEP_LABELS_MARKER = "__RUYI_STEP_LABELS__"
+
+# 预编译日志处理用到的正则
+_ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+_ERROR_PATTERN = re.compile(r'(\w+Error): (.*)')
+
+
+class _LineReader:
+    """把管道中的字节流增量解码为 UTF-8，并按行切分（不完整的行保留到读到换行为止）"""
+    def __init__(self, is_error):
+        self.is_error = is_error
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._partial = []
+
+    def feed(self, data):
+        """输入新读到的字节（空字节串表示 EOF），返回其中完整的行"""
+        text = self._decoder.decode(data, final=not data)
+        if "\n" not in text:
+            if text:
+                self._partial.append(text)
+            if data or not self._partial:
+                return []
+            # EOF 时输出最后一行不完整的内容
+            line, self._partial = "".join(self._partial), []
+            return [line]
+
+        parts = text.split("\n")
+        parts[0] = "".join(self._partial) + parts[0]
+        remainder = parts.pop()
+        self._partial = [remainder] if remainder else []
+        lines = [part + "\n" for part in parts]
+        if not data and self._partial:
+            lines.append("".join(self._partial))
+            self._partial = []
+        return lines
+
+
+class CompiledScript:
+    """
+    一次生成并检查过语法的任务脚本：内容与编译错误（没有错误时为 None）。
+    不保存代码对象：脚本在子进程或 warm worker 中执行，由它们各自编译（worker 按 key 缓存）。
+    """
+    def __init__(self, key, content, error):
+        self.key = key  # 生成参数的内容哈希
+        self.content = content
+        self.error = error
+
+
+# 编译结果缓存：按生成参数的内容哈希索引，所有 ScriptExecutor 共享
+# （RuyiManager 每个任务都会新建 ScriptExecutor，重试同一脚本时跳过生成与编译）
+_COMPILED_CACHE_SIZE = 64
+_compiled_scripts = collections.OrderedDict()
+_compiled_scripts_lock = threading.Lock()
+
+# config.yaml 中 Ruyi 连接设备服务所用的主机端口（adb 转发到设备上的 Ruyi 服务）
+DEFAULT_HOST_PORT = 51825
+
+# 后台写调试副本，不阻塞任务执行
+_debug_copy_writer = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="ruyi_debug_copy")
+
+
+def _exit_status(returncode):
+    """把子进程退出码转换为与 warm worker 一致的退出状态"""
+    if returncode == 0:
+        return "ok"
+    # 负数表示被信号终止
+    return "crashed" if returncode is not None and returncode < 0 else "error"
+
+
+def ruyi_config_path(ruyi_agent_path, host_port=None):
+    """
+    返回连接给定主机端口的 Ruyi 配置文件路径。
+    config.yaml 中的端口固定为 DEFAULT_HOST_PORT，同时在多个模拟器上运行时各自需要不同的端口：
+    此时把其中的默认端口替换为 host_port，写入临时目录中的副本（内容不变时不重写）。
+    """
+    config_path = os.path.join(ruyi_agent_path, "config.yaml")
+    if host_port is None or host_port == DEFAULT_HOST_PORT:
+        return config_path
+    with open(config_path, encoding="utf-8") as f:
+        content = f.read()
+    port_content, count = re.subn(rf"\b{DEFAULT_HOST_PORT}\b", str(host_port), content)
+    if count == 0:
+        print(f"config.yaml 中没有端口 {DEFAULT_HOST_PORT}，无法改为 {host_port}", file=sys.stderr)
+    digest = hashlib.sha256(os.path.abspath(config_path).encode("utf-8")).hexdigest()[:12]
+    port_config_path = os.path.join(tempfile.gettempdir(), f"ruyi_config_{digest}_{host_port}.yaml")
+    try:
+        with open(port_config_path, encoding="utf-8") as f:
+            if f.read() == port_content:
+                return port_config_path
+    except OSError:
+        pass
+    # 先写临时文件再替换，避免并行运行的进程读到写了一半的配置
+    temp_path = f"{port_config_path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(port_content)
+    os.replace(temp_path, port_config_path)
+    return port_config_path
+
+
+def _write_debug_copy(path, content):
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+    except OSError as e:
+        print(f"保存调试脚本失败 {path}: {e}", file=sys.stderr)
+
 
 class ScriptExecutor:
     """
     This module is used to execute scripts using RuyiAgent.
     """
-    def __init__(self):
+    def __init__(self, use_warm_worker=None, max_log_lines=100000, warm_worker_timeout=_WARM_WORKER_TASK_TIMEOUT, host_port=None):
         self.current_dir = os.path.dirname(os.path.abspath(__file__))
+        # Ruyi 连接设备服务所用的主机端口，None 表示使用 config.yaml 中的默认端口
+        self.host_port = host_port
         # 跨平台日志路径设置
         if os.name == 'nt':  # Windows 系统
             self.log_file = os.path.join(os.path.expanduser('~'), 'Documents', 'ruyi_agent.log')
@@ -29,9 +147,24 @@ class ScriptExecutor:
         self.task_end = False
         self.task_success = False
         self.log_queue = None  # 新增 log_queue 属性
-        self.log_buffer = ""  # 新增日志缓冲区（需在任何日志调用前初始化）
+        # 日志缓冲区（需在任何日志调用前初始化），按行保存，超过 max_log_lines 时丢弃最早的日志
+        self._log_lines = collections.deque(maxlen=max_log_lines)
+        self.line_callbacks = []  # 每读到子进程的一行输出时调用 callback(line, is_error)
         self.current_temp_file = None  # 追踪当前临时文件路径
         self.execution_error = None  # 用于存储执行错误信息
+        # 最近一次执行的退出状态：ok / error / crashed / timeout / compile_error
+        self.exit_status = None
+        self.task_events = TaskEventRecorder()  # 脚本通过结构化事件通道发来的事件
+        self.event_callbacks = []  # 每收到一个事件时调用 callback(event)
+
+        # 是否在常驻 worker 进程中执行脚本（省去每个任务启动解释器、导入 RuyiAgent 的开销）
+        # 默认由环境变量 RUYI_WARM_WORKER=1 开启；worker 依赖 pass_fds，仅支持 POSIX 系统
+        if use_warm_worker is None:
+            use_warm_worker = os.environ.get("RUYI_WARM_WORKER") == "1"
+        self.use_warm_worker = use_warm_worker and os.name == 'posix'
+        self.warm_worker = None
+        # warm worker 中单个任务的最长执行时间（秒），超时后重启 worker；None 表示不限制
+        self.warm_worker_timeout = warm_worker_timeout
 
         # 初始化时仅清理较久之前残留的临时文件，避免并行任务互相影响
         self.cleanup_all_temp_files(older_than_seconds=3600)  # 仅清理 1h 之前残留的临时文件
@@ -47,6 +180,9 @@ sys.path.append("{ruyi_agent_path}")
 from ruyi.agent import RuyiAgent
 from ruyi.task import RuyiTask
 from ruyi.config import RuyiConfig, RuyiArgParser
+{event_helpers}
+# 脚本行号 -> workflow 步骤标签
+_RUYI_STEP_LABELS = {step_labels}
 
 class DynamicTask(RuyiTask):
     def __init__(self):
@@ -61,23 +197,53 @@ class DynamicTask(RuyiTask):
 
 
     def main(self, agent):
-        device_manager, data, fm, user = agent.device_manager, agent.data, agent.fm, agent.user
+        # 通过结构化事件通道报告任务的开始、结束与最终状态
+        _ruyi_emit("task_start", task_id=self.task_id)
+        start = _ruyi_time.time()
+        status = "error"
+        try:
+            with _RuyiStepTracer(DynamicTask._run_script.__code__, _RUYI_STEP_LABELS) as tracer:
+                self._run_script(agent, tracer)
+            status = "success"
+        finally:
+            _ruyi_emit("task_end", status=status, duration_sec=_ruyi_time.time() - start)
+
+    def _run_script(self, agent, tracer):
+        device_manager = _RuyiActionRecorder(agent.device_manager, "device_manager", tracer)
+        data, fm, user = agent.data, agent.fm, agent.user
 {script_content}
 
 if __name__ == '__main__':
-    yaml_file = os.path.join("{ruyi_agent_path}", 'config.yaml')
+    yaml_file = "{config_path}"
     parser = RuyiArgParser((RuyiConfig,))
     config = parser.parse_yaml_file(yaml_file=yaml_file)[0]
     agent = RuyiAgent(config)
     task = DynamicTask()
     agent.task.execute_task(task)
 '''
-        # self.log_buffer 已在构造前部初始化
+        # self._log_lines 已在构造前部初始化
+
+    @property
+    def log_buffer(self):
+        """当前缓冲区中的日志内容"""
+        return "\n".join(self._log_lines)
 
     def set_log_queue(self, log_queue):
         """设置 log_queue"""
         self.log_queue = log_queue
 
+    def add_line_callback(self, callback):
+        """注册行回调：脚本每输出一行就调用 callback(line, is_error)"""
+        self.line_callbacks.append(callback)
+
+    def add_event_callback(self, callback):
+        """注册事件回调：脚本每发来一个结构化事件就调用 callback(event)"""
+        self.event_callbacks.append(callback)
+
+    def get_step_summary(self):
+        """最近一次执行中每个 workflow 步骤的执行次数、耗时、设备操作数与是否成功"""
+        return self.task_events.step_summary()
+
     def cleanup_temp_file(self):
         """清理当前临时文件"""
         if self.current_temp_file and os.path.exists(self.current_temp_file):
@@ -130,6 +296,11 @@ if __name__ == '__main__':
 
     def stop_execution(self):
         """停止当前执行并清理资源"""
+        # 停止 warm worker 中正在执行的任务（空闲的 worker 保留，供后续任务复用）
+        if self.warm_worker is not None and self.warm_worker.busy:
+            self.warm_worker.stop()
+            self._log(self.format_ruyi_log("warm worker 已停止"))
+
         # 停止执行进程
         if self.execute_process:
             try:
@@ -156,19 +327,14 @@ if __name__ == '__main__':
 
     def _log(self, message, is_error=False):
         """跨平台日志写入"""
+        if not isinstance(message, str):
+            message = str(message)
         # 去除ANSI转义字符
-        ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-        message = ansi_escape.sub('', message)
+        log_message = _ANSI_ESCAPE.sub('', message)
         
-        log_message = message
-        if not isinstance(log_message, str):
-            log_message = str(log_message)
-        
-        # 将日志同时写入缓冲区（防御性初始化，避免极端情况下属性未就绪）
+        # 将日志同时写入缓冲区
         try:
-            if not hasattr(self, 'log_buffer') or self.log_buffer is None:
-                self.log_buffer = ''
-            self.log_buffer += log_message
+            self._log_lines.append(log_message)
         except Exception:
             # 保障不因日志失败影响主流程
             pass
@@ -192,7 +358,7 @@ if __name__ == '__main__':
     def get_log(self):
         """获取当前日志内容并清空缓冲区"""
         log_content = self.log_buffer
-        self.log_buffer = ""  # 清空缓冲区
+        self._log_lines.clear()  # 清空缓冲区
         return log_content
 
     def check_task_end(self, log_content):
@@ -224,8 +390,7 @@ if __name__ == '__main__':
             return False
         
         # 检查常见 Python 错误模式, 如 SyntaxError, IndentationError 等
-        error_pattern = r'(\w+Error): (.*)'
-        match = re.search(error_pattern, log_content)
+        match = _ERROR_PATTERN.search(log_content)
         if match:
             error_type = match.group(1)
             error_message = match.group(2)
@@ -237,13 +402,20 @@ if __name__ == '__main__':
             return True
         return False
 
-    # 生成任务内容
-    def generate_task_content(self, scripts, code_script_labeled, NL_script_labeled, task="task", variables=None, device_mappings=None):
-        # 获取 RuyiAgent 路径（修复路径分隔符问题）
+    def get_ruyi_agent_path(self):
+        """获取 RuyiAgent 路径（修复路径分隔符问题）"""
         ruyi_agent_path = os.path.join(os.path.dirname(self.current_dir), 'RuyiAgent')
 
         # 将路径转换为原始字符串格式
-        ruyi_agent_path = os.path.normpath(ruyi_agent_path).replace('\\', '/')  # 统一使用正斜杠
+        return os.path.normpath(ruyi_agent_path).replace('\\', '/')  # 统一使用正斜杠
+
+    def get_config_path(self):
+        """获取连接 self.host_port 的 Ruyi 配置文件路径"""
+        return ruyi_config_path(self.get_ruyi_agent_path(), self.host_port).replace('\\', '/')
+
+    # 生成任务内容
+    def generate_task_content(self, scripts, code_script_labeled, NL_script_labeled, task="task", variables=None, device_mappings=None):
+        ruyi_agent_path = self.get_ruyi_agent_path()
 
         # 准备脚本内容（添加适当的缩进）
         formatted_scripts = '\n'.join(f'        {line}' for line in scripts.splitlines())
@@ -261,14 +433,25 @@ if __name__ == '__main__':
 
         task_content = self.template_content.format(
             ruyi_agent_path=ruyi_agent_path.replace('\\', r'\\'),  # 双重转义反斜杠
+            config_path=self.get_config_path(),
             task_description=escaped_task,
             code_script_labeled=escaped_code_script_labeled,
             NL_script_labeled=escaped_NL_script_labeled,
-            script_content=formatted_scripts,
+            script_content=_SCRIPT_CONTENT_MARKER,
+            event_helpers=SCRIPT_HELPERS,
+            step_labels=_STEP_LABELS_MARKER,
             variable_mapping=variable_mapping_str,
             device_mappings=device_mappings_str
         )
-        return task_content
+
+        # 根据脚本在生成内容中的起始行号，计算每行代码对应的步骤标签
+        # （占位符位于描述等用户内容之后，取最后一次出现的位置）
+        script_start = task_content.rindex(_SCRIPT_CONTENT_MARKER)
+        first_lineno = task_content.count("\n", 0, script_start) + 1
+        step_labels = step_labels_by_line(scripts, first_lineno)
+        head, tail = task_content[:script_start], task_content[script_start + len(_SCRIPT_CONTENT_MARKER):]
+        head = head.replace(_STEP_LABELS_MARKER, repr(step_labels), 1)
+        return head + formatted_scripts + tail
 
     # 创建临时 .ruyi 文件
     def create_temp_ruyi_script(self, task_content: str, track_current: bool = True) -> str:
@@ -294,54 +477,65 @@ if __name__ == '__main__':
             self._log(self.format_ruyi_log(f"创建脚本文件失败: {str(e)}"), is_error=True)
             raise
 
+    def get_compiled_script(self, scripts, code_script_labeled, NL_script_labeled, task="task", variables=None, device_mappings=None):
+        """
+        生成并编译任务脚本，结果按生成参数的内容哈希缓存。
+        返回: CompiledScript
+        """
+        key_source = repr((self.template_content, self.get_ruyi_agent_path(), self.host_port, scripts, code_script_labeled, NL_script_labeled, task, variables, device_mappings))
+        key = hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+        with _compiled_scripts_lock:
+            compiled = _compiled_scripts.get(key)
+            if compiled is not None:
+                _compiled_scripts.move_to_end(key)
+                return compiled
+
+        task_content = self.generate_task_content(scripts, code_script_labeled, NL_script_labeled, task, variables, device_mappings)
+        # 使用内置 compile 对源码进行语法检查（不会执行 import），只保留错误
+        error = None
+        try:
+            compile(task_content, f"<ruyi_script_{key[:12]}>", 'exec')
+        except SyntaxError as e:
+            error = {
+                'type': e.__class__.__name__,
+                'message': e.msg,
+                'lineno': e.lineno,
+                'offset': e.offset,
+                'text': e.text
+            }
+        except Exception as e:
+            error = {
+                'type': e.__class__.__name__,
+                'message': str(e)
+            }
+        compiled = CompiledScript(key, task_content, error)
+
+        with _compiled_scripts_lock:
+            _compiled_scripts[key] = compiled
+            while len(_compiled_scripts) > _COMPILED_CACHE_SIZE:
+                _compiled_scripts.popitem(last=False)
+        return compiled
+
     # 检查编译错误（仅语法层面，不执行）
     def check_compile_errors(self, scripts, code_script_labeled, NL_script_labeled, task="task", variables=None, device_mappings=None):
         """
-        生成与执行时相同的 .ruyi 脚本文件，并进行语法编译检查。
+        生成与执行时相同的 .ruyi 脚本内容，并进行语法编译检查（结果会缓存，执行时不再重复生成与编译）。
         返回: (compiled_ok: bool, error: dict | None)
         """
-        temp_path = None
-        try:
-            task_content = self.generate_task_content(scripts, code_script_labeled, NL_script_labeled, task, variables, device_mappings)
-            # 对于编译检查，不跟踪为 current_temp_file，避免影响正在执行的任务
-            temp_path = self.create_temp_ruyi_script(task_content, track_current=False)
-
-            # 使用内置 compile 对源码进行语法检查（不会执行 import）
-            try:
-                compile(task_content, temp_path, 'exec')
-                return True, None
-            except SyntaxError as e:
-                error_info = {
-                    'type': e.__class__.__name__,
-                    'message': e.msg,
-                    'lineno': e.lineno,
-                    'offset': e.offset,
-                    'text': e.text
-                }
-                return False, error_info
-            except Exception as e:
-                error_info = {
-                    'type': e.__class__.__name__,
-                    'message': str(e)
-                }
-                return False, error_info
-        finally:
-            # 编译检查用的临时文件立即清理
-            try:
-                if temp_path and os.path.exists(temp_path):
-                    os.remove(temp_path)
-            except Exception:
-                pass
+        compiled = self.get_compiled_script(scripts, code_script_labeled, NL_script_labeled, task, variables, device_mappings)
+        return compiled.error is None, compiled.error
 
     # 执行脚本
     def execute_scripts(self, scripts, code_script_labeled="", NL_script_labeled="", task="task", variables=None, device_mappings=None):
-        self.log_buffer = ""  # 每次执行前清空缓冲区
+        # 停止之前的执行并清理资源（会把 task_end 置为 True，因此要在重置任务状态之前调用）
+        self.stop_execution()
+
+        self._log_lines.clear()  # 每次执行前清空缓冲区
         self.task_end = False
         self.task_success = False
         self.execution_error = None  # 重置错误信息
-
-        # 停止之前的执行并清理资源
-        self.stop_execution()
+        self.exit_status = None
+        self.task_events = TaskEventRecorder()
 
         self._log(self.format_ruyi_log("="*42))
         self._log(self.format_ruyi_log("开始新的任务执行"))
@@ -351,8 +545,9 @@ if __name__ == '__main__':
         # self._log(f"脚本内容:\n{scripts}")
         
         try:
-            # 生成任务内容
-            task_content = self.generate_task_content(scripts, code_script_labeled, NL_script_labeled, task, variables, device_mappings)
+            # 生成并编译任务内容（命中缓存时直接复用）
+            compiled = self.get_compiled_script(scripts, code_script_labeled, NL_script_labeled, task, variables, device_mappings)
+            task_content = compiled.content
 
             # 将执行的 Ruyi Script 保存到桌面 / 保存到本地，用于调试
             current_time = datetime.now()
@@ -363,8 +558,17 @@ if __name__ == '__main__':
                 task_file_name = task_file_name[:30]  # 控制文件名前缀长度，避免过长
                 
             task_content_path = os.path.join('ruyi_scripts', f'{task_file_name}_{current_time.strftime("%Y%m%d_%H%M%S_%f")}.ruyi')
-            with open(task_content_path, "w", encoding="utf-8") as f:
-                f.write(task_content)
+            _debug_copy_writer.submit(_write_debug_copy, task_content_path, task_content)
+
+            # 存在语法错误时无需启动执行进程
+            if compiled.error is not None:
+                self.execution_error = {**compiled.error, 'full_log': self.log_buffer}
+                self.exit_status = "compile_error"
+                self._log(self.format_ruyi_log(f"脚本编译失败: {compiled.error['type']}: {compiled.error['message']}"), is_error=True)
+                return False, self.execution_error
+
+            if self.use_warm_worker:
+                return self._execute_in_warm_worker(compiled, task_content_path)
             
             # 创建执行脚本文件
             try:
@@ -382,118 +586,40 @@ if __name__ == '__main__':
                 # 注意：不再使用 start_new_session=True，将子进程保留在与当前进程相同的进程组中。
                 # 这样当用户在终端中通过 Ctrl+C 终止 `run.py` 时，操作系统发送的 SIGINT
                 # 会同时传递给该子进程，避免脚本在后台“孤儿进程”式继续运行。
-                self.execute_process = subprocess.Popen(
-                    [sys.executable, "-u", temp_path],  # unbuffered 模式
-                    cwd=project_dir,  # 设置工作目录为项目目录，用于配置读取、写入文件时的相对路径地址
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    encoding="utf-8",  # 指定编码为 utf-8
-                    bufsize=1,
-                    universal_newlines=True,
-                    env={**os.environ, 'PYTHONUNBUFFERED': '1', 'PYTHONIOENCODING': 'utf-8'},  # 添加环境变量
-                    # start_new_session=True
-                )
-                # self._log(f"启动执行脚本文件进程: {self.execute_process.pid}")
-
+                env = {**os.environ, 'PYTHONUNBUFFERED': '1', 'PYTHONIOENCODING': 'utf-8'}  # 添加环境变量
+                # 结构化事件通道：把管道写端传给子进程（依赖 pass_fds，仅 POSIX 系统支持）
+                event_fd, pass_fds = None, ()
                 if os.name == 'posix':
-                    # Unix/Linux 系统：设置非阻塞读取
-                    for fd in [self.execute_process.stdout, self.execute_process.stderr]:
-                        fl = fcntl.fcntl(fd, fcntl.F_GETFL)
-                        fcntl.fcntl(fd, fcntl.F_SETFL, fl | os.O_NONBLOCK)
-                else:
-                    # Windows 系统：使用线程读取输出
-                    import threading, queue
-                    stdout_queue = queue.Queue()
-                    stderr_queue = queue.Queue()
-                    
-                    def enqueue_output(pipe, output_queue):
-                        for line in iter(pipe.readline, ''):
-                            output_queue.put(line)
-                        pipe.close()
-                    
-                    threading.Thread(target=enqueue_output, args=(self.execute_process.stdout, stdout_queue), daemon=True).start()
-                    threading.Thread(target=enqueue_output, args=(self.execute_process.stderr, stderr_queue), daemon=True).start()
-                
-                stop_reading = False
-                while not stop_reading:
-                    if os.name == 'nt':
-                        # Windows 平台：从线程队列中获取输出
-                        while not stdout_queue.empty():
-                            line = stdout_queue.get()
-                            print(line, end='', flush=True)
-                            self._log(line.strip())
-                            # 检查语法错误
-                            # if self.check_execution_error(line):
-                            #     self.task_end = True
-                            #     stop_reading = True
-                            #     break
-                            # if self.check_task_end(line):
-                            #     self.task_end = True
-                            #     stop_reading = True
-                            #     break
-                        while not stderr_queue.empty():
-                            line = stderr_queue.get()
-                            print(line, end='', file=sys.stderr, flush=True)
-                            self._log(line.strip(), is_error=True)
-                            # 检查语法错误
-                            # if self.check_execution_error(line):
-                            #     self.task_end = True
-                            #     stop_reading = True
-                            #     break
-                            # if self.check_task_end(line):
-                            #     self.task_end = True
-                            #     stop_reading = True
-                            #     break
-                    else:
-                        # macOS/Linux 平台：继续使用非阻塞读取
-                        output = ''
-                        try:
-                            chunk = self.execute_process.stdout.read()
-                            if chunk:
-                                output = chunk.decode('utf-8', errors='replace') if isinstance(chunk, bytes) else str(chunk)
-                                print(output, end='')
-                                self._log(output.strip())
-                                # 检查语法错误
-                                # if self.check_execution_error(output):
-                                #     # self._log(self.format_ruyi_log("=====在读取 stdout 时，检测到错误，结束任务 log 读取=====", level="debug"), is_error=True)
-                                #     # self._log(self.format_ruyi_log(f"{output}", level="debug"), is_error=True)
-                                #     # self._log(self.format_ruyi_log("="*60, level="debug"), is_error=True)
-                                #     self.task_end = True
-                                #     stop_reading = True
-                                # elif self.check_task_end(output):
-                                #     # self._log(self.format_ruyi_log("=====在读取 stdout 时，检测到任务结束，结束任务 log 读取=====", level="debug"), is_error=True)
-                                #     # self._log(self.format_ruyi_log(f"{output}", level="debug"), is_error=True)
-                                #     # self._log(self.format_ruyi_log("="*60, level="debug"), is_error=True)
-                                #     self.task_end = True
-                                #     stop_reading = True
-                        except Exception as _:
-                            pass
-
-                        # 读取错误输出
-                        error = ''
-                        try:
-                            err_chunk = self.execute_process.stderr.read()
-                            if err_chunk:
-                                error = err_chunk.decode('utf-8', errors='replace') if isinstance(err_chunk, bytes) else str(err_chunk)
-                                print(error, end='', file=sys.stderr)
-                                self._log(error.strip(), is_error=True)
-                                # 检查语法错误
-                                # if self.check_execution_error(error):
-                                #     # self._log(self.format_ruyi_log("=====在读取 stderr 时，检测到错误，结束任务 log 读取====="), is_error=True)
-                                #     # self._log(self.format_ruyi_log(f"{error}"), is_error=True)
-                                #     # self._log(self.format_ruyi_log("="*60), is_error=True)
-                                #     self.task_end = True
-                                #     stop_reading = True
-                        except Exception as _:
-                            pass
-                    
-                    # 检查进程是否结束
-                    if self.execute_process.poll() is not None:
-                        break
+                    event_fd, event_write_fd = os.pipe()
+                    env[EVENT_FD_ENV] = str(event_write_fd)
+                    pass_fds = (event_write_fd,)
+                try:
+                    self.execute_process = subprocess.Popen(
+                        [sys.executable, "-u", temp_path],  # unbuffered 模式
+                        cwd=project_dir,  # 设置工作目录为项目目录，用于配置读取、写入文件时的相对路径地址
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        text=True,
+                        encoding="utf-8",  # 指定编码为 utf-8
+                        bufsize=1,
+                        universal_newlines=True,
+                        env=env,
+                        pass_fds=pass_fds,
+                        # start_new_session=True
+                    )
+                finally:
+                    # 父进程不再持有写端，子进程退出后读端才能读到 EOF
+                    for fd in pass_fds:
+                        os.close(fd)
+                # self._log(f"启动执行脚本文件进程: {self.execute_process.pid}")
 
-                    # 适当降低CPU占用
-                    time.sleep(0.1)
+                try:
+                    self._stream_process_output(self.execute_process, event_fd)
+                finally:
+                    if event_fd is not None:
+                        os.close(event_fd)
+                self._apply_task_events()
+                self.exit_status = _exit_status(self.execute_process.returncode)
 
                 success = self.task_success
                 # self._log(f"任务执行结束，执行结果：{'成功' if success else '失败'}")
@@ -513,6 +639,145 @@ if __name__ == '__main__':
             self._log(self.format_ruyi_log("任务执行结束"))
             self._log(self.format_ruyi_log("="*42))  # 添加结束分隔符
 
+    def _handle_line(self, line, is_error=False):
+        """处理脚本输出的一行：回显、写入日志，并实时检查执行错误与任务结束"""
+        print(line, end='', file=sys.stderr if is_error else sys.stdout, flush=True)
+        self._log(line.strip(), is_error=is_error)
+
+        # 只记录第一个执行错误；检测到错误或任务结束后仍继续读取，直到脚本退出
+        if self.execution_error is None and not self.task_success:
+            self.check_execution_error(line)
+        if not self.task_end and self.check_task_end(line):
+            self.task_end = True
+            if self.task_success:
+                # 脚本报告成功时，日志中形如 "XxxError: ..." 的行只是普通输出（如已处理的异常），不是执行错误
+                self.execution_error = None
+
+        for callback in self.line_callbacks:
+            try:
+                callback(line, is_error)
+            except Exception as e:
+                self._log(self.format_ruyi_log(f"日志回调出错: {str(e)}"), is_error=True)
+
+    def _handle_event(self, event):
+        """处理脚本通过结构化通道发来的一个事件"""
+        self.task_events.handle(event)
+        for callback in self.event_callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                self._log(self.format_ruyi_log(f"事件回调出错: {str(e)}"), is_error=True)
+
+    def _handle_event_line(self, line):
+        try:
+            event = json.loads(line)
+        except ValueError:
+            self._log(self.format_ruyi_log(f"无法解析的事件: {line.strip()}"), is_error=True)
+            return
+        if isinstance(event, dict):
+            self._handle_event(event)
+
+    def _apply_task_events(self):
+        """收到结构化事件时，以其为准确定任务是否成功与执行错误，不再依赖日志文本"""
+        if self.task_events.status is not None:
+            self.task_end = True
+            self.task_success = self.task_events.status == "success"
+        error = self.task_events.error
+        if self.task_events.status == "success" and error is None:
+            # 脚本报告成功时，日志中形如 "XxxError: ..." 的行只是普通输出（如已处理的异常），不是执行错误
+            self.execution_error = None
+        if error is not None:
+            self.execution_error = {
+                'type': error.get('type'),
+                'message': error.get('message'),
+                'label': error.get('label'),
+                'full_log': self.log_buffer
+            }
+
+    def _stream_process_output(self, process, event_fd=None):
+        """读取子进程的输出直到其结束，每一行交给 _handle_line 处理，事件通道的每一行交给 _handle_event_line 处理"""
+        if os.name == 'posix':
+            # Unix/Linux 系统：有数据时才唤醒，不再轮询
+            selector = selectors.DefaultSelector()
+            for pipe, is_error in ((process.stdout, False), (process.stderr, True)):
+                selector.register(pipe.fileno(), selectors.EVENT_READ, _LineReader(is_error))
+            if event_fd is not None:
+                selector.register(event_fd, selectors.EVENT_READ, _LineReader(False))
+            try:
+                while selector.get_map():
+                    events = selector.select(timeout=1.0)
+                    if not events and process.poll() is not None:
+                        # 进程已退出但管道未关闭（如被后台子进程继承），不再等待
+                        break
+                    for key, _ in events:
+                        data = os.read(key.fd, 65536)
+                        if not data:
+                            selector.unregister(key.fd)
+                        for line in key.data.feed(data):
+                            if key.fd == event_fd:
+                                self._handle_event_line(line)
+                            else:
+                                self._handle_line(line, key.data.is_error)
+            finally:
+                selector.close()
+        else:
+            # Windows 系统：select 不支持管道，使用线程读取输出，主线程阻塞等待
+            import threading, queue
+            output_queue = queue.Queue()
+
+            def enqueue_output(pipe, is_error):
+                for line in iter(pipe.readline, ''):
+                    output_queue.put((line, is_error))
+                pipe.close()
+                output_queue.put((None, is_error))
+
+            threading.Thread(target=enqueue_output, args=(process.stdout, False), daemon=True).start()
+            threading.Thread(target=enqueue_output, args=(process.stderr, True), daemon=True).start()
+
+            open_pipes = 2
+            while open_pipes:
+                line, is_error = output_queue.get()
+                if line is None:
+                    open_pipes -= 1
+                else:
+                    self._handle_line(line, is_error)
+        process.wait()
+
+    def warm_up(self):
+        """
+        提前完成执行前的准备（启动 warm worker），可与脚本生成并行进行。
+        返回是否已就绪；未使用 warm worker 时无需准备，直接返回 True。
+        """
+        if not self.use_warm_worker:
+            return True
+        self.warm_worker = get_warm_worker(self.get_ruyi_agent_path(), cwd="./", config_path=self.get_config_path())
+        error = self.warm_worker.warm_up(self._handle_line)
+        if error is not None:
+            self._log(self.format_ruyi_log(f"warm worker 启动失败: {error['type']}: {error['message']}"), is_error=True)
+            return False
+        return True
+
+    def _execute_in_warm_worker(self, compiled, filename):
+        """在常驻 worker 进程中执行脚本，worker 崩溃或超过内存水位线时自动重启"""
+        # 与子进程方式相同，以项目目录作为工作目录
+        self.warm_worker = get_warm_worker(self.get_ruyi_agent_path(), cwd="./", config_path=self.get_config_path())
+
+        status, error = self.warm_worker.run_task(compiled.content, filename, self._handle_line, on_event=self._handle_event, timeout=self.warm_worker_timeout, key=compiled.key)
+        self.exit_status = status
+        self._apply_task_events()
+        if error is not None and self.task_events.error is None:
+            self.execution_error = {
+                'type': error.get('type'),
+                'message': error.get('message'),
+                'full_log': self.log_buffer
+            }
+            self._log(self.format_ruyi_log(f"warm worker 执行失败 ({status}): {error.get('type')}: {error.get('message')}"), is_error=True)
+
+        reason = self.warm_worker.recycle_if_needed()
+        if reason:
+            self._log(self.format_ruyi_log(f"warm worker 已重启: {reason}"))
+        return self.task_success, self.execution_error
+
 
 if __name__ == '__main__':
     scripts = "device.start_app('Contacts')\nui.root.locate_view('Create Contact').click()"
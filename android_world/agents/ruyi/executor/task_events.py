@@ -0,0 +1,217 @@
+"""
+生成脚本与 ScriptExecutor 之间的结构化事件通道。
+
+ScriptExecutor 通过环境变量 RUYI_EVENT_FD 把一个管道的写端传给脚本，脚本向其中
+每行写入一个 JSON 事件：
+- task_start / task_end：任务开始与结束，task_end 带有最终状态 status（success / error）
+- step_start / step_end：workflow 步骤（_label_workflow 生成的 [n] 标签）的开始与结束
+- action：通过 device_manager 发起的设备操作
+- error：脚本执行中抛出的异常
+
+这样任务是否成功、每个步骤的耗时不再需要从日志文本中解析。
+"""
+import re
+
+# 传递事件管道文件描述符的环境变量
+EVENT_FD_ENV = "RUYI_EVENT_FD"
+
+# 生成代码中的步骤标签，形如 "# [3] 点击保存按钮"
+_STEP_LABEL_PATTERN = re.compile(r'#.*?\[(\d+)\]')
+
+# 插入到生成脚本中的事件辅助代码（不经过 str.format，可直接使用花括号）
+SCRIPT_HELPERS = '''
+import json as _ruyi_json
+import time as _ruyi_time
+
+# 结构化事件通道，未设置 RUYI_EVENT_FD 时不发送任何事件
+_ruyi_event_fd = os.environ.get("RUYI_EVENT_FD")
+_ruyi_event_file = os.fdopen(int(_ruyi_event_fd), "w", encoding="utf-8", closefd=False) if _ruyi_event_fd else None
+
+
+def _ruyi_emit(event, **fields):
+    """向 ScriptExecutor 发送一个事件"""
+    if _ruyi_event_file is None:
+        return
+    fields["event"] = event
+    fields["time"] = _ruyi_time.time()
+    try:
+        _ruyi_event_file.write(_ruyi_json.dumps(fields, ensure_ascii=False, default=str) + "\\n")
+        _ruyi_event_file.flush()
+    except (OSError, ValueError):
+        pass
+
+
+def _ruyi_short_repr(value, limit=200):
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+class _RuyiStepTracer:
+    """
+    跟踪脚本执行到的行，根据行号对应的步骤标签发送 step_start / step_end 事件。
+    只跟踪脚本主体的代码对象：脚本中定义的函数被调用时，其中的操作计入调用处所在的步骤。
+    Python 3.12+ 使用 sys.monitoring，只为该代码对象开启行事件，其余代码没有任何开销；
+    更早的版本退回 sys.settrace，对脚本文件以外的函数调用立即返回 None。
+    """
+    def __init__(self, code, labels):
+        self.code = code
+        self.filename = code.co_filename
+        self.labels = labels
+        self.label = None
+        self.start = None
+        self.active = bool(labels) and _ruyi_event_file is not None
+        self._tool_id = None
+
+    def _switch(self, label, ok=True):
+        now = _ruyi_time.time()
+        if self.label is not None:
+            _ruyi_emit("step_end", label=self.label, ok=ok, duration_sec=now - self.start)
+        self.label, self.start = label, now
+        if label is not None:
+            _ruyi_emit("step_start", label=label)
+
+    def _on_line(self, lineno):
+        label = self.labels.get(lineno)
+        if label is not None and label != self.label:
+            self._switch(label)
+
+    def _monitor_line(self, code, lineno):
+        self._on_line(lineno)
+
+    def _trace_calls(self, frame, event, arg):
+        # 大部分调用来自脚本文件以外的库代码，先按文件名快速排除
+        if frame.f_code.co_filename != self.filename:
+            return None
+        return self._trace_lines if frame.f_code is self.code else None
+
+    def _trace_lines(self, frame, event, arg):
+        if event == "line":
+            self._on_line(frame.f_lineno)
+        return self._trace_lines
+
+    def _start_monitoring(self):
+        monitoring = getattr(sys, "monitoring", None)
+        if monitoring is None:
+            return False
+        for tool_id in range(monitoring.PROFILER_ID + 1, monitoring.OPTIMIZER_ID):
+            if monitoring.get_tool(tool_id) is None:
+                break
+        else:
+            return False
+        monitoring.use_tool_id(tool_id, "ruyi_step_tracer")
+        monitoring.register_callback(tool_id, monitoring.events.LINE, self._monitor_line)
+        monitoring.set_local_events(tool_id, self.code, monitoring.events.LINE)
+        self._tool_id = tool_id
+        return True
+
+    def _stop_monitoring(self):
+        monitoring = sys.monitoring
+        monitoring.set_local_events(self._tool_id, self.code, 0)
+        monitoring.register_callback(self._tool_id, monitoring.events.LINE, None)
+        monitoring.free_tool_id(self._tool_id)
+        self._tool_id = None
+
+    def __enter__(self):
+        if self.active and not self._start_monitoring():
+            self._previous_trace = sys.gettrace()
+            sys.settrace(self._trace_calls)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._tool_id is not None:
+            self._stop_monitoring()
+        elif self.active:
+            sys.settrace(self._previous_trace)
+        if exc is not None:
+            _ruyi_emit("error", type=exc_type.__name__, message=str(exc), label=self.label)
+        self._switch(None, ok=exc is None)
+        return False
+
+
+class _RuyiActionRecorder:
+    """包装 device_manager，对其方法调用发送 action 事件（只包装第一层方法）"""
+    def __init__(self, target, name, tracer):
+        self._ruyi_target = target
+        self._ruyi_name = name
+        self._ruyi_tracer = tracer
+
+    def __getattr__(self, attr):
+        value = getattr(self._ruyi_target, attr)
+        if _ruyi_event_file is None or not callable(value) or isinstance(value, type):
+            return value
+        name = f"{self._ruyi_name}.{attr}"
+        tracer = self._ruyi_tracer
+
+        def call(*args, **kwargs):
+            start = _ruyi_time.time()
+            ok = False
+            try:
+                result = value(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                _ruyi_emit(
+                    "action", name=name, args=_ruyi_short_repr((args, kwargs)),
+                    label=tracer.label, ok=ok, duration_sec=_ruyi_time.time() - start,
+                )
+        return call
+
+    def __setattr__(self, attr, value):
+        if attr.startswith("_ruyi_"):
+            object.__setattr__(self, attr, value)
+        else:
+            setattr(self._ruyi_target, attr, value)
+
+    def __repr__(self):
+        return repr(self._ruyi_target)
+'''
+
+
+def step_labels_by_line(scripts, first_lineno):
+    """
+    计算生成脚本中每一行代码所属的步骤标签。
+    标签写在注释中（如 "# [3] ..."），对其后的代码行生效，直到出现下一个标签。
+    返回: {行号: 标签}，行号以脚本第一行位于 first_lineno 计算
+    """
+    labels = {}
+    current = None
+    for offset, line in enumerate(scripts.splitlines()):
+        match = _STEP_LABEL_PATTERN.search(line)
+        if match:
+            current = int(match.group(1))
+        if current is not None and line.strip():
+            labels[first_lineno + offset] = current
+    return labels
+
+
+class TaskEventRecorder:
+    """接收并汇总脚本发来的事件"""
+    def __init__(self):
+        self.events = []
+        self.status = None  # task_end 中的最终状态，未收到时为 None
+        self.error = None  # 第一个 error 事件
+        self._steps = {}
+
+    def handle(self, event):
+        self.events.append(event)
+        kind = event.get("event")
+        if kind == "step_end":
+            step = self._step(event.get("label"))
+            step["count"] += 1
+            step["seconds"] += event.get("duration_sec", 0.0)
+            step["ok"] = step["ok"] and event.get("ok", True)
+        elif kind == "action":
+            self._step(event.get("label"))["actions"] += 1
+        elif kind == "error" and self.error is None:
+            self.error = event
+        elif kind == "task_end":
+            self.status = event.get("status")
+
+    def _step(self, label):
+        if label not in self._steps:
+            self._steps[label] = {"label": label, "count": 0, "seconds": 0.0, "actions": 0, "ok": True}
+        return self._steps[label]
+
+    def step_summary(self):
+        """每个步骤的执行次数、总耗时、设备操作数与是否成功，按标签排序（无标签的操作排在最后）"""
+        return sorted(self._steps.values(), key=lambda step: (step["label"] is None, step["label"] or 0))
@@ -0,0 +1,355 @@
+"""
+常驻的 Ruyi 脚本执行进程（warm worker）。
+
+ScriptExecutor 默认为每个任务启动一个新的解释器，每次都要重新导入整个 RuyiAgent
+依赖并解析 config.yaml。warm worker 只在启动时做一次初始化，之后通过 stdin 接收
+生成的 DynamicTask 源码，在独立的命名空间中执行，日志仍然通过 stdout/stderr 实时返回，
+执行结果通过单独的控制管道返回。
+
+worker 崩溃、超时，或内存占用超过水位线时会被重启。
+"""
+import atexit
+import collections
+import itertools
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+# 每个任务结束后，worker 在 stdout/stderr 中各输出一行该标记，
+# 父进程据此确认该任务的日志已全部读完（脚本输出未以换行结尾时，标记位于该行末尾）
+_TASK_END_MARK = "\x1eruyi-warm-worker-task-end:"
+
+# worker 中缓存的已编译脚本数量
+_CODE_CACHE_SIZE = 32
+
+
+def _current_rss_mb():
+    """当前进程的常驻内存（MB）"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # 非 Linux 系统退化为峰值内存
+        import resource
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 单位为字节，Linux 为 KB
+        return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+
+def worker_main(ruyi_agent_path, control_fd, config_path=None):
+    """
+    worker 进程入口：初始化 RuyiAgent 一次，然后循环执行收到的任务。
+    config_path 为 Ruyi 配置文件，默认为 RuyiAgent 目录中的 config.yaml。
+    """
+    control = os.fdopen(control_fd, "w", encoding="utf-8", buffering=1)
+
+    def report(**message):
+        control.write(json.dumps(message, ensure_ascii=False) + "\n")
+        control.flush()
+
+    # 脚本的结构化事件与 worker 的控制消息共用同一个管道
+    # （worker 作为脚本运行，所在目录即 sys.path[0]，可直接导入同目录模块）
+    from task_events import EVENT_FD_ENV
+    os.environ[EVENT_FD_ENV] = str(control_fd)
+
+    sys.path.append(ruyi_agent_path)
+    from ruyi.agent import RuyiAgent
+    from ruyi.config import RuyiConfig, RuyiArgParser
+
+    yaml_file = config_path or os.path.join(ruyi_agent_path, "config.yaml")
+    parser = RuyiArgParser((RuyiConfig,))
+    config = parser.parse_yaml_file(yaml_file=yaml_file)[0]
+    agent = RuyiAgent(config)
+    report(event="ready", pid=os.getpid(), rss_mb=_current_rss_mb())
+
+    # 已编译的脚本，按内容哈希索引；重试同一脚本时父进程只发送哈希
+    codes = collections.OrderedDict()
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        status, error = "ok", None
+        key = request.get("key")
+        try:
+            code = codes.get(key) if key is not None else None
+            if code is None:
+                code = compile(request["source"], request["filename"], "exec")
+                if key is not None:
+                    codes[key] = code
+                    while len(codes) > _CODE_CACHE_SIZE:
+                        codes.popitem(last=False)
+            else:
+                codes.move_to_end(key)
+            # 每个任务使用全新的命名空间，避免任务之间相互影响；
+            # __name__ 不是 '__main__'，因此脚本自带的启动代码不会执行
+            namespace = {"__name__": "ruyi_dynamic_task", "__file__": request["filename"]}
+            exec(code, namespace)
+            agent.task.execute_task(namespace["DynamicTask"]())
+        except (Exception, SystemExit) as e:
+            import traceback
+            traceback.print_exc()
+            status = "error"
+            error = {"type": e.__class__.__name__, "message": str(e)}
+        finally:
+            # 生成的脚本每次都会向 sys.path 追加 RuyiAgent 路径，这里去重，避免无限增长
+            sys.path[:] = list(dict.fromkeys(sys.path))
+
+        mark = f"{_TASK_END_MARK}{request['id']}"
+        print(mark, flush=True)
+        print(mark, file=sys.stderr, flush=True)
+        report(event="done", id=request["id"], status=status, error=error, cached=key in codes, rss_mb=_current_rss_mb())
+
+
+def _pump(name, pipe, events):
+    """逐行读取管道并放入事件队列，管道关闭时放入 eof 事件"""
+    try:
+        for line in iter(pipe.readline, ""):
+            events.put((name, line))
+    except (OSError, ValueError):
+        pass
+    finally:
+        events.put(("eof", name))
+
+
+class WarmWorker:
+    """
+    管理一个常驻的 Ruyi 执行进程。
+    同一时间只执行一个任务（同一个 RuyiAgent 只操作一台设备），run_task 会串行化调用。
+    """
+    def __init__(self, ruyi_agent_path, cwd="./", max_rss_mb=2048, max_tasks=200, startup_timeout=300, config_path=None):
+        self.ruyi_agent_path = ruyi_agent_path
+        self.cwd = cwd
+        self.config_path = config_path  # Ruyi 配置文件，None 表示 RuyiAgent 目录中的 config.yaml
+        self.max_rss_mb = max_rss_mb  # 内存水位线，超过后在任务间隙重启
+        self.max_tasks = max_tasks  # 单个进程最多执行的任务数，None 表示不限制
+        self.startup_timeout = startup_timeout
+
+        self.process = None
+        self.busy = False
+        self.last_rss_mb = None
+        self._events = None
+        self._tasks_run = 0
+        # worker 中已缓存代码的脚本哈希，按与 worker 相同的 LRU 规则维护
+        self._compiled_keys = collections.OrderedDict()
+        self._task_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def _next_event(self, deadline):
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            return self._events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _start(self, on_output):
+        """启动 worker 并等待 RuyiAgent 初始化完成，失败时返回错误信息"""
+        read_fd, write_fd = os.pipe()
+        try:
+            self.process = subprocess.Popen(
+                [sys.executable, "-u", os.path.abspath(__file__), self.ruyi_agent_path, str(write_fd),
+                 *([self.config_path] if self.config_path else [])],
+                cwd=self.cwd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                bufsize=1,
+                pass_fds=(write_fd,),
+                env={**os.environ, 'PYTHONUNBUFFERED': '1', 'PYTHONIOENCODING': 'utf-8'},
+            )
+        finally:
+            os.close(write_fd)
+        control = os.fdopen(read_fd, "r", encoding="utf-8")
+
+        # 每个进程使用新的队列，旧进程残留的事件不会混入
+        self._events = queue.Queue()
+        for name, pipe in (("stdout", self.process.stdout), ("stderr", self.process.stderr), ("control", control)):
+            threading.Thread(target=_pump, args=(name, pipe, self._events), daemon=True).start()
+        self._tasks_run = 0
+        self._compiled_keys.clear()
+
+        deadline = time.monotonic() + self.startup_timeout
+        while True:
+            event = self._next_event(deadline)
+            if event is None:
+                self.stop()
+                return {"type": "TimeoutError", "message": f"warm worker 启动超过 {self.startup_timeout} 秒"}
+            kind, payload = event
+            if kind == "control":
+                message = json.loads(payload)
+                self.last_rss_mb = message.get("rss_mb")
+                return None
+            if kind == "eof":
+                process, self.process = self.process, None
+                self._drain_after_exit(process, on_output)
+                return {"type": "WorkerStartError", "message": f"warm worker 启动失败，退出码 {process.returncode}"}
+            on_output(payload, kind == "stderr")
+
+    def _drain_after_exit(self, process, on_output):
+        """进程退出后转发剩余的输出"""
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        deadline = time.monotonic() + 1
+        while True:
+            event = self._next_event(deadline)
+            if event is None:
+                return
+            kind, payload = event
+            if kind in ("stdout", "stderr"):
+                on_output(payload, kind == "stderr")
+
+    def warm_up(self, on_output):
+        """提前启动 worker（已在运行时不做任何事），失败时返回错误信息"""
+        with self._lock:
+            if self.alive():
+                return None
+            return self._start(on_output)
+
+    def run_task(self, source, filename, on_output, on_event=None, timeout=None, key=None):
+        """
+        在 worker 中执行一个任务。
+        key 为脚本内容的哈希，worker 已缓存该脚本的代码对象时不再发送与编译源码。
+        on_output(line, is_error) 会在每行日志输出时被调用，on_event(event) 会在脚本每发来一个结构化事件时被调用。
+        返回 (status, error)，status 为 ok / error / crashed / timeout，error 为 None 或 {'type', 'message'}。
+        """
+        with self._lock:
+            if not self.alive():
+                error = self._start(on_output)
+                if error is not None:
+                    return "crashed", error
+
+            process = self.process
+            task_id = next(self._task_ids)
+            mark = f"{_TASK_END_MARK}{task_id}"
+            self.busy = True
+            try:
+                try:
+                    request = {"id": task_id, "key": key, "filename": filename}
+                    if key is None or key not in self._compiled_keys:
+                        request["source"] = source
+                    process.stdin.write(json.dumps(request, ensure_ascii=False) + "\n")
+                    process.stdin.flush()
+                except (OSError, ValueError) as e:
+                    self.stop()
+                    return "crashed", {"type": e.__class__.__name__, "message": f"无法向 warm worker 发送任务: {e}"}
+
+                deadline = None if timeout is None else time.monotonic() + timeout
+                pending = {"stdout", "stderr", "control"}
+                result = None
+                while pending:
+                    event = self._next_event(deadline)
+                    if event is None:
+                        self.stop()
+                        return "timeout", {"type": "TimeoutError", "message": f"任务执行超过 {timeout} 秒"}
+                    kind, payload = event
+                    if kind == "eof":
+                        # 执行中进程退出，说明 worker 崩溃（如段错误、被杀死）或被 stop() 停止
+                        if self.process is process:
+                            self.process = None
+                        self._drain_after_exit(process, on_output)
+                        return "crashed", {"type": "WorkerCrashed", "message": f"warm worker 异常退出，退出码 {process.returncode}"}
+                    if kind == "control":
+                        message = json.loads(payload)
+                        if message.get("event") != "done":
+                            if on_event is not None:
+                                on_event(message)
+                            continue
+                        result = message
+                        pending.discard("control")
+                    elif payload.rstrip("\n").endswith(mark):
+                        # 脚本最后一次输出没有换行时，标记会接在该行末尾，去掉标记后转发剩余内容
+                        rest = payload.rstrip("\n")[:-len(mark)]
+                        if rest:
+                            on_output(rest + "\n", kind == "stderr")
+                        pending.discard(kind)
+                    else:
+                        on_output(payload, kind == "stderr")
+
+                self._tasks_run += 1
+                if key in self._compiled_keys:
+                    self._compiled_keys.move_to_end(key)
+                elif result.get("cached"):
+                    self._compiled_keys[key] = True
+                    while len(self._compiled_keys) > _CODE_CACHE_SIZE:
+                        self._compiled_keys.popitem(last=False)
+                self.last_rss_mb = result.get("rss_mb")
+                return result["status"], result.get("error")
+            finally:
+                self.busy = False
+
+    def recycle_if_needed(self):
+        """在任务间隙检查内存水位线与任务数，需要时重启 worker，返回重启原因"""
+        with self._lock:
+            if not self.alive():
+                return None
+            reason = None
+            if self.max_rss_mb is not None and self.last_rss_mb is not None and self.last_rss_mb > self.max_rss_mb:
+                reason = f"内存占用 {self.last_rss_mb:.0f}MB 超过水位线 {self.max_rss_mb}MB"
+            elif self.max_tasks is not None and self._tasks_run >= self.max_tasks:
+                reason = f"已执行 {self._tasks_run} 个任务"
+            if reason is not None:
+                self.stop()
+            return reason
+
+    def stop(self):
+        """停止 worker 进程，下次执行任务时会重新启动"""
+        process, self.process = self.process, None
+        if process is None or process.poll() is not None:
+            return
+        try:
+            process.stdin.close()  # worker 读到 EOF 后自行退出
+            process.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            process.terminate()
+            try:
+                process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+# 同一个 RuyiAgent 路径与工作目录共享一个 worker，RuyiManager 每次新建 ScriptExecutor 时也能复用
+_workers = {}
+_workers_lock = threading.Lock()
+
+
+def get_warm_worker(ruyi_agent_path, cwd="./", config_path=None):
+    """
+    获取共享的 warm worker，不存在时创建（进程在第一次执行任务时启动）。
+    使用不同配置文件（如连接不同端口）的 worker 互不共享。
+    """
+    config_path = os.path.abspath(config_path or os.path.join(ruyi_agent_path, "config.yaml"))
+    key = (os.path.abspath(ruyi_agent_path), os.path.abspath(cwd), config_path)
+    with _workers_lock:
+        if key not in _workers:
+            _workers[key] = WarmWorker(ruyi_agent_path, cwd=cwd, config_path=config_path)
+        return _workers[key]
+
+
+def shutdown_warm_workers():
+    """停止所有 warm worker"""
+    with _workers_lock:
+        workers = list(_workers.values())
+        _workers.clear()
+    for worker in workers:
+        worker.stop()
+
+
+atexit.register(shutdown_warm_workers)
+
+
+if __name__ == '__main__':
+    worker_main(sys.argv[1], int(sys.argv[2]), *sys.argv[3:])
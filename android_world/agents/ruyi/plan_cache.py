@@ -0,0 +1,207 @@
+"""
+重复目标的 workflow / 脚本计划缓存。
+
+同一任务模板（如 "Delete the following expenses …"）会以不同参数多次出现，
+而 RuyiManager 每次都要依次调用两次 LLM（generate_workflow、transfer_workflow_to_code）。
+任务验证成功后（由 RuyiManager.record_plan_outcome 记录），计划缓存保存带标签的 workflow 与代码：
+- 按规范化后的目标精确匹配；
+- 按任务模板匹配：把计划中的参数值替换为参数槽位保存，新目标匹配同一模板时再代入新参数。
+每条缓存记录成功与失败次数，成功率不足的记录不再使用。
+"""
+import json
+import os
+import re
+import string
+import threading
+from datetime import datetime
+
+# 参数槽位在 workflow / 代码中的占位形式
+_SLOT_OPEN, _SLOT_CLOSE = "⟦", "⟧"
+# 过短的参数值（如单个数字）容易误替换，不做槽位化
+_MIN_SLOT_VALUE_LENGTH = 2
+
+
+def normalize_goal(goal: str) -> str:
+    """规范化目标：合并空白字符，去掉首尾空白"""
+    return " ".join(goal.split())
+
+
+class TemplateMatcher:
+    """把任务模板（如 "Delete {name}."）转换为正则，从目标中提取参数"""
+    def __init__(self, template: str):
+        self.template = template
+        parts = []
+        seen = set()
+        self.literal_length = 0
+        for literal, field, _, _ in string.Formatter().parse(normalize_goal(template)):
+            parts.append(re.escape(literal))
+            self.literal_length += len(literal)
+            if field is None:
+                continue
+            if field in seen:
+                parts.append(f"(?P={field})")
+            else:
+                seen.add(field)
+                parts.append(f"(?P<{field}>.+?)")
+        self.fields = seen
+        self.pattern = re.compile("".join(parts), flags=re.DOTALL)
+
+    def match(self, goal: str) -> dict | None:
+        match = self.pattern.fullmatch(goal)
+        return match.groupdict() if match else None
+
+
+def _value_pattern(value: str) -> re.Pattern:
+    # 以字母数字开头/结尾的参数值只在词边界处替换，避免替换到其他单词内部
+    prefix = r"(?<!\w)" if value[0].isalnum() else ""
+    suffix = r"(?!\w)" if value[-1].isalnum() else ""
+    return re.compile(prefix + re.escape(value) + suffix)
+
+
+def _to_slots(text: str, params: dict) -> str | None:
+    """把参数值替换为槽位；任一参数值无法安全替换时返回 None"""
+    values = list(params.values())
+    if len(set(values)) != len(values):
+        return None  # 不同参数取值相同，无法区分
+    # 先替换较长的值，避免较短的值是其子串
+    for name, value in sorted(params.items(), key=lambda item: -len(item[1])):
+        if len(value) < _MIN_SLOT_VALUE_LENGTH:
+            return None
+        text, count = _value_pattern(value).subn(lambda _: f"{_SLOT_OPEN}{name}{_SLOT_CLOSE}", text)
+        if count == 0:
+            return None  # 计划中找不到该参数，说明计划可能隐式依赖它
+    return text
+
+
+def _from_slots(text: str, params: dict) -> str:
+    for name, value in params.items():
+        text = text.replace(f"{_SLOT_OPEN}{name}{_SLOT_CLOSE}", value)
+    return text
+
+
+class CachedPlan:
+    """缓存命中的计划；code 为 None 时只能复用 workflow，需要重新生成代码"""
+    def __init__(self, source: str, key: str, workflow: str, code: str | None):
+        self.source = source  # "goal"：精确匹配；"template"：模板参数匹配
+        self.key = key
+        self.workflow = workflow
+        self.code = code
+
+
+class PlanCache:
+    """
+    持久化在 JSON 文件中的计划缓存，可在多个 RuyiManager 之间共享（线程安全）。
+    """
+    def __init__(self, path: str = "ruyi_plan_cache.json", templates=(), min_success_rate: float = 0.5):
+        self.path = path
+        self.min_success_rate = min_success_rate
+        # 优先匹配字面内容更多（更具体）的模板
+        self.matchers = sorted(
+            (TemplateMatcher(t) for t in set(templates) if t and "{" in t),
+            key=lambda matcher: -matcher.literal_length,
+        )
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self) -> dict:
+        data = {"goals": {}, "templates": {}}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+            if isinstance(loaded, dict):
+                data["goals"].update(loaded.get("goals", {}))
+                data["templates"].update(loaded.get("templates", {}))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"读取计划缓存失败，将重新建立: {e}")
+        return data
+
+    def _save(self):
+        # 先写临时文件再替换，避免中断时留下损坏的缓存文件
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"保存计划缓存失败: {e}")
+
+    def _match_template(self, goal: str):
+        for matcher in self.matchers:
+            params = matcher.match(goal)
+            if params is not None:
+                return matcher, params
+        return None, None
+
+    def _usable(self, entry: dict | None) -> bool:
+        if not entry or entry.get("successes", 0) == 0:
+            return False
+        total = entry["successes"] + entry.get("failures", 0)
+        return entry["successes"] / total >= self.min_success_rate
+
+    def lookup(self, task_description: str) -> CachedPlan | None:
+        """先按目标精确查找，再按模板参数匹配；未命中时返回 None"""
+        goal = normalize_goal(task_description)
+        with self._lock:
+            entry = self._data["goals"].get(goal)
+            if self._usable(entry):
+                return CachedPlan("goal", goal, entry["workflow"], entry["code"])
+
+            matcher, params = self._match_template(goal)
+            if matcher is None:
+                return None
+            entry = self._data["templates"].get(matcher.template)
+            if not self._usable(entry):
+                return None
+            code = entry.get("code")
+            return CachedPlan(
+                "template",
+                matcher.template,
+                _from_slots(entry["workflow"], params),
+                _from_slots(code, params) if code is not None else None,
+            )
+
+    def record(self, task_description: str, workflow: str, code: str, success: bool, plan: CachedPlan | None = None):
+        """
+        记录一次执行结果：更新所用缓存记录的成功/失败次数；
+        执行成功时，把 workflow 与代码写入精确匹配与模板匹配的缓存。
+        """
+        goal = normalize_goal(task_description)
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            if plan is not None:
+                table = self._data["goals"] if plan.source == "goal" else self._data["templates"]
+                entry = table.get(plan.key)
+                if entry is not None:
+                    entry["successes" if success else "failures"] += 1
+                    entry["updated"] = now
+
+            if success and workflow and code:
+                entry = self._data["goals"].get(goal)
+                if entry is None or not self._usable(entry):
+                    self._data["goals"][goal] = {
+                        "workflow": workflow, "code": code, "successes": 1, "failures": 0, "updated": now,
+                    }
+
+                matcher, params = self._match_template(goal)
+                if matcher is not None and not self._usable(self._data["templates"].get(matcher.template)):
+                    slotted_workflow = _to_slots(workflow, params)
+                    if slotted_workflow is not None:
+                        # 代码无法槽位化时仍可复用 workflow，只省去一次 LLM 调用
+                        self._data["templates"][matcher.template] = {
+                            "workflow": slotted_workflow, "code": _to_slots(code, params),
+                            "successes": 1, "failures": 0, "updated": now,
+                        }
+            self._save()
+
+    def stats(self) -> dict:
+        """缓存记录数与累计成功/失败次数"""
+        with self._lock:
+            entries = list(self._data["goals"].values()) + list(self._data["templates"].values())
+            return {
+                "goals": len(self._data["goals"]),
+                "templates": len(self._data["templates"]),
+                "successes": sum(e.get("successes", 0) for e in entries),
+                "failures": sum(e.get("failures", 0) for e in entries),
+            }
@@ -1,13 +1,18 @@
 import os
+import json
 import base64
 import requests
 
 
 class LLM:
-    def __init__(self, model_name: str = 'gpt-5-chat', max_retry: int = 3, temperature: float = 0.0):
+    def __init__(self, model_name: str = 'gpt-5-chat', max_retry: int = 3, temperature: float = 0.0, stream: bool | None = None):
         self.model_name = model_name
         self.max_retry = max_retry
         self.temperature = temperature
+        # 是否以流式（SSE）方式获取回复，默认开启，可通过环境变量 RUYI_LLM_STREAM=0 关闭
+        if stream is None:
+            stream = os.environ.get("RUYI_LLM_STREAM", "1") != "0"
+        self.stream = stream
         self.base_url = self.get_base_url()
         self.api_key = os.environ['OPENAI_API_KEY']
 
@@ -51,6 +56,54 @@ class LLM:
         
         return response_text
 
+    def query_stream(self, prompt):
+        """
+        以流式方式查询，逐块返回回复文本（生成器）。
+        调用方提前停止迭代时关闭连接，不再接收剩余内容。
+        服务端不支持流式输出、直接返回完整 JSON 时，一次性返回完整回复。
+        调用失败时不返回任何内容。
+        """
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+
+        data = {
+            "model": self.model_name,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "stream": True,
+        }
+
+        with requests.post(self.base_url, headers=headers, json=data, stream=True) as response:
+            if response.status_code != 200:
+                print(f"LLM API call failed: {response.status_code} - {response.text}")
+                return
+
+            if "text/event-stream" not in response.headers.get("Content-Type", ""):
+                result = response.json()
+                yield result["choices"][0]["message"]["content"]
+                return
+
+            # SSE 响应通常不声明字符集，requests 会按 ISO-8859-1 解码，这里显式指定 UTF-8
+            response.encoding = "utf-8"
+            for line in response.iter_lines(decode_unicode=True):
+                # SSE 格式：每个事件形如 "data: {...}"，以 "data: [DONE]" 结束
+                if not line or not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    return
+                try:
+                    chunk = json.loads(payload)
+                except ValueError:
+                    continue
+                choices = chunk.get("choices") or []
+                content = choices[0].get("delta", {}).get("content") if choices else None
+                if content:
+                    yield content
+
 
 if __name__ == "__main__":
     llm = LLM()
@@ -1,8 +1,8 @@
-import re
 from datetime import datetime
 
 from .prompt_manager import PromptManager
 from .models import LLM
+from .tag_parser import IncrementalTagParser, extract_tag_content
 
 
 class ScriptGenerator:
@@ -11,17 +11,25 @@ class ScriptGenerator:
         self.llm = LLM("gpt-5-chat")
 
     def _extract_tag_content(self, text: str, tag: str) -> str | None:
-        if not text:
-            return None
-        pattern = rf"<{tag}>(.*?)</{tag}>"
-        match = re.search(pattern, text, flags=re.DOTALL | re.IGNORECASE)
-        if match:
-            match_content = match.group(1).strip()
-            if match_content.startswith("```") and match_content.endswith("```"):
-                match_content = match_content.splitlines()[1:-1]
-                return "\n".join(match_content).strip()
-            return match_content.strip()
-        return None
+        return extract_tag_content(text, tag)
+
+    def _query(self, prompt: str, stop_tag: str) -> str | None:
+        """
+        查询 LLM。流式模式下读到 stop_tag 的结束标签即停止接收，忽略其后的内容。
+        返回已接收的回复文本，调用失败时返回 None。
+        """
+        if not self.llm.stream:
+            return self.llm.query(prompt)
+
+        parser = IncrementalTagParser(stop_tag)
+        chunks = self.llm.query_stream(prompt)
+        try:
+            for chunk in chunks:
+                if parser.feed(chunk):
+                    break
+        finally:
+            chunks.close()  # 提前停止时关闭连接
+        return parser.text or None
 
     def generate_workflow(self, task_description: str):
         generate_workflow_prompt = self.prompt_manager.generate_workflow(task_description)
@@ -31,7 +39,7 @@ class ScriptGenerator:
         with open(f"ruyi_scripts/generate_workflow_prompt_{current_time}.txt", "w") as f:
             f.write(generate_workflow_prompt)
 
-        response = self.llm.query(generate_workflow_prompt)
+        response = self._query(generate_workflow_prompt, "workflow")
         thought = self._extract_tag_content(response, "thought")
         workflow = self._extract_tag_content(response, "workflow")
 
@@ -53,7 +61,7 @@ class ScriptGenerator:
         with open(f"ruyi_scripts/transfer_workflow_to_code_prompt_{current_time}.txt", "w") as f:
             f.write(transfer_workflow_to_code_prompt)
 
-        response = self.llm.query(transfer_workflow_to_code_prompt)
+        response = self._query(transfer_workflow_to_code_prompt, "labeled_python_script")
         thought = self._extract_tag_content(response, "thought")
         python_script = self._extract_tag_content(response, "labeled_python_script")
 
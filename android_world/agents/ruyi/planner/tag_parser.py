@@ -0,0 +1,61 @@
+"""
+增量解析 LLM 流式回复中的标签（如 <workflow>…</workflow>）。
+
+ScriptGenerator 只需要回复中的某个标签内容，流式接收时一旦读到该标签的结束标签即可停止，
+不必等待模型输出剩余内容。
+"""
+import re
+
+
+def extract_tag_content(text: str, tag: str) -> str | None:
+    """提取 <tag>…</tag> 中的内容（忽略大小写），内容被 ``` 代码块包裹时去掉代码块标记"""
+    if not text:
+        return None
+    pattern = rf"<{tag}>(.*?)</{tag}>"
+    match = re.search(pattern, text, flags=re.DOTALL | re.IGNORECASE)
+    if match:
+        match_content = match.group(1).strip()
+        if match_content.startswith("```") and match_content.endswith("```"):
+            match_content = match_content.splitlines()[1:-1]
+            return "\n".join(match_content).strip()
+        return match_content.strip()
+    return None
+
+
+class IncrementalTagParser:
+    """
+    逐块接收回复文本，读到 stop_tag 的结束标签时 feed 返回 True。
+    每次只在新到达的文本附近查找结束标签，总开销与回复长度成线性关系。
+    """
+    def __init__(self, stop_tag: str):
+        self.stop_tag = stop_tag
+        self._open_tag = f"<{stop_tag.lower()}>"
+        self._close_tag = f"</{stop_tag.lower()}>"
+        self._chunks = []
+        self._lowered = ""  # 已接收文本的小写形式，用于忽略大小写查找
+        self._open_index = -1
+        self.done = False
+
+    @property
+    def text(self) -> str:
+        """已接收的全部文本"""
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> bool:
+        if self.done or not chunk:
+            return self.done
+        self._chunks.append(chunk)
+        # 标签可能被拆分在两个块之间，从上一块末尾往前回退一个标签长度开始查找
+        received = len(self._lowered)
+        self._lowered += chunk.lower()
+        if self._open_index < 0:
+            self._open_index = self._lowered.find(self._open_tag, max(0, received - len(self._open_tag) + 1))
+            if self._open_index < 0:
+                return False
+        start = max(self._open_index + len(self._open_tag), received - len(self._close_tag) + 1)
+        self.done = self._lowered.find(self._close_tag, start) >= 0
+        return self.done
+
+    def content(self, tag: str | None = None) -> str | None:
+        """已接收文本中 tag（默认 stop_tag）的内容，标签尚未完整时返回 None"""
+        return extract_tag_content(self.text, tag or self.stop_tag)
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import os
+import re
+import threading
+from collections.abc import Mapping
 from pathlib import Path
-from typing import Dict, List
-
-TEMPLATE_JS_PATH = os.environ['TEMPLATE_JS_PATH']
+from typing import Dict, Iterator, List
 
 TARGET_TEMPLATE_VARIABLES: List[str] = [
     "EnglishRuyiDSLSyntax",
@@ -17,6 +20,13 @@ TARGET_TEMPLATE_VARIABLES: List[str] = [
     "EnglishOutputNotes",
 ]
 
+# 解析结果缓存文件，可通过环境变量 RUYI_TEMPLATE_CACHE 指定
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ruyi", "template_variables.json")
+
+# 一次扫描出所有 `key: `...`` 形式的模板字符串（反引号内允许反斜杠转义）
+_TEMPLATE_LITERAL_PATTERN = re.compile(r"(\w+):\s*`([^`\\]*(?:\\.[^`\\]*)*)`", flags=re.DOTALL)
+_ESCAPE_PATTERN = re.compile(r"\\(.)", flags=re.DOTALL)
+
 
 def _unescape_template_literal_char(char: str) -> str:
     escape_map = {
@@ -32,59 +42,143 @@ def _unescape_template_literal_char(char: str) -> str:
     return escape_map.get(char, char)
 
 
-def _extract_template_literal(content: str, key: str) -> str:
-    marker = f"{key}: `"
-    start = content.find(marker)
-    if start == -1:
-        raise ValueError(f"Cannot find template literal for key '{key}'.")
+def _unescape_template_literal(body: str) -> str:
+    return _ESCAPE_PATTERN.sub(lambda match: _unescape_template_literal_char(match.group(1)), body)
+
+
+def _extract_template_literals(content: str, keys: List[str]) -> Dict[str, str]:
+    """单次扫描源码，提取所有目标 key 的模板字符串（同一 key 以第一次出现为准）"""
+    wanted = set(keys)
+    data: Dict[str, str] = {}
+    for match in _TEMPLATE_LITERAL_PATTERN.finditer(content):
+        key = match.group(1)
+        if key in wanted and key not in data:
+            data[key] = _unescape_template_literal(match.group(2))
+            if len(data) == len(wanted):
+                break
+
+    missing = [key for key in keys if key not in data]
+    if missing:
+        raise ValueError(f"Cannot find template literal for keys {missing}.")
+    return data
 
-    index = start + len(marker)
-    chars: List[str] = []
 
-    while index < len(content):
-        char = content[index]
-        if char == "`":
-            return "".join(chars)
+def get_template_js_path() -> Path:
+    if "TEMPLATE_JS_PATH" not in os.environ:
+        raise RuntimeError("TEMPLATE_JS_PATH not set.")
+    return Path(os.environ["TEMPLATE_JS_PATH"])
 
-        if char == "\\":
-            index += 1
-            if index >= len(content):
-                raise ValueError(f"Incomplete escape sequence in '{key}'.")
-            chars.append(_unescape_template_literal_char(content[index]))
-            index += 1
-            continue
 
-        chars.append(char)
-        index += 1
+def _cache_path() -> str:
+    return os.environ.get("RUYI_TEMPLATE_CACHE", DEFAULT_CACHE_PATH)
 
-    raise ValueError(f"Unterminated template literal for key '{key}'.")
+
+def _read_cache() -> dict:
+    try:
+        with open(_cache_path(), "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(cache: dict) -> None:
+    # 先写临时文件再替换，并行启动的进程不会读到写了一半的缓存
+    cache_path = _cache_path()
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: failed to write template cache {cache_path}: {e}")
 
 
 def _load_template_variables() -> Dict[str, str]:
-    template_js_path = Path(TEMPLATE_JS_PATH)
+    template_js_path = get_template_js_path()
     if not template_js_path.exists():
         raise FileNotFoundError(f"Template file not found: {template_js_path}")
 
-    content = template_js_path.read_text(encoding="utf-8")
-    data: Dict[str, str] = {}
-    for key in TARGET_TEMPLATE_VARIABLES:
-        data[key] = _extract_template_literal(content, key)
+    # 缓存按源文件路径索引；修改时间与大小不变时直接使用缓存，不读取源文件
+    stat = template_js_path.stat()
+    source_key = str(template_js_path.resolve())
+    cache = _read_cache()
+    entry = cache.get(source_key)
+    keys_match = isinstance(entry, dict) and entry.get("keys") == TARGET_TEMPLATE_VARIABLES
+    if keys_match and entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("size") == stat.st_size:
+        return entry["variables"]
+
+    raw = template_js_path.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()
+    if keys_match and entry.get("sha256") == digest:
+        # 内容未变（如仅被 touch），更新修改时间即可
+        data = entry["variables"]
+    else:
+        data = _extract_template_literals(raw.decode("utf-8"), TARGET_TEMPLATE_VARIABLES)
+
+    cache[source_key] = {
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": digest,
+        "keys": TARGET_TEMPLATE_VARIABLES,
+        "variables": data,
+    }
+    _write_cache(cache)
     return data
 
 
-TEMPLATE_VARIABLES: Dict[str, str] = _load_template_variables()
+_template_variables: Dict[str, str] | None = None
+_template_variables_lock = threading.Lock()
+
+
+def get_template_variables() -> Dict[str, str]:
+    """第一次调用时加载模板变量（优先使用缓存），之后直接返回"""
+    global _template_variables
+    if _template_variables is None:
+        with _template_variables_lock:
+            if _template_variables is None:
+                _template_variables = _load_template_variables()
+    return _template_variables
+
+
+class _LazyTemplateVariables(Mapping):
+    """在第一次访问时才加载的模板变量，导入本模块时不读取 TEMPLATE_JS_PATH"""
+    def __getitem__(self, key: str) -> str:
+        return get_template_variables()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(get_template_variables())
+
+    def __len__(self) -> int:
+        return len(get_template_variables())
+
+    def __repr__(self) -> str:
+        if _template_variables is None:
+            return "<template variables, not loaded>"
+        return repr(_template_variables)
+
+
+TEMPLATE_VARIABLES: Mapping[str, str] = _LazyTemplateVariables()
+
+
+def __getattr__(name: str):
+    # 兼容旧的模块级常量 TEMPLATE_JS_PATH，访问时才读取环境变量
+    if name == "TEMPLATE_JS_PATH":
+        return str(get_template_js_path())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
-    print(TEMPLATE_VARIABLES)
-    
+    print(dict(TEMPLATE_VARIABLES))
+
     with open("EnglishRuyiDSLSyntax.txt", "w", encoding="utf-8") as f:
         f.write(TEMPLATE_VARIABLES["EnglishRuyiDSLSyntax"])
-    
+
     # import json
     # with open("english_template_variables.json", "w", encoding="utf-8") as f:
-    #     json.dump(TEMPLATE_VARIABLES, f, indent=4)
-    
+    #     json.dump(dict(TEMPLATE_VARIABLES), f, indent=4)
+
     # print(TEMPLATE_VARIABLES["EnglishRuyiDSLSyntax"])
     # print(TEMPLATE_VARIABLES["EnglishRuyiDSLSyntaxExamples"])
     # print(TEMPLATE_VARIABLES["EnglishWorkflowToPythonHint"])
@@ -92,4 +186,4 @@ if __name__ == "__main__":
     # print(TEMPLATE_VARIABLES["EnglishExamplesIntroduction"])
     # print(TEMPLATE_VARIABLES["EnglishExamples"])
     # print(TEMPLATE_VARIABLES["EnglishTaskNameExamplePrompt"])
-    # print(TEMPLATE_VARIABLES["EnglishOutputNotes"])
\ No newline at end of file
+    # print(TEMPLATE_VARIABLES["EnglishOutputNotes"])
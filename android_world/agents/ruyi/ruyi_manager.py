@@ -1,28 +1,113 @@
+import concurrent.futures
+import logging
+import time
+
 from .planner import ScriptGenerator
 from .executor import ScriptExecutor
+from .plan_cache import PlanCache
+
+# 在后台准备设备与执行器，与生成 workflow / 代码的 LLM 调用并行进行
+_preparation_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="ruyi_prepare")
 
 
 class RuyiManager:
-    def __init__(self):
+    def __init__(self, plan_cache: PlanCache | None = None, host_port: int | None = None):
         self.script_generator = ScriptGenerator()
-        self.script_executor = ScriptExecutor()
-
-    def execute_task(self, task_description: str):
+        # host_port 为 Ruyi 连接设备服务的主机端口，None 表示使用 config.yaml 中的端口
+        self.script_executor = ScriptExecutor(host_port=host_port)
+        # 计划缓存：命中时跳过一次或两次 LLM 调用
+        self.plan_cache = plan_cache
+        # 最近一次任务各阶段的耗时（秒），未执行的阶段（如命中计划缓存时的 LLM 调用）为 None；
+        # prepare_error 为准备阶段的错误描述，没有出错时为 None
+        self.timings = {}
+        # 最近一次任务所用的计划，等待任务验证结果后由 record_plan_outcome 写入计划缓存
+        self._pending_plan = None
+
+    def execute_task(self, task_description: str, prepare_device=None):
+        """
+        执行任务：生成 workflow 与代码后交给执行器执行。
+        prepare_device 为可选的设备准备函数（如设置输入法、端口转发、打开目标应用），
+        与执行器预热一起在后台运行，和脚本生成并行进行；脚本就绪后只等待尚未完成的部分。
+        """
         print("=" * 10, "Executing task with Ruyi", "=" * 10)
         print("=" * 10, "Task description:", task_description, "=" * 10)
 
-        print("=" * 10, "Generating workflow...", "=" * 10)
-        workflow = self.script_generator.generate_workflow(task_description)
-
-        # 对生成的 workflow 进行按行打标签，形成 labeled_workflow
-        labeled_workflow = _label_workflow(workflow)
-
-        print("=" * 10, "Transferring workflow to code...", "=" * 10)
-        labeled_python_script = self.script_generator.transfer_workflow_to_code(task_description, labeled_workflow)
+        self.timings = {
+            "generate_workflow": None, "transfer_workflow_to_code": None, "execute": None,
+            "prepare": None, "prepare_wait": None, "overlap_saved": None, "prepare_error": None,
+        }
+        preparation = _preparation_pool.submit(self._prepare, prepare_device)
+        try:
+            plan = self.plan_cache.lookup(task_description) if self.plan_cache is not None else None
+            if plan is not None:
+                print("=" * 10, f"Plan cache hit ({plan.source}), reusing workflow", "=" * 10)
+                labeled_workflow = plan.workflow
+            else:
+                print("=" * 10, "Generating workflow...", "=" * 10)
+                start = time.perf_counter()
+                workflow = self.script_generator.generate_workflow(task_description)
+                self.timings["generate_workflow"] = time.perf_counter() - start
+
+                # 对生成的 workflow 进行按行打标签，形成 labeled_workflow
+                labeled_workflow = _label_workflow(workflow)
+
+            if plan is not None and plan.code is not None:
+                labeled_python_script = plan.code
+            else:
+                print("=" * 10, "Transferring workflow to code...", "=" * 10)
+                start = time.perf_counter()
+                labeled_python_script = self.script_generator.transfer_workflow_to_code(task_description, labeled_workflow)
+                self.timings["transfer_workflow_to_code"] = time.perf_counter() - start
+        finally:
+            # 脚本已就绪（或生成失败），等待仍在进行的准备工作，避免与下一个任务的准备交错；
+            # 准备耗时中与脚本生成重叠的部分即节省的时间
+            start = time.perf_counter()
+            self.timings["prepare"], self.timings["prepare_error"] = preparation.result()
+            self.timings["prepare_wait"] = time.perf_counter() - start
+            self.timings["overlap_saved"] = max(0.0, self.timings["prepare"] - self.timings["prepare_wait"])
+        print("=" * 10, f"Preparation took {self.timings['prepare']:.2f}s, "
+              f"{self.timings['overlap_saved']:.2f}s overlapped with planning", "=" * 10)
 
         # 将带标签的 workflow 一并传给执行器，方便后续使用
-        self.script_executor.execute_scripts(labeled_python_script, code_script_labeled = labeled_python_script, NL_script_labeled=labeled_workflow, task=task_description)
-        return
+        # 返回 (task_success, execution_error)；每个步骤的耗时可通过 script_executor.get_step_summary() 获取
+        start = time.perf_counter()
+        result = self.script_executor.execute_scripts(labeled_python_script, code_script_labeled = labeled_python_script, NL_script_labeled=labeled_workflow, task=task_description)
+        self.timings["execute"] = time.perf_counter() - start
+
+        # 脚本未抛出异常不代表任务完成，计划要等任务验证后再写入缓存
+        self._pending_plan = (task_description, labeled_workflow, labeled_python_script, plan)
+        return result
+
+    def record_plan_outcome(self, success: bool):
+        """
+        记录最近一次任务的验证结果：更新所用缓存记录的成功率，验证成功的新计划写入缓存。
+        每次任务只记录一次；未启用计划缓存时不做任何事。
+        """
+        if self.plan_cache is None or self._pending_plan is None:
+            return
+        task_description, labeled_workflow, labeled_python_script, plan = self._pending_plan
+        self._pending_plan = None
+        self.plan_cache.record(task_description, labeled_workflow, labeled_python_script, success=success, plan=plan)
+
+    def _prepare(self, prepare_device):
+        """
+        准备设备并预热执行器，返回 (耗时, 错误描述)；没有出错时错误描述为 None。
+        失败只记录日志，不影响后续执行：脚本本身仍会打开应用、启动执行器。
+        """
+        start = time.perf_counter()
+        errors = []
+        if prepare_device is not None:
+            try:
+                prepare_device()
+            except Exception as e:
+                logging.warning("设备准备失败", exc_info=True)
+                errors.append(f"设备准备失败: {type(e).__name__}: {e}")
+        try:
+            self.script_executor.warm_up()
+        except Exception as e:
+            logging.warning("执行器预热失败", exc_info=True)
+            errors.append(f"执行器预热失败: {type(e).__name__}: {e}")
+        return time.perf_counter() - start, "; ".join(errors) or None
 
 
 def _label_workflow(workflow: str) -> str:
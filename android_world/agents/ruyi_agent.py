@@ -14,20 +14,26 @@
 
 """T3A: Text-only Autonomous Agent for Android."""
 
-import json
-import os
 from datetime import datetime
+import re
 
+from android_world import registry
 from android_world.agents import agent_utils
 from android_world.agents import base_agent
 from android_world.agents import infer
 from android_world.agents import m3a_utils
+from android_world.agents import ruyi_device_bridge
+from android_world.agents import ruyi_records
 from android_world.env import adb_utils
 from android_world.env import interface
 from android_world.env import json_action
 from android_world.env import representation_utils
+from android_world.utils import tracing
 
 from .ruyi import RuyiManager
+from .ruyi.plan_cache import normalize_goal
+from .ruyi.plan_cache import PlanCache
+from .ruyi.plan_cache import TemplateMatcher
 
 class RuyiAgent(base_agent.EnvironmentInteractingAgent):
   """Ruyi Agent for Android."""
@@ -36,15 +42,38 @@ class RuyiAgent(base_agent.EnvironmentInteractingAgent):
       self,
       env: interface.AsyncEnv,
       name: str = 'RuyiAgent',
+      use_plan_cache: bool = False,
+      plan_cache_path: str = 'ruyi_plan_cache.json',
+      host_port: int = ruyi_device_bridge.DEFAULT_HOST_PORT,
+      record_path: str = ruyi_records.DEFAULT_RECORD_PATH,
+      launch_likely_app: bool = True,
   ):
     """Initializes a RuyiAgent.
 
     Args:
       env: The environment.
       name: The agent name.
+      use_plan_cache: Whether to reuse the workflow and script of earlier
+        runs of the same goal or task template whose task evaluation succeeded.
+      plan_cache_path: Where the plan cache is persisted.
+      host_port: Host port forwarded to the Ruyi service on the device; the
+        Ruyi scripts are configured to connect to it.
+      record_path: JSON-lines file the execution records are appended to.
+      launch_likely_app: Whether to open the app a goal most likely targets,
+        guessed from the task templates, while the script is being generated.
     """
     super().__init__(env, name)
     self.additional_guidelines = None
+    self.plan_cache = None
+    # 最近一次执行的 RuyiManager，任务验证后由它把计划结果写入计划缓存。
+    self._last_manager = None
+    self.device_bridge = ruyi_device_bridge.RuyiDeviceBridge(
+        env, host_port=host_port
+    )
+    self.record_store = ruyi_records.get_record_store(record_path)
+    self.app_guesser = _LikelyAppGuesser() if launch_likely_app else None
+    if use_plan_cache:
+      self.plan_cache = PlanCache(plan_cache_path, templates=_task_templates())
 
   def reset(self, go_home_on_reset: bool = False):
     super().reset(go_home_on_reset)
@@ -69,15 +98,31 @@ class RuyiAgent(base_agent.EnvironmentInteractingAgent):
     """
     print(f'RuyiAgent receives goal: "{goal}".')
 
-    os.system("adb shell settings put secure show_ime_with_hard_keyboard 0")
-    os.system("adb forward tcp:51825 tcp:6666")
-
     task_start = datetime.now()
-    ruyi_manager = RuyiManager()
-    ruyi_manager.execute_task(goal)
+    ruyi_manager = RuyiManager(
+        plan_cache=self.plan_cache, host_port=self.device_bridge.host_port
+    )
+    self._last_manager = ruyi_manager
+    # 设备准备与脚本生成并行进行；准备在工作线程中执行，计时记入本步骤。
+    with tracing.span('agent.ruyi.execute_task'):
+      task_success, execution_error = ruyi_manager.execute_task(
+          goal,
+          prepare_device=tracing.propagate(lambda: self._prepare_device(goal)),
+      )
     task_end = datetime.now()
+    # 脚本通过结构化事件通道上报的每个 workflow 步骤的耗时与结果。
+    steps = ruyi_manager.script_executor.get_step_summary()
 
-    self._record_execution(goal, task_start, task_end)
+    self._record_execution(
+        goal,
+        task_start,
+        task_end,
+        task_success,
+        execution_error,
+        steps,
+        timings=ruyi_manager.timings,
+        exit_status=ruyi_manager.script_executor.exit_status,
+    )
 
     step_data: dict[str, object] = {
         'before_screenshot': None,
@@ -93,6 +138,9 @@ class RuyiAgent(base_agent.EnvironmentInteractingAgent):
             f'Goal: "{goal}".'
         ),
         'summary_raw_response': None,
+        'ruyi_task_success': task_success,
+        'ruyi_execution_error': _error_without_log(execution_error),
+        'ruyi_steps': steps,
     }
 
     # 关键：通过 done=True 告诉上层 episode_runner，本次任务已经结束。
@@ -101,34 +149,140 @@ class RuyiAgent(base_agent.EnvironmentInteractingAgent):
         data=step_data,
     )
 
+  def episode_finished(self, goal: str, is_successful: float | None) -> None:
+    """按任务验证结果更新计划缓存；运行或验证出错时不记录。"""
+    ruyi_manager, self._last_manager = self._last_manager, None
+    if ruyi_manager is None or is_successful is None:
+      return
+    ruyi_manager.record_plan_outcome(is_successful > 0.5)
+
+  def _prepare_device(self, goal: str) -> None:
+    """通过 env 的 controller 准备设备，并打开目标最可能操作的应用。"""
+    with tracing.span('agent.ruyi.prepare_device'):
+      # 端口转发每个连接只建立一次。
+      self.device_bridge.prepare()
+      if self.app_guesser is None:
+        return
+      app_name = self.app_guesser.guess(goal)
+      if app_name is not None:
+        print(f'RuyiAgent opens the likely target app: {app_name}')
+        self.device_bridge.launch_app(app_name)
+
   def _record_execution(
-      self, goal: str, start_time: datetime, end_time: datetime
+      self,
+      goal: str,
+      start_time: datetime,
+      end_time: datetime,
+      task_success: bool = False,
+      execution_error: dict[str, object] | None = None,
+      steps: list[dict[str, object]] | None = None,
+      timings: dict[str, float | str | None] | None = None,
+      exit_status: str | None = None,
   ) -> None:
-    """记录单次任务执行信息，便于后续审计与调试。"""
-    record_path = 'ruyi_execution_records.json'
+    """记录单次任务执行信息，便于后续审计与调试。
+
+    记录由后台线程追加写入，不阻塞任务执行。
+    """
+    timings = timings or {}
     duration_seconds = (end_time - start_time).total_seconds()
     record = {
         'goal': goal,
         'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S'),
         'end_time': end_time.strftime('%Y-%m-%d %H:%M:%S'),
         'duration_seconds': round(duration_seconds, 2),
+        'task_success': task_success,
+        'execution_error': _error_without_log(execution_error),
+        'steps': [
+            {**step, 'seconds': round(step['seconds'], 3)}
+            for step in steps or []
+        ],
+        # 两次规划 LLM 调用的耗时；命中计划缓存而未调用时为 None。
+        'llm_latency_sec': {
+            'generate_workflow': _round(timings.get('generate_workflow')),
+            'transfer_workflow_to_code': _round(
+                timings.get('transfer_workflow_to_code')
+            ),
+        },
+        'execute_sec': _round(timings.get('execute')),
+        # 设备准备耗时，以及其中与脚本生成重叠、因此节省下来的时间。
+        'prepare_sec': _round(timings.get('prepare')),
+        'overlap_saved_sec': _round(timings.get('overlap_saved')),
+        'prepare_error': timings.get('prepare_error'),
+        'exit_status': exit_status,
     }
+    self.record_store.append(record)
+
+
+def _task_templates() -> list[str]:
+  """任务模板，用于在计划缓存中按模板参数匹配目标。"""
+  task_registry = registry.TaskRegistry().get_registry(
+      registry.TaskRegistry.ANDROID_WORLD_FAMILY
+  )
+  # 个别任务的 template 是 property，无法在类上取得，跳过。
+  return [
+      task.template
+      for task in task_registry.values()
+      if isinstance(task.template, str)
+  ]
+
+
+class _LikelyAppGuesser:
+  """根据目标猜测任务要操作的应用。
+
+  优先按任务模板匹配，取模板对应任务的应用；没有匹配的模板（如目标由任务动态
+  生成），或匹配的任务涉及多个应用（如“Open the {app_name} app.”）时，只有目标
+  恰好提到一个应用名才取它。提到多个应用的目标（如“把图库中的账单记到
+  Pro Expense”）无法判断主应用，不猜测，以免打开错误的应用。
+  """
+
+  def __init__(self):
+    task_registry = registry.TaskRegistry().get_registry(
+        registry.TaskRegistry.ANDROID_WORLD_FAMILY
+    )
+    tasks = [task for task in task_registry.values() if task.app_names]
+    # 优先匹配字面内容更多（更具体）的模板。
+    self.matchers = sorted(
+        (
+            (TemplateMatcher(task.template), task.app_names)
+            for task in tasks
+            if isinstance(task.template, str) and task.template
+        ),
+        key=lambda item: -item[0].literal_length,
+    )
+    app_names = {name for task in tasks for name in task.app_names}
+    # 按整词匹配应用名，较长的名字优先，避免 "files" 匹配到 "profiles" 之类的词。
+    self.app_name_pattern = re.compile(
+        r'\b(?:{})\b'.format(
+            '|'.join(
+                re.escape(name)
+                for name in sorted(app_names, key=len, reverse=True)
+            )
+        ),
+        re.IGNORECASE,
+    )
+
+  def guess(self, goal: str) -> str | None:
+    goal = normalize_goal(goal)
+    for matcher, app_names in self.matchers:
+      if matcher.match(goal) is not None:
+        if len(app_names) == 1:
+          return app_names[0]
+        break
+    mentions = {
+        match.group().lower()
+        for match in self.app_name_pattern.finditer(goal)
+    }
+    return mentions.pop() if len(mentions) == 1 else None
+
+
+def _error_without_log(
+    execution_error: dict[str, object] | None,
+) -> dict[str, object] | None:
+  """去掉执行错误中的完整日志，只保留类型、信息与出错步骤。"""
+  if execution_error is None:
+    return None
+  return {k: v for k, v in execution_error.items() if k != 'full_log'}
+
 
-    try:
-      if os.path.exists(record_path):
-        with open(record_path, 'r', encoding='utf-8') as record_file:
-          data = json.load(record_file)
-      else:
-        data = []
-    except (json.JSONDecodeError, OSError):
-      data = []
-
-    if not isinstance(data, list):
-      data = []
-    data.append(record)
-
-    try:
-      with open(record_path, 'w', encoding='utf-8') as record_file:
-        json.dump(data, record_file, ensure_ascii=False, indent=4)
-    except OSError as exc:
-      print(f'记录任务执行信息失败: {exc}')
\ No newline at end of file
+def _round(seconds: float | None) -> float | None:
+  return None if seconds is None else round(seconds, 3)
@@ -0,0 +1,114 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from android_world.agents import ruyi_test_utils
+from android_world.env import interface
+
+ruyi_test_utils.install_fake_prompt_manager()
+
+# pylint: disable=g-import-not-at-top
+from android_world.agents import ruyi_agent
+# pylint: enable=g-import-not-at-top
+
+
+class LikelyAppGuesserTest(parameterized.TestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    super().setUpClass()
+    cls.guesser = ruyi_agent._LikelyAppGuesser()
+
+  @parameterized.named_parameters(
+      (
+          'template',
+          'Create a new note in Markor named a.md with the following text: hi',
+          'markor',
+      ),
+      (
+          'template_with_several_apps',
+          'Open the osmand app. Clear any pop-ups that may appear by granting'
+          ' all permissions that are required.',
+          'osmand',
+      ),
+      (
+          'single_mention',
+          'Check the Broccoli app for new recipes.',
+          'broccoli app',
+      ),
+      (
+          'several_mentions',
+          'Add the expenses from expenses.jpg in Simple Gallery Pro to Pro'
+          ' Expense.',
+          None,
+      ),
+      ('whole_words_only', 'Rename the profiles of my friends.', None),
+      ('no_mention', 'What is the weather like?', None),
+  )
+  def test_guess(self, goal, expected):
+    self.assertEqual(self.guesser.guess(goal), expected)
+
+
+class PrepareDeviceTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.bridge = mock.patch.object(
+        ruyi_agent.ruyi_device_bridge, 'RuyiDeviceBridge'
+    ).start().return_value
+    self.addCleanup(mock.patch.stopall)
+    self.record_path = os.path.join(tempfile.mkdtemp(), 'records.jsonl')
+
+  def _agent(self, launch_likely_app):
+    return ruyi_agent.RuyiAgent(
+        mock.create_autospec(interface.AsyncEnv, instance=True),
+        record_path=self.record_path,
+        launch_likely_app=launch_likely_app,
+    )
+
+  def test_launches_likely_app(self):
+    agent = self._agent(launch_likely_app=True)
+    agent.app_guesser = mock.Mock(guess=mock.Mock(return_value='markor'))
+
+    agent._prepare_device('Create a note in Markor.')
+
+    self.bridge.prepare.assert_called_once()
+    self.bridge.launch_app.assert_called_once_with('markor')
+
+  def test_no_launch_without_guess(self):
+    agent = self._agent(launch_likely_app=True)
+    agent.app_guesser = mock.Mock(guess=mock.Mock(return_value=None))
+
+    agent._prepare_device('What is the weather like?')
+
+    self.bridge.prepare.assert_called_once()
+    self.bridge.launch_app.assert_not_called()
+
+  def test_launch_disabled(self):
+    agent = self._agent(launch_likely_app=False)
+
+    agent._prepare_device('Create a note in Markor.')
+
+    self.assertIsNone(agent.app_guesser)
+    self.bridge.prepare.assert_called_once()
+    self.bridge.launch_app.assert_not_called()
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,123 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Prepares the device of an AndroidWorld env for Ruyi scripts.
+
+Ruyi scripts drive the device through an on-device service, reached from the
+host through an adb port forward. Instead of spawning `adb` processes that
+target whichever device adb picks by default, the bridge issues its requests
+through the env's `AndroidWorldController`, so they go to the env's own
+emulator. The port forward is set up once per connection and kept alive.
+"""
+
+from absl import logging
+from android_env.proto import adb_pb2
+from android_world.env import adb_utils
+from android_world.env import interface
+
+# Host port that the Ruyi config connects to.
+DEFAULT_HOST_PORT = 51825
+# Port of the Ruyi service on the device.
+DEFAULT_DEVICE_PORT = 6666
+# Console port of the first emulator; emulators use every other port from it.
+_FIRST_CONSOLE_PORT = 5554
+
+
+def host_port_for_console_port(console_port: int) -> int:
+  """Returns a host port for the emulator with the given console port.
+
+  Each emulator gets its own port, so runs on several emulators at once do not
+  forward the same host port; the first emulator gets `DEFAULT_HOST_PORT`.
+
+  Args:
+    console_port: The console port of the emulator, e.g. 5554.
+  """
+  return DEFAULT_HOST_PORT + max(0, console_port - _FIRST_CONSOLE_PORT) // 2
+
+
+class RuyiDeviceBridge:
+  """Issues the device setup needed by Ruyi through the env's controller."""
+
+  def __init__(
+      self,
+      env: interface.AsyncEnv,
+      host_port: int = DEFAULT_HOST_PORT,
+      device_port: int = DEFAULT_DEVICE_PORT,
+  ):
+    """Initializes the bridge; no request is issued until `prepare`.
+
+    Args:
+      env: The environment whose device Ruyi scripts operate.
+      host_port: Host port forwarded to the device. Runs on several emulators
+        at once need a distinct port per env.
+      device_port: Port of the Ruyi service on the device.
+    """
+    self.env = env
+    self.host_port = host_port
+    self.device_port = device_port
+    # The android_env connection the forward was set up for. A controller
+    # reconnects by replacing it, which drops the forward.
+    self._forwarded_env = None
+
+  @property
+  def forward_spec(self) -> tuple[str, str]:
+    return f'tcp:{self.host_port}', f'tcp:{self.device_port}'
+
+  def prepare(self) -> None:
+    """Prepares the device before a Ruyi task runs."""
+    # Tasks may toggle the setting, so it is applied before every task; it is a
+    # single request over the existing connection.
+    response = adb_utils.put_settings(
+        adb_pb2.AdbRequest.SettingsRequest.Namespace.SECURE,
+        'show_ime_with_hard_keyboard',
+        '0',
+        self.env.controller,
+    )
+    if response.status != adb_pb2.AdbResponse.Status.OK:
+      logging.warning(
+          'Failed to hide the soft keyboard for Ruyi: %s',
+          response.error_message,
+      )
+    self.ensure_port_forward()
+
+  def ensure_port_forward(self) -> bool:
+    """Sets up the port forward unless it is already up on this connection.
+
+    Returns:
+      Whether the forward is up.
+    """
+    connection = self.env.controller.env
+    if self._forwarded_env is connection:
+      return True
+    response = adb_utils.issue_generic_request(
+        ['forward', *self.forward_spec], self.env.controller
+    )
+    if response.status != adb_pb2.AdbResponse.Status.OK:
+      # Not remembered, so the next task tries again.
+      return False
+    self._forwarded_env = connection
+    return True
+
+  def launch_app(self, app_name: str) -> None:
+    """Opens an app, so that a Ruyi script can start operating it at once."""
+    adb_utils.launch_app(app_name, self.env.controller)
+
+  def close(self) -> None:
+    """Removes the port forward, if it was set up."""
+    if self._forwarded_env is None:
+      return
+    adb_utils.issue_generic_request(
+        ['forward', '--remove', self.forward_spec[0]], self.env.controller
+    )
+    self._forwarded_env = None
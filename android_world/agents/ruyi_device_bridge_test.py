@@ -0,0 +1,132 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest import mock
+
+from absl.testing import absltest
+from android_env.proto import adb_pb2
+from android_world.agents import ruyi_device_bridge
+from android_world.env import adb_utils
+
+
+def _response(ok: bool = True) -> adb_pb2.AdbResponse:
+  status = (
+      adb_pb2.AdbResponse.Status.OK
+      if ok
+      else adb_pb2.AdbResponse.Status.ADB_ERROR
+  )
+  return adb_pb2.AdbResponse(status=status)
+
+
+class RuyiDeviceBridgeTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.env = mock.MagicMock()
+    self.mock_put_settings = mock.patch.object(
+        adb_utils, 'put_settings', autospec=True, return_value=_response()
+    ).start()
+    self.mock_issue_generic_request = mock.patch.object(
+        adb_utils,
+        'issue_generic_request',
+        autospec=True,
+        return_value=_response(),
+    ).start()
+
+  def tearDown(self):
+    super().tearDown()
+    mock.patch.stopall()
+
+  def test_prepare_uses_env_controller(self):
+    bridge = ruyi_device_bridge.RuyiDeviceBridge(self.env)
+
+    bridge.prepare()
+
+    self.mock_put_settings.assert_called_once_with(
+        adb_pb2.AdbRequest.SettingsRequest.Namespace.SECURE,
+        'show_ime_with_hard_keyboard',
+        '0',
+        self.env.controller,
+    )
+    self.mock_issue_generic_request.assert_called_once_with(
+        ['forward', 'tcp:51825', 'tcp:6666'], self.env.controller
+    )
+
+  def test_port_forward_is_set_up_once(self):
+    bridge = ruyi_device_bridge.RuyiDeviceBridge(self.env, host_port=51900)
+
+    for _ in range(3):
+      bridge.prepare()
+
+    self.assertEqual(self.mock_put_settings.call_count, 3)
+    self.mock_issue_generic_request.assert_called_once_with(
+        ['forward', 'tcp:51900', 'tcp:6666'], self.env.controller
+    )
+
+  def test_port_forward_is_set_up_again_after_reconnect(self):
+    bridge = ruyi_device_bridge.RuyiDeviceBridge(self.env)
+    bridge.prepare()
+
+    self.env.controller.env = mock.MagicMock()
+    bridge.prepare()
+
+    self.assertEqual(self.mock_issue_generic_request.call_count, 2)
+
+  def test_failed_port_forward_is_retried(self):
+    self.mock_issue_generic_request.return_value = _response(ok=False)
+    bridge = ruyi_device_bridge.RuyiDeviceBridge(self.env)
+
+    self.assertFalse(bridge.ensure_port_forward())
+    self.mock_issue_generic_request.return_value = _response()
+    self.assertTrue(bridge.ensure_port_forward())
+    self.assertTrue(bridge.ensure_port_forward())
+
+    self.assertEqual(self.mock_issue_generic_request.call_count, 2)
+
+  def test_launch_app_uses_env_controller(self):
+    with mock.patch.object(adb_utils, 'launch_app', autospec=True) as launch:
+      ruyi_device_bridge.RuyiDeviceBridge(self.env).launch_app('markor')
+    launch.assert_called_once_with('markor', self.env.controller)
+
+  def test_close_removes_port_forward(self):
+    bridge = ruyi_device_bridge.RuyiDeviceBridge(self.env)
+    bridge.close()
+    self.mock_issue_generic_request.assert_not_called()
+
+    bridge.prepare()
+    bridge.close()
+
+    self.mock_issue_generic_request.assert_called_with(
+        ['forward', '--remove', 'tcp:51825'], self.env.controller
+    )
+
+
+class HostPortForConsolePortTest(absltest.TestCase):
+
+  def test_one_port_per_emulator(self):
+    self.assertEqual(
+        [
+            ruyi_device_bridge.host_port_for_console_port(port)
+            for port in (5554, 5556, 5558)
+        ],
+        [
+            ruyi_device_bridge.DEFAULT_HOST_PORT,
+            ruyi_device_bridge.DEFAULT_HOST_PORT + 1,
+            ruyi_device_bridge.DEFAULT_HOST_PORT + 2,
+        ],
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,130 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from unittest import mock
+
+from absl.testing import absltest
+from android_world.agents import ruyi_test_utils
+
+ruyi_test_utils.install_fake_prompt_manager()
+
+# pylint: disable=g-import-not-at-top
+from android_world.agents.ruyi import plan_cache
+from android_world.agents.ruyi import ruyi_manager
+# pylint: enable=g-import-not-at-top
+
+_GOAL = 'Open the settings.'
+
+
+class RuyiManagerTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.generator = mock.patch.object(
+        ruyi_manager, 'ScriptGenerator'
+    ).start().return_value
+    self.executor = mock.patch.object(
+        ruyi_manager, 'ScriptExecutor'
+    ).start().return_value
+    self.addCleanup(mock.patch.stopall)
+    self.generator.generate_workflow.return_value = 'open settings'
+    self.generator.transfer_workflow_to_code.return_value = 'open_app()'
+    self.executor.execute_scripts.return_value = (True, None)
+
+  def test_prepares_while_planning(self):
+    def generate_workflow(goal):
+      del goal
+      time.sleep(0.2)
+      return 'open settings'
+
+    self.generator.generate_workflow.side_effect = generate_workflow
+    prepare_device = mock.Mock(side_effect=lambda: time.sleep(0.1))
+    manager = ruyi_manager.RuyiManager()
+
+    result = manager.execute_task(_GOAL, prepare_device=prepare_device)
+
+    self.assertEqual(result, (True, None))
+    prepare_device.assert_called_once()
+    self.executor.warm_up.assert_called_once()
+    self.executor.execute_scripts.assert_called_once_with(
+        'open_app()',
+        code_script_labeled='open_app()',
+        NL_script_labeled='[1]open settings',
+        task=_GOAL,
+    )
+    timings = manager.timings
+    self.assertGreaterEqual(timings['generate_workflow'], 0.2)
+    self.assertIsNotNone(timings['transfer_workflow_to_code'])
+    self.assertIsNotNone(timings['execute'])
+    self.assertGreaterEqual(timings['prepare'], 0.1)
+    self.assertLess(timings['prepare_wait'], 0.1)
+    self.assertAlmostEqual(
+        timings['overlap_saved'], timings['prepare'] - timings['prepare_wait']
+    )
+    self.assertIsNone(timings['prepare_error'])
+
+  def test_plan_cache_hit_skips_llm_calls(self):
+    cache = mock.create_autospec(plan_cache.PlanCache, instance=True)
+    cache.lookup.return_value = plan_cache.CachedPlan(
+        key=_GOAL, source='goal', workflow='[1]open settings', code='cached()'
+    )
+    manager = ruyi_manager.RuyiManager(plan_cache=cache)
+
+    manager.execute_task(_GOAL)
+
+    self.generator.generate_workflow.assert_not_called()
+    self.generator.transfer_workflow_to_code.assert_not_called()
+    self.assertEqual(
+        self.executor.execute_scripts.call_args.args, ('cached()',)
+    )
+    self.assertIsNone(manager.timings['generate_workflow'])
+    self.assertIsNone(manager.timings['transfer_workflow_to_code'])
+    self.assertIsNotNone(manager.timings['prepare'])
+    self.assertIsNotNone(manager.timings['overlap_saved'])
+
+  def test_llm_failure_waits_for_preparation(self):
+    self.generator.generate_workflow.side_effect = TypeError('no reply')
+    prepare_device = mock.Mock(side_effect=lambda: time.sleep(0.1))
+    manager = ruyi_manager.RuyiManager()
+
+    with self.assertRaises(TypeError):
+      manager.execute_task(_GOAL, prepare_device=prepare_device)
+
+    prepare_device.assert_called_once()
+    self.executor.execute_scripts.assert_not_called()
+    self.assertIsNone(manager.timings['generate_workflow'])
+    self.assertIsNone(manager.timings['execute'])
+    self.assertGreaterEqual(manager.timings['prepare'], 0.1)
+    self.assertIsNone(manager._pending_plan)
+
+  def test_preparation_errors_are_recorded(self):
+    self.executor.warm_up.side_effect = OSError('no worker')
+    manager = ruyi_manager.RuyiManager()
+
+    with self.assertLogs(level='WARNING'):
+      result = manager.execute_task(
+          _GOAL, prepare_device=mock.Mock(side_effect=RuntimeError('no adb'))
+      )
+
+    self.assertEqual(result, (True, None))
+    self.executor.execute_scripts.assert_called_once()
+    self.assertEqual(
+        manager.timings['prepare_error'],
+        '设备准备失败: RuntimeError: no adb; 执行器预热失败: OSError: no worker',
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
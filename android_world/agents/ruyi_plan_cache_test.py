@@ -0,0 +1,95 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+
+from absl.testing import absltest
+from android_world.agents import ruyi_test_utils
+
+plan_cache = ruyi_test_utils.load_ruyi_module('plan_cache')
+
+_TEMPLATE = 'Delete the expense {name} from {app}.'
+_WORKFLOW = '[1]Open Pro Expense\n[2]Delete "Coffee beans"'
+_CODE = 'open_app("Pro Expense")\ndelete("Coffee beans")'
+
+
+class PlanCacheTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.path = os.path.join(tempfile.mkdtemp(), 'plan_cache.json')
+    self.cache = plan_cache.PlanCache(self.path, templates=[_TEMPLATE])
+
+  def test_normalizes_goal(self):
+    self.cache.record('Open  the\tsettings. ', 'wf', 'code', success=True)
+
+    plan = self.cache.lookup('Open the settings.')
+
+    self.assertEqual(plan.source, 'goal')
+    self.assertEqual(plan.key, 'Open the settings.')
+    self.assertEqual((plan.workflow, plan.code), ('wf', 'code'))
+
+  def test_records_only_successful_plans(self):
+    self.cache.record('Open the settings.', 'wf', 'code', success=False)
+
+    self.assertIsNone(self.cache.lookup('Open the settings.'))
+    self.assertEqual(self.cache.stats()['goals'], 0)
+
+  def test_template_match_substitutes_parameters(self):
+    self.cache.record(
+        'Delete the expense Coffee beans from Pro Expense.',
+        _WORKFLOW,
+        _CODE,
+        success=True,
+    )
+
+    plan = self.cache.lookup('Delete the expense Rent from Budget App.')
+
+    self.assertEqual(plan.source, 'template')
+    self.assertEqual(plan.key, _TEMPLATE)
+    self.assertEqual(plan.workflow, '[1]Open Budget App\n[2]Delete "Rent"')
+    self.assertEqual(plan.code, 'open_app("Budget App")\ndelete("Rent")')
+
+  def test_failures_retire_plan(self):
+    goal = 'Open the settings.'
+    self.cache.record(goal, 'wf', 'code', success=True)
+    plan = self.cache.lookup(goal)
+
+    self.cache.record(goal, 'wf', 'code', success=False, plan=plan)
+    self.assertIsNotNone(self.cache.lookup(goal))
+    self.cache.record(goal, 'wf', 'code', success=False, plan=plan)
+
+    self.assertIsNone(self.cache.lookup(goal))
+    self.assertEqual(self.cache.stats()['failures'], 2)
+
+  def test_persists_between_instances(self):
+    self.cache.record('Open the settings.', 'wf', 'code', success=True)
+
+    reloaded = plan_cache.PlanCache(self.path, templates=[_TEMPLATE])
+
+    self.assertEqual(reloaded.lookup('Open the settings.').code, 'code')
+    self.assertFalse(os.path.exists(f'{self.path}.tmp'))
+
+  def test_ignores_corrupt_file(self):
+    with open(self.path, 'w') as f:
+      f.write('{not json')
+
+    cache = plan_cache.PlanCache(self.path)
+
+    self.assertEqual(cache.stats()['goals'], 0)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,232 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Append-only store of Ruyi task execution records.
+
+Each record is one JSON line. Records are appended by a background thread, so
+recording a task never blocks the agent and costs O(1) regardless of how many
+records the file already holds. Appends hold an exclusive file lock, so
+runners sharing a working directory do not interleave their lines.
+"""
+
+import atexit
+from collections.abc import Iterable, Iterator, Sequence
+import json
+import os
+import queue
+import threading
+from typing import Any
+
+from absl import logging
+
+try:
+  import fcntl  # pylint: disable=g-import-not-at-top
+except ImportError:  # Windows.
+  fcntl = None
+
+DEFAULT_RECORD_PATH = 'ruyi_execution_records.jsonl'
+
+# Latency fields of a record, as paths of nested keys.
+LATENCY_FIELDS = (
+    ('llm_latency_sec', 'generate_workflow'),
+    ('llm_latency_sec', 'transfer_workflow_to_code'),
+    ('execute_sec',),
+    ('prepare_sec',),
+    ('overlap_saved_sec',),
+    ('duration_seconds',),
+)
+
+# Upper bounds of the histogram buckets, in seconds; the last is unbounded.
+DEFAULT_BUCKETS = (1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+_STOP = object()
+
+
+class ExecutionRecordStore:
+  """Appends records to a JSON-lines file from a background thread."""
+
+  def __init__(self, path: str = DEFAULT_RECORD_PATH):
+    self.path = path
+    self._queue = queue.Queue()
+    self._closed = False
+    self._lock = threading.Lock()
+    self._writer = threading.Thread(
+        target=self._write_loop, name='ruyi_records_writer', daemon=True
+    )
+    self._writer.start()
+
+  def append(self, record: dict[str, Any]) -> None:
+    """Queues a record to be appended; does not wait for the write."""
+    with self._lock:
+      if self._closed:
+        raise RuntimeError('Record store is closed.')
+      self._queue.put(record)
+
+  def flush(self) -> None:
+    """Waits until all queued records are written."""
+    self._queue.join()
+
+  def close(self) -> None:
+    """Writes the queued records and stops the writer thread."""
+    with self._lock:
+      if self._closed:
+        return
+      self._closed = True
+      self._queue.put(_STOP)
+    self._writer.join()
+
+  def _write_loop(self) -> None:
+    while True:
+      batch = [self._queue.get()]
+      # Records queued meanwhile are written under the same lock.
+      while True:
+        try:
+          batch.append(self._queue.get_nowait())
+        except queue.Empty:
+          break
+      records = [record for record in batch if record is not _STOP]
+      try:
+        if records:
+          self._write(records)
+      except Exception as e:  # pylint: disable=broad-exception-caught
+        logging.error('Failed to write %d Ruyi records: %s', len(records), e)
+      finally:
+        for _ in batch:
+          self._queue.task_done()
+      if len(records) < len(batch):
+        return
+
+  def _write(self, records: list[dict[str, Any]]) -> None:
+    lines = ''.join(
+        json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        for record in records
+    )
+    with open(self.path, 'a', encoding='utf-8') as f:
+      if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX)
+      try:
+        f.write(lines)
+        f.flush()
+      finally:
+        if fcntl is not None:
+          fcntl.flock(f, fcntl.LOCK_UN)
+
+
+_stores: dict[str, ExecutionRecordStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_record_store(path: str = DEFAULT_RECORD_PATH) -> ExecutionRecordStore:
+  """Returns the store of a file, shared by all agents of the process."""
+  key = os.path.abspath(path)
+  with _stores_lock:
+    if key not in _stores:
+      _stores[key] = ExecutionRecordStore(path)
+    return _stores[key]
+
+
+@atexit.register
+def close_record_stores() -> None:
+  """Writes the queued records of all stores."""
+  with _stores_lock:
+    stores = list(_stores.values())
+    _stores.clear()
+  for store in stores:
+    store.close()
+
+
+def read_records(path: str = DEFAULT_RECORD_PATH) -> Iterator[dict[str, Any]]:
+  """Reads the records of a file.
+
+  Also reads files in the former format, a single JSON list of records.
+  Malformed lines, such as one cut short by a crash, are skipped.
+
+  Args:
+    path: The record file.
+
+  Yields:
+    The records, in the order they were written.
+  """
+  with open(path, 'r', encoding='utf-8') as f:
+    first = f.read(1)
+    while first.isspace():
+      first = f.read(1)
+    f.seek(0)
+    if first == '[':
+      yield from json.load(f)
+      return
+    for line_number, line in enumerate(f, start=1):
+      if not line.strip():
+        continue
+      try:
+        yield json.loads(line)
+      except ValueError:
+        logging.warning('Skipping malformed record at %s:%d', path, line_number)
+
+
+def _get_field(record: dict[str, Any], field: Sequence[str]) -> Any:
+  value = record
+  for key in field:
+    if not isinstance(value, dict):
+      return None
+    value = value.get(key)
+  return value
+
+
+def latency_histograms(
+    records: Iterable[dict[str, Any]],
+    fields: Sequence[Sequence[str]] = LATENCY_FIELDS,
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+) -> dict[str, dict[str, Any]]:
+  """Aggregates the latencies of records into histograms.
+
+  Records without a value for a field, e.g. no LLM call because the plan was
+  cached, do not count for that field.
+
+  Args:
+    records: The execution records.
+    fields: Latency fields, as paths of nested keys.
+    buckets: Sorted upper bounds of the buckets, in seconds.
+
+  Returns:
+    For each field, named by its keys joined with '.', the number of values,
+    their sum and max, and `buckets`: (upper bound, count) pairs, where the
+    last bound is inf.
+  """
+  bounds = list(buckets) + [float('inf')]
+  histograms = {
+      '.'.join(field): {
+          'count': 0,
+          'sum': 0.0,
+          'max': 0.0,
+          'buckets': [[bound, 0] for bound in bounds],
+      }
+      for field in fields
+  }
+  for record in records:
+    for field in fields:
+      value = _get_field(record, field)
+      if not isinstance(value, (int, float)) or isinstance(value, bool):
+        continue
+      histogram = histograms['.'.join(field)]
+      histogram['count'] += 1
+      histogram['sum'] += value
+      histogram['max'] = max(histogram['max'], value)
+      for bucket in histogram['buckets']:
+        if value <= bucket[0]:
+          bucket[1] += 1
+          break
+  for histogram in histograms.values():
+    histogram['buckets'] = [tuple(bucket) for bucket in histogram['buckets']]
+  return histograms
@@ -0,0 +1,141 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import tempfile
+import threading
+
+from absl.testing import absltest
+from android_world.agents import ruyi_records
+
+
+class ExecutionRecordStoreTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.path = os.path.join(tempfile.mkdtemp(), 'records.jsonl')
+
+  def test_records_are_appended_as_lines(self):
+    store = ruyi_records.ExecutionRecordStore(self.path)
+    store.append({'goal': 'a'})
+    store.append({'goal': 'b'})
+    store.flush()
+
+    with open(self.path) as f:
+      lines = f.read().splitlines()
+    self.assertEqual([json.loads(line) for line in lines], [
+        {'goal': 'a'},
+        {'goal': 'b'},
+    ])
+    store.close()
+
+  def test_concurrent_appends_keep_lines_whole(self):
+    stores = [ruyi_records.ExecutionRecordStore(self.path) for _ in range(2)]
+
+    def append(store, prefix):
+      for i in range(200):
+        store.append({'goal': f'{prefix}{i}', 'padding': 'x' * 500})
+
+    threads = [
+        threading.Thread(target=append, args=(store, i))
+        for i, store in enumerate(stores)
+    ]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    for store in stores:
+      store.close()
+
+    records = list(ruyi_records.read_records(self.path))
+    self.assertLen(records, 400)
+    self.assertLen({record['goal'] for record in records}, 400)
+
+  def test_append_after_close_raises(self):
+    store = ruyi_records.ExecutionRecordStore(self.path)
+    store.close()
+    with self.assertRaises(RuntimeError):
+      store.append({})
+
+  def test_get_record_store_is_shared(self):
+    store = ruyi_records.get_record_store(self.path)
+    self.assertIs(store, ruyi_records.get_record_store(self.path))
+    ruyi_records.close_record_stores()
+    self.assertIsNot(store, ruyi_records.get_record_store(self.path))
+    ruyi_records.close_record_stores()
+
+
+class ReadRecordsTest(absltest.TestCase):
+
+  def test_skips_malformed_lines(self):
+    path = os.path.join(tempfile.mkdtemp(), 'records.jsonl')
+    with open(path, 'w') as f:
+      f.write('{"goal": "a"}\n\n{"goal": \n{"goal": "b"}\n')
+
+    self.assertEqual(
+        list(ruyi_records.read_records(path)), [{'goal': 'a'}, {'goal': 'b'}]
+    )
+
+  def test_reads_json_list(self):
+    path = os.path.join(tempfile.mkdtemp(), 'records.json')
+    with open(path, 'w') as f:
+      json.dump([{'goal': 'a'}], f, indent=4)
+
+    self.assertEqual(list(ruyi_records.read_records(path)), [{'goal': 'a'}])
+
+
+class LatencyHistogramsTest(absltest.TestCase):
+
+  def test_histograms(self):
+    records = [
+        {
+            'llm_latency_sec': {'generate_workflow': 0.5},
+            'execute_sec': 3.0,
+        },
+        {
+            'llm_latency_sec': {'generate_workflow': None},
+            'execute_sec': 12.0,
+        },
+        {'execute_sec': 500.0},
+    ]
+
+    histograms = ruyi_records.latency_histograms(
+        records,
+        fields=(('llm_latency_sec', 'generate_workflow'), ('execute_sec',)),
+        buckets=(1.0, 10.0),
+    )
+
+    self.assertEqual(
+        histograms['llm_latency_sec.generate_workflow'],
+        {
+            'count': 1,
+            'sum': 0.5,
+            'max': 0.5,
+            'buckets': [(1.0, 1), (10.0, 0), (float('inf'), 0)],
+        },
+    )
+    self.assertEqual(
+        histograms['execute_sec'],
+        {
+            'count': 3,
+            'sum': 515.0,
+            'max': 500.0,
+            'buckets': [(1.0, 0), (10.0, 1), (float('inf'), 2)],
+        },
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
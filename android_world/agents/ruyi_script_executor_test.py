@@ -0,0 +1,238 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import os
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from android_world.agents import ruyi_test_utils
+
+script_executor = ruyi_test_utils.load_ruyi_module(
+    'executor.script_executor'
+)
+
+
+class LineReaderTest(absltest.TestCase):
+
+  def test_splits_lines_across_reads(self):
+    reader = script_executor._LineReader(is_error=False)
+
+    self.assertEqual(reader.feed(b'first\nsec'), ['first\n'])
+    self.assertEqual(reader.feed(b'ond\nthi'), ['second\n'])
+    self.assertEqual(reader.feed(b''), ['thi'])
+
+  def test_decodes_split_utf8(self):
+    reader = script_executor._LineReader(is_error=True)
+    encoded = '任务\n'.encode('utf-8')
+
+    self.assertEqual(reader.feed(encoded[:2]), [])
+    self.assertEqual(reader.feed(encoded[2:]), ['任务\n'])
+    self.assertEqual(reader.feed(b''), [])
+
+
+class ScriptExecutorTest(parameterized.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    ruyi_agent_path = ruyi_test_utils.write_fake_ruyi_agent(tempfile.mkdtemp())
+    mock.patch.object(
+        script_executor.ScriptExecutor,
+        'get_ruyi_agent_path',
+        return_value=ruyi_agent_path,
+    ).start()
+    # Debug copies would otherwise be written to the working directory.
+    mock.patch.object(script_executor, '_write_debug_copy').start()
+    self.addCleanup(mock.patch.stopall)
+
+  def _executor(self, use_warm_worker):
+    executor = script_executor.ScriptExecutor(use_warm_worker=use_warm_worker)
+    if use_warm_worker:
+      self.addCleanup(script_executor.get_warm_worker(
+          executor.get_ruyi_agent_path(), cwd='./'
+      ).stop)
+    return executor
+
+  @parameterized.named_parameters(
+      ('subprocess', False), ('warm_worker', True)
+  )
+  def test_success(self, use_warm_worker):
+    executor = self._executor(use_warm_worker)
+    lines = []
+    executor.add_line_callback(lambda line, is_error: lines.append(line))
+
+    success, error = executor.execute_scripts(
+        "print('hello')\ndevice_manager.tap(1, 2)", task='Say hello'
+    )
+
+    self.assertTrue(success)
+    self.assertIsNone(error)
+    self.assertIn('hello\n', lines)
+
+  @parameterized.named_parameters(
+      ('subprocess', False), ('warm_worker', True)
+  )
+  def test_error_like_output_of_successful_script(self, use_warm_worker):
+    executor = self._executor(use_warm_worker)
+
+    success, error = executor.execute_scripts(
+        "print('ValueError: handled and ignored')", task='Handle errors'
+    )
+
+    self.assertTrue(success)
+    self.assertIsNone(error)
+
+  @parameterized.named_parameters(
+      ('subprocess', False), ('warm_worker', True)
+  )
+  def test_script_error(self, use_warm_worker):
+    executor = self._executor(use_warm_worker)
+
+    success, error = executor.execute_scripts(
+        "raise KeyError('missing')", task='Fail'
+    )
+
+    self.assertFalse(success)
+    self.assertEqual(error['type'], 'KeyError')
+
+  def test_compile_error_is_not_executed(self):
+    executor = self._executor(use_warm_worker=False)
+
+    with mock.patch.object(script_executor.subprocess, 'Popen') as popen:
+      success, error = executor.execute_scripts('if True print(1)', task='Bad')
+
+    self.assertFalse(success)
+    self.assertEqual(error['type'], 'SyntaxError')
+    self.assertEqual(executor.exit_status, 'compile_error')
+    popen.assert_not_called()
+
+
+class RuyiConfigPathTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.ruyi_agent_path = tempfile.mkdtemp()
+    with open(
+        os.path.join(self.ruyi_agent_path, 'config.yaml'), 'w', encoding='utf-8'
+    ) as f:
+      f.write('server: "http://localhost:51825"\nretries: 518250\n')
+
+  def test_default_port_uses_config(self):
+    for host_port in (None, script_executor.DEFAULT_HOST_PORT):
+      self.assertEqual(
+          script_executor.ruyi_config_path(self.ruyi_agent_path, host_port),
+          os.path.join(self.ruyi_agent_path, 'config.yaml'),
+      )
+
+  def test_other_port_uses_copy(self):
+    path = script_executor.ruyi_config_path(self.ruyi_agent_path, 51830)
+    self.addCleanup(os.remove, path)
+
+    with open(path, encoding='utf-8') as f:
+      self.assertEqual(
+          f.read(), 'server: "http://localhost:51830"\nretries: 518250\n'
+      )
+    self.assertEqual(
+        script_executor.ruyi_config_path(self.ruyi_agent_path, 51830), path
+    )
+
+  def test_executor_scripts_and_worker_use_port_config(self):
+    mock.patch.object(
+        script_executor.ScriptExecutor,
+        'get_ruyi_agent_path',
+        return_value=self.ruyi_agent_path,
+    ).start()
+    self.addCleanup(mock.patch.stopall)
+    executor = script_executor.ScriptExecutor(host_port=51830)
+    config_path = executor.get_config_path()
+    self.addCleanup(os.remove, config_path)
+
+    content = executor.generate_task_content('tap()', '', '', 'Task')
+
+    self.assertIn(f'yaml_file = "{config_path}"', content)
+    self.assertEqual(
+        script_executor.get_warm_worker(
+            self.ruyi_agent_path, config_path=config_path
+        ).config_path,
+        os.path.abspath(config_path),
+    )
+    self.assertIsNot(
+        script_executor.get_warm_worker(self.ruyi_agent_path),
+        script_executor.get_warm_worker(
+            self.ruyi_agent_path, config_path=config_path
+        ),
+    )
+
+
+class CompiledScriptCacheTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    mock.patch.object(
+        script_executor, '_compiled_scripts', collections.OrderedDict()
+    ).start()
+    self.addCleanup(mock.patch.stopall)
+    self.executor = script_executor.ScriptExecutor(use_warm_worker=False)
+    self.generate = mock.patch.object(
+        self.executor,
+        'generate_task_content',
+        wraps=self.executor.generate_task_content,
+    ).start()
+
+  def test_reuses_compiled_script(self):
+    first = self.executor.get_compiled_script('tap()', '', '', 'Task')
+    second = self.executor.get_compiled_script('tap()', '', '', 'Task')
+
+    self.assertIs(first, second)
+    self.assertIn('tap()', first.content)
+    self.assertIsNone(first.error)
+    self.generate.assert_called_once()
+
+  def test_key_covers_all_inputs(self):
+    keys = {
+        self.executor.get_compiled_script('tap()', '', '', 'Task').key,
+        self.executor.get_compiled_script('swipe()', '', '', 'Task').key,
+        self.executor.get_compiled_script('tap()', '', '', 'Other').key,
+        self.executor.get_compiled_script(
+            'tap()', '', '', 'Task', variables={'a': 1}
+        ).key,
+    }
+
+    self.assertLen(keys, 4)
+
+  def test_evicts_least_recently_used(self):
+    with mock.patch.object(script_executor, '_COMPILED_CACHE_SIZE', 2):
+      first = self.executor.get_compiled_script('a()', '', '', 'Task')
+      second = self.executor.get_compiled_script('b()', '', '', 'Task')
+      self.executor.get_compiled_script('a()', '', '', 'Task')
+      self.executor.get_compiled_script('c()', '', '', 'Task')
+
+    self.assertIn(first.key, script_executor._compiled_scripts)
+    self.assertNotIn(second.key, script_executor._compiled_scripts)
+    self.assertLen(script_executor._compiled_scripts, 2)
+
+  def test_caches_compile_errors(self):
+    ok, error = self.executor.check_compile_errors('if True print(1)', '', '')
+    ok_again, _ = self.executor.check_compile_errors('if True print(1)', '', '')
+
+    self.assertFalse(ok)
+    self.assertFalse(ok_again)
+    self.assertEqual(error['type'], 'SyntaxError')
+    self.generate.assert_called_once()
+
+
+if __name__ == '__main__':
+  absltest.main()
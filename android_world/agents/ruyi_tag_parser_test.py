@@ -0,0 +1,169 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+from unittest import mock
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from android_world.agents import ruyi_test_utils
+
+tag_parser = ruyi_test_utils.load_ruyi_module('planner.tag_parser')
+models = ruyi_test_utils.load_ruyi_module('planner.models')
+
+_REPLY = 'Thoughts.\n<workflow>\n```\nopen app\n```\n</workflow>\nMore text.'
+
+
+class ExtractTagContentTest(absltest.TestCase):
+
+  def test_extract_tag_content(self):
+    self.assertEqual(
+        tag_parser.extract_tag_content(_REPLY, 'workflow'), 'open app'
+    )
+    self.assertEqual(
+        tag_parser.extract_tag_content('<CODE> x() </code>', 'code'), 'x()'
+    )
+    self.assertIsNone(tag_parser.extract_tag_content('<code>x()', 'code'))
+    self.assertIsNone(tag_parser.extract_tag_content('', 'code'))
+
+
+class IncrementalTagParserTest(parameterized.TestCase):
+
+  @parameterized.parameters(1, 2, 3, 7, len(_REPLY))
+  def test_stops_at_closing_tag(self, chunk_size):
+    parser = tag_parser.IncrementalTagParser('workflow')
+    end = _REPLY.index('</workflow>') + len('</workflow>')
+
+    fed = 0
+    while not parser.feed(_REPLY[fed : fed + chunk_size]):
+      fed += chunk_size
+
+    self.assertBetween(fed + chunk_size, end, end + chunk_size - 1)
+    self.assertEqual(parser.content(), 'open app')
+    self.assertTrue(parser.feed('more'))
+    self.assertEqual(parser.text, _REPLY[: fed + chunk_size])
+
+  def test_ignores_case(self):
+    parser = tag_parser.IncrementalTagParser('code')
+
+    self.assertFalse(parser.feed('<CODE>x()</'))
+    self.assertTrue(parser.feed('Code>'))
+    self.assertEqual(parser.content(), 'x()')
+
+  def test_closing_tag_before_opening_tag(self):
+    parser = tag_parser.IncrementalTagParser('code')
+
+    self.assertFalse(parser.feed('</code> <code>x()'))
+    self.assertIsNone(parser.content())
+    self.assertTrue(parser.feed('</code>'))
+
+  def test_content_of_other_tag(self):
+    parser = tag_parser.IncrementalTagParser('code')
+    parser.feed('<name>Task</name><code>x()</code>')
+
+    self.assertEqual(parser.content('name'), 'Task')
+
+
+class _FakeResponse:
+
+  def __init__(self, lines=(), content_type='text/event-stream', body=None):
+    self.status_code = 200
+    self.headers = {'Content-Type': content_type}
+    self.text = ''
+    self.encoding = None
+    self.closed = False
+    self.lines_read = 0
+    self._lines = lines
+    self._body = body
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.closed = True
+
+  def json(self):
+    return self._body
+
+  def iter_lines(self, decode_unicode=False):
+    del decode_unicode
+    for line in self._lines:
+      self.lines_read += 1
+      yield line
+
+
+def _sse_line(content):
+  return 'data: ' + json.dumps({'choices': [{'delta': {'content': content}}]})
+
+
+class QueryStreamTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    mock.patch.dict(
+        os.environ,
+        {'OPENAI_API_KEY': 'key', 'OPENAI_API_URL': 'http://llm'},
+    ).start()
+    self.post = mock.patch.object(models.requests, 'post').start()
+    self.addCleanup(mock.patch.stopall)
+    self.llm = models.LLM(stream=True)
+
+  def test_yields_deltas(self):
+    response = _FakeResponse([
+        ': keep-alive',
+        _sse_line('Hel'),
+        '',
+        'data: not json',
+        'data: {"choices": []}',
+        _sse_line('lo'),
+        'data: [DONE]',
+        _sse_line('ignored'),
+    ])
+    self.post.return_value = response
+
+    self.assertEqual(list(self.llm.query_stream('hi')), ['Hel', 'lo'])
+    self.assertEqual(response.encoding, 'utf-8')
+    self.assertTrue(response.closed)
+    self.assertTrue(self.post.call_args.kwargs['json']['stream'])
+
+  def test_stopping_early_closes_connection(self):
+    response = _FakeResponse([_sse_line(str(i)) for i in range(10)])
+    self.post.return_value = response
+
+    chunks = self.llm.query_stream('hi')
+    self.assertEqual(next(chunks), '0')
+    chunks.close()
+
+    self.assertTrue(response.closed)
+    self.assertEqual(response.lines_read, 1)
+
+  def test_non_streaming_response(self):
+    self.post.return_value = _FakeResponse(
+        content_type='application/json',
+        body={'choices': [{'message': {'content': 'whole reply'}}]},
+    )
+
+    self.assertEqual(list(self.llm.query_stream('hi')), ['whole reply'])
+
+  def test_failed_call_yields_nothing(self):
+    response = _FakeResponse()
+    response.status_code = 500
+    self.post.return_value = response
+
+    self.assertEqual(list(self.llm.query_stream('hi')), [])
+
+
+if __name__ == '__main__':
+  absltest.main()
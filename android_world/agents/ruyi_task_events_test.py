@@ -0,0 +1,140 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from android_world.agents import ruyi_test_utils
+
+task_events = ruyi_test_utils.load_ruyi_module('executor.task_events')
+script_executor = ruyi_test_utils.load_ruyi_module(
+    'executor.script_executor'
+)
+
+_LABELED_SCRIPT = """\
+# [1] Tap twice
+device_manager.tap(1, 2)
+
+def tap_again():
+    device_manager.tap(3, 4)
+
+# [2] Tap with a helper
+tap_again()
+"""
+
+
+class StepLabelsTest(absltest.TestCase):
+
+  def test_step_labels_by_line(self):
+    self.assertEqual(
+        task_events.step_labels_by_line(
+            'setup()\n# [1] first\na()\n\nb()  # [2] second\nc()', 10
+        ),
+        {11: 1, 12: 1, 14: 2, 15: 2},
+    )
+
+
+class TaskEventRecorderTest(absltest.TestCase):
+
+  def test_summarises_steps(self):
+    recorder = task_events.TaskEventRecorder()
+    for event in [
+        {'event': 'task_start'},
+        {'event': 'step_start', 'label': 2},
+        {'event': 'action', 'label': 2},
+        {'event': 'step_end', 'label': 2, 'ok': True, 'duration_sec': 1.5},
+        {'event': 'step_start', 'label': 1},
+        {'event': 'step_end', 'label': 1, 'ok': False, 'duration_sec': 0.5},
+        {'event': 'action', 'label': None},
+        {'event': 'error', 'type': 'ValueError', 'message': 'first'},
+        {'event': 'error', 'type': 'KeyError', 'message': 'second'},
+        {'event': 'task_end', 'status': 'error'},
+    ]:
+      recorder.handle(event)
+
+    self.assertEqual(recorder.status, 'error')
+    self.assertEqual(recorder.error['type'], 'ValueError')
+    self.assertEqual(
+        recorder.step_summary(),
+        [
+            {'label': 1, 'count': 1, 'seconds': 0.5, 'actions': 0, 'ok': False},
+            {'label': 2, 'count': 1, 'seconds': 1.5, 'actions': 1, 'ok': True},
+            {
+                'label': None,
+                'count': 0,
+                'seconds': 0.0,
+                'actions': 1,
+                'ok': True,
+            },
+        ],
+    )
+
+
+class StepTracerTest(parameterized.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    ruyi_agent_path = ruyi_test_utils.write_fake_ruyi_agent(tempfile.mkdtemp())
+    mock.patch.object(
+        script_executor.ScriptExecutor,
+        'get_ruyi_agent_path',
+        return_value=ruyi_agent_path,
+    ).start()
+    mock.patch.object(script_executor, '_write_debug_copy').start()
+    self.addCleanup(mock.patch.stopall)
+
+  @parameterized.named_parameters(
+      ('subprocess', False), ('warm_worker', True)
+  )
+  def test_reports_steps_of_script(self, use_warm_worker):
+    executor = script_executor.ScriptExecutor(use_warm_worker=use_warm_worker)
+    if use_warm_worker:
+      self.addCleanup(
+          script_executor.get_warm_worker(
+              executor.get_ruyi_agent_path(), cwd='./'
+          ).stop
+      )
+
+    success, _ = executor.execute_scripts(_LABELED_SCRIPT, task='Tap')
+
+    self.assertTrue(success)
+    self.assertEqual(
+        [
+            (step['label'], step['count'], step['actions'], step['ok'])
+            for step in executor.get_step_summary()
+        ],
+        # The tap inside the helper function counts towards step 2.
+        [(1, 1, 1, True), (2, 1, 1, True)],
+    )
+
+  def test_settrace_ignores_other_files(self):
+    namespace = {'os': mock.MagicMock(), 'sys': sys}
+    namespace['os'].environ.get.return_value = None
+    exec(task_events.SCRIPT_HELPERS, namespace)  # pylint: disable=exec-used
+    tracer = namespace['_RuyiStepTracer'](
+        self.test_settrace_ignores_other_files.__code__, {1: 1}
+    )
+    frame = mock.Mock()
+
+    frame.f_code = absltest.TestCase.setUp.__code__
+    self.assertIsNone(tracer._trace_calls(frame, 'call', None))
+    frame.f_code = self.test_settrace_ignores_other_files.__code__
+    self.assertIsNotNone(tracer._trace_calls(frame, 'call', None))
+
+
+if __name__ == '__main__':
+  absltest.main()
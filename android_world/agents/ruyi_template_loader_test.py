@@ -0,0 +1,138 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+from android_world.agents import ruyi_test_utils
+
+template_loader = ruyi_test_utils.load_ruyi_module('planner.template_loader')
+
+
+def _template_js(**overrides: str) -> str:
+  values = {
+      key: f'{key} text' for key in template_loader.TARGET_TEMPLATE_VARIABLES
+  }
+  values.update(overrides)
+  return 'export const templates = {\n' + ''.join(
+      f'  {key}: `{value}`,\n' for key, value in values.items()
+  ) + '};\n'
+
+
+class TemplateLoaderTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    directory = tempfile.mkdtemp()
+    self.js_path = os.path.join(directory, 'templates.js')
+    self.cache_path = os.path.join(directory, 'cache', 'variables.json')
+    self._write_js(_template_js())
+    mock.patch.dict(
+        os.environ,
+        {
+            'TEMPLATE_JS_PATH': self.js_path,
+            'RUYI_TEMPLATE_CACHE': self.cache_path,
+        },
+    ).start()
+    self.addCleanup(mock.patch.stopall)
+    self.extract = mock.patch.object(
+        template_loader,
+        '_extract_template_literals',
+        wraps=template_loader._extract_template_literals,
+    ).start()
+
+  def _write_js(self, content, mtime_ns=None):
+    with open(self.js_path, 'w', encoding='utf-8') as f:
+      f.write(content)
+    if mtime_ns is not None:
+      os.utime(self.js_path, ns=(mtime_ns, mtime_ns))
+
+  def test_extracts_and_unescapes(self):
+    self._write_js(
+        _template_js(EnglishExamples=r'a \`quoted\` \${x}\nline'),
+    )
+
+    variables = template_loader._load_template_variables()
+
+    self.assertEqual(variables['EnglishExamples'], 'a `quoted` ${x}\nline')
+    self.assertEqual(variables['EnglishOutputNotes'], 'EnglishOutputNotes text')
+
+  def test_missing_key(self):
+    self._write_js('export const templates = {};\n')
+
+    with self.assertRaisesRegex(ValueError, 'EnglishRuyiDSLSyntax'):
+      template_loader._load_template_variables()
+
+  def test_uses_cache_while_file_unchanged(self):
+    first = template_loader._load_template_variables()
+    with mock.patch('pathlib.Path.read_bytes') as read_bytes:
+      second = template_loader._load_template_variables()
+
+    self.assertEqual(first, second)
+    read_bytes.assert_not_called()
+    self.extract.assert_called_once()
+
+  def test_reparses_modified_file(self):
+    template_loader._load_template_variables()
+    stat = os.stat(self.js_path)
+    self._write_js(
+        _template_js(EnglishExamples='changed'),
+        mtime_ns=stat.st_mtime_ns + 10**9,
+    )
+
+    variables = template_loader._load_template_variables()
+
+    self.assertEqual(variables['EnglishExamples'], 'changed')
+    self.assertEqual(self.extract.call_count, 2)
+
+  def test_touched_file_is_not_reparsed(self):
+    template_loader._load_template_variables()
+    stat = os.stat(self.js_path)
+    os.utime(self.js_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    template_loader._load_template_variables()
+
+    self.extract.assert_called_once()
+    with open(self.cache_path, encoding='utf-8') as f:
+      entry = json.load(f)[os.path.realpath(self.js_path)]
+    self.assertEqual(entry['mtime_ns'], stat.st_mtime_ns + 10**9)
+
+  def test_reparses_when_target_keys_change(self):
+    template_loader._load_template_variables()
+
+    with mock.patch.object(
+        template_loader,
+        'TARGET_TEMPLATE_VARIABLES',
+        template_loader.TARGET_TEMPLATE_VARIABLES[:2],
+    ):
+      variables = template_loader._load_template_variables()
+
+    self.assertLen(variables, 2)
+    self.assertEqual(self.extract.call_count, 2)
+
+  def test_ignores_corrupt_cache(self):
+    os.makedirs(os.path.dirname(self.cache_path))
+    with open(self.cache_path, 'w', encoding='utf-8') as f:
+      f.write('{not json')
+
+    variables = template_loader._load_template_variables()
+
+    self.assertLen(variables, len(template_loader.TARGET_TEMPLATE_VARIABLES))
+
+
+if __name__ == '__main__':
+  absltest.main()
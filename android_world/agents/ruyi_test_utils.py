@@ -0,0 +1,142 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Helpers for testing the modules of the Ruyi agent package.
+
+The package's `__init__` imports the script generator, whose prompt templates
+are not part of this tree, so the modules are loaded under a separate package
+name whose `__init__` files are not run, or the package is imported with a
+placeholder prompt manager. The RuyiAgent library the generated
+scripts import is replaced by a minimal fake.
+"""
+
+import importlib
+import os
+import sys
+import textwrap
+import types
+
+_RUYI_DIR = os.path.join(os.path.dirname(__file__), 'ruyi')
+_PACKAGE = 'ruyi_under_test'
+
+_FAKE_RUYI_AGENT_FILES = {
+    'ruyi/__init__.py': '',
+    'ruyi/agent.py': """\
+        class _DeviceManager:
+
+          def __init__(self):
+            self.taps = []
+
+          def tap(self, x, y):
+            self.taps.append((x, y))
+            return True
+
+
+        class _TaskRunner:
+
+          def __init__(self, agent):
+            self._agent = agent
+
+          def execute_task(self, task):
+            task.main(self._agent)
+
+
+        class RuyiAgent:
+
+          def __init__(self, config):
+            self.config = config
+            self.device_manager = _DeviceManager()
+            self.data = self.fm = self.user = None
+            self.task = _TaskRunner(self)
+        """,
+    'ruyi/task.py': """\
+        class RuyiTask:
+
+          def main(self, agent):
+            raise NotImplementedError()
+        """,
+    'ruyi/config.py': """\
+        class RuyiConfig:
+          pass
+
+
+        class RuyiArgParser:
+
+          def __init__(self, config_types):
+            self.config_types = config_types
+
+          def parse_yaml_file(self, yaml_file):
+            return [RuyiConfig()]
+        """,
+    'config.yaml': '',
+}
+
+
+class _FakePromptManager:
+  """Stands in for the planner's prompt manager, whose templates are absent."""
+
+  def __getattr__(self, name):
+    raise NotImplementedError(f'PromptManager.{name}')
+
+
+def install_fake_prompt_manager() -> None:
+  """Registers a placeholder for the prompt manager of the script generator.
+
+  This lets the Ruyi package itself, and the RuyiAgent that imports it, be
+  imported; tests replace the script generator's LLM calls.
+  """
+  name = 'android_world.agents.ruyi.planner.prompt_manager'
+  if name not in sys.modules:
+    module = types.ModuleType(name)
+    module.PromptManager = _FakePromptManager
+    sys.modules[name] = module
+
+
+def load_ruyi_module(name: str) -> types.ModuleType:
+  """Imports a module of the Ruyi package without its package `__init__`s.
+
+  Args:
+    name: Module path relative to the package, e.g. "executor.warm_worker".
+
+  Returns:
+    The module; relative imports between Ruyi modules work as usual.
+  """
+  parts = name.split('.')
+  for i in range(len(parts)):
+    package = '.'.join([_PACKAGE] + parts[:i])
+    if package not in sys.modules:
+      module = types.ModuleType(package)
+      module.__path__ = [os.path.join(_RUYI_DIR, *parts[:i])]
+      sys.modules[package] = module
+  return importlib.import_module(f'{_PACKAGE}.{name}')
+
+
+def write_fake_ruyi_agent(directory: str) -> str:
+  """Writes a fake RuyiAgent library and returns its directory.
+
+  The fake agent runs a task's `main` and records the taps of its device
+  manager; it needs no device.
+
+  Args:
+    directory: Where to write the library.
+
+  Returns:
+    The directory, to be used as the RuyiAgent path.
+  """
+  for path, content in _FAKE_RUYI_AGENT_FILES.items():
+    full_path = os.path.join(directory, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, 'w', encoding='utf-8') as f:
+      f.write(textwrap.dedent(content))
+  return directory
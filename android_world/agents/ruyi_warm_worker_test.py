@@ -0,0 +1,127 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tempfile
+import textwrap
+
+from absl.testing import absltest
+from android_world.agents import ruyi_test_utils
+
+warm_worker = ruyi_test_utils.load_ruyi_module('executor.warm_worker')
+
+_TIMEOUT_SEC = 60
+
+
+def _task_source(body: str) -> str:
+  return 'class DynamicTask:\n\n  def main(self, agent):\n' + textwrap.indent(
+      textwrap.dedent(body), '    '
+  )
+
+
+class WarmWorkerTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    directory = tempfile.mkdtemp()
+    self.worker = warm_worker.WarmWorker(
+        ruyi_test_utils.write_fake_ruyi_agent(directory), cwd=directory
+    )
+    self.addCleanup(self.worker.stop)
+    self.output = []
+
+  def _on_output(self, line, is_error):
+    self.output.append((line, is_error))
+
+  def _run(self, body, **kwargs):
+    kwargs.setdefault('timeout', _TIMEOUT_SEC)
+    return self.worker.run_task(
+        _task_source(body), 'task.py', self._on_output, **kwargs
+    )
+
+  def test_runs_tasks_in_one_process(self):
+    status, error = self._run("print('first')")
+    pid = self.worker.process.pid
+    second = self._run('agent.device_manager.tap(1, 2)\nprint("second")')
+
+    self.assertEqual((status, error), ('ok', None))
+    self.assertEqual(second, ('ok', None))
+    self.assertEqual(self.worker.process.pid, pid)
+    self.assertEqual(
+        self.output, [('first\n', False), ('second\n', False)]
+    )
+
+  def test_output_without_trailing_newline(self):
+    status, _ = self._run("print('no newline', end='')")
+    next_status, _ = self._run("print('next')")
+
+    self.assertEqual(status, 'ok')
+    self.assertEqual(next_status, 'ok')
+    self.assertEqual(
+        self.output, [('no newline\n', False), ('next\n', False)]
+    )
+
+  def test_script_error(self):
+    status, error = self._run("raise ValueError('boom')")
+
+    self.assertEqual(status, 'error')
+    self.assertEqual(error, {'type': 'ValueError', 'message': 'boom'})
+    self.assertTrue(any(is_error for _, is_error in self.output))
+    self.assertTrue(self.worker.alive())
+
+  def test_crash_restarts_worker(self):
+    status, error = self._run('import os\nos._exit(3)')
+    next_status, _ = self._run("print('after crash')")
+
+    self.assertEqual(status, 'crashed')
+    self.assertEqual(error['type'], 'WorkerCrashed')
+    self.assertEqual(next_status, 'ok')
+
+  def test_timeout_stops_worker(self):
+    status, error = self._run('import time\ntime.sleep(30)', timeout=0.5)
+
+    self.assertEqual(status, 'timeout')
+    self.assertEqual(error['type'], 'TimeoutError')
+    self.assertFalse(self.worker.alive())
+
+  def test_sends_cached_scripts_by_key(self):
+    self._run("print('cached')", key='abc')
+    self.assertIn('abc', self.worker._compiled_keys)
+
+    # The source is not sent again; the worker runs its compiled code.
+    status, _ = self.worker.run_task(
+        '', 'task.py', self._on_output, timeout=_TIMEOUT_SEC, key='abc'
+    )
+
+    self.assertEqual(status, 'ok')
+    self.assertEqual([line for line, _ in self.output], ['cached\n'] * 2)
+
+  def test_recycles_after_max_tasks(self):
+    self.worker.max_tasks = 2
+    self._run('pass')
+    self.assertIsNone(self.worker.recycle_if_needed())
+    self._run('pass')
+
+    self.assertIn('2', self.worker.recycle_if_needed())
+    self.assertFalse(self.worker.alive())
+
+  def test_recycles_above_rss_watermark(self):
+    self._run('pass')
+    self.worker.max_rss_mb = 0
+
+    self.assertIsNotNone(self.worker.recycle_if_needed())
+    self.assertFalse(self.worker.alive())
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -17,10 +17,12 @@
 from typing import Any
 
 from android_world.agents import base_agent
+from android_world.agents import llm_scheduler
 from android_world.agents import seeact_utils
 from android_world.env import actuation
 from android_world.env import interface
 from android_world.env import json_action
+from android_world.utils import tracing
 
 SEEACT_ONLINE_SYS_PROMPT = """Imagine that you are imitating humans operating an Android device for a task step by step. At each stage, you can see the Android screen like humans by a screenshot and know the previous actions before the current step decided by yourself through recorded history. You need to decide on the first following action to take. You can tap on an element, long-press an element, swipe, input text, open an app, or use the keyboard enter, home, or back key. (For your understanding, they are like `adb shell input tap`, `adb shell input swipe`, `adb shell input text`, `adb shell am start -n`, and `adb shell input keyevent`). One next step means one operation within these actions. Unlike humans, for typing (e.g., in text areas, text boxes), you should try directly typing the input or selecting the choice, bypassing the need for an initial click. You should not attempt to create accounts, log in or do the final submission. Terminate when you deem the task complete or if it requires potentially harmful actions."""
 
@@ -82,6 +84,7 @@ def generate_seeact_prompts(
     previous_actions: list[str] | None = None,
     ui_element_choices: list[Any] | None = None,
     additional_guidelines: list[str] | None = None,
+    cache_friendly: bool = False,
 ) -> tuple[str, str, str]:
   """Generates prompts for the SeeAct setup.
 
@@ -91,6 +94,9 @@ def generate_seeact_prompts(
       ui_element_choices: A list of choices available for the next action,
         derived from the accessibility tree.
       additional_guidelines: Task specific guidelines.
+      cache_friendly: If True, the system prompt is kept identical across
+        tasks (guidelines go with the task instead) and static instructions
+        come before per-step content.
 
   Returns:
       A list of strings forming the complete prompt for the SeeAct task.
@@ -102,7 +108,10 @@ def generate_seeact_prompts(
 
   if additional_guidelines is not None:
     for guideline in additional_guidelines:
-      system_prompt_input += f" {guideline}"
+      if cache_friendly:
+        task += f" {guideline}"
+      else:
+        system_prompt_input += f" {guideline}"
 
   return (
       system_prompt_input,
@@ -110,6 +119,7 @@ def generate_seeact_prompts(
           task,
           question_description_input,
           previous_actions=previous_actions,
+          cache_friendly=cache_friendly,
       ),
       seeact_utils.generate_grounding_prompt(
           referring_description=referring_input,
@@ -122,10 +132,31 @@ def generate_seeact_prompts(
 class SeeAct(base_agent.EnvironmentInteractingAgent):
   """SeeAct agent for Android."""
 
-  def __init__(self, env: interface.AsyncEnv, name: str = "SeeAct"):
+  def __init__(
+      self,
+      env: interface.AsyncEnv,
+      name: str = "SeeAct",
+      cache_friendly_prompts: bool = False,
+      cache_control: bool = False,
+      scheduler: llm_scheduler.LlmScheduler | None = None,
+  ):
+    """Initializes the agent.
+
+    Args:
+      env: The environment.
+      name: The agent name.
+      cache_friendly_prompts: Whether to lay out prompts so that consecutive
+        requests share a long prefix.
+      cache_control: Whether to mark the system prompt as cacheable in
+        requests, for endpoints that accept `cache_control`.
+      scheduler: If provided, LLM requests go through this scheduler.
+    """
     super().__init__(env, name)
     self._actions = []
     self.additional_guidelines = None
+    self.cache_friendly_prompts = cache_friendly_prompts
+    self.cache_control = cache_control
+    self.scheduler = scheduler
 
   def reset(self, go_home: bool = False) -> None:
     super().reset(go_home)
@@ -164,15 +195,22 @@ class SeeAct(base_agent.EnvironmentInteractingAgent):
             previous_actions=self._actions,
             ui_element_choices=descriptions,
             additional_guidelines=self.additional_guidelines,
+            cache_friendly=self.cache_friendly_prompts,
         )
     )
 
     # Action generation.
     payload = seeact_utils.create_action_generation_messages_payload(
-        sys_prompt, action_gen_prompt, state.pixels
+        sys_prompt,
+        action_gen_prompt,
+        state.pixels,
+        cache_control=self.cache_control,
     )
     result["action_gen_payload"] = payload
-    response = seeact_utils.execute_openai_request(payload)
+    with tracing.span("agent.llm.action_generation"):
+      response = seeact_utils.execute_openai_request(
+          payload, scheduler=self.scheduler
+      )
     action_gen_response = response["choices"][0]["message"]["content"]
     result["action_gen_response"] = action_gen_response
     if verbose:
@@ -190,9 +228,13 @@ class SeeAct(base_agent.EnvironmentInteractingAgent):
         state.pixels,
         action_gen_response,
         action_ground_prompt,
+        cache_control=self.cache_control,
     )
     result["action_ground_payload"] = payload
-    response = seeact_utils.execute_openai_request(payload)
+    with tracing.span("agent.llm.grounding"):
+      response = seeact_utils.execute_openai_request(
+          payload, scheduler=self.scheduler
+      )
     action_ground_response = response["choices"][0]["message"]["content"]
     result["action_ground_response"] = action_ground_response
 
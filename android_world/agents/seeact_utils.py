@@ -26,6 +26,8 @@ import string
 from typing import Any
 from absl import logging
 from android_world.agents import infer
+from android_world.agents import llm_retry
+from android_world.agents import llm_scheduler
 from android_world.env import json_action
 from android_world.env import representation_utils
 from IPython import display
@@ -66,6 +68,7 @@ def generate_action_generation_prompt(
     task: str,
     question_description: str,
     previous_actions: list[str] | None = None,
+    cache_friendly: bool = False,
 ) -> str:
   """Generate the first phase prompt for the SeeAct experiment setup.
 
@@ -76,6 +79,8 @@ def generate_action_generation_prompt(
       task: The task description.
       question_description: A description of the question or task at hand.
       previous_actions: A list of previous actions taken.
+      cache_friendly: If True, the static question description comes first so
+        that prompts of consecutive steps share a long prefix.
 
   Returns:
       list: A list containing the system role and the generated query text.
@@ -86,6 +91,8 @@ def generate_action_generation_prompt(
     previous_actions = []
   for action_text in previous_actions:
     previous_action_text += action_text + "\n"
+  if cache_friendly:
+    return question_description + "\n\n" + query_text + previous_action_text
   query_text += previous_action_text + "\n" + question_description
   return query_text
 
@@ -163,10 +170,20 @@ def generate_multiple_choice(index: int) -> str:
     return f"{first_letter}{second_letter}"
 
 
+def _system_message(
+    system_role_prompt: str, cache_control: bool
+) -> dict[str, Any]:
+  content = {"type": "text", "text": system_role_prompt}
+  if cache_control:
+    content["cache_control"] = {"type": "ephemeral"}
+  return {"role": "system", "content": [content]}
+
+
 def create_action_generation_messages_payload(
     system_role_prompt: str,
     action_gen_prompt: str,
     image_array: np.ndarray,
+    cache_control: bool = False,
 ) -> list[dict[str, Any]]:
   """Creates JSON input for action generation.
 
@@ -174,16 +191,15 @@ def create_action_generation_messages_payload(
     system_role_prompt: The general instructions to give to the agent.
     action_gen_prompt: Prompt for the specific task.
     image_array: Image of the current screen.
+    cache_control: Whether to mark the system prompt as cacheable, for
+      endpoints that accept `cache_control` on content blocks.
 
   Returns:
     JSON input for OpenAI API.
   """
   base64_image = infer.Gpt4Wrapper.encode_image(image_array)
   messages = [
-      {
-          "role": "system",
-          "content": [{"type": "text", "text": system_role_prompt}],
-      },
+      _system_message(system_role_prompt, cache_control),
       {
           "role": "user",
           "content": [
@@ -208,6 +224,7 @@ def create_grounding_messages_payload(
     image_array: np.ndarray,
     action_generation_output: str,
     action_grounding_prompt: str,
+    cache_control: bool = False,
 ) -> list[dict[str, Any]]:
   """Creates JSON input for grounding.
 
@@ -217,16 +234,15 @@ def create_grounding_messages_payload(
     image_array: Image of the current screen.
     action_generation_output: Output from the action generation.
     action_grounding_prompt: Prompt for generating the grounding action.
+    cache_control: Whether to mark the system prompt as cacheable, for
+      endpoints that accept `cache_control` on content blocks.
 
   Returns:
     JSON input for OpenAI API.
   """
   base64_image = infer.Gpt4Wrapper.encode_image(image_array)
   messages = [
-      {
-          "role": "system",
-          "content": [{"type": "text", "text": system_role_prompt}],
-      },
+      _system_message(system_role_prompt, cache_control),
       {
           "role": "user",
           "content": [
@@ -299,6 +315,8 @@ def execute_openai_request(
     model: str = _GPT_TURBO,
     temperature: float = 0.0,
     max_tokens: int = 4096,
+    scheduler: llm_scheduler.LlmScheduler | None = None,
+    retry_policy: llm_retry.RetryPolicy = llm_retry.RetryPolicy(),
 ) -> dict[str, Any]:
   """Executes a request to the OpenAI API with the given JSON input.
 
@@ -307,9 +325,15 @@ def execute_openai_request(
     model: The model to use for the request.
     temperature: Temperature setting for GPT's responses.
     max_tokens: Max number of output tokens.
+    scheduler: If provided, the request goes through this scheduler, which can
+      be shared by agents running in parallel to stay within rate limits.
+    retry_policy: How failed requests are retried.
 
   Returns:
     The response from the OpenAI API as a dictionary.
+
+  Raises:
+    Exception: If the request still fails after retrying.
   """
   api_key = os.environ["OPENAI_API_KEY"]
   headers = {
@@ -323,13 +347,28 @@ def execute_openai_request(
       "max_tokens": max_tokens,
   }
 
-  response = requests.post(
-      "https://api.openai.com/v1/chat/completions",
-      headers=headers,
-      json=payload,
+  url = os.environ.get(
+      "OPENAI_API_URL", "https://api.openai.com/v1/chat/completions"
   )
 
-  return response.json()
+  def post() -> dict[str, Any]:
+    response = requests.post(url, headers=headers, json=payload)
+    if not response.ok:
+      raise llm_retry.LlmRequestError.from_response(response)
+    return response.json()
+
+  def attempt() -> dict[str, Any]:
+    if scheduler is None:
+      return post()
+    return scheduler.call(
+        post,
+        tokens=llm_scheduler.estimate_request_tokens(payload),
+        key=llm_scheduler.request_key(payload),
+    )
+
+  return llm_retry.call_with_retry(
+      attempt, retry_policy, llm_retry.circuit_breaker("openai")
+  )
 
 
 @dataclasses.dataclass(frozen=True)
@@ -802,7 +841,11 @@ def _generate_episode_html(episode: dict[str, Any], num: int) -> str:
 def generate_full_report(
     episodes: list[dict[str, Any]], run_id: str = ""
 ) -> str:
-  """Generate a comprehensive HTML report for multiple episodes."""
+  """Generate a comprehensive HTML report for multiple episodes.
+
+  For large runs, use `html_report.write_report`, which streams the episodes
+  from a run's checkpoint directory and writes screenshots as separate files.
+  """
   html_str = f"<html><head><title>SeeAct: {run_id}</title></head><body>"
   html_str += "<h1>SeeAct Report</h1>"
 
@@ -14,14 +14,18 @@
 
 """T3A: Text-only Autonomous Agent for Android."""
 
+import dataclasses
+
 from android_world.agents import agent_utils
 from android_world.agents import base_agent
 from android_world.agents import infer
 from android_world.agents import m3a_utils
+from android_world.agents import prompt_utils
 from android_world.env import adb_utils
 from android_world.env import interface
 from android_world.env import json_action
 from android_world.env import representation_utils
+from android_world.utils import tracing
 
 PROMPT_PREFIX = (
     'You are an agent who can operate an Android phone on behalf of a user.'
@@ -153,6 +157,26 @@ ACTION_SELECTION_PROMPT_TEMPLATE = (
     'Your Answer:\n'
 )
 
+# Same content as above, but ordered from least to most frequently changing
+# (static instructions, then per-task content, then per-step content) so that
+# consecutive prompts share a long prefix for provider-side prompt caching.
+CACHE_FRIENDLY_ACTION_SELECTION_PROMPT_TEMPLATE = (
+    PROMPT_PREFIX
+    + GUIDANCE
+    + '{cache_breakpoint}'
+    + '\nThe current user goal/request is: {goal}\n'
+    + '{additional_guidelines}'
+    + '{cache_breakpoint}'
+    + '\nHere is a history of what you have done so far:\n{history}'
+    + '\n\nHere is a list of descriptions for some UI elements on the current'
+    ' screen:\n{ui_elements_description}\n'
+    + '\nNow output an action from the above list in the correct JSON format,'
+    ' following the reason why you do that. Your answer should look like:\n'
+    'Reason: ...\nAction: {{"action_type":...}}\n\n'
+    'Your Answer:\n'
+)
+
+
 SUMMARIZATION_PROMPT_TEMPLATE = (
     PROMPT_PREFIX
     + '\nThe (overall) user goal/request is:{goal}\n'
@@ -183,24 +207,48 @@ SUMMARIZATION_PROMPT_TEMPLATE = (
 )
 
 
+def _compact_ui_element_repr(ui_element: representation_utils.UIElement) -> str:
+  """Like `str(ui_element)`, but omits fields that are unset or False."""
+  fields = ', '.join(
+      f'{field.name}={value!r}'
+      for field in dataclasses.fields(ui_element)
+      if (value := getattr(ui_element, field.name)) is not None
+      and value is not False
+  )
+  return f'{type(ui_element).__name__}({fields})'
+
+
 def _generate_ui_elements_description_list_full(
     ui_elements: list[representation_utils.UIElement],
     screen_width_height_px: tuple[int, int],
+    prompt_budget: prompt_utils.PromptBudget | None = None,
 ) -> str:
   """Generate description for a list of UIElement using full information.
 
   Args:
     ui_elements: UI elements for the current screen.
     screen_width_height_px: Logical screen size.
+    prompt_budget: If provided, controls how the list is compacted.
 
   Returns:
     Information for each UIElement.
   """
-  tree_info = ''
-  for index, ui_element in enumerate(ui_elements):
-    if m3a_utils.validate_ui_element(ui_element, screen_width_height_px):
-      tree_info += f'UI element {index}: {str(ui_element)}\n'
-  return tree_info
+  selected = prompt_utils.select_ui_elements(
+      ui_elements,
+      screen_width_height_px,
+      drop_duplicates=bool(
+          prompt_budget and prompt_budget.drop_duplicate_elements
+      ),
+  )
+  describe = (
+      _compact_ui_element_repr
+      if prompt_budget and prompt_budget.compact_flags
+      else str
+  )
+  return ''.join(
+      f'UI element {index}: {describe(ui_element)}\n'
+      for index, ui_element in selected
+  )
 
 
 def _action_selection_prompt(
@@ -208,6 +256,8 @@ def _action_selection_prompt(
     history: list[str],
     ui_elements_description: str,
     additional_guidelines: list[str] | None = None,
+    prompt_budget: prompt_utils.PromptBudget | None = None,
+    cache_friendly: bool = False,
 ) -> str:
   """Generate the prompt for the action selection.
 
@@ -216,28 +266,52 @@ def _action_selection_prompt(
     history: Summaries for previous steps.
     ui_elements_description: A list of descriptions for the UI elements.
     additional_guidelines: Task specific guidelines.
+    prompt_budget: If provided, older history is windowed and the prompt is
+      truncated to fit in the budget.
+    cache_friendly: Whether to use the prompt layout that puts static content
+      first, with cache breakpoints after the static and per-task parts.
 
   Returns:
     The text prompt for action selection that will be sent to gpt4v.
   """
-  if history:
-    history = '\n'.join(history)
-  else:
-    history = 'You just started, no action has been performed yet.'
-
   extra_guidelines = ''
   if additional_guidelines:
-    extra_guidelines = 'For The Current Task:\n'
-    for guideline in additional_guidelines:
-      extra_guidelines += f'- {guideline}\n'
+    extra_guidelines = 'For The Current Task:\n' + ''.join(
+        f'- {guideline}\n' for guideline in additional_guidelines
+    )
 
-  return ACTION_SELECTION_PROMPT_TEMPLATE.format(
-      history=history,
-      goal=goal,
-      ui_elements_description=ui_elements_description
-      if ui_elements_description
-      else 'Not available',
-      additional_guidelines=extra_guidelines,
+  if cache_friendly:
+    template = CACHE_FRIENDLY_ACTION_SELECTION_PROMPT_TEMPLATE.replace(
+        '{cache_breakpoint}', prompt_utils.CACHE_BREAKPOINT
+    )
+  else:
+    template = ACTION_SELECTION_PROMPT_TEMPLATE
+
+  def render(history: list[str], ui_element_lines: list[str]) -> str:
+    return template.format(
+        history='\n'.join(history)
+        if history
+        else 'You just started, no action has been performed yet.',
+        goal=goal,
+        ui_elements_description=''.join(
+            line + '\n' for line in ui_element_lines
+        )
+        if ui_element_lines
+        else 'Not available',
+        additional_guidelines=extra_guidelines,
+    )
+
+  if prompt_budget is None:
+    return render(history, ui_elements_description.splitlines())
+  return prompt_utils.fit_to_budget(
+      render,
+      prompt_utils.window_history(
+          history,
+          prompt_budget.max_history_entries,
+          prompt_budget.summary_chars,
+      ),
+      ui_elements_description.splitlines(),
+      prompt_budget,
   )
 
 
@@ -277,6 +351,8 @@ class T3A(base_agent.EnvironmentInteractingAgent):
       env: interface.AsyncEnv,
       llm: infer.LlmWrapper,
       name: str = 'T3A',
+      prompt_budget: prompt_utils.PromptBudget | None = None,
+      cache_friendly_prompts: bool = False,
   ):
     """Initializes a RandomAgent.
 
@@ -284,11 +360,18 @@ class T3A(base_agent.EnvironmentInteractingAgent):
       env: The environment.
       llm: The text only LLM.
       name: The agent name.
+      prompt_budget: If provided, compacts the UI element lists and history in
+        prompts and bounds the action selection prompt size.
+      cache_friendly_prompts: Whether to lay out action selection prompts so
+        that consecutive steps share a long prefix, with cache breakpoints
+        that the LLM wrapper can turn into provider cache control.
     """
     super().__init__(env, name)
     self.llm = llm
     self.history = []
     self.additional_guidelines = None
+    self.prompt_budget = prompt_budget
+    self.cache_friendly_prompts = cache_friendly_prompts
 
   def reset(self, go_home_on_reset: bool = False):
     super().reset(go_home_on_reset)
@@ -320,6 +403,7 @@ class T3A(base_agent.EnvironmentInteractingAgent):
     before_element_list = _generate_ui_elements_description_list_full(
         ui_elements,
         logical_screen_size,
+        self.prompt_budget,
     )
     # Only save the screenshot for result visualization.
     step_data['before_screenshot'] = state.pixels.copy()
@@ -333,11 +417,14 @@ class T3A(base_agent.EnvironmentInteractingAgent):
         ],
         before_element_list,
         self.additional_guidelines,
+        self.prompt_budget,
+        self.cache_friendly_prompts,
     )
     step_data['action_prompt'] = action_prompt
-    action_output, is_safe, raw_response = self.llm.predict(
-        action_prompt,
-    )
+    with tracing.span('agent.llm.action_selection'):
+      action_output, is_safe, raw_response = self.llm.predict(
+          action_prompt,
+      )
 
     if is_safe == False:  # pylint: disable=singleton-comparison
       #  is_safe could be None
@@ -448,6 +535,7 @@ Action: {{"action_type": "status", "goal_status": "infeasible"}}"""
     after_element_list = _generate_ui_elements_description_list_full(
         ui_elements,
         self.env.logical_screen_size,
+        self.prompt_budget,
     )
 
     # Save screenshot only for result visualization.
@@ -462,9 +550,10 @@ Action: {{"action_type": "status", "goal_status": "infeasible"}}"""
         after_element_list,
     )
 
-    summary, is_safe, raw_response = self.llm.predict(
-        summary_prompt,
-    )
+    with tracing.span('agent.llm.summary'):
+      summary, is_safe, raw_response = self.llm.predict(
+          summary_prompt,
+      )
     if is_safe == False:  # pylint: disable=singleton-comparison
       #  is_safe could be None
       summary = """Summary triggered LLM safety classifier."""
@@ -15,17 +15,44 @@
 """Checkpointer class."""
 
 import abc
+import atexit
+import contextlib
 import datetime
 import gzip
 import io
+import json
 import os
 import pickle
-from typing import Any
+import queue
+import signal
+import threading
+import time
+from typing import Any, Iterator
 
 from absl import logging
+from android_world import constants
+from android_world.utils import frame_store
+from android_world.utils import metrics
 
 INSTANCE_SEPARATOR = '_'
 
+# Append-only index of the saved task groups, one JSON object per line.
+MANIFEST_FILENAME = 'manifest.jsonl'
+# Append-only log of the episodes' metadata, one pickle per task group. The
+# manifest holds the offset and size of each.
+METADATA_LOG_FILENAME = 'metadata.log'
+# The heavy per-step data of a task group's episodes.
+DATA_SUFFIX = '.data.pkl.gz'
+# Former formats: the metadata of a task group in its own file, and the full
+# episodes in one file.
+METADATA_SUFFIX = '.meta.pkl'
+LEGACY_SUFFIX = '.pkl.gz'
+
+# Fields stored apart from the metadata, loaded only when requested.
+DATA_FIELDS = (constants.EpisodeConstants.EPISODE_DATA,)
+# Subdirectory of the deduplicated screenshots of a run.
+FRAMES_DIRECTORY = 'frames'
+
 Episode = dict[str, Any]
 
 
@@ -72,6 +99,32 @@ def _gzip_pickle(data: Any) -> bytes:
   return compressed_data.getvalue()
 
 
+def _write_atomic(file_path: str, data: bytes) -> None:
+  """Writes a file under a temporary name, then renames it into place.
+
+  Readers, and a resumed run after a crash, see either the previous file or the
+  complete new one, never a partial file.
+
+  Args:
+    file_path: The file to write.
+    data: The contents.
+  """
+  temp_path = f'{file_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+  try:
+    with open(temp_path, 'wb') as f:
+      f.write(data)
+    os.replace(temp_path, file_path)
+  except BaseException:
+    if os.path.exists(temp_path):
+      os.remove(temp_path)
+    raise
+
+
+def _read_pickle(file_path: str) -> Any:
+  with open(file_path, 'rb') as f:
+    return pickle.load(f)
+
+
 def _unzip_and_read_pickle(file_path: str) -> Any:
   """Reads a gzipped pickle file using 'with open', unzips, and unpickles it.
 
@@ -99,6 +152,9 @@ class Checkpointer(abc.ABC):
   def load(self, fields: list[str] | None = None) -> list[Episode]:
     """Loads all episodes from disk."""
 
+  def flush(self) -> None:
+    """Waits until all saved episodes are on disk."""
+
 
 class IncrementalCheckpointer(Checkpointer):
   """Saves and loads the results of an evaluation run.
@@ -107,13 +163,34 @@ class IncrementalCheckpointer(Checkpointer):
   checkpointer to save the results of an evaluation run task by task, rather
   than saving the entire dataset at once.
 
+  The metadata of a task group's episodes is stored apart from their heavy
+  data fields, such as the per-step screenshots, so loading only metadata
+  fields, as done when resuming a run, does not read the heavy data. Each save
+  appends the metadata to a log and a line to the manifest, which indexes the
+  saved task groups; loading reads the manifest instead of listing and opening
+  the files of the directory. Directories written in former formats are
+  indexed once, when the manifest is created.
+
+  Screenshots in the episode data are stored once per run as PNG files, see
+  `frame_store`, and are decoded when accessed after loading.
+
   Attributes:
       directory: The directory to store the task data.
+      frames: Store of the screenshots; None to pickle them with the data.
   """
 
-  def __init__(self, directory: str) -> None:
+  def __init__(self, directory: str, store_frames: bool = True) -> None:
     self.directory = directory
     os.makedirs(directory, exist_ok=True)
+    self.frames = None
+    if store_frames:
+      self.frames = frame_store.FrameStore(
+          os.path.join(directory, FRAMES_DIRECTORY)
+      )
+    self._lock = threading.Lock()
+
+  def _path(self, task_group_id: str, suffix: str = '') -> str:
+    return os.path.join(self.directory, f'{task_group_id}{suffix}')
 
   def save_episodes(self, task_episodes: list[Episode], task_name: str):
     """Saves a task group to disk.
@@ -122,45 +199,340 @@ class IncrementalCheckpointer(Checkpointer):
         task_episodes: The task's episodes to save.
         task_name: The unique identifier for the task group.
     """
-    filename = os.path.join(self.directory, f'{task_name}.pkl.gz')
-    with open(filename, 'wb') as f:
-      compressed = _gzip_pickle(task_episodes)
-      f.write(compressed)
+    metadata = [
+        {k: v for k, v in episode.items() if k not in DATA_FIELDS}
+        for episode in task_episodes
+    ]
+    data = [
+        {k: self._encode(episode[k]) for k in DATA_FIELDS if k in episode}
+        for episode in task_episodes
+    ]
+    filename = self._path(task_name, DATA_SUFFIX)
+    compressed = _gzip_pickle(data)
+    _write_atomic(filename, compressed)
+    pickled_metadata = pickle.dumps(metadata)
+    failed = any(
+        episode.get(constants.EpisodeConstants.EXCEPTION_INFO) is not None
+        for episode in task_episodes
+    )
+    with self._lock:
+      self._ensure_manifest()
+      with open(self._path(METADATA_LOG_FILENAME), 'ab') as f:
+        offset = f.tell()
+        f.write(pickled_metadata)
+        f.flush()
+        os.fsync(f.fileno())
+      # The task group is saved once its manifest line is written; a crash
+      # before only leaves unreferenced bytes behind.
+      self._append_manifest({
+          'task_name': task_name,
+          'status': 'failed' if failed else 'completed',
+          'episodes': len(task_episodes),
+          'metadata_offset': offset,
+          'metadata_size': len(pickled_metadata),
+          'data_file': os.path.basename(filename),
+          'data_size': len(compressed),
+          'time': time.time(),
+      })
+    # Files of the task group in former formats are superseded.
+    for suffix in (METADATA_SUFFIX, LEGACY_SUFFIX):
+      if os.path.exists(self._path(task_name, suffix)):
+        os.remove(self._path(task_name, suffix))
     logging.info('Wrote task episodes for %s to %s', task_name, filename)
 
-  def load(self, fields: list[str] | None = None) -> list[Episode]:
-    """Loads all task groups from disk."""
+  def _append_manifest(self, entry: dict[str, Any]) -> None:
+    with open(self._path(MANIFEST_FILENAME), 'a', encoding='utf-8') as f:
+      f.write(json.dumps(entry) + '\n')
+      f.flush()
+      os.fsync(f.fileno())
+
+  def _ensure_manifest(self) -> None:
+    """Creates the manifest, indexing task groups saved in former formats."""
+    if os.path.exists(self._path(MANIFEST_FILENAME)):
+      return
+    lines = ''.join(json.dumps(entry) + '\n' for entry in self._index_files())
+    _write_atomic(self._path(MANIFEST_FILENAME), lines.encode('utf-8'))
+
+  def _index_files(self) -> list[dict[str, Any]]:
+    """Returns manifest entries for the task groups saved in former formats."""
+    entries = []
+    for filename in os.listdir(self.directory):
+      if filename.endswith(METADATA_SUFFIX):
+        task_name = filename[: -len(METADATA_SUFFIX)]
+        entries.append({'task_name': task_name, 'metadata_file': filename})
+      elif filename.endswith(LEGACY_SUFFIX) and not filename.endswith(
+          DATA_SUFFIX
+      ):
+        task_name = filename[: -len(LEGACY_SUFFIX)]
+        entries.append({'task_name': task_name, 'legacy_file': filename})
+    return entries
+
+  def _read_manifest(self) -> dict[str, dict[str, Any]]:
+    """Returns the latest manifest entry of each task group."""
+    entries = {}
+    with open(self._path(MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+      for line in f:
+        try:
+          entry = json.loads(line)
+        except ValueError:
+          # A line cut short by a crash.
+          logging.info('Skipping malformed manifest line: %r', line)
+          continue
+        entries[entry['task_name']] = entry
+    return entries
+
+  def task_group_entries(self) -> list[dict[str, Any]]:
+    """Returns the manifest entries of the saved task groups, in run order."""
+    with self._lock:
+      entries = None
+      # A directory in a former format that cannot be written, e.g. one being
+      # analyzed read-only, is indexed in memory instead.
+      if os.path.exists(self._path(MANIFEST_FILENAME)) or os.access(
+          self.directory, os.W_OK
+      ):
+        try:
+          self._ensure_manifest()
+          entries = self._read_manifest()
+        except OSError as e:
+          logging.info('Unable to create the manifest: %s', e)
+      if entries is None:
+        entries = {entry['task_name']: entry for entry in self._index_files()}
     # Keep same order as runtime.
-    directories = os.listdir(self.directory)
-    directories.sort(key=sort_key)
+    return [entries[name] for name in sorted(entries, key=sort_key)]
 
-    data = []
-    for filename in directories:
-      if filename.endswith('.pkl.gz'):
+  def iter_task_groups(
+      self,
+      entries: list[dict[str, Any]] | None = None,
+      fields: list[str] | None = None,
+  ) -> Iterator[tuple[dict[str, Any], list[Episode]]]:
+    """Loads task groups one at a time.
+
+    Args:
+      entries: Manifest entries of the task groups to load, as returned by
+        `task_group_entries`; all task groups if None.
+      fields: The fields to load; all fields if None. If none of them is a data
+        field, only the manifest and the metadata log are read.
+
+    Yields:
+      The manifest entry and the episodes of each task group. Task groups that
+      fail to load are skipped.
+    """
+    if entries is None:
+      entries = self.task_group_entries()
+    load_data = fields is None or any(field in DATA_FIELDS for field in fields)
+    metadata_log_path = self._path(METADATA_LOG_FILENAME)
+    with contextlib.ExitStack() as stack:
+      metadata_log = None
+      if os.path.exists(metadata_log_path):
+        metadata_log = stack.enter_context(open(metadata_log_path, 'rb'))
+      for entry in entries:
         try:
-          task_group_id = filename[:-7]  # Remove ".pkl.gz" extension
-          task_group = self._load_task_group(task_group_id)
+          task_group = self._load_task_group(entry, metadata_log, load_data)
           if fields is not None:
             task_group = [
                 {field: episode[field] for field in fields}
                 for episode in task_group
             ]
-          data.extend(task_group)
         except Exception as e:  # pylint: disable=broad-exception-caught
-          logging.info('Unable to load %s with exception: %s', filename, e)
+          logging.info(
+              'Unable to load %s with exception: %s', entry['task_name'], e
+          )
+          continue
+        yield entry, task_group
+
+  def load(self, fields: list[str] | None = None) -> list[Episode]:
+    """Loads all task groups from disk.
+
+    Args:
+      fields: The fields to load; all fields if None. If none of them is a data
+        field, only the manifest and the metadata log are read.
+
+    Returns:
+      The episodes, in the order the task groups were run.
+    """
+    data = []
+    for _, task_group in self.iter_task_groups(fields=fields):
+      data.extend(task_group)
     return data
 
-  def _load_task_group(self, task_group_id: str) -> list[Episode]:
+  def _load_task_group(
+      self,
+      entry: dict[str, Any],
+      metadata_log: io.BufferedReader | None,
+      load_data: bool,
+  ) -> list[Episode]:
     """Loads a single task group from disk."""
-    filename = os.path.join(self.directory, f'{task_group_id}.pkl.gz')
+    if 'legacy_file' in entry:
+      return _unzip_and_read_pickle(self._path(entry['legacy_file']))
+    if 'metadata_file' in entry:
+      episodes = _read_pickle(self._path(entry['metadata_file']))
+      data_file = entry['task_name'] + DATA_SUFFIX
+    else:
+      metadata_log.seek(entry['metadata_offset'])
+      episodes = pickle.loads(metadata_log.read(entry['metadata_size']))
+      data_file = entry['data_file']
+    if load_data:
+      data = _unzip_and_read_pickle(self._path(data_file))
+      for episode, episode_data in zip(episodes, data):
+        episode.update(
+            {k: self._decode(v) for k, v in episode_data.items()}
+        )
+    return episodes
+
+  def _encode(self, step_data: Any) -> Any:
+    if self.frames is None or not isinstance(step_data, dict):
+      return step_data
+    return frame_store.encode_frames(step_data, self.frames)
+
+  def _decode(self, step_data: Any) -> Any:
+    # Frames may have been stored even if this checkpointer does not store
+    # them.
+    if not isinstance(step_data, dict):
+      return step_data
+    frames = self.frames or frame_store.FrameStore(
+        os.path.join(self.directory, FRAMES_DIRECTORY)
+    )
+    return frame_store.decode_frames(step_data, frames)
+
+
+class AsyncCheckpointer(Checkpointer):
+  """Saves episodes from a background thread.
+
+  `save_episodes` hands the episodes to a writer thread and returns, so the
+  runner does not wait for serialization, compression and disk I/O before the
+  next task. At most `max_pending` task groups wait to be written; saving more
+  blocks until the writer catches up. Pending episodes are written before
+  loading, on `close` and at exit. On SIGINT the pending episodes are
+  announced and written at exit, unless interrupted again. If writing fails,
+  the error is raised by the next call to `save_episodes`, `flush`, `load` or
+  `close`.
+
+  The saved episodes must not be modified afterwards.
+  """
+
+  def __init__(self, checkpointer: Checkpointer, max_pending: int = 2) -> None:
+    """Constructor.
+
+    Args:
+      checkpointer: Writes the episodes, in the background thread.
+      max_pending: Max number of task groups waiting to be written.
+    """
+    self.checkpointer = checkpointer
+    self._queue = queue.Queue(maxsize=max_pending)
+    self._writer = threading.Thread(
+        target=self._write_loop, name='checkpoint_writer', daemon=True
+    )
+    self._writer.start()
+    self._installed_sigint_handler = False
+    self._previous_sigint_handler = None
+    self._interrupted = False
+    self._abandoned = False
+    self._closed = False
+    # The first error of the writer thread, raised in the caller's thread.
+    self._write_error = None
+    atexit.register(self._flush_at_exit)
+    if threading.current_thread() is threading.main_thread():
+      self._previous_sigint_handler = signal.signal(
+          signal.SIGINT, self._handle_sigint
+      )
+      self._installed_sigint_handler = True
+
+  def save_episodes(self, task_episodes: list[Episode], task_name: str):
+    if self._closed:
+      raise ValueError('Cannot save episodes with a closed checkpointer.')
+    self._raise_write_error()
+    self._queue.put((task_episodes, task_name))
+    metrics.QUEUE_DEPTH.set(self._queue.unfinished_tasks, queue='checkpoints')
+
+  def load(self, fields: list[str] | None = None) -> list[Episode]:
+    self.flush()
+    return self.checkpointer.load(fields)
+
+  def flush(self) -> None:
+    self._queue.join()
+    self._raise_write_error()
+
+  def close(self) -> None:
+    """Writes the pending episodes and stops the writer thread.
+
+    Also restores the SIGINT handler replaced by the constructor and removes
+    the exit hook. Closing again, or after a second SIGINT gave up on the
+    pending episodes, does not wait for them.
+
+    Raises:
+      Exception: The first error of writing the episodes, if not raised yet.
+    """
+    if self._closed:
+      return
+    self._closed = True
+    atexit.unregister(self._flush_at_exit)
+    if (
+        self._installed_sigint_handler
+        and signal.getsignal(signal.SIGINT) == self._handle_sigint
+    ):
+      signal.signal(
+          signal.SIGINT,
+          # None means the handler was not installed from Python.
+          self._previous_sigint_handler
+          if self._previous_sigint_handler is not None
+          else signal.default_int_handler,
+      )
+    if self._abandoned:
+      return
+    self._queue.put(None)  # Stops the writer once the pending saves are done.
+    self._writer.join()
+    self._raise_write_error()
+
+  def _raise_write_error(self) -> None:
+    error, self._write_error = self._write_error, None
+    if error is not None:
+      raise error
+
+  def _flush_at_exit(self) -> None:
+    if self._abandoned:
+      return
     try:
-      return _unzip_and_read_pickle(filename)
-    except FileNotFoundError:
-      logging.info(
-          'File not readable: %s. It may not exist. Starting from empty state.',
-          filename,
+      self.flush()
+    except Exception:  # pylint: disable=broad-exception-caught
+      logging.exception('Failed to save task episodes before exiting.')
+
+  def _write_loop(self) -> None:
+    while True:
+      item = self._queue.get()
+      if item is None:
+        self._queue.task_done()
+        return
+      task_episodes, task_name = item
+      try:
+        self.checkpointer.save_episodes(task_episodes, task_name)
+      except Exception as e:  # pylint: disable=broad-exception-caught
+        logging.error('Failed to save task episodes for %s: %s', task_name, e)
+        if self._write_error is None:
+          self._write_error = e
+      finally:
+        self._queue.task_done()
+        metrics.QUEUE_DEPTH.set(
+            self._queue.unfinished_tasks, queue='checkpoints'
+        )
+
+  def _handle_sigint(self, signum, frame) -> None:
+    # Does not wait for the writer: the interrupted code may hold the queue's
+    # lock. The pending episodes are written by the caller's `flush` or
+    # `close`, or at exit; a second interrupt stops waiting for them.
+    pending = self._queue.unfinished_tasks
+    if self._interrupted:
+      self._abandoned = True
+    elif pending:
+      self._interrupted = True
+      print(
+          f'Interrupted; writing {pending} pending checkpoint(s). Interrupt'
+          ' again to stop without them.'
       )
-      return []
+    previous = self._previous_sigint_handler
+    if callable(previous):
+      previous(signum, frame)
+    elif previous != signal.SIG_IGN:
+      raise KeyboardInterrupt
 
 
 class NullCheckpointer(Checkpointer):
@@ -12,10 +12,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import gzip
+import json
 import os
+import pickle
+import signal
 import tempfile
+import threading
+from unittest import mock
 from absl.testing import absltest
 from android_world import checkpointer
+import numpy as np
 
 
 class CheckpointerTest(absltest.TestCase):
@@ -85,6 +92,330 @@ class CheckpointerTest(absltest.TestCase):
     expected_data = [{'key1': 'value1'}]
     self.assertEqual(expected_data, loaded_data)
 
+  def test_load_metadata_fields_does_not_read_data(self) -> None:
+    """Tests that loading metadata fields does not read the episode data."""
+    task_group = [{'goal': 'goal', 'episode_data': {'screenshot': [1, 2]}}]
+    self.checkpointer.save_episodes(task_group, 'task_group')
+    os.remove(
+        os.path.join(
+            self.temp_dir.name, 'task_group' + checkpointer.DATA_SUFFIX
+        )
+    )
+
+    loaded_data = self.checkpointer.load(fields=['goal'])
+
+    self.assertEqual([{'goal': 'goal'}], loaded_data)
+
+  def test_load_data_fields(self) -> None:
+    """Tests if episode data is loaded when requested."""
+    task_group = [
+        {'goal': 'goal1', 'episode_data': {'step': [1]}},
+        {'goal': 'goal2', 'episode_data': {'step': [2]}},
+    ]
+    self.checkpointer.save_episodes(task_group, 'task_group')
+
+    self.assertEqual(task_group, self.checkpointer.load())
+    self.assertEqual(
+        [{'episode_data': {'step': [1]}}, {'episode_data': {'step': [2]}}],
+        self.checkpointer.load(fields=['episode_data']),
+    )
+
+  def test_load_legacy_files(self) -> None:
+    """Tests if task groups saved in the former format are loaded."""
+    legacy_group = [{'goal': 'legacy', 'episode_data': {'step': [1]}}]
+    with gzip.open(os.path.join(self.temp_dir.name, 'Task_0.pkl.gz'), 'wb') as f:
+      pickle.dump(legacy_group, f)
+    new_group = [{'goal': 'new', 'episode_data': {'step': [2]}}]
+    self.checkpointer.save_episodes(new_group, 'Task_1')
+
+    self.assertEqual(legacy_group + new_group, self.checkpointer.load())
+    self.assertEqual(
+        [{'goal': 'legacy'}, {'goal': 'new'}],
+        self.checkpointer.load(fields=['goal']),
+    )
+
+  def test_load_legacy_files_from_read_only_directory(self) -> None:
+    """Tests that a read-only legacy directory is indexed without a manifest."""
+    legacy_group = [{'goal': 'legacy'}]
+    with gzip.open(os.path.join(self.temp_dir.name, 'Task_0.pkl.gz'), 'wb') as f:
+      pickle.dump(legacy_group, f)
+
+    with mock.patch.object(
+        checkpointer, '_write_atomic', autospec=True
+    ) as write, mock.patch.object(os, 'access', return_value=False):
+      self.assertEqual(legacy_group, self.checkpointer.load())
+
+    write.assert_not_called()
+    self.assertNotIn(
+        checkpointer.MANIFEST_FILENAME, os.listdir(self.temp_dir.name)
+    )
+
+  def test_save_replaces_legacy_file(self) -> None:
+    """Tests if saving a task group replaces its file in the former format."""
+    with gzip.open(os.path.join(self.temp_dir.name, 'Task_0.pkl.gz'), 'wb') as f:
+      pickle.dump([{'goal': 'old'}], f)
+    self.checkpointer.save_episodes([{'goal': 'new'}], 'Task_0')
+
+    self.assertEqual([{'goal': 'new'}], self.checkpointer.load())
+
+  def test_screenshots_are_deduplicated(self) -> None:
+    """Tests that identical screenshots are stored once and load lazily."""
+    screenshot = np.full((64, 32, 3), 7, dtype=np.uint8)
+    for i in range(2):
+      self.checkpointer.save_episodes(
+          [{
+              'goal': 'goal',
+              'episode_data': {
+                  'raw_screenshot': [screenshot.copy(), screenshot.copy()]
+              },
+          }],
+          f'task_{i}',
+      )
+
+    frames_directory = os.path.join(
+        self.temp_dir.name, checkpointer.FRAMES_DIRECTORY
+    )
+    self.assertLen(os.listdir(frames_directory), 1)
+    for episode in self.checkpointer.load():
+      screenshots = episode['episode_data']['raw_screenshot']
+      self.assertLen(screenshots, 2)
+      np.testing.assert_array_equal(screenshots[1], screenshot)
+
+  def _read_manifest(self) -> list[dict[str, object]]:
+    with open(
+        os.path.join(self.temp_dir.name, checkpointer.MANIFEST_FILENAME)
+    ) as f:
+      return [json.loads(line) for line in f]
+
+  def test_save_appends_to_manifest(self) -> None:
+    """Tests that each save appends an entry to the manifest."""
+    self.checkpointer.save_episodes([{'exception_info': None}], 'Task_0')
+    self.checkpointer.save_episodes([{'exception_info': 'error'}], 'Task_1')
+
+    manifest = self._read_manifest()
+
+    self.assertEqual(
+        ['Task_0', 'Task_1'], [entry['task_name'] for entry in manifest]
+    )
+    self.assertEqual(
+        ['completed', 'failed'], [entry['status'] for entry in manifest]
+    )
+    self.assertEqual(0, manifest[0]['metadata_offset'])
+    self.assertEqual(
+        manifest[0]['metadata_size'], manifest[1]['metadata_offset']
+    )
+    self.assertEqual(
+        os.path.getsize(
+            os.path.join(self.temp_dir.name, manifest[1]['data_file'])
+        ),
+        manifest[1]['data_size'],
+    )
+
+  def test_load_reads_manifest_instead_of_listing(self) -> None:
+    """Tests that loading does not list the directory once indexed."""
+    self.checkpointer.save_episodes([{'goal': 'goal'}], 'Task_0')
+
+    with mock.patch.object(os, 'listdir', autospec=True) as listdir:
+      loaded_data = self.checkpointer.load(fields=['goal'])
+
+    listdir.assert_not_called()
+    self.assertEqual([{'goal': 'goal'}], loaded_data)
+
+  def test_load_skips_truncated_manifest_line(self) -> None:
+    """Tests that a manifest line cut short by a crash is skipped."""
+    self.checkpointer.save_episodes([{'goal': 'goal'}], 'Task_0')
+    with open(
+        os.path.join(self.temp_dir.name, checkpointer.MANIFEST_FILENAME), 'a'
+    ) as f:
+      f.write('{"task_name": "Task_1", "metad')
+
+    self.assertEqual([{'goal': 'goal'}], self.checkpointer.load())
+
+  def test_iter_task_groups(self) -> None:
+    """Tests that task groups are loaded one at a time, in run order."""
+    self.checkpointer.save_episodes([{'goal': 'b'}], 'Task_10')
+    self.checkpointer.save_episodes([{'goal': 'a'}, {'goal': 'c'}], 'Task_2')
+
+    entries = self.checkpointer.task_group_entries()
+    task_groups = list(self.checkpointer.iter_task_groups(entries[1:]))
+
+    self.assertEqual(['Task_2', 'Task_10'], [e['task_name'] for e in entries])
+    self.assertLen(task_groups, 1)
+    self.assertEqual(entries[1], task_groups[0][0])
+    self.assertEqual([{'goal': 'b'}], task_groups[0][1])
+
+  def test_load_metadata_files(self) -> None:
+    """Tests if task groups with their metadata in own files are loaded."""
+    with open(os.path.join(self.temp_dir.name, 'Task_0.meta.pkl'), 'wb') as f:
+      pickle.dump([{'goal': 'goal'}], f)
+    with gzip.open(
+        os.path.join(self.temp_dir.name, 'Task_0.data.pkl.gz'), 'wb'
+    ) as f:
+      pickle.dump([{'episode_data': {'step': [1]}}], f)
+
+    self.assertEqual(
+        [{'goal': 'goal', 'episode_data': {'step': [1]}}],
+        self.checkpointer.load(),
+    )
+    self.assertEqual(
+        [{'task_name': 'Task_0', 'metadata_file': 'Task_0.meta.pkl'}],
+        self._read_manifest(),
+    )
+
+
+class _BlockingCheckpointer(checkpointer.NullCheckpointer):
+  """Records saved task names; saving waits until `release` is set."""
+
+  def __init__(self) -> None:
+    super().__init__()
+    self.release = threading.Event()
+    self.saved = []
+
+  def save_episodes(self, task_episodes, task_name):
+    self.release.wait()
+    if task_name == 'bad':
+      raise ValueError('Cannot save.')
+    self.saved.append(task_name)
+
+
+class AsyncCheckpointerTest(absltest.TestCase):
+
+  def setUp(self) -> None:
+    super().setUp()
+    self.temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(self.temp_dir.cleanup)
+
+  def _async_checkpointer(self, *args, **kwargs):
+    """Creates an AsyncCheckpointer that is closed after the test."""
+    async_checkpointer = checkpointer.AsyncCheckpointer(*args, **kwargs)
+    self.addCleanup(async_checkpointer.close)
+    return async_checkpointer
+
+  def test_save_and_load(self) -> None:
+    """Tests that loading returns the episodes saved in the background."""
+    async_checkpointer = self._async_checkpointer(
+        checkpointer.IncrementalCheckpointer(self.temp_dir.name)
+    )
+    for i in range(5):
+      async_checkpointer.save_episodes([{'key': i}], f'task_{i}')
+
+    self.assertEqual(
+        [{'key': i} for i in range(5)], async_checkpointer.load()
+    )
+    self.assertNotIn('.tmp', ' '.join(os.listdir(self.temp_dir.name)))
+
+  def test_save_blocks_when_queue_is_full(self) -> None:
+    """Tests backpressure: saving waits while too many saves are pending."""
+    blocking = _BlockingCheckpointer()
+    async_checkpointer = self._async_checkpointer(blocking, max_pending=1)
+    async_checkpointer.save_episodes([], 'task_0')  # Taken by the writer.
+    async_checkpointer.save_episodes([], 'task_1')  # Pending.
+    third_saved = threading.Event()
+
+    def save_third():
+      async_checkpointer.save_episodes([], 'task_2')
+      third_saved.set()
+
+    threading.Thread(target=save_third, daemon=True).start()
+    self.assertFalse(third_saved.wait(0.2))
+
+    blocking.release.set()
+    self.assertTrue(third_saved.wait(5))
+    async_checkpointer.flush()
+    self.assertEqual(['task_0', 'task_1', 'task_2'], blocking.saved)
+
+  def test_failed_save_does_not_stop_writer(self) -> None:
+    """Tests that a failed save is raised by flush and later saves happen."""
+    blocking = _BlockingCheckpointer()
+    async_checkpointer = self._async_checkpointer(blocking)
+
+    async_checkpointer.save_episodes([], 'bad')
+    async_checkpointer.save_episodes([], 'good')
+    blocking.release.set()
+    with self.assertRaisesRegex(ValueError, 'Cannot save'):
+      async_checkpointer.flush()
+    async_checkpointer.flush()  # The error is raised once.
+
+    self.assertEqual(['good'], blocking.saved)
+
+  def test_failed_save_is_raised_by_next_call(self) -> None:
+    """Tests that the next save or load raises the error of a failed save."""
+    blocking = _BlockingCheckpointer()
+    blocking.release.set()
+    async_checkpointer = self._async_checkpointer(blocking)
+
+    async_checkpointer.save_episodes([], 'bad')
+    async_checkpointer._queue.join()  # Waits for the write without raising.
+    with self.assertRaisesRegex(ValueError, 'Cannot save'):
+      async_checkpointer.save_episodes([], 'task_1')
+    async_checkpointer.save_episodes([], 'bad')
+    with self.assertRaisesRegex(ValueError, 'Cannot save'):
+      async_checkpointer.load()
+
+  def test_close_writes_pending_episodes_and_restores_process_state(
+      self,
+  ) -> None:
+    """Tests that close stops the writer and undoes the constructor's hooks."""
+    sigint_handler = signal.getsignal(signal.SIGINT)
+    blocking = _BlockingCheckpointer()
+    with mock.patch.object(checkpointer, 'atexit') as mock_atexit:
+      async_checkpointer = checkpointer.AsyncCheckpointer(blocking)
+      self.assertEqual(
+          async_checkpointer._handle_sigint, signal.getsignal(signal.SIGINT)
+      )
+      async_checkpointer.save_episodes([], 'task_0')
+      threading.Timer(0.1, blocking.release.set).start()
+
+      async_checkpointer.close()
+      async_checkpointer.close()
+
+    self.assertEqual(['task_0'], blocking.saved)
+    self.assertFalse(async_checkpointer._writer.is_alive())
+    self.assertEqual(sigint_handler, signal.getsignal(signal.SIGINT))
+    mock_atexit.unregister.assert_called_once_with(
+        mock_atexit.register.call_args.args[0]
+    )
+    with self.assertRaises(ValueError):
+      async_checkpointer.save_episodes([], 'task_1')
+
+  def test_close_raises_write_error(self) -> None:
+    """Tests that close raises the error of a failed save."""
+    blocking = _BlockingCheckpointer()
+    blocking.release.set()
+    async_checkpointer = checkpointer.AsyncCheckpointer(blocking)
+    async_checkpointer.save_episodes([], 'bad')
+
+    with self.assertRaisesRegex(ValueError, 'Cannot save'):
+      async_checkpointer.close()
+
+  def test_sigint_interrupts_without_waiting(self) -> None:
+    """Tests that SIGINT interrupts at once; closing writes pending saves."""
+    blocking = _BlockingCheckpointer()
+    async_checkpointer = self._async_checkpointer(blocking)
+    async_checkpointer.save_episodes([], 'task_0')
+
+    with self.assertRaises(KeyboardInterrupt):
+      async_checkpointer._handle_sigint(signal.SIGINT, None)
+
+    self.assertEqual([], blocking.saved)
+    blocking.release.set()
+    async_checkpointer.close()
+    self.assertEqual(['task_0'], blocking.saved)
+
+  def test_second_sigint_abandons_pending_episodes(self) -> None:
+    """Tests that closing after a second SIGINT does not wait for the writer."""
+    blocking = _BlockingCheckpointer()
+    self.addCleanup(blocking.release.set)
+    async_checkpointer = self._async_checkpointer(blocking)
+    async_checkpointer.save_episodes([], 'task_0')
+
+    for _ in range(2):
+      with self.assertRaises(KeyboardInterrupt):
+        async_checkpointer._handle_sigint(signal.SIGINT, None)
+    async_checkpointer.close()
+
+    self.assertEqual([], blocking.saved)
+
 
 if __name__ == '__main__':
   absltest.main()
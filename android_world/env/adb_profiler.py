@@ -0,0 +1,450 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Profiling of the adb and gRPC calls made to the device.
+
+Device I/O goes through `execute_adb_call`, `step` and `reset` of the env
+wrapped by `AndroidWorldController`. `ProfilingEnv` wraps that env and records
+the command, argument signature, payload bytes and latency of every call in an
+`AdbProfiler`:
+
+  profiler = adb_profiler.AdbProfiler()
+  env.controller.enable_profiling(profiler)
+  with adb_profiler.call_site('initialize_task of ExpenseAddMultiple'):
+    task.initialize_task(env)
+  print(profiler.report())
+
+Calls are aggregated per call site, the label set by the innermost
+`call_site`, into latency histograms. Within a call site they are also broken
+down by command signature, e.g. "generic shell sqlite3", and by the function
+issuing them, e.g. "app_snapshot.restore_snapshot".
+"""
+
+import bisect
+from collections.abc import Iterator
+import contextlib
+import dataclasses
+import json
+import re
+import sys
+import threading
+import time
+from typing import Any
+import weakref
+
+from android_env import env_interface
+from android_env.proto import adb_pb2
+from android_env.wrappers import base_wrapper
+from android_world.utils import metrics
+import dm_env
+import numpy as np
+
+# Upper bounds of the latency histogram buckets, in seconds.
+LATENCY_BUCKETS_SEC = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+    float('inf'),
+)
+
+# Call site of calls made outside of any `call_site`.
+UNLABELED_CALL_SITE = 'unlabeled'
+
+# Modules whose frames are skipped when looking for the issuer of a call.
+_PLUMBING_MODULES = frozenset({
+    __name__,
+    'contextlib',
+    'android_world.env.adb_utils',
+    'android_world.env.android_world_controller',
+    'android_world.utils.file_utils',
+})
+_PLUMBING_PACKAGES = ('android_env.',)
+
+# Leading arguments of a generic adb command that make up its signature, e.g.
+# "shell am start"; paths, numbers and text end the signature.
+_SIGNATURE_ARG = re.compile(r'-{0,2}[A-Za-z][\w.-]*')
+_MAX_SIGNATURE_ARGS = 3
+
+_context = threading.local()
+# The ProfilingEnvs in use; `call_site` is a no-op without any. Envs that are
+# closed, unwrapped or no longer referenced drop out.
+_profiling_envs = weakref.WeakSet()
+_NULL_CALL_SITE = contextlib.nullcontext()
+
+
+@dataclasses.dataclass
+class CallStats:
+  """Aggregated latency and payload of a group of calls."""
+
+  count: int = 0
+  errors: int = 0
+  total_sec: float = 0.0
+  max_sec: float = 0.0
+  request_bytes: int = 0
+  response_bytes: int = 0
+  histogram: list[int] = dataclasses.field(
+      default_factory=lambda: [0] * len(LATENCY_BUCKETS_SEC)
+  )
+
+  def add(
+      self,
+      latency_sec: float,
+      request_bytes: int,
+      response_bytes: int,
+      ok: bool,
+  ) -> None:
+    self.count += 1
+    self.errors += not ok
+    self.total_sec += latency_sec
+    self.max_sec = max(self.max_sec, latency_sec)
+    self.request_bytes += request_bytes
+    self.response_bytes += response_bytes
+    self.histogram[bisect.bisect_left(LATENCY_BUCKETS_SEC, latency_sec)] += 1
+
+  @property
+  def mean_sec(self) -> float:
+    return self.total_sec / self.count if self.count else 0.0
+
+  def quantile_sec(self, q: float) -> float:
+    """Returns an upper bound of the q-quantile latency, from the histogram."""
+    rank = q * self.count
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS_SEC, self.histogram):
+      seen += count
+      if seen >= rank and seen:
+        return min(bound, self.max_sec)
+    return self.max_sec
+
+  def to_dict(self) -> dict[str, Any]:
+    return {
+        'count': self.count,
+        'errors': self.errors,
+        'total_sec': round(self.total_sec, 4),
+        'mean_sec': round(self.mean_sec, 4),
+        'max_sec': round(self.max_sec, 4),
+        'request_bytes': self.request_bytes,
+        'response_bytes': self.response_bytes,
+        'histogram': {
+            f'le_{bound:g}': count
+            for bound, count in zip(LATENCY_BUCKETS_SEC, self.histogram)
+        },
+    }
+
+
+@dataclasses.dataclass
+class CallSiteStats:
+  """Calls of a call site, overall and by signature and by issuer."""
+
+  overall: CallStats = dataclasses.field(default_factory=CallStats)
+  by_signature: dict[str, CallStats] = dataclasses.field(default_factory=dict)
+  by_issuer: dict[str, CallStats] = dataclasses.field(default_factory=dict)
+
+
+class AdbProfiler:
+  """Aggregates the calls recorded by `ProfilingEnv`s, from any thread."""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.call_sites: dict[str, CallSiteStats] = {}
+
+  def record(
+      self,
+      signature: str,
+      latency_sec: float,
+      request_bytes: int = 0,
+      response_bytes: int = 0,
+      ok: bool = True,
+      call_site_label: str | None = None,
+      issuer: str = '',
+  ) -> None:
+    """Records a call.
+
+    Args:
+      signature: The command and its leading arguments, e.g. "generic shell am
+        start".
+      latency_sec: Duration of the call.
+      request_bytes: Serialized size of the request.
+      response_bytes: Serialized size of the response.
+      ok: Whether the call succeeded.
+      call_site_label: The call site; the current thread's if unset.
+      issuer: The function that issued the call.
+    """
+    if call_site_label is None:
+      call_site_label = current_call_site()
+    args = (latency_sec, request_bytes, response_bytes, ok)
+    with self._lock:
+      stats = self.call_sites.get(call_site_label)
+      if stats is None:
+        stats = self.call_sites[call_site_label] = CallSiteStats()
+      stats.overall.add(*args)
+      stats.by_signature.setdefault(signature, CallStats()).add(*args)
+      if issuer:
+        stats.by_issuer.setdefault(issuer, CallStats()).add(*args)
+
+  def ranked_call_sites(self) -> list[tuple[str, CallSiteStats]]:
+    """Returns the call sites, most expensive first."""
+    with self._lock:
+      items = list(self.call_sites.items())
+    return sorted(items, key=lambda item: -item[1].overall.total_sec)
+
+  def report(self, top_n: int = 20, top_n_breakdown: int = 3) -> str:
+    """Returns a report of the most expensive call sites.
+
+    Args:
+      top_n: Number of call sites listed.
+      top_n_breakdown: Number of signatures and issuers listed per call site.
+
+    Returns:
+      E.g. "initialize_task of ExpenseAddMultiple: 42 calls, 7.3 s", followed
+      by the latency percentiles and the costliest signatures and issuers.
+    """
+    ranked = self.ranked_call_sites()
+    total_count = sum(stats.overall.count for _, stats in ranked)
+    total_sec = sum(stats.overall.total_sec for _, stats in ranked)
+    lines = [
+        f'Device calls: {total_count} calls, {total_sec:.1f} s in'
+        f' {len(ranked)} call sites.'
+    ]
+    for rank, (label, stats) in enumerate(ranked[:top_n], start=1):
+      overall = stats.overall
+      share = overall.total_sec / total_sec if total_sec else 0.0
+      lines.append(
+          f'{rank:>3}. {label}: {overall.count} calls,'
+          f' {overall.total_sec:.1f} s ({share:.0%});'
+          f' p50 {_format_sec(overall.quantile_sec(0.5))},'
+          f' p90 {_format_sec(overall.quantile_sec(0.9))},'
+          f' max {_format_sec(overall.max_sec)};'
+          f' {_format_bytes(overall.request_bytes)} sent,'
+          f' {_format_bytes(overall.response_bytes)} received'
+          + (f'; {overall.errors} errors' if overall.errors else '')
+      )
+      for title, breakdown in (
+          ('by command', stats.by_signature),
+          ('by issuer', stats.by_issuer),
+      ):
+        costliest = sorted(
+            breakdown.items(), key=lambda item: -item[1].total_sec
+        )[:top_n_breakdown]
+        for name, call_stats in costliest:
+          lines.append(
+              f'       {title}: {name}: {call_stats.count} calls,'
+              f' {call_stats.total_sec:.2f} s'
+          )
+    return '\n'.join(lines)
+
+  def to_dict(self) -> dict[str, Any]:
+    """Returns the statistics of all call sites, most expensive first."""
+    return {
+        label: {
+            'overall': stats.overall.to_dict(),
+            'by_signature': {
+                name: call_stats.to_dict()
+                for name, call_stats in stats.by_signature.items()
+            },
+            'by_issuer': {
+                name: call_stats.to_dict()
+                for name, call_stats in stats.by_issuer.items()
+            },
+        }
+        for label, stats in self.ranked_call_sites()
+    }
+
+  def write_json(self, path: str) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+      json.dump(self.to_dict(), f, indent=2)
+
+
+class MetricsRecorder:
+  """Observes the latency of every call in `metrics.ADB_LATENCY`."""
+
+  def record(self, signature: str, latency_sec: float, **unused_kwargs):
+    metrics.ADB_LATENCY.observe(latency_sec, command=signature)
+
+
+def _format_sec(seconds: float) -> str:
+  if seconds < 1.0:
+    return f'{seconds * 1000:.0f} ms'
+  return f'{seconds:.1f} s'
+
+
+def _format_bytes(num_bytes: int) -> str:
+  for unit in ('B', 'KB', 'MB'):
+    if num_bytes < 1024:
+      return f'{num_bytes:.0f} {unit}'
+    num_bytes /= 1024
+  return f'{num_bytes:.1f} GB'
+
+
+@contextlib.contextmanager
+def _push_call_site(label: str) -> Iterator[None]:
+  stack = getattr(_context, 'call_sites', None)
+  if stack is None:
+    stack = _context.call_sites = []
+  stack.append(label)
+  try:
+    yield
+  finally:
+    stack.pop()
+
+
+def call_site(label: str) -> contextlib.AbstractContextManager[None]:
+  """Attributes the device calls of the current thread to a call site.
+
+  Without a `ProfilingEnv` in use, this returns a shared no-op context manager.
+
+  Args:
+    label: The call site, e.g. "initialize_task of ExpenseAddMultiple".
+
+  Returns:
+    A context manager; call sites nest, the innermost one wins.
+  """
+  if not _profiling_envs:
+    return _NULL_CALL_SITE
+  return _push_call_site(label)
+
+
+def current_call_site() -> str:
+  stack = getattr(_context, 'call_sites', None)
+  return stack[-1] if stack else UNLABELED_CALL_SITE
+
+
+def adb_signature(request: adb_pb2.AdbRequest) -> str:
+  """Returns the command of a request and its leading arguments.
+
+  Arguments that vary between calls, e.g. paths, numbers and text, are left
+  out so that calls of the same kind share a signature.
+
+  Args:
+    request: The adb request.
+
+  Returns:
+    E.g. "generic shell input tap" or "push". At most three arguments are kept,
+    so that e.g. typed words never end up in the signature.
+  """
+  command = request.WhichOneof('command') or 'unknown'
+  if command != 'generic':
+    return command
+  args = []
+  for arg in request.generic.args[:_MAX_SIGNATURE_ARGS]:
+    if not _SIGNATURE_ARG.fullmatch(arg):
+      break
+    args.append(arg)
+  return ' '.join([command] + args)
+
+
+def _issuer(frame) -> str:
+  """Returns the first function up the stack that is not adb plumbing."""
+  while frame is not None:
+    module = frame.f_globals.get('__name__', '')
+    if module not in _PLUMBING_MODULES and not module.startswith(
+        _PLUMBING_PACKAGES
+    ):
+      return f'{module.rsplit(".", 1)[-1]}.{frame.f_code.co_qualname}'
+    frame = frame.f_back
+  return ''
+
+
+def _payload_bytes(value: Any) -> int:
+  """Returns the size of the arrays and protos in a timestep or extras."""
+  if isinstance(value, dm_env.TimeStep):
+    value = value.observation
+  if isinstance(value, dict):
+    return sum(_payload_bytes(item) for item in value.values())
+  if hasattr(value, 'ByteSize'):
+    return value.ByteSize()
+  if isinstance(value, np.ndarray) and value.dtype != object:
+    return value.nbytes
+  if isinstance(value, (list, tuple, np.ndarray)):
+    return sum(_payload_bytes(item) for item in value)
+  return 0
+
+
+def unwrap(env: env_interface.AndroidEnvInterface) -> Any:
+  """Removes the outer `ProfilingEnv`s of an env.
+
+  Args:
+    env: An env, possibly wrapped by `ProfilingEnv`s.
+
+  Returns:
+    The env below the outer `ProfilingEnv`s, which stop counting as in use.
+  """
+  while isinstance(env, ProfilingEnv):
+    _profiling_envs.discard(env)
+    env = env._env  # pylint: disable=protected-access
+  return env
+
+
+class ProfilingEnv(base_wrapper.BaseWrapper):
+  """Records the latency of every adb call, step and reset of an env."""
+
+  def __init__(
+      self,
+      env: env_interface.AndroidEnvInterface,
+      profiler: AdbProfiler | MetricsRecorder,
+  ):
+    super().__init__(env)
+    self._profiler = profiler
+    _profiling_envs.add(self)
+
+  def close(self) -> None:
+    _profiling_envs.discard(self)
+    super().close()
+
+  def execute_adb_call(
+      self, adb_call: adb_pb2.AdbRequest
+  ) -> adb_pb2.AdbResponse:
+    issuer = _issuer(sys._getframe(1))  # pylint: disable=protected-access
+    start = time.perf_counter()
+    response = None
+    try:
+      response = self._env.execute_adb_call(adb_call)
+      return response
+    finally:
+      self._profiler.record(
+          adb_signature(adb_call),
+          time.perf_counter() - start,
+          request_bytes=adb_call.ByteSize(),
+          response_bytes=response.ByteSize() if response is not None else 0,
+          ok=(
+              response is not None
+              and response.status == adb_pb2.AdbResponse.Status.OK
+          ),
+          issuer=issuer,
+      )
+
+  def _timed(self, signature: str, fn, *args) -> Any:
+    issuer = _issuer(sys._getframe(2))  # pylint: disable=protected-access
+    start = time.perf_counter()
+    result = None
+    try:
+      result = fn(*args)
+      return result
+    finally:
+      self._profiler.record(
+          signature,
+          time.perf_counter() - start,
+          response_bytes=_payload_bytes(result),
+          ok=result is not None,
+          issuer=issuer,
+      )
+
+  def reset(self) -> dm_env.TimeStep:
+    return self._timed('grpc reset', self._env.reset)
+
+  def step(self, action: Any) -> dm_env.TimeStep:
+    return self._timed('grpc step', self._env.step, action)
+
+  def accumulate_new_extras(self) -> dict[str, Any]:
+    """Fetches the latest a11y tree from the a11y forwarder app."""
+    return self._timed(
+        'grpc accumulate_new_extras', self._env.accumulate_new_extras
+    )
@@ -0,0 +1,254 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import tempfile
+from unittest import mock
+import weakref
+
+from absl.testing import absltest
+from android_env import env_interface
+from android_env.proto import adb_pb2
+from android_world.env import adb_profiler
+from android_world.env import adb_utils
+from android_world.env import android_world_controller
+from android_world.utils import metrics
+import dm_env
+import numpy as np
+
+
+def _helper_issuing_calls(env, num_calls):
+  for _ in range(num_calls):
+    adb_utils.issue_generic_request(['shell', 'input', 'tap', '1', '2'], env)
+
+
+class AdbProfilerTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    mock.patch.object(
+        adb_profiler, '_profiling_envs', weakref.WeakSet()
+    ).start()
+    self.addCleanup(mock.patch.stopall)
+    self.base_env = mock.create_autospec(env_interface.AndroidEnvInterface)
+    self.base_env.execute_adb_call.return_value = adb_pb2.AdbResponse(
+        status=adb_pb2.AdbResponse.Status.OK
+    )
+    self.profiler = adb_profiler.AdbProfiler()
+    self.env = adb_profiler.ProfilingEnv(self.base_env, self.profiler)
+
+  def test_adb_signature(self):
+    self.assertEqual(
+        adb_profiler.adb_signature(
+            adb_pb2.AdbRequest(
+                generic=adb_pb2.AdbRequest.GenericRequest(
+                    args=['shell', 'am', 'start', '-n', 'com.app/.Main']
+                )
+            )
+        ),
+        'generic shell am start',
+    )
+    self.assertEqual(
+        adb_profiler.adb_signature(
+            adb_pb2.AdbRequest(
+                generic=adb_pb2.AdbRequest.GenericRequest(
+                    args=['shell', 'sqlite3', '/data/app.db', 'SELECT 1']
+                )
+            )
+        ),
+        'generic shell sqlite3',
+    )
+    self.assertEqual(
+        adb_profiler.adb_signature(
+            adb_pb2.AdbRequest(
+                push=adb_pb2.AdbRequest.Push(content=b'abc', path='/sdcard/a')
+            )
+        ),
+        'push',
+    )
+
+  def test_records_per_call_site(self):
+    with adb_profiler.call_site('initialize_task of TaskA'):
+      _helper_issuing_calls(self.env, 3)
+      with adb_profiler.call_site('nested'):
+        _helper_issuing_calls(self.env, 1)
+    _helper_issuing_calls(self.env, 2)
+
+    sites = self.profiler.call_sites
+    self.assertCountEqual(
+        [
+            'initialize_task of TaskA',
+            'nested',
+            adb_profiler.UNLABELED_CALL_SITE,
+        ],
+        sites,
+    )
+    task_site = sites['initialize_task of TaskA']
+    self.assertEqual(task_site.overall.count, 3)
+    self.assertEqual(sum(task_site.overall.histogram), 3)
+    self.assertEqual(task_site.overall.errors, 0)
+    self.assertGreater(task_site.overall.request_bytes, 0)
+    self.assertEqual(list(task_site.by_signature), ['generic shell input tap'])
+    self.assertEqual(
+        list(task_site.by_issuer), ['adb_profiler_test._helper_issuing_calls']
+    )
+    self.assertEqual(sites['nested'].overall.count, 1)
+    self.assertEqual(sites[adb_profiler.UNLABELED_CALL_SITE].overall.count, 2)
+
+  def test_records_failures(self):
+    self.base_env.execute_adb_call.side_effect = [
+        adb_pb2.AdbResponse(
+            status=adb_pb2.AdbResponse.Status.FAILED_PRECONDITION
+        ),
+        RuntimeError('device lost'),
+    ]
+
+    self.env.execute_adb_call(adb_pb2.AdbRequest())
+    with self.assertRaises(RuntimeError):
+      self.env.execute_adb_call(adb_pb2.AdbRequest())
+
+    overall = self.profiler.call_sites[
+        adb_profiler.UNLABELED_CALL_SITE
+    ].overall
+    self.assertEqual(overall.count, 2)
+    self.assertEqual(overall.errors, 2)
+
+  def test_step_records_observation_bytes(self):
+    pixels = np.zeros((10, 20, 3), dtype=np.uint8)
+    self.base_env.step.return_value = dm_env.transition(
+        reward=0.0, observation={'pixels': pixels}
+    )
+
+    with adb_profiler.call_site('run_episode of TaskA'):
+      self.env.step({})
+
+    stats = self.profiler.call_sites['run_episode of TaskA'].by_signature[
+        'grpc step'
+    ]
+    self.assertEqual(stats.count, 1)
+    self.assertEqual(stats.response_bytes, pixels.nbytes)
+
+  def test_report_ranks_call_sites(self):
+    self.profiler.record('push', 0.5, call_site_label='cheap')
+    for _ in range(4):
+      self.profiler.record(
+          'generic shell sqlite3', 2.0, call_site_label='expensive'
+      )
+
+    report = self.profiler.report().splitlines()
+
+    self.assertEqual(report[0], 'Device calls: 5 calls, 8.5 s in 2 call sites.')
+    self.assertTrue(
+        report[1].startswith('  1. expensive: 4 calls, 8.0 s (94%)')
+    )
+    self.assertIn('p50 2.0 s', report[1])
+    self.assertIn('by command: generic shell sqlite3: 4 calls', report[2])
+    self.assertTrue(report[3].startswith('  2. cheap: 1 calls, 0.5 s'))
+
+  def test_write_json(self):
+    self.profiler.record('push', 0.02, request_bytes=10, call_site_label='a')
+    path = os.path.join(tempfile.mkdtemp(), 'adb_profile.json')
+
+    self.profiler.write_json(path)
+
+    with open(path) as f:
+      profile = json.load(f)
+    self.assertEqual(profile['a']['overall']['request_bytes'], 10)
+    self.assertEqual(
+        profile['a']['by_signature']['push']['histogram']['le_0.025'], 1
+    )
+
+  def test_quantiles(self):
+    stats = adb_profiler.CallStats()
+    for latency in (0.001, 0.002, 0.3, 4.0):
+      stats.add(latency, 0, 0, True)
+
+    self.assertEqual(stats.quantile_sec(0.5), 0.005)
+    self.assertEqual(stats.quantile_sec(0.75), 0.5)
+    self.assertEqual(stats.quantile_sec(1.0), 4.0)
+
+  def test_controller_enable_profiling(self):
+    controller = android_world_controller.AndroidWorldController(
+        self.base_env, a11y_method=android_world_controller.A11yMethod.NONE
+    )
+
+    controller.enable_profiling(self.profiler)
+    adb_utils.issue_generic_request(['shell', 'ls'], controller.env)
+    adb_utils.issue_generic_request(['shell', 'ls'], controller)
+
+    stats = self.profiler.call_sites[adb_profiler.UNLABELED_CALL_SITE]
+    self.assertEqual(stats.by_signature['generic shell ls'].count, 2)
+
+  def test_call_site_is_no_op_once_profiling_stops(self):
+    self.assertIsNot(
+        adb_profiler.call_site('a'), adb_profiler._NULL_CALL_SITE
+    )
+
+    self.env.close()
+
+    self.assertIs(adb_profiler.call_site('a'), adb_profiler._NULL_CALL_SITE)
+    self.base_env.close.assert_called_once()
+
+  def test_controller_disable_profiling(self):
+    self.env.close()
+    controller = android_world_controller.AndroidWorldController(
+        self.base_env, a11y_method=android_world_controller.A11yMethod.NONE
+    )
+    controller.enable_profiling(self.profiler)
+    controller.enable_profiling(adb_profiler.MetricsRecorder())
+
+    controller.disable_profiling()
+    adb_utils.issue_generic_request(['shell', 'ls'], controller)
+
+    self.assertIs(controller.env, self.base_env)
+    self.assertIs(adb_profiler.call_site('a'), adb_profiler._NULL_CALL_SITE)
+    self.assertEmpty(self.profiler.call_sites)
+
+  def test_refresh_env_replaces_profiling_envs(self):
+    self.env.close()
+    controller = android_world_controller.AndroidWorldController(
+        self.base_env, a11y_method=android_world_controller.A11yMethod.NONE
+    )
+    controller.enable_profiling(self.profiler)
+    lost_env = controller.env
+    self.base_env._coordinator = mock.MagicMock()
+    new_base_env = mock.create_autospec(env_interface.AndroidEnvInterface)
+
+    with mock.patch.object(
+        android_world_controller, 'get_controller'
+    ) as mock_get_controller:
+      mock_get_controller.return_value.env = new_base_env
+      controller.refresh_env()
+
+    self.assertEqual(list(adb_profiler._profiling_envs), [controller.env])
+    self.assertNotIn(lost_env, adb_profiler._profiling_envs)
+    self.assertIs(adb_profiler.unwrap(controller.env), new_base_env)
+
+  def test_metrics_recorder(self):
+    before = metrics.ADB_LATENCY.count(command='generic shell input tap')
+    env = adb_profiler.ProfilingEnv(
+        self.base_env, adb_profiler.MetricsRecorder()
+    )
+
+    _helper_issuing_calls(env, 2)
+
+    self.assertEqual(
+        metrics.ADB_LATENCY.count(command='generic shell input tap'),
+        before + 2,
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -28,6 +28,7 @@ from android_env.components import config_classes
 from android_env.proto.a11y import android_accessibility_forest_pb2
 from android_env.wrappers import a11y_grpc_wrapper
 from android_env.wrappers import base_wrapper
+from android_world.env import adb_profiler
 from android_world.env import adb_utils
 from android_world.env import representation_utils
 from android_world.utils import file_utils
@@ -174,6 +175,7 @@ class AndroidWorldController(base_wrapper.BaseWrapper):
     else:
       self._env = env
     self._a11y_method = a11y_method
+    self._profilers = []
 
   @property
   def device_screen_size(self) -> tuple[int, int]:
@@ -193,15 +195,32 @@ class AndroidWorldController(base_wrapper.BaseWrapper):
   def env(self) -> env_interface.AndroidEnvInterface:
     return self._env
 
+  def enable_profiling(
+      self, profiler: adb_profiler.AdbProfiler | adb_profiler.MetricsRecorder
+  ) -> None:
+    """Records the adb calls, steps and resets of the device in `profiler`."""
+    self._profilers.append(profiler)
+    self._env = adb_profiler.ProfilingEnv(self._env, profiler)
+
+  def disable_profiling(self) -> None:
+    """Stops recording the device calls in the profilers enabled so far."""
+    self._profilers.clear()
+    self._env = adb_profiler.unwrap(self._env)
+
   def refresh_env(self):
     # pylint: disable=protected-access
     # pytype: disable=attribute-error
     # Reconnect to emulator and reload a11y wrapper in case we lose connection.
+    lost_env = self._env
     self._env = get_controller(
         console_port=self.env._coordinator._simulator._config.emulator_launcher.emulator_console_port,
         adb_path=self.env._coordinator._simulator._config.adb_controller.adb_path,
         grpc_port=self.env._coordinator._simulator._config.emulator_launcher.grpc_port,
     ).env
+    # The profiling wrappers of the lost connection are replaced by new ones.
+    adb_profiler.unwrap(lost_env)
+    for profiler in self._profilers:
+      self._env = adb_profiler.ProfilingEnv(self._env, profiler)
     # pylint: enable=protected-access
     # pytype: enable=attribute-error
 
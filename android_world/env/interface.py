@@ -26,6 +26,8 @@ from android_world.env import adb_utils
 from android_world.env import android_world_controller
 from android_world.env import json_action
 from android_world.env import representation_utils
+from android_world.utils import metrics
+from android_world.utils import tracing
 import dm_env
 import numpy as np
 
@@ -235,10 +237,14 @@ class AsyncAndroidEnv(AsyncEnv):
       adb_utils.press_home_button(self.controller)
     self.interaction_cache = ''
 
-    return _process_timestep(self.controller.reset())
+    with tracing.span('env.reset'):
+      return _process_timestep(self.controller.reset())
 
   def _get_state(self):
-    return _process_timestep(self.controller.step(_get_no_op_action()))
+    with tracing.span('env.get_state'):
+      state = _process_timestep(self.controller.step(_get_no_op_action()))
+    metrics.SCREENSHOT_BYTES.observe(state.pixels.nbytes)
+    return state
 
   def _get_stable_state(
       self,
@@ -291,7 +297,11 @@ class AsyncAndroidEnv(AsyncEnv):
 
   def get_state(self, wait_to_stabilize: bool = False) -> State:
     if wait_to_stabilize:
-      return self._get_stable_state()
+      with (
+          tracing.span('env.wait_to_stabilize'),
+          metrics.STABILIZATION_WAIT.time(),
+      ):
+        return self._get_stable_state()
     return self._get_state()
 
   def execute_action(self, action: json_action.JSONAction) -> None:
@@ -303,13 +313,14 @@ class AsyncAndroidEnv(AsyncEnv):
     if action.action_type == json_action.STATUS:
       # Do nothing if it is a termination action.
       return
-    state = self.get_state(wait_to_stabilize=False)
-    actuation.execute_adb_action(
-        action,
-        state.ui_elements,
-        self.logical_screen_size,
-        self.controller,
-    )
+    with tracing.span('env.execute_action'):
+      state = self.get_state(wait_to_stabilize=False)
+      actuation.execute_adb_action(
+          action,
+          state.ui_elements,
+          self.logical_screen_size,
+          self.controller,
+      )
 
   def hide_automation_ui(self) -> None:
     """Hides the coordinates on screen."""
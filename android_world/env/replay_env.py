@@ -0,0 +1,188 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Environment that replays recorded states instead of driving a device."""
+
+import time
+from typing import Any
+
+from android_env.proto import adb_pb2
+from android_world.env import interface
+from android_world.env import json_action
+import numpy as np
+
+
+def states_from_episode(
+    episode_data: dict[str, list[Any]],
+) -> list[interface.State]:
+  """Extracts the observed states of a recorded M3A or T3A episode.
+
+  Args:
+    episode_data: The `episode_data` of an episode.
+
+  Returns:
+    One state per step, in order.
+  """
+  for pixels_key, elements_key in (
+      ('raw_screenshot', 'before_ui_elements'),  # M3A.
+      ('before_screenshot', 'before_element_list'),  # T3A.
+  ):
+    if pixels_key in episode_data and elements_key in episode_data:
+      return [
+          interface.State(pixels=pixels, forest=None, ui_elements=elements)
+          for pixels, elements in zip(
+              episode_data[pixels_key], episode_data[elements_key]
+          )
+          if pixels is not None and elements is not None
+      ]
+  return []
+
+
+def synthetic_states(
+    num_states: int = 1,
+    screen_size: tuple[int, int] = (1080, 2400),
+) -> list[interface.State]:
+  """Returns blank states with no UI elements."""
+  width, height = screen_size
+  return [
+      interface.State(
+          pixels=np.zeros((height, width, 3), dtype=np.uint8),
+          forest=None,
+          ui_elements=[],
+      )
+      for _ in range(num_states)
+  ]
+
+
+class ReplayController:
+  """Stands in for the device controller of a `ReplayEnv`.
+
+  Answers the adb queries agents make about the screen (frame boundary and
+  orientation) from the replayed states; every other adb call fails, as there
+  is no device.
+  """
+
+  def __init__(self, env: 'ReplayEnv'):
+    self._env = env
+
+  def execute_adb_call(
+      self, request: adb_pb2.AdbRequest
+  ) -> adb_pb2.AdbResponse:
+    command = ' '.join(request.generic.args)
+    if 'dumpsys input' in command:
+      width, height = self._env.logical_screen_size
+      output = f'physicalFrame=[0, 0, {width}, {height}]'
+    elif 'dumpsys window' in command:
+      output = 'mCurrentRotation=ROTATION_0'
+    else:
+      return adb_pb2.AdbResponse(
+          status=adb_pb2.AdbResponse.Status.FAILED_PRECONDITION,
+          error_message=f'ReplayEnv has no device to run: {command}',
+      )
+    return adb_pb2.AdbResponse(
+        status=adb_pb2.AdbResponse.Status.OK,
+        generic=adb_pb2.AdbResponse.GenericResponse(output=output.encode()),
+    )
+
+
+class ReplayEnv(interface.AsyncEnv):
+  """Serves a fixed sequence of states; each action advances to the next one.
+
+  Useful to benchmark agents without a device. Actions are recorded but have no
+  effect. The controller only answers screen geometry queries (see
+  `ReplayController`), and questions to the user are never answered.
+  """
+
+  interaction_cache = ''
+
+  def __init__(
+      self,
+      states: list[interface.State],
+      action_latency_sec: float = 0.0,
+  ):
+    """Initializes the environment.
+
+    Args:
+      states: States to serve, cycled when the end is reached.
+      action_latency_sec: Simulated time to execute an action.
+    """
+    if not states:
+      raise ValueError('At least one state is required.')
+    self._states = states
+    self._index = 0
+    self._action_latency_sec = action_latency_sec
+    self.actions = []
+    self.interaction_cache = ''
+    self._controller = ReplayController(self)
+
+  @property
+  def controller(self) -> ReplayController:
+    return self._controller
+
+  def reset(self, go_home: bool = False) -> interface.State:
+    del go_home
+    self._index = 0
+    self.actions = []
+    self.interaction_cache = ''
+    return self.get_state()
+
+  def get_state(self, wait_to_stabilize: bool = False) -> interface.State:
+    del wait_to_stabilize
+    return self._states[self._index % len(self._states)]
+
+  def ask_question(
+      self, question: str, timeout_seconds: float = -1.0
+  ) -> str | None:
+    """Returns None: there is no user to answer."""
+    del question, timeout_seconds
+    return None
+
+  def execute_action(self, action: json_action.JSONAction) -> None:
+    self.actions.append(action)
+    if action.action_type == json_action.ANSWER:
+      self.interaction_cache = action.text
+      return
+    if action.action_type == json_action.STATUS:
+      return
+    if self._action_latency_sec:
+      time.sleep(self._action_latency_sec)
+    self._index += 1
+
+  @property
+  def foreground_activity_name(self) -> str:
+    return ''
+
+  @property
+  def device_screen_size(self) -> tuple[int, int]:
+    return self.logical_screen_size
+
+  @property
+  def logical_screen_size(self) -> tuple[int, int]:
+    height, width = self.get_state().pixels.shape[:2]
+    return (width, height)
+
+  def close(self) -> None:
+    pass
+
+  def hide_automation_ui(self) -> None:
+    pass
+
+  @property
+  def orientation(self) -> int:
+    return 0
+
+  @property
+  def physical_frame_boundary(self) -> tuple[int, int, int, int]:
+    width, height = self.logical_screen_size
+    return (0, 0, width, height)
@@ -0,0 +1,71 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from absl.testing import absltest
+from android_env.proto import adb_pb2
+from android_world.env import adb_utils
+from android_world.env import json_action
+from android_world.env import replay_env
+import numpy as np
+
+
+class ReplayEnvTest(absltest.TestCase):
+
+  def test_actions_advance_states(self):
+    states = replay_env.synthetic_states(2, screen_size=(20, 40))
+    env = replay_env.ReplayEnv(states)
+
+    self.assertIs(env.reset(), states[0])
+    self.assertEqual(env.logical_screen_size, (20, 40))
+    env.execute_action(json_action.JSONAction(action_type=json_action.WAIT))
+    self.assertIs(env.get_state(), states[1])
+    env.execute_action(
+        json_action.JSONAction(action_type=json_action.ANSWER, text='42')
+    )
+    self.assertIs(env.get_state(), states[1])
+    self.assertEqual(env.interaction_cache, '42')
+    env.execute_action(json_action.JSONAction(action_type=json_action.WAIT))
+    self.assertIs(env.get_state(), states[0])
+    self.assertLen(env.actions, 3)
+
+  def test_states_from_episode(self):
+    pixels = np.zeros((4, 4, 3), np.uint8)
+
+    states = replay_env.states_from_episode({
+        'before_screenshot': [pixels, pixels],
+        'before_element_list': [[], None],
+    })
+
+    self.assertLen(states, 1)
+    self.assertIs(states[0].pixels, pixels)
+    self.assertEmpty(replay_env.states_from_episode({}))
+
+  def test_controller_answers_screen_queries(self):
+    env = replay_env.ReplayEnv(
+        replay_env.synthetic_states(screen_size=(20, 40))
+    )
+
+    self.assertEqual(
+        adb_utils.get_physical_frame_boundary(env.controller), (0, 0, 20, 40)
+    )
+    self.assertEqual(adb_utils.get_orientation(env.controller), 0)
+    self.assertNotEqual(
+        adb_utils.issue_generic_request(['shell', 'ls'], env.controller).status,
+        adb_pb2.AdbResponse.Status.OK,
+    )
+    self.assertIsNone(env.ask_question('Which one?', timeout_seconds=1))
+
+
+if __name__ == '__main__':
+  absltest.main()
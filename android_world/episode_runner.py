@@ -18,7 +18,11 @@ import dataclasses
 from typing import Any, Callable, Optional
 from android_world import constants
 from android_world.agents import base_agent
+from android_world.agents import llm_retry
+from android_world.agents import llm_scheduler
 from android_world.env import interface
+from android_world.utils import metrics
+from android_world.utils import tracing
 import termcolor
 
 
@@ -46,6 +50,7 @@ def run_episode(
     start_on_home_screen: bool = False,
     termination_fn: Callable[[interface.AsyncEnv], float] | None = None,
     print_fn: Callable[[str], None] = print,
+    step_deadline_sec: float | None = None,
 ) -> EpisodeResult:
   """Runs an agent on goal, e.g., "turn off wifi".
 
@@ -64,6 +69,8 @@ def run_episode(
       For example, for MiniWoB++ tasks, the episode should terminate if there is
       a nonzero reward.
     print_fn: A function to print log messages to the console or logger.
+    step_deadline_sec: If provided, LLM calls of a step stop retrying once the
+      step has run for this long, so that the step fails fast.
 
   Returns:
     Data collected during running agent on goal.
@@ -73,12 +80,20 @@ def run_episode(
   if termination_fn is None:
     termination_fn = lambda env: False
 
-  agent.reset(start_on_home_screen)
+  with tracing.span('agent.reset'):
+    agent.reset(start_on_home_screen)
   agent.set_max_steps(max_n_steps)
 
   output = []
   for step_n in range(max_n_steps):
-    result = agent.step(goal)
+    # Lets a shared LLM scheduler favor episodes that are about to finish.
+    with (
+        llm_scheduler.steps_remaining(max_n_steps - step_n),
+        llm_retry.deadline(step_deadline_sec),
+        tracing.span('agent.step'),
+        metrics.STEP_LATENCY.time(),
+    ):
+      result = agent.step(goal)
     print_fn('Completed step {:d}.'.format(step_n + 1))
     assert constants.STEP_NUMBER not in result.data
     output.append(result.data | {constants.STEP_NUMBER: step_n})
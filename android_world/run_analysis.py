@@ -0,0 +1,341 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Offline analysis of finished or running runs, from their checkpoints.
+
+Only the episodes' metadata is read, by a pool of worker processes, and the
+metadata is cached in a sidecar index in each checkpoint directory. Analyzing a
+run again only reads the task groups saved since it was last indexed.
+"""
+
+from collections.abc import Sequence
+import concurrent.futures
+import json
+import math
+import os
+from typing import Any
+
+from absl import logging
+from android_world import checkpointer as checkpointer_lib
+from android_world import constants
+from android_world import suite_metrics
+import numpy as np
+import pandas as pd
+
+ANALYSIS_INDEX_FILENAME = 'analysis_index.json'
+
+METADATA_FIELDS = (
+    constants.EpisodeConstants.TASK_TEMPLATE,
+    constants.EpisodeConstants.INSTANCE_ID,
+    constants.EpisodeConstants.IS_SUCCESSFUL,
+    constants.EpisodeConstants.EPISODE_LENGTH,
+    constants.EpisodeConstants.RUN_TIME,
+    constants.EpisodeConstants.EXCEPTION_INFO,
+)
+RUNTIME_PERCENTILES = (50, 90, 99)
+# Upper bounds of the step count buckets; the last bucket is unbounded.
+STEP_BUCKETS = (5, 10, 15, 20, 30, 50)
+
+_INDEX_VERSION = 1
+# Task groups loaded per worker task.
+_CHUNK_SIZE = 64
+_ALL = 'all'
+
+
+def _number(value: Any) -> float | None:
+  try:
+    value = float(value)
+  except (TypeError, ValueError):
+    return None
+  return None if math.isnan(value) else value
+
+
+def _summarize_episode(episode: dict[str, Any]) -> dict[str, Any]:
+  """Returns the JSON-serializable metadata of an episode."""
+  instance_id = episode.get(constants.EpisodeConstants.INSTANCE_ID)
+  if isinstance(instance_id, np.integer):
+    instance_id = int(instance_id)
+  summary = {
+      constants.EpisodeConstants.TASK_TEMPLATE: episode.get(
+          constants.EpisodeConstants.TASK_TEMPLATE
+      ),
+      constants.EpisodeConstants.INSTANCE_ID: instance_id,
+  }
+  for field in (
+      constants.EpisodeConstants.IS_SUCCESSFUL,
+      constants.EpisodeConstants.EPISODE_LENGTH,
+      constants.EpisodeConstants.RUN_TIME,
+  ):
+    summary[field] = _number(episode.get(field))
+  exception_info = episode.get(constants.EpisodeConstants.EXCEPTION_INFO)
+  if exception_info is not None:
+    # The last line of a traceback names the exception.
+    lines = [line for line in str(exception_info).splitlines() if line.strip()]
+    exception_info = lines[-1].strip() if lines else 'Exception'
+  summary[constants.EpisodeConstants.EXCEPTION_INFO] = exception_info
+  return summary
+
+
+def _load_task_groups(
+    checkpoint_dir: str, entries: list[dict[str, Any]]
+) -> list[tuple[dict[str, Any], list[dict[str, Any]]]]:
+  """Loads the metadata of task groups; runs in a worker process."""
+  checkpointer = checkpointer_lib.IncrementalCheckpointer(
+      checkpoint_dir, store_frames=False
+  )
+  return [
+      (entry, [_summarize_episode(episode) for episode in episodes])
+      for entry, episodes in checkpointer.iter_task_groups(
+          entries, fields=list(METADATA_FIELDS)
+      )
+  ]
+
+
+def _read_index(path: str) -> dict[str, Any]:
+  try:
+    with open(path, 'r', encoding='utf-8') as f:
+      index = json.load(f)
+  except (OSError, ValueError):
+    return {}
+  if index.get('version') != _INDEX_VERSION:
+    return {}
+  return index.get('task_groups', {})
+
+
+def _write_index(path: str, task_groups: dict[str, Any]) -> None:
+  temp_path = f'{path}.{os.getpid()}.tmp'
+  try:
+    with open(temp_path, 'w', encoding='utf-8') as f:
+      json.dump({'version': _INDEX_VERSION, 'task_groups': task_groups}, f)
+    os.replace(temp_path, path)
+  except OSError as e:
+    # E.g. a read-only checkpoint directory; analysis still works, uncached.
+    logging.info('Unable to write the analysis index %s: %s', path, e)
+
+
+def load_runs(
+    checkpoint_dirs: Sequence[str],
+    num_workers: int | None = None,
+    use_index: bool = True,
+) -> dict[str, list[dict[str, Any]]]:
+  """Loads the episodes' metadata of runs.
+
+  Args:
+    checkpoint_dirs: Directories of `IncrementalCheckpointer`s.
+    num_workers: Processes reading task groups; the number of CPUs if None, or
+      read in this process if 0.
+    use_index: Whether to use and update the sidecar index of each directory.
+
+  Returns:
+    For each directory, the metadata of its episodes, in run order. Exception
+    info is reduced to the last line of the traceback.
+
+  Raises:
+    FileNotFoundError: If a directory does not exist.
+  """
+  indexes, entries, work = {}, {}, []
+  for checkpoint_dir in checkpoint_dirs:
+    if not os.path.isdir(checkpoint_dir):
+      raise FileNotFoundError(f'No checkpoint directory {checkpoint_dir}')
+    entries[checkpoint_dir] = checkpointer_lib.IncrementalCheckpointer(
+        checkpoint_dir, store_frames=False
+    ).task_group_entries()
+    index = {}
+    if use_index:
+      index = _read_index(os.path.join(checkpoint_dir, ANALYSIS_INDEX_FILENAME))
+    indexes[checkpoint_dir] = index
+    changed = [
+        entry
+        for entry in entries[checkpoint_dir]
+        if index.get(entry['task_name'], {}).get('entry') != entry
+    ]
+    for start in range(0, len(changed), _CHUNK_SIZE):
+      work.append((checkpoint_dir, changed[start : start + _CHUNK_SIZE]))
+
+  if work and num_workers != 0:
+    with concurrent.futures.ProcessPoolExecutor(num_workers) as pool:
+      results = list(pool.map(_load_task_groups, *zip(*work)))
+  else:
+    results = [_load_task_groups(*args) for args in work]
+  for (checkpoint_dir, _), task_groups in zip(work, results):
+    for entry, episodes in task_groups:
+      indexes[checkpoint_dir][entry['task_name']] = {
+          'entry': entry,
+          'episodes': episodes,
+      }
+
+  runs = {}
+  for checkpoint_dir in checkpoint_dirs:
+    index = indexes[checkpoint_dir]
+    if use_index and any(args[0] == checkpoint_dir for args in work):
+      _write_index(
+          os.path.join(checkpoint_dir, ANALYSIS_INDEX_FILENAME), index
+      )
+    runs[checkpoint_dir] = [
+        episode
+        for entry in entries[checkpoint_dir]
+        for episode in index.get(entry['task_name'], {}).get('episodes', [])
+    ]
+  return runs
+
+
+def metrics_of(
+    episodes: Sequence[dict[str, Any]],
+) -> suite_metrics.SuiteMetrics:
+  """Returns the per-template and per-tag metrics of episodes."""
+  metrics = suite_metrics.SuiteMetrics()
+  for episode in episodes:
+    metrics.add(episode)
+  return metrics
+
+
+def _episodes_frame(episodes: Sequence[dict[str, Any]]) -> pd.DataFrame:
+  frame = pd.DataFrame(list(episodes), columns=list(METADATA_FIELDS))
+  for field in (
+      constants.EpisodeConstants.IS_SUCCESSFUL,
+      constants.EpisodeConstants.EPISODE_LENGTH,
+      constants.EpisodeConstants.RUN_TIME,
+  ):
+    frame[field] = pd.to_numeric(frame[field], errors='coerce')
+  return frame
+
+
+def runtime_percentiles(
+    episodes: Sequence[dict[str, Any]],
+    percentiles: Sequence[float] = RUNTIME_PERCENTILES,
+) -> pd.DataFrame:
+  """Returns run time percentiles, in seconds, per template and overall."""
+  frame = _episodes_frame(episodes).dropna(
+      subset=[constants.EpisodeConstants.RUN_TIME]
+  )
+  groups = [
+      (template, group[constants.EpisodeConstants.RUN_TIME].to_numpy())
+      for template, group in frame.groupby(
+          constants.EpisodeConstants.TASK_TEMPLATE
+      )
+  ]
+  groups.append((_ALL, frame[constants.EpisodeConstants.RUN_TIME].to_numpy()))
+  rows = {}
+  for name, run_times in groups:
+    row = {'count': len(run_times)}
+    for percentile in percentiles:
+      row[f'p{percentile:g}'] = (
+          np.percentile(run_times, percentile) if len(run_times) else np.nan
+      )
+    row['max'] = run_times.max() if len(run_times) else np.nan
+    rows[name] = row
+  table = pd.DataFrame.from_dict(rows, orient='index')
+  table.index.name = 'task'
+  return table
+
+
+def step_distribution(
+    episodes: Sequence[dict[str, Any]], buckets: Sequence[int] = STEP_BUCKETS
+) -> pd.DataFrame:
+  """Returns the number of episodes per step count bucket, by difficulty.
+
+  Episodes that raised an exception are left out. The last columns are the
+  mean step count and, for successful episodes of templates with known optimal
+  steps, the mean ratio of step count to optimal steps.
+
+  Args:
+    episodes: The episodes' metadata.
+    buckets: Sorted upper bounds of the buckets; the last bucket is unbounded.
+
+  Returns:
+    A table with a row per difficulty and a row for all episodes.
+  """
+  task_metadata = suite_metrics.load_task_metadata()
+  frame = _episodes_frame(episodes)
+  frame = frame[
+      frame[constants.EpisodeConstants.EXCEPTION_INFO].isnull()
+      & frame[constants.EpisodeConstants.EPISODE_LENGTH].notnull()
+  ]
+  templates = frame[constants.EpisodeConstants.TASK_TEMPLATE]
+  frame = frame.assign(
+      difficulty=templates.map(
+          lambda t: task_metadata.get(t, {}).get('difficulty', 'unknown')
+      ),
+      optimal_steps=templates.map(
+          lambda t: task_metadata.get(t, {}).get('optimal_steps', np.nan)
+      ),
+  )
+  edges = [0] + list(buckets) + [np.inf]
+  labels = [f'{lo + 1}-{hi}' for lo, hi in zip(edges[:-2], edges[1:-1])]
+  labels.append(f'>{buckets[-1]}')
+  frame['bucket'] = pd.cut(
+      frame[constants.EpisodeConstants.EPISODE_LENGTH],
+      bins=edges,
+      labels=labels,
+  )
+  frame['optimal_ratio'] = (
+      frame[constants.EpisodeConstants.EPISODE_LENGTH] / frame.optimal_steps
+  ).where(frame[constants.EpisodeConstants.IS_SUCCESSFUL] > 0.5)
+
+  rows = {}
+  groups = list(frame.groupby('difficulty')) + [(_ALL, frame)]
+  for name, group in groups:
+    row = group['bucket'].value_counts().reindex(labels, fill_value=0)
+    row = row.to_dict()
+    row['mean_steps'] = group[constants.EpisodeConstants.EPISODE_LENGTH].mean()
+    row['mean_optimal_ratio'] = group['optimal_ratio'].mean()
+    rows[name] = row
+  table = pd.DataFrame.from_dict(rows, orient='index')
+  table.index.name = 'difficulty'
+  return table
+
+
+def compare_runs(
+    episodes_a: Sequence[dict[str, Any]],
+    episodes_b: Sequence[dict[str, Any]],
+) -> pd.DataFrame:
+  """Compares the success rates of two runs per template.
+
+  Args:
+    episodes_a: The episodes' metadata of the first run.
+    episodes_b: The episodes' metadata of the second run.
+
+  Returns:
+    Success rates and trial counts of both runs, and the difference of the
+    success rates (b - a), per template sorted by difference, with a last row
+    for the mean over templates run by both.
+  """
+  columns = ['num_complete_trials', 'mean_success_rate']
+  table_a = metrics_of(episodes_a).results_table()
+  table_b = metrics_of(episodes_b).results_table()
+  if table_a.empty:
+    table_a = pd.DataFrame(columns=columns)
+  if table_b.empty:
+    table_b = pd.DataFrame(columns=columns)
+  table = table_a[columns].join(
+      table_b[columns], how='outer', lsuffix='_a', rsuffix='_b'
+  )
+  table['delta'] = table.mean_success_rate_b - table.mean_success_rate_a
+  table = table.sort_values('delta', kind='stable')
+  both = table.dropna(subset=['delta'])
+  mean = pd.Series(
+      {
+          'num_complete_trials_a': both.num_complete_trials_a.sum(),
+          'mean_success_rate_a': both.mean_success_rate_a.mean(),
+          'num_complete_trials_b': both.num_complete_trials_b.sum(),
+          'mean_success_rate_b': both.mean_success_rate_b.mean(),
+          'delta': both.delta.mean(),
+      },
+      name='========= Average (both) =========',
+  )
+  table = pd.concat([table, mean.to_frame().T])
+  table.index.name = 'task'
+  return table.astype(
+      {'num_complete_trials_a': 'Int64', 'num_complete_trials_b': 'Int64'}
+  )
@@ -0,0 +1,217 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import os
+import pickle
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+from android_world import checkpointer as checkpointer_lib
+from android_world import constants
+from android_world import run_analysis
+from android_world import suite_metrics
+import numpy as np
+
+
+def _episode(
+    template: str,
+    instance_id: int,
+    success: float,
+    length: float = 5,
+    run_time: float = 10.0,
+    exception_info: str | None = None,
+):
+  return {
+      constants.EpisodeConstants.TASK_TEMPLATE: template,
+      constants.EpisodeConstants.INSTANCE_ID: instance_id,
+      constants.EpisodeConstants.GOAL: 'goal',
+      constants.EpisodeConstants.IS_SUCCESSFUL: success,
+      constants.EpisodeConstants.EPISODE_LENGTH: length,
+      constants.EpisodeConstants.RUN_TIME: run_time,
+      constants.EpisodeConstants.EXCEPTION_INFO: exception_info,
+      constants.EpisodeConstants.EPISODE_DATA: {'step': [1, 2, 3]},
+  }
+
+
+def _templates():
+  return list(suite_metrics.load_task_metadata())[:2]
+
+
+class LoadRunsTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.run_dir = tempfile.mkdtemp()
+    self.checkpointer = checkpointer_lib.IncrementalCheckpointer(self.run_dir)
+    self.template_a, self.template_b = _templates()
+    self.checkpointer.save_episodes(
+        [_episode(self.template_a, 0, 1.0)], f'{self.template_a}_0'
+    )
+    self.checkpointer.save_episodes(
+        [
+            _episode(
+                self.template_b,
+                np.int64(0),
+                np.nan,
+                np.nan,
+                exception_info='Traceback:\n  ...\nValueError: boom\n',
+            )
+        ],
+        f'{self.template_b}_0',
+    )
+
+  def test_load_reads_metadata(self):
+    runs = run_analysis.load_runs([self.run_dir], num_workers=0)
+
+    episodes = runs[self.run_dir]
+    self.assertLen(episodes, 2)
+    self.assertNotIn(constants.EpisodeConstants.EPISODE_DATA, episodes[0])
+    self.assertEqual(episodes[0][constants.EpisodeConstants.IS_SUCCESSFUL], 1.0)
+    self.assertIsNone(episodes[1][constants.EpisodeConstants.IS_SUCCESSFUL])
+    self.assertEqual(
+        episodes[1][constants.EpisodeConstants.EXCEPTION_INFO],
+        'ValueError: boom',
+    )
+
+  def test_index_is_reused(self):
+    first = run_analysis.load_runs([self.run_dir], num_workers=0)
+    self.assertTrue(
+        os.path.exists(
+            os.path.join(self.run_dir, run_analysis.ANALYSIS_INDEX_FILENAME)
+        )
+    )
+    self.checkpointer.save_episodes(
+        [_episode(self.template_a, 1, 0.0)], f'{self.template_a}_1'
+    )
+
+    with mock.patch.object(
+        run_analysis,
+        '_load_task_groups',
+        wraps=run_analysis._load_task_groups,
+    ) as load:
+      second = run_analysis.load_runs([self.run_dir], num_workers=0)
+
+    load.assert_called_once()
+    self.assertLen(load.call_args.args[1], 1)
+    self.assertLen(second[self.run_dir], 3)
+    for episode in first[self.run_dir]:
+      self.assertIn(episode, second[self.run_dir])
+
+  def test_worker_pool(self):
+    other_dir = tempfile.mkdtemp()
+    checkpointer_lib.IncrementalCheckpointer(other_dir).save_episodes(
+        [_episode(self.template_a, 0, 0.0)], f'{self.template_a}_0'
+    )
+
+    runs = run_analysis.load_runs(
+        [self.run_dir, other_dir], num_workers=2, use_index=False
+    )
+
+    self.assertLen(runs[self.run_dir], 2)
+    self.assertLen(runs[other_dir], 1)
+    self.assertFalse(
+        os.path.exists(
+            os.path.join(other_dir, run_analysis.ANALYSIS_INDEX_FILENAME)
+        )
+    )
+
+  def test_missing_directory(self):
+    with self.assertRaises(FileNotFoundError):
+      run_analysis.load_runs([os.path.join(self.run_dir, 'missing')])
+
+  def test_read_only_legacy_directory(self):
+    legacy_dir = tempfile.mkdtemp()
+    with gzip.open(
+        os.path.join(legacy_dir, f'{self.template_a}_0.pkl.gz'), 'wb'
+    ) as f:
+      pickle.dump([_episode(self.template_a, 0, 1.0)], f)
+
+    with mock.patch.object(os, 'access', return_value=False):
+      runs = run_analysis.load_runs([legacy_dir], num_workers=0)
+
+    self.assertLen(runs[legacy_dir], 1)
+    self.assertNotIn(checkpointer_lib.MANIFEST_FILENAME, os.listdir(legacy_dir))
+
+
+class TablesTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.template_a, self.template_b = _templates()
+
+  def test_runtime_percentiles(self):
+    episodes = [
+        _episode(self.template_a, i, 1.0, run_time=float(i + 1))
+        for i in range(10)
+    ]
+    episodes.append(_episode(self.template_b, 0, 0.0, run_time=100.0))
+
+    table = run_analysis.runtime_percentiles(episodes)
+
+    self.assertEqual(table.loc[self.template_a, 'count'], 10)
+    self.assertAlmostEqual(table.loc[self.template_a, 'p50'], 5.5)
+    self.assertEqual(table.loc[self.template_a, 'max'], 10.0)
+    self.assertEqual(table.loc['all', 'count'], 11)
+    self.assertEqual(table.loc['all', 'max'], 100.0)
+
+  def test_step_distribution(self):
+    difficulty = suite_metrics.load_task_metadata()[self.template_a][
+        'difficulty'
+    ]
+    optimal_steps = suite_metrics.load_task_metadata()[self.template_a][
+        'optimal_steps'
+    ]
+    episodes = [
+        _episode(self.template_a, 0, 1.0, length=3),
+        _episode(self.template_a, 1, 0.0, length=12),
+        _episode(self.template_a, 2, 1.0, length=60),
+        _episode(self.template_a, 3, np.nan, np.nan, exception_info='Error'),
+    ]
+
+    table = run_analysis.step_distribution(episodes)
+
+    self.assertEqual(table.loc['all', '1-5'], 1)
+    self.assertEqual(table.loc['all', '11-15'], 1)
+    self.assertEqual(table.loc['all', '>50'], 1)
+    self.assertEqual(table.loc[difficulty, '6-10'], 0)
+    self.assertEqual(table.loc['all', 'mean_steps'], 25.0)
+    self.assertAlmostEqual(
+        table.loc['all', 'mean_optimal_ratio'],
+        (3 / optimal_steps + 60 / optimal_steps) / 2,
+    )
+
+  def test_compare_runs(self):
+    run_a = [
+        _episode(self.template_a, 0, 1.0),
+        _episode(self.template_b, 0, 0.0),
+    ]
+    run_b = [
+        _episode(self.template_a, 0, 0.0),
+        _episode(self.template_b, 0, 1.0),
+        _episode('OnlyInB', 0, 1.0),
+    ]
+
+    table = run_analysis.compare_runs(run_a, run_b)
+
+    self.assertEqual(table.loc[self.template_a, 'delta'], -1.0)
+    self.assertEqual(table.loc[self.template_b, 'delta'], 1.0)
+    self.assertTrue(np.isnan(table.loc['OnlyInB', 'mean_success_rate_a']))
+    self.assertEqual(table.iloc[-1]['delta'], 0.0)
+    self.assertEqual(table.iloc[-1]['num_complete_trials_b'], 2)
+
+
+if __name__ == '__main__':
+  absltest.main()
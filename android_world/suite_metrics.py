@@ -0,0 +1,221 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Running metrics of a task suite run, updated episode by episode.
+
+`suite_utils.process_episodes` aggregates a full list of episodes; calling it
+after every episode of a run costs time quadratic in the number of episodes.
+`SuiteMetrics` keeps per-template counters and tag and difficulty rollups,
+updated in constant time per episode, and renders the same tables on demand.
+"""
+
+import collections
+import dataclasses
+import functools
+import json
+import math
+import os
+from typing import Any
+
+from android_world import constants
+import pandas as pd
+
+_DIFFICULTIES = ('easy', 'medium', 'hard')
+_AVERAGE_ROW = '========= Average ========='
+
+
+@functools.cache
+def load_task_metadata() -> dict[str, dict[str, Any]]:
+  """Returns the difficulty, optimal steps and tags of each task template."""
+  filepath = os.path.join(
+      os.path.dirname(os.path.abspath(__file__)), 'task_metadata.json'
+  )
+  with open(filepath) as f:
+    entries = json.load(f)
+  return {
+      entry['task_name']: {
+          'difficulty': entry['difficulty'],
+          'optimal_steps': float(entry['optimal_steps']),
+          'tags': tuple(tag or 'untagged' for tag in entry['tags']),
+      }
+      for entry in entries
+  }
+
+
+def _as_number(value: Any) -> float | None:
+  """Returns a value as a float, or None if it is missing or NaN."""
+  if value is None or isinstance(value, str):
+    return None
+  try:
+    value = float(value)
+  except (TypeError, ValueError):
+    return None
+  return None if math.isnan(value) else value
+
+
+@dataclasses.dataclass
+class TemplateStats:
+  """Counters of the episodes of a task template."""
+
+  num_complete_trials: int = 0
+  num_successes: float = 0.0
+  total_episode_length: float = 0.0
+  num_episode_lengths: int = 0
+  total_runtime_s: float = 0.0
+  num_fail_trials: int = 0
+
+  @property
+  def mean_success_rate(self) -> float:
+    if not self.num_complete_trials:
+      return math.nan
+    return self.num_successes / self.num_complete_trials
+
+  @property
+  def mean_episode_length(self) -> float:
+    if not self.num_episode_lengths:
+      return math.nan
+    return self.total_episode_length / self.num_episode_lengths
+
+
+class _MeanOfMeans:
+  """Mean of the success rates of a group of templates, kept up to date."""
+
+  def __init__(self):
+    self.total = 0.0
+    self.count = 0
+
+  def update(self, old: float, new: float) -> None:
+    if not math.isnan(old):
+      self.total -= old
+      self.count -= 1
+    if not math.isnan(new):
+      self.total += new
+      self.count += 1
+
+  @property
+  def mean(self) -> float:
+    return self.total / self.count if self.count else math.nan
+
+
+class SuiteMetrics:
+  """Aggregates the metadata of a run's episodes as they complete."""
+
+  def __init__(self, task_metadata: dict[str, dict[str, Any]] | None = None):
+    """Constructor.
+
+    Args:
+      task_metadata: Difficulty, optimal steps and tags of each template;
+        defaults to those of task_metadata.json.
+    """
+    self.task_metadata = (
+        load_task_metadata() if task_metadata is None else task_metadata
+    )
+    self.templates: dict[str, TemplateStats] = {}
+    self.num_episodes = 0
+    self.num_successes = 0.0
+    self.num_scored = 0
+    self._by_tag = collections.defaultdict(_MeanOfMeans)
+
+  def add(self, episode: dict[str, Any]) -> None:
+    """Adds the metadata of an episode, in constant time."""
+    template = episode.get(constants.EpisodeConstants.TASK_TEMPLATE)
+    if template is None:
+      return
+    stats = self.templates.setdefault(template, TemplateStats())
+    old_rate = stats.mean_success_rate
+
+    success = _as_number(episode.get(constants.EpisodeConstants.IS_SUCCESSFUL))
+    if success is not None:
+      stats.num_complete_trials += 1
+      stats.num_successes += success
+      self.num_successes += success
+      self.num_scored += 1
+    length = _as_number(episode.get(constants.EpisodeConstants.EPISODE_LENGTH))
+    if length is not None:
+      stats.total_episode_length += length
+      stats.num_episode_lengths += 1
+    runtime = _as_number(episode.get(constants.EpisodeConstants.RUN_TIME))
+    if runtime is not None:
+      stats.total_runtime_s += runtime
+    exception_info = episode.get(constants.EpisodeConstants.EXCEPTION_INFO)
+    if exception_info is not None and not (
+        isinstance(exception_info, float) and math.isnan(exception_info)
+    ):
+      stats.num_fail_trials += 1
+    self.num_episodes += 1
+
+    metadata = self.task_metadata.get(template)
+    if metadata is not None:
+      for tag in metadata['tags']:
+        self._by_tag[(tag, metadata['difficulty'])].update(
+            old_rate, stats.mean_success_rate
+        )
+
+  def summary_line(self) -> str:
+    """Returns a one-line summary of the episodes so far."""
+    rate = self.num_successes / self.num_scored if self.num_scored else 0.0
+    return (
+        f'{self.num_episodes} episodes, {len(self.templates)} templates:'
+        f' {self.num_successes:g}/{self.num_scored} successful ({rate:.1%})'
+    )
+
+  def results_table(self) -> pd.DataFrame:
+    """Returns the per-template table of `suite_utils.process_episodes`."""
+    rows = {
+        template: {
+            'num_complete_trials': stats.num_complete_trials,
+            'mean_success_rate': stats.mean_success_rate,
+            'mean_episode_length': stats.mean_episode_length,
+            'total_runtime_s': float(f'{stats.total_runtime_s:.1f}'),
+            'num_fail_trials': stats.num_fail_trials,
+        }
+        for template, stats in sorted(self.templates.items())
+    }
+    table = pd.DataFrame.from_dict(rows, orient='index')
+    table.index.name = 'task'
+    return table
+
+  def tags_table(self) -> pd.DataFrame:
+    """Returns the mean success rate of templates by tag and difficulty."""
+    rows = collections.defaultdict(dict)
+    for (tag, difficulty), mean in self._by_tag.items():
+      if mean.count:
+        rows[tag][difficulty] = mean.mean
+    table = pd.DataFrame.from_dict(rows, orient='index')
+    table = table.reindex(
+        columns=[d for d in _DIFFICULTIES if d in table.columns]
+    ).sort_index()
+    table.index.name = 'tags'
+    table.columns.name = 'difficulty'
+    return table.fillna('-')
+
+  def render(self) -> str:
+    """Renders the per-template table, with an average row, and tag table."""
+    table = self.results_table()
+    if table.empty:
+      return self.summary_line()
+    average = table.mean(axis=0)
+    average.name = _AVERAGE_ROW
+    table = pd.concat([table, average.to_frame().T])
+    table.index.name = 'task'
+    table.insert(0, 'task_num', list(range(len(table) - 1)) + [0])
+    with pd.option_context(
+        'display.max_columns', 100,
+        'display.max_rows', 1000,
+        'display.width', 1000,
+    ):
+      rendered = f'{table}'
+      with pd.option_context('display.precision', 2):
+        rendered += f'\n\nmean_success_rate\n{self.tags_table()}'
+    return rendered
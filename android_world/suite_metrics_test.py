@@ -0,0 +1,142 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+
+from absl.testing import absltest
+from android_world import constants
+from android_world import suite_metrics
+from android_world import suite_utils
+import numpy as np
+import pandas as pd
+
+
+def _episode(
+    template: str,
+    success: float,
+    length: float = 5,
+    run_time: float = 1.5,
+    exception_info: str | None = None,
+):
+  return {
+      constants.EpisodeConstants.TASK_TEMPLATE: template,
+      constants.EpisodeConstants.IS_SUCCESSFUL: success,
+      constants.EpisodeConstants.EPISODE_LENGTH: length,
+      constants.EpisodeConstants.RUN_TIME: run_time,
+      constants.EpisodeConstants.EXCEPTION_INFO: exception_info,
+  }
+
+
+def _failed_episode(template: str):
+  return _episode(template, np.nan, np.nan, 0.25, 'Traceback')
+
+
+def _random_episodes(num_episodes: int, seed: int = 0):
+  rng = random.Random(seed)
+  templates = list(suite_metrics.load_task_metadata())[:12]
+  templates.append('NotInTaskMetadata')
+  episodes = []
+  for _ in range(num_episodes):
+    template = rng.choice(templates)
+    if rng.random() < 0.2:
+      episodes.append(_failed_episode(template))
+    else:
+      episodes.append(
+          _episode(
+              template,
+              float(rng.random() < 0.5),
+              rng.randint(1, 30),
+              rng.uniform(1, 100),
+          )
+      )
+  return episodes
+
+
+class SuiteMetricsTest(absltest.TestCase):
+
+  def test_results_table_matches_process_episodes(self):
+    episodes = _random_episodes(200)
+    metrics = suite_metrics.SuiteMetrics()
+
+    for episode in episodes:
+      metrics.add(episode)
+
+    expected = suite_utils.process_episodes(episodes)[
+        list(metrics.results_table().columns)
+    ]
+    expected.index.name = 'task'
+    pd.testing.assert_frame_equal(
+        metrics.results_table(), expected, check_dtype=False
+    )
+
+  def test_tags_table_matches_process_episodes(self):
+    episodes = _random_episodes(200, seed=1)
+    metrics = suite_metrics.SuiteMetrics()
+
+    for episode in episodes:
+      metrics.add(episode)
+
+    expected = suite_utils._print_results_by_tag(
+        suite_utils.process_episodes(episodes)
+    )['mean_success_rate']
+    actual = metrics.tags_table()
+    self.assertEqual(list(actual.index), list(expected.index))
+    self.assertEqual(list(actual.columns), list(expected.columns))
+    for tag in actual.index:
+      for difficulty in actual.columns:
+        want = expected.loc[tag, difficulty]
+        got = actual.loc[tag, difficulty]
+        if want == '-':
+          self.assertEqual(got, '-')
+        else:
+          self.assertAlmostEqual(got, want)
+
+  def test_template_of_failed_episodes_only(self):
+    metrics = suite_metrics.SuiteMetrics(
+        task_metadata={
+            'A': {'difficulty': 'easy', 'optimal_steps': 1.0, 'tags': ('x',)},
+        }
+    )
+
+    metrics.add(_failed_episode('A'))
+    metrics.add(_failed_episode('A'))
+
+    table = metrics.results_table()
+    self.assertEqual(table.loc['A', 'num_complete_trials'], 0)
+    self.assertEqual(table.loc['A', 'num_fail_trials'], 2)
+    self.assertTrue(np.isnan(table.loc['A', 'mean_success_rate']))
+    self.assertTrue(metrics.tags_table().empty)
+
+    metrics.add(_episode('A', 1.0))
+
+    self.assertEqual(metrics.tags_table().loc['x', 'easy'], 1.0)
+
+  def test_summary_line(self):
+    metrics = suite_metrics.SuiteMetrics()
+    self.assertEqual(metrics.render(), metrics.summary_line())
+
+    metrics.add(_episode('A', 1.0))
+    metrics.add(_episode('A', 0.0))
+    metrics.add(_episode('B', True))
+    metrics.add(_failed_episode('B'))
+
+    self.assertEqual(
+        metrics.summary_line(),
+        '4 episodes, 2 templates: 2/3 successful (66.7%)',
+    )
+    self.assertIn('========= Average =========', metrics.render())
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -15,7 +15,10 @@
 """Utilities for evaluating automation agents."""
 
 import collections
+from collections.abc import Iterator
+import contextlib
 import datetime
+import functools
 import hashlib
 import logging
 import os
@@ -28,11 +31,15 @@ from android_env import env_interface
 from android_world import checkpointer as checkpointer_lib
 from android_world import constants
 from android_world import episode_runner
+from android_world import suite_metrics
 from android_world.agents import base_agent
+from android_world.env import adb_profiler
 from android_world.env import adb_utils
 from android_world.env import interface
 from android_world.task_evals import task_eval
 from android_world.task_evals.miniwob import miniwob_base
+from android_world.utils import metrics
+from android_world.utils import tracing
 from fuzzywuzzy import process
 import numpy as np
 import pandas as pd
@@ -41,6 +48,8 @@ import pandas as pd
 _FIXED_SEED = 123
 _TASK_TEMPLATE_COLUMN = 'task_template'
 _TASK_PROMPT_COLUMN = 'task_prompt'
+# Number of episodes between printing the full results tables during a run.
+DEFAULT_SUMMARY_EVERY_N = 10
 TaskEvalType = TypeVar('TaskEvalType', bound=task_eval.TaskEval)
 
 
@@ -220,6 +229,13 @@ def _filter_tasks(
   return subset
 
 
+@contextlib.contextmanager
+def _phase(name: str, task_name: str) -> Iterator[None]:
+  """Times a phase of a task and attributes its device calls to it."""
+  with tracing.span(name), adb_profiler.call_site(f'{name} of {task_name}'):
+    yield
+
+
 def _run_task(
     task: TaskEvalType,
     run_episode: Callable[[TaskEvalType], episode_runner.EpisodeResult],
@@ -241,52 +257,70 @@ def _run_task(
     ValueError: If step data was not as expected.
   """
   start = time.time()
-  try:
-    task.initialize_task(env)
-    _log_and_print('Running task %s with goal "%s"', task.name, task.goal)
-    interaction_results = run_episode(task)
-    task_successful = task.is_successful(env)
-  except Exception as e:  # pylint: disable=broad-exception-caught
-    _log_and_print('%s\nSKIPPING %s.', '~' * 80, task.name)
-    logging.exception(
-        'Logging exception and skipping task. Will keep running. Task: %s: %s',
-        task.name,
-        e,
-    )
-    traceback.print_exc()
-    return _create_failed_result(
-        task.name, task.goal, traceback.format_exc(), time.time() - start
-    )
-  else:
-    agent_successful = task_successful if interaction_results.done else 0.0
-    _log_and_print(
-        '%s; %s',
-        'Task Successful ✅' if agent_successful > 0.5 else 'Task Failed ❌',
-        f' {task.goal}',
-    )
+  with tracing.trace() as tracer:
+    try:
+      with _phase('initialize_task', task.name):
+        task.initialize_task(env)
+      _log_and_print('Running task %s with goal "%s"', task.name, task.goal)
+      with _phase('run_episode', task.name):
+        interaction_results = run_episode(task)
+      with _phase('is_successful', task.name):
+        task_successful = task.is_successful(env)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+      _log_and_print('%s\nSKIPPING %s.', '~' * 80, task.name)
+      logging.exception(
+          'Logging exception and skipping task. Will keep running. Task: %s:'
+          ' %s',
+          task.name,
+          e,
+      )
+      traceback.print_exc()
+      result = _create_failed_result(
+          task.name, task.goal, traceback.format_exc(), time.time() - start
+      )
+    else:
+      agent_successful = task_successful if interaction_results.done else 0.0
+      _log_and_print(
+          '%s; %s',
+          'Task Successful ✅' if agent_successful > 0.5 else 'Task Failed ❌',
+          f' {task.goal}',
+      )
 
-    if demo_mode:
-      _display_success_overlay(env.controller, agent_successful)
-
-    result = {
-        constants.EpisodeConstants.GOAL: task.goal,
-        constants.EpisodeConstants.TASK_TEMPLATE: task.name,
-        constants.EpisodeConstants.EPISODE_DATA: interaction_results.step_data,
-        constants.EpisodeConstants.IS_SUCCESSFUL: agent_successful,
-        constants.EpisodeConstants.RUN_TIME: time.time() - start,
-        constants.EpisodeConstants.FINISH_DTIME: datetime.datetime.now(),
-        constants.EpisodeConstants.EPISODE_LENGTH: len(
-            interaction_results.step_data[constants.STEP_NUMBER]
-        ),
-        constants.EpisodeConstants.AUX_DATA: interaction_results.aux_data,
-        constants.EpisodeConstants.SCREEN_CONFIG: _get_screen_config(task),
-        constants.EpisodeConstants.EXCEPTION_INFO: None,
-        constants.EpisodeConstants.SEED: task.params[
-            constants.EpisodeConstants.SEED
-        ],
-    }
-    task.tear_down(env)
-    return result
+      if demo_mode:
+        _display_success_overlay(env.controller, agent_successful)
+
+      result = {
+          constants.EpisodeConstants.GOAL: task.goal,
+          constants.EpisodeConstants.TASK_TEMPLATE: task.name,
+          constants.EpisodeConstants.EPISODE_DATA: (
+              interaction_results.step_data
+          ),
+          constants.EpisodeConstants.IS_SUCCESSFUL: agent_successful,
+          constants.EpisodeConstants.RUN_TIME: time.time() - start,
+          constants.EpisodeConstants.FINISH_DTIME: datetime.datetime.now(),
+          constants.EpisodeConstants.EPISODE_LENGTH: len(
+              interaction_results.step_data[constants.STEP_NUMBER]
+          ),
+          constants.EpisodeConstants.AUX_DATA: interaction_results.aux_data,
+          constants.EpisodeConstants.SCREEN_CONFIG: _get_screen_config(task),
+          constants.EpisodeConstants.EXCEPTION_INFO: None,
+          constants.EpisodeConstants.SEED: task.params[
+              constants.EpisodeConstants.SEED
+          ],
+      }
+      with _phase('tear_down', task.name):
+        task.tear_down(env)
+  metrics.record_episode(
+      task.name,
+      result[constants.EpisodeConstants.IS_SUCCESSFUL],
+      error=result[constants.EpisodeConstants.EXCEPTION_INFO] is not None,
+  )
+  if tracer is not None:
+    aux_data = dict(result[constants.EpisodeConstants.AUX_DATA] or {})
+    aux_data[tracing.AUX_DATA_KEY] = tracer.durations()
+    result[constants.EpisodeConstants.AUX_DATA] = aux_data
+    tracing.export(tracer, {'task': task.name})
+  return result
 
 
 def _get_task_info(
@@ -326,6 +360,8 @@ def _run_task_suite(
     return_full_episode_data: bool = False,
     process_episodes_fn=None,
     check_episode_fn: Callable[[dict[str, Any]], bool] | None = None,
+    summary_every_n: int = DEFAULT_SUMMARY_EVERY_N,
+    episode_finished_fn: Callable[[dict[str, Any]], None] | None = None,
 ) -> list[dict[str, Any]]:
   """Runs e2e system on suite.
 
@@ -339,8 +375,15 @@ def _run_task_suite(
     return_full_episode_data: Whether to return full episode data instead of
       just metadata.
     process_episodes_fn: The function to process episode data. Usually to
-      compute metrics. Deafaults to process_episodes from this file.
+      compute metrics. If given, it is called with all episodes after each
+      episode. By default, metrics are aggregated incrementally with
+      `suite_metrics.SuiteMetrics`.
     check_episode_fn: The function to check episode data.
+    summary_every_n: With the default metrics, the number of episodes between
+      printing the full results tables; a one-line summary is printed after
+      every episode. The tables are also printed at the end of the run.
+    episode_finished_fn: If given, called with the data of each newly run
+      episode once its task has been evaluated.
 
   Returns:
     Metadata for each episode, including the scripted reward.
@@ -358,8 +401,9 @@ def _run_task_suite(
   completed_tasks, failed_tasks = _get_task_info(
       checkpointer.load(fields=metadata_fields)
   )
+  suite_metrics_agg = None
   if process_episodes_fn is None:
-    process_episodes_fn = process_episodes
+    suite_metrics_agg = suite_metrics.SuiteMetrics()
 
   if (completed_tasks or failed_tasks) and return_full_episode_data:
     raise ValueError(
@@ -368,55 +412,78 @@ def _run_task_suite(
   episodes_metadata: list[dict[str, Any]] = []
   full_episode_data = []
   correct, total = 0, 0
-  for name, instances in suite.items():
-    msg = 'Running task: ' + name
-    _log_and_print(msg + '\n' + '=' * len(msg))
+  num_new_episodes = 0
+  try:
+    for name, instances in suite.items():
+      msg = 'Running task: ' + name
+      _log_and_print(msg + '\n' + '=' * len(msg))
 
-    for i, instance in enumerate(instances):
-      instance_name = (
-          instance.name + checkpointer_lib.INSTANCE_SEPARATOR + str(i)
-      )
-      # Transferring from old checkpoint.
-      if instance_name in completed_tasks:
-        completed_episodes: list[dict[str, Any]] = completed_tasks[
-            instance_name
-        ]
-        episodes_metadata.extend(completed_episodes)
-      if instance_name in failed_tasks:
-        episodes_metadata.extend(failed_tasks[instance_name])
-      already_processed = (
-          instance_name in completed_tasks and instance_name not in failed_tasks
-      )
-      if already_processed:
-        _log_and_print('Skipping already processed task %s', instance_name)
-        continue
-
-      episode = _run_task(instance, run_episode, env, demo_mode=demo_mode)
-      if (
-          episode.get(constants.EpisodeConstants.EXCEPTION_INFO) is None
-          and check_episode_fn is not None
-      ):
-        if not check_episode_fn(episode):
+      for i, instance in enumerate(instances):
+        instance_name = (
+            instance.name + checkpointer_lib.INSTANCE_SEPARATOR + str(i)
+        )
+        # Transferring from old checkpoint.
+        if instance_name in completed_tasks:
+          completed_episodes: list[dict[str, Any]] = completed_tasks[
+              instance_name
+          ]
+          episodes_metadata.extend(completed_episodes)
+          if suite_metrics_agg is not None:
+            for completed_episode in completed_episodes:
+              suite_metrics_agg.add(completed_episode)
+        if instance_name in failed_tasks:
+          episodes_metadata.extend(failed_tasks[instance_name])
+          if suite_metrics_agg is not None:
+            for failed_episode in failed_tasks[instance_name]:
+              suite_metrics_agg.add(failed_episode)
+        already_processed = (
+            instance_name in completed_tasks
+            and instance_name not in failed_tasks
+        )
+        if already_processed:
+          _log_and_print('Skipping already processed task %s', instance_name)
           continue
-      episode[constants.EpisodeConstants.AGENT_NAME] = agent_name
-      episode[constants.EpisodeConstants.INSTANCE_ID] = i
-      checkpointer.save_episodes([episode], instance_name)
-
-      if return_full_episode_data:
-        full_episode_data.append(episode)
-
-      episodes_metadata.append({k: episode[k] for k in metadata_fields})
-      process_episodes_fn(episodes_metadata, print_summary=True)
-
-      if episode[constants.EpisodeConstants.EXCEPTION_INFO] is not None:
-        # Don't include episode in tally if execution/eval logic errored out.
-        continue
-      correct += episode[constants.EpisodeConstants.IS_SUCCESSFUL]
-      total += 1
-      if demo_mode:
-        _update_scoreboard(correct, total, env.controller)
-    print()
 
+        episode = _run_task(instance, run_episode, env, demo_mode=demo_mode)
+        if episode_finished_fn is not None:
+          episode_finished_fn(episode)
+        if (
+            episode.get(constants.EpisodeConstants.EXCEPTION_INFO) is None
+            and check_episode_fn is not None
+        ):
+          if not check_episode_fn(episode):
+            continue
+        episode[constants.EpisodeConstants.AGENT_NAME] = agent_name
+        episode[constants.EpisodeConstants.INSTANCE_ID] = i
+        checkpointer.save_episodes([episode], instance_name)
+
+        if return_full_episode_data:
+          full_episode_data.append(episode)
+
+        episodes_metadata.append({k: episode[k] for k in metadata_fields})
+        num_new_episodes += 1
+        if suite_metrics_agg is None:
+          process_episodes_fn(episodes_metadata, print_summary=True)
+        else:
+          suite_metrics_agg.add(episodes_metadata[-1])
+          _log_and_print(suite_metrics_agg.summary_line())
+          if summary_every_n and num_new_episodes % summary_every_n == 0:
+            _log_and_print('\n\n%s', suite_metrics_agg.render())
+
+        if episode[constants.EpisodeConstants.EXCEPTION_INFO] is not None:
+          # Don't include episode in tally if execution/eval logic errored out.
+          continue
+        correct += episode[constants.EpisodeConstants.IS_SUCCESSFUL]
+        total += 1
+        if demo_mode:
+          _update_scoreboard(correct, total, env.controller)
+      print()
+  finally:
+    # Written even if the loop raises, e.g. on KeyboardInterrupt.
+    checkpointer.flush()
+
+  if suite_metrics_agg is not None and suite_metrics_agg.num_episodes:
+    _log_and_print('\n\n%s', suite_metrics_agg.render())
   return full_episode_data if return_full_episode_data else episodes_metadata
 
 
@@ -428,6 +495,8 @@ def run(
     return_full_episode_data: bool = False,
     process_episodes_fn=None,
     check_episode_fn: Callable[[dict[str, Any]], bool] | None = None,
+    summary_every_n: int = DEFAULT_SUMMARY_EVERY_N,
+    step_deadline_sec: float | None = None,
 ) -> list[dict[str, Any]]:
   """Create suite and runs eval suite.
 
@@ -443,8 +512,11 @@ def run(
     return_full_episode_data: Whether to return full episode data instead of
       just metadata.
     process_episodes_fn: The function to process episode data. Usually to
-      compute metrics. Deafaults to process_episodes from this file.
+      compute metrics. See `_run_task_suite` for the default.
     check_episode_fn: The function to check episode data.
+    summary_every_n: See `_run_task_suite`.
+    step_deadline_sec: If provided, LLM calls of an agent step stop retrying
+      once the step has run for this long. See `episode_runner.run_episode`.
 
   Returns:
     Step-by-step data from each episode.
@@ -463,6 +535,16 @@ def run(
             if task.name.lower().startswith('miniwob')
             else None
         ),
+        step_deadline_sec=step_deadline_sec,
+    )
+
+  def episode_finished(episode: dict[str, Any]) -> None:
+    if episode[constants.EpisodeConstants.EXCEPTION_INFO] is not None:
+      is_successful = None
+    else:
+      is_successful = episode[constants.EpisodeConstants.IS_SUCCESSFUL]
+    agent.episode_finished(
+        episode[constants.EpisodeConstants.GOAL], is_successful
     )
 
   if demo_mode:
@@ -483,6 +565,8 @@ def run(
       return_full_episode_data=return_full_episode_data,
       process_episodes_fn=process_episodes_fn,
       check_episode_fn=check_episode_fn,
+      summary_every_n=summary_every_n,
+      episode_finished_fn=episode_finished,
   )
 
   return results
@@ -588,6 +672,11 @@ def _update_scoreboard(
 
 def _extract_task_metadata() -> pd.DataFrame:
   """Extracts metadata from task_metadata.json."""
+  return _read_task_metadata().copy()
+
+
+@functools.cache
+def _read_task_metadata() -> pd.DataFrame:
   name = 'task_metadata.json'
   filepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
   df = pd.read_json(filepath)
@@ -15,6 +15,8 @@
 """Tests for suite utils."""
 
 import copy
+import os
+import tempfile
 import time
 from typing import Any
 from unittest import mock
@@ -29,6 +31,7 @@ from android_world.agents import base_agent
 from android_world.env import adb_utils
 from android_world.env import interface
 from android_world.utils import test_utils
+from android_world.utils import tracing
 import dm_env
 import numpy as np
 
@@ -305,6 +308,44 @@ class SuiteUtilsTest(parameterized.TestCase):
 
     self.assertIsNone(result[constants.EpisodeConstants.EXCEPTION_INFO])
 
+  def test_run_task_records_phase_durations(self):
+    self.addCleanup(tracing.configure, enabled=False)
+    trace_path = os.path.join(tempfile.mkdtemp(), 'trace.json')
+    tracing.configure(chrome_trace_path=trace_path)
+
+    def run_episode(task):
+      del task
+      with tracing.span('agent.step'):
+        pass
+      return episode_runner.EpisodeResult(
+          done=True, step_data={'step_number': [0]}, aux_data={'key': 1}
+      )
+
+    result = suite_utils._run_task(
+        test_utils.FakeMiniWobTask(
+            test_utils.FakeMiniWobTask.generate_random_params()
+        ),
+        run_episode,
+        mock.MagicMock(),
+        demo_mode=False,
+    )
+
+    aux_data = result[constants.EpisodeConstants.AUX_DATA]
+    self.assertEqual(aux_data['key'], 1)
+    self.assertContainsSubset(
+        [
+            'initialize_task',
+            'run_episode',
+            'agent.step',
+            'is_successful',
+            'tear_down',
+        ],
+        aux_data[tracing.AUX_DATA_KEY],
+    )
+    events = tracing.read_chrome_trace(trace_path)
+    self.assertLen(events, 5)
+    self.assertEqual(events[0]['args'], {'task': result['task_template']})
+
   def test_run_adb_task_instances_initialize_fails(self):
     mock_run_e2e = mock.MagicMock()
     mock_run_e2e.return_value = episode_runner.EpisodeResult(
@@ -368,9 +409,32 @@ class SuiteUtilsTest(parameterized.TestCase):
         tasks=tasks,
     )
 
-    results = suite_utils.run(suite, agent=mock_agent, demo_mode=False)
+    results = suite_utils.run(
+        suite, agent=mock_agent, demo_mode=False, step_deadline_sec=30.0
+    )
 
     mock_run_suite.assert_called_once()
+    run_episode = mock_run_suite.call_args.args[1]
+    with mock.patch.object(episode_runner, 'run_episode') as mock_run_episode:
+      run_episode(suite['Task1'][0])
+    self.assertEqual(
+        mock_run_episode.call_args.kwargs['step_deadline_sec'], 30.0
+    )
+    episode_finished_fn = mock_run_suite.call_args.kwargs['episode_finished_fn']
+    episode_finished_fn({
+        constants.EpisodeConstants.GOAL: 'Goal',
+        constants.EpisodeConstants.IS_SUCCESSFUL: 1.0,
+        constants.EpisodeConstants.EXCEPTION_INFO: None,
+    })
+    episode_finished_fn({
+        constants.EpisodeConstants.GOAL: 'Goal',
+        constants.EpisodeConstants.IS_SUCCESSFUL: np.nan,
+        constants.EpisodeConstants.EXCEPTION_INFO: 'Traceback',
+    })
+    self.assertEqual(
+        mock_agent.episode_finished.call_args_list,
+        [mock.call('Goal', 1.0), mock.call('Goal', None)],
+    )
     self.assertLen(results, 2)
     for result in results:
       self.assertEqual(result[constants.EpisodeConstants.GOAL], 'Goal')
@@ -439,11 +503,53 @@ class RunTaskSuiteTest(absltest.TestCase):
         },
     )
     suite.suite_family = 'android'
+    episode_finished_fn = mock.MagicMock()
     result = suite_utils._run_task_suite(
-        suite, mock_run_e2e, mock_env, demo_mode=False
+        suite,
+        mock_run_e2e,
+        mock_env,
+        demo_mode=False,
+        episode_finished_fn=episode_finished_fn,
     )
 
     self.assertTaskResults(result)
+    self.assertEqual(
+        [
+            call.args[0][constants.EpisodeConstants.IS_SUCCESSFUL]
+            for call in episode_finished_fn.call_args_list
+        ],
+        [0, 1, 1],
+    )
+
+  @mock.patch.object(interface, 'AsyncAndroidEnv')
+  def test_interrupted_run_flushes_checkpointer(self, mock_env):
+    mock_checkpointer = mock.create_autospec(
+        checkpointer.Checkpointer, instance=True
+    )
+    mock_checkpointer.load.return_value = []
+    mock_run_e2e = mock.MagicMock(
+        side_effect=[
+            episode_runner.EpisodeResult(True, {'step_number': [0]}),
+            KeyboardInterrupt,
+        ]
+    )
+    suite = suite_utils.Suite(
+        Task1=[
+            test_utils.FakeCurrentStateEval(
+                test_utils.FakeCurrentStateEval.generate_random_params()
+            )
+            for _ in range(2)
+        ]
+    )
+    suite.suite_family = 'android'
+
+    with self.assertRaises(KeyboardInterrupt):
+      suite_utils._run_task_suite(
+          suite, mock_run_e2e, mock_env, checkpointer=mock_checkpointer
+      )
+
+    mock_checkpointer.save_episodes.assert_called_once()
+    mock_checkpointer.flush.assert_called_once()
 
   @mock.patch.object(time, 'sleep', autospec=True)
   @mock.patch.object(interface, 'AsyncAndroidEnv')
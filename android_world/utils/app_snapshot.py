@@ -19,6 +19,7 @@ from android_env import env_interface
 from android_world.env import adb_utils
 from android_world.env import device_constants
 from android_world.utils import file_utils
+from android_world.utils import metrics
 
 
 def _app_data_path(app_name: str) -> str:
@@ -77,6 +78,24 @@ def save_snapshot(app_name: str, env: env_interface.AndroidEnvInterface):
 
 
 def restore_snapshot(app_name: str, env: env_interface.AndroidEnvInterface):
+  """Loads a snapshot of application data, timing it in `metrics`.
+
+  Args:
+    app_name: App package that will have its data overwritten with the stored
+      snapshot.
+    env: Android environment.
+
+  Raises:
+    RuntimeError: when there is no available snapshot or a failure occurs while
+      loading the snapshot.
+  """
+  with metrics.SNAPSHOT_RESTORE.time(app=app_name):
+    _restore_snapshot(app_name, env)
+
+
+def _restore_snapshot(
+    app_name: str, env: env_interface.AndroidEnvInterface
+) -> None:
   """Loads a snapshot of application data.
 
   Args:
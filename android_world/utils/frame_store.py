@@ -0,0 +1,209 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Deduplicated storage of screenshots for episode checkpoints.
+
+Screenshots are the bulk of episode data, and consecutive steps, as well as
+episodes of a run, often repeat frames. A `FrameStore` keeps each distinct
+frame once, as a PNG file named by the hash of its pixels, and episode data
+references frames by `FrameRef`. When episode data is loaded, frames are only
+decoded when they are accessed.
+"""
+
+import collections
+from collections.abc import Iterator, Sequence
+import dataclasses
+import hashlib
+import io
+import os
+import threading
+from typing import Any
+
+import numpy as np
+from PIL import Image
+
+# Fast PNG compression: most of the size reduction comes from deduplication.
+_PNG_COMPRESS_LEVEL = 1
+# Smallest side of an array that is stored as a frame.
+_MIN_FRAME_SIZE = 16
+# Number of decoded frames kept in memory per store.
+_DECODED_CACHE_SIZE = 16
+
+
+@dataclasses.dataclass(frozen=True)
+class FrameRef:
+  """Reference to a frame in a `FrameStore`."""
+
+  frame_id: str
+
+
+def is_frame(value: Any) -> bool:
+  """Returns whether a value is an image that is stored as a frame."""
+  return (
+      isinstance(value, np.ndarray)
+      and value.dtype == np.uint8
+      and value.ndim == 3
+      and value.shape[2] in (3, 4)
+      and min(value.shape[:2]) >= _MIN_FRAME_SIZE
+  )
+
+
+def frame_id(frame: np.ndarray) -> str:
+  """Returns the ID of a frame: a hash of its shape and pixels."""
+  digest = hashlib.blake2b(digest_size=16)
+  digest.update(repr(frame.shape).encode())
+  digest.update(np.ascontiguousarray(frame).data)
+  return digest.hexdigest()
+
+
+class FrameStore:
+  """Stores frames in a directory, one PNG file per distinct frame."""
+
+  def __init__(self, directory: str):
+    self.directory = directory
+    self._lock = threading.Lock()
+    self._known_ids = set()
+    self._decoded = collections.OrderedDict()
+
+  def _path(self, frame_id_: str) -> str:
+    return os.path.join(self.directory, f'{frame_id_}.png')
+
+  def path(self, ref: FrameRef) -> str:
+    """Returns the path of the PNG file of a stored frame."""
+    return self._path(ref.frame_id)
+
+  def put(self, frame: np.ndarray) -> FrameRef:
+    """Stores a frame, unless an identical frame is already stored."""
+    ref = FrameRef(frame_id(frame))
+    with self._lock:
+      if ref.frame_id in self._known_ids:
+        return ref
+    path = self._path(ref.frame_id)
+    if not os.path.exists(path):
+      os.makedirs(self.directory, exist_ok=True)
+      buffer = io.BytesIO()
+      Image.fromarray(frame).save(
+          buffer, format='PNG', compress_level=_PNG_COMPRESS_LEVEL
+      )
+      # Written under a unique name and renamed, so readers, and writers of the
+      # same frame, never see a partial file.
+      temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+      with open(temp_path, 'wb') as f:
+        f.write(buffer.getvalue())
+      os.replace(temp_path, path)
+    with self._lock:
+      self._known_ids.add(ref.frame_id)
+    return ref
+
+  def get(self, ref: FrameRef) -> np.ndarray:
+    """Decodes a frame."""
+    with self._lock:
+      if ref.frame_id in self._decoded:
+        self._decoded.move_to_end(ref.frame_id)
+        return self._decoded[ref.frame_id]
+    with Image.open(self._path(ref.frame_id)) as image:
+      frame = np.asarray(image)
+    frame.flags.writeable = False  # Shared by all accesses to the frame.
+    with self._lock:
+      self._decoded[ref.frame_id] = frame
+      while len(self._decoded) > _DECODED_CACHE_SIZE:
+        self._decoded.popitem(last=False)
+    return frame
+
+  def __getstate__(self) -> dict[str, Any]:
+    return {'directory': self.directory}
+
+  def __setstate__(self, state: dict[str, Any]) -> None:
+    self.__init__(state['directory'])
+
+
+class LazyFrames(Sequence):
+  """A list of step values whose frames are decoded on access."""
+
+  def __init__(self, items: list[Any], store: FrameStore):
+    self.items = items
+    self.store = store
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      return LazyFrames(self.items[index], self.store)
+    item = self.items[index]
+    return self.store.get(item) if isinstance(item, FrameRef) else item
+
+  def __len__(self) -> int:
+    return len(self.items)
+
+  def __iter__(self) -> Iterator[Any]:
+    for i in range(len(self.items)):
+      yield self[i]
+
+  def __repr__(self) -> str:
+    return f'LazyFrames({self.items!r})'
+
+
+def _encode_value(value: Any, store: FrameStore) -> Any:
+  if isinstance(value, LazyFrames):
+    if value.store.directory == store.directory:
+      return list(value.items)
+    value = list(value)
+  if is_frame(value):
+    return store.put(value)
+  if isinstance(value, list):
+    return [_encode_value(item, store) for item in value]
+  return value
+
+
+def encode_frames(
+    step_data: dict[str, Any], store: FrameStore
+) -> dict[str, Any]:
+  """Replaces the frames of step data with references to the stored frames.
+
+  Args:
+    step_data: Step data, mapping each key to a value or a list of values per
+      step.
+    store: Where the frames are stored.
+
+  Returns:
+    A copy of the step data with frames replaced by `FrameRef`s.
+  """
+  return {key: _encode_value(value, store) for key, value in step_data.items()}
+
+
+def _has_frame_ref(value: list[Any]) -> bool:
+  return any(isinstance(item, FrameRef) for item in value)
+
+
+def decode_frames(
+    step_data: dict[str, Any], store: FrameStore
+) -> dict[str, Any]:
+  """Makes the referenced frames of step data accessible as arrays.
+
+  Frames are decoded when accessed, not by this function.
+
+  Args:
+    step_data: Step data, as returned by `encode_frames`.
+    store: Where the frames are stored.
+
+  Returns:
+    A copy of the step data where lists holding frame references are
+    `LazyFrames`.
+  """
+  decoded = {}
+  for key, value in step_data.items():
+    if isinstance(value, FrameRef):
+      value = store.get(value)
+    elif isinstance(value, list) and _has_frame_ref(value):
+      value = LazyFrames(value, store)
+    decoded[key] = value
+  return decoded
@@ -0,0 +1,112 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import pickle
+import tempfile
+
+from absl.testing import absltest
+from android_world.utils import frame_store
+import numpy as np
+
+
+def _frame(value: int) -> np.ndarray:
+  frame = np.zeros((32, 24, 3), dtype=np.uint8)
+  frame[:, :, 0] = value
+  frame[5, 7] = (1, 2, 3)
+  return frame
+
+
+class FrameStoreTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.directory = os.path.join(tempfile.mkdtemp(), 'frames')
+    self.store = frame_store.FrameStore(self.directory)
+
+  def test_put_and_get(self):
+    frame = _frame(10)
+
+    ref = self.store.put(frame)
+
+    np.testing.assert_array_equal(self.store.get(ref), frame)
+    np.testing.assert_array_equal(
+        frame_store.FrameStore(self.directory).get(ref), frame
+    )
+
+  def test_identical_frames_are_stored_once(self):
+    refs = [self.store.put(_frame(10)) for _ in range(3)]
+    refs.append(frame_store.FrameStore(self.directory).put(_frame(10)))
+    other = self.store.put(_frame(20))
+
+    self.assertLen(set(refs), 1)
+    self.assertNotEqual(refs[0], other)
+    self.assertLen(os.listdir(self.directory), 2)
+
+  def test_is_frame(self):
+    self.assertTrue(frame_store.is_frame(_frame(1)))
+    self.assertFalse(frame_store.is_frame(_frame(1).astype(np.float32)))
+    self.assertFalse(frame_store.is_frame(np.zeros((4, 4, 3), np.uint8)))
+    self.assertFalse(frame_store.is_frame(np.zeros((32, 32), np.uint8)))
+    self.assertFalse(frame_store.is_frame([[1, 2]]))
+
+
+class EncodeFramesTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.store = frame_store.FrameStore(tempfile.mkdtemp())
+
+  def test_round_trip(self):
+    step_data = {
+        'raw_screenshot': [_frame(1), _frame(2), None],
+        'summary': ['a', 'b', 'c'],
+        'last_screenshot': _frame(3),
+        'step_number': [0, 1, 2],
+    }
+
+    encoded = frame_store.encode_frames(step_data, self.store)
+    encoded = pickle.loads(pickle.dumps(encoded))
+    decoded = frame_store.decode_frames(encoded, self.store)
+
+    self.assertIsInstance(encoded['raw_screenshot'][0], frame_store.FrameRef)
+    self.assertIsNone(encoded['raw_screenshot'][2])
+    self.assertEqual(decoded['summary'], ['a', 'b', 'c'])
+    self.assertEqual(decoded['step_number'], [0, 1, 2])
+    self.assertIsInstance(decoded['raw_screenshot'], frame_store.LazyFrames)
+    self.assertLen(decoded['raw_screenshot'], 3)
+    np.testing.assert_array_equal(decoded['raw_screenshot'][1], _frame(2))
+    np.testing.assert_array_equal(decoded['raw_screenshot'][-2], _frame(2))
+    self.assertIsNone(decoded['raw_screenshot'][2])
+    np.testing.assert_array_equal(decoded['last_screenshot'], _frame(3))
+    self.assertLen(list(decoded['raw_screenshot']), 3)
+
+  def test_decoded_frames_can_be_encoded_again(self):
+    decoded = frame_store.decode_frames(
+        frame_store.encode_frames({'screenshot': [_frame(1)]}, self.store),
+        self.store,
+    )
+    other_store = frame_store.FrameStore(tempfile.mkdtemp())
+
+    same = frame_store.encode_frames(decoded, self.store)
+    other = frame_store.encode_frames(decoded, other_store)
+
+    self.assertEqual(same['screenshot'], other['screenshot'])
+    np.testing.assert_array_equal(
+        other_store.get(other['screenshot'][0]), _frame(1)
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
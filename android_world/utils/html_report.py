@@ -0,0 +1,423 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""HTML report of a run, streamed from its checkpoint directory.
+
+Unlike `m3a_utils.generate_eval_html_report` and
+`seeact_utils.generate_full_report`, which build one HTML string with every
+screenshot inlined as base64, the report is a directory: paginated index pages,
+one page per episode, and screenshots as external JPEG files, each distinct
+screenshot written once. Task groups are loaded one at a time and screenshots
+are encoded by a process pool.
+
+Writing the report again into the same directory only renders the task groups
+saved since, so it can be refreshed while the run is in progress.
+"""
+
+import concurrent.futures
+import html
+import json
+import math
+import os
+import threading
+from typing import Any
+
+from absl import logging
+from android_world import checkpointer as checkpointer_lib
+from android_world import constants
+from android_world.utils import frame_store
+import numpy as np
+from PIL import Image
+
+INDEX_FILENAME = 'index.html'
+STATE_FILENAME = 'report_state.json'
+EPISODES_DIRECTORY = 'episodes'
+IMAGES_DIRECTORY = 'images'
+DEFAULT_PAGE_SIZE = 50
+
+_STATE_VERSION = 1
+_JPEG_QUALITY = 85
+# Screenshots queued for encoding per worker, bounding the frames in memory.
+_MAX_PENDING_PER_WORKER = 4
+# Step values rendered as text; others, e.g. UI element lists, are omitted.
+_TEXT_TYPES = (str, int, float, bool, dict)
+_STYLE = """
+body { font-family: sans-serif; word-wrap: break-word; background: #d9ead3; }
+table.episodes { border-collapse: collapse; }
+table.episodes td, table.episodes th { border: 1px solid #999; padding: 2px 6px; }
+.success { color: green; } .fail { color: red; } .error { color: darkorange; }
+.step { border-top: 1px solid #999; margin-top: 8px; }
+.step img { margin: 4px; border: 1px solid #999; }
+pre { white-space: pre-wrap; }
+"""
+
+
+def _write_text_atomic(path: str, text: str) -> None:
+  temp_path = f'{path}.{os.getpid()}.tmp'
+  with open(temp_path, 'w', encoding='utf-8') as f:
+    f.write(text)
+  os.replace(temp_path, path)
+
+
+def _save_jpeg(image: Image.Image, path: str) -> None:
+  temp_path = f'{path}.{os.getpid()}.tmp'
+  image.convert('RGB').save(temp_path, format='JPEG', quality=_JPEG_QUALITY)
+  os.replace(temp_path, path)
+
+
+def _encode_frame(frame: np.ndarray, path: str) -> None:
+  """Writes a frame as a JPEG file; runs in a worker process."""
+  _save_jpeg(Image.fromarray(frame), path)
+
+
+def _convert_stored_frame(source: str, path: str) -> None:
+  """Converts a frame stored as PNG to a JPEG file; runs in a worker process."""
+  with Image.open(source) as image:
+    _save_jpeg(image, path)
+
+
+class _ImageWriter:
+  """Writes the screenshots of a report, each distinct screenshot once."""
+
+  def __init__(self, directory: str, num_workers: int | None):
+    self.directory = directory
+    os.makedirs(directory, exist_ok=True)
+    self._written = set(os.listdir(directory))
+    self._pool = None
+    if num_workers != 0:
+      num_workers = num_workers or os.cpu_count() or 1
+      self._pool = concurrent.futures.ProcessPoolExecutor(num_workers)
+      self._max_pending = num_workers * _MAX_PENDING_PER_WORKER
+    self._pending = set()
+
+  def add(self, value: Any, store: frame_store.FrameStore | None) -> str:
+    """Queues a screenshot to be written and returns its filename.
+
+    Args:
+      value: A frame, or a `FrameRef` to a frame of `store`.
+      store: The store of the referenced frames.
+
+    Returns:
+      The filename of the screenshot, relative to the images directory.
+    """
+    if isinstance(value, frame_store.FrameRef):
+      filename = f'{value.frame_id}.jpg'
+      args = (_convert_stored_frame, store.path(value))
+    else:
+      filename = f'{frame_store.frame_id(value)}.jpg'
+      args = (_encode_frame, value)
+    if filename in self._written:
+      return filename
+    self._written.add(filename)
+    path = os.path.join(self.directory, filename)
+    if self._pool is None:
+      args[0](args[1], path)
+      return filename
+    if len(self._pending) >= self._max_pending:
+      done, self._pending = concurrent.futures.wait(
+          self._pending, return_when=concurrent.futures.FIRST_COMPLETED
+      )
+      for future in done:
+        future.result()
+    self._pending.add(self._pool.submit(*args, path))
+    return filename
+
+  def close(self) -> None:
+    """Waits until all screenshots are written."""
+    if self._pool is None:
+      return
+    try:
+      for future in concurrent.futures.as_completed(self._pending):
+        future.result()
+    finally:
+      self._pending = set()
+      self._pool.shutdown()
+
+
+def _status(episode: dict[str, Any]) -> str:
+  if episode.get(constants.EpisodeConstants.EXCEPTION_INFO) is not None:
+    return 'error'
+  success = episode.get(constants.EpisodeConstants.IS_SUCCESSFUL)
+  try:
+    return 'success' if float(success) > 0.5 else 'fail'
+  except (TypeError, ValueError):
+    return 'fail'
+
+
+def _format_number(value: Any, fmt: str) -> str:
+  try:
+    value = float(value)
+  except (TypeError, ValueError):
+    return '-'
+  return '-' if math.isnan(value) else format(value, fmt)
+
+
+def _page_head(title: str, refresh_seconds: int | None = None) -> str:
+  refresh = ''
+  if refresh_seconds:
+    refresh = f'<meta http-equiv="refresh" content="{int(refresh_seconds)}">'
+  return (
+      '<!DOCTYPE html><html><head><meta charset="utf-8">'
+      f'{refresh}<title>{html.escape(title)}</title>'
+      f'<style>{_STYLE}</style></head><body>'
+  )
+
+
+class _EpisodeRenderer:
+  """Renders the page of an episode, queuing its screenshots."""
+
+  def __init__(self, images: _ImageWriter):
+    self.images = images
+
+  def _render_value(
+      self, key: str, value: Any, store: frame_store.FrameStore | None
+  ) -> str:
+    if isinstance(value, frame_store.FrameRef) or frame_store.is_frame(value):
+      filename = self.images.add(value, store)
+      return (
+          f'<img src="../{IMAGES_DIRECTORY}/{filename}"'
+          f' title="{html.escape(key)}" alt="{html.escape(key)}" width="324">'
+      )
+    if isinstance(value, _TEXT_TYPES):
+      return (
+          f'<div><b>{html.escape(key)}</b>:'
+          f' <pre>{html.escape(str(value))}</pre></div>'
+      )
+    return ''
+
+  def render(self, episode: dict[str, Any], title: str) -> str:
+    """Returns the HTML page of an episode."""
+    status = _status(episode)
+    goal = html.escape(str(episode.get(constants.EpisodeConstants.GOAL)))
+    run_time = _format_number(
+        episode.get(constants.EpisodeConstants.RUN_TIME), '.1f'
+    )
+    steps = _format_number(
+        episode.get(constants.EpisodeConstants.EPISODE_LENGTH), '.0f'
+    )
+    parts = [
+        _page_head(title),
+        f'<p><a href="../{INDEX_FILENAME}">Index</a></p>',
+        f'<h1>{html.escape(title)} <span class="{status}">{status}</span></h1>',
+        f'<p>Goal: {goal}<br>Duration: {run_time} seconds<br>Steps: {steps}'
+        '</p>',
+    ]
+    exception_info = episode.get(constants.EpisodeConstants.EXCEPTION_INFO)
+    if exception_info is not None:
+      parts.append(f'<pre>{html.escape(str(exception_info))}</pre>')
+
+    data = episode.get(constants.EpisodeConstants.EPISODE_DATA)
+    if isinstance(data, dict):
+      per_step = {}
+      for key, value in data.items():
+        if isinstance(value, frame_store.LazyFrames):
+          # Stored frames are converted without being decoded here.
+          per_step[key] = (value.items, value.store)
+        elif isinstance(value, (list, tuple)):
+          per_step[key] = (value, None)
+        else:
+          parts.append(self._render_value(key, value, None))
+      num_steps = max((len(v) for v, _ in per_step.values()), default=0)
+      for i in range(num_steps):
+        texts, images = [], []
+        for key, (values, store) in per_step.items():
+          if i >= len(values) or values[i] is None:
+            continue
+          rendered = self._render_value(key, values[i], store)
+          (images if rendered.startswith('<img') else texts).append(rendered)
+        parts.append(
+            f'<div class="step"><h3>Step {i}</h3>{"".join(texts)}'
+            f'<div>{"".join(images)}</div></div>'
+        )
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def _episode_filename(task_name: str, index: int) -> str:
+  return f'{task_name}{checkpointer_lib.INSTANCE_SEPARATOR}{index}.html'
+
+
+def _render_index(
+    rows: list[dict[str, Any]],
+    page_size: int,
+    title: str,
+    refresh_seconds: int | None,
+) -> dict[str, str]:
+  """Returns the HTML of each index page, by filename."""
+  num_pages = max(1, math.ceil(len(rows) / page_size))
+  filenames = [INDEX_FILENAME] + [
+      f'index_{page + 1}.html' for page in range(1, num_pages)
+  ]
+  num_success = sum(row['status'] == 'success' for row in rows)
+  num_error = sum(row['status'] == 'error' for row in rows)
+  num_scored = len(rows) - num_error
+  rate = num_success / num_scored if num_scored else 0.0
+  summary = (
+      f'<p>{len(rows)} episodes: {num_success}/{num_scored} successful'
+      f' ({rate:.1%}), {num_error} with errors.</p>'
+  )
+  navigation = ' '.join(
+      f'<a href="{filename}">{page + 1}</a>'
+      for page, filename in enumerate(filenames)
+  )
+  pages = {}
+  for page, filename in enumerate(filenames):
+    parts = [
+        _page_head(title, refresh_seconds),
+        f'<h1>{html.escape(title)}</h1>',
+        summary,
+        f'<p>Page {page + 1} of {num_pages}: {navigation}</p>',
+        '<table class="episodes"><tr><th>#</th><th>Task</th><th>Goal</th>'
+        '<th>Status</th><th>Steps</th><th>Runtime (s)</th></tr>',
+    ]
+    for number, row in enumerate(
+        rows[page * page_size : (page + 1) * page_size],
+        start=page * page_size + 1,
+    ):
+      parts.append(
+          f'<tr><td>{number}</td><td><a'
+          f' href="{EPISODES_DIRECTORY}/{html.escape(row["page"])}">'
+          f'{html.escape(row["task"])}</a></td>'
+          f'<td>{html.escape(row["goal"])}</td>'
+          f'<td class="{row["status"]}">{row["status"]}</td>'
+          f'<td>{row["steps"]}</td><td>{row["runtime"]}</td></tr>'
+      )
+    parts.append('</table></body></html>')
+    pages[filename] = ''.join(parts)
+  return pages
+
+
+def _load_state(path: str, options: dict[str, Any]) -> dict[str, Any]:
+  try:
+    with open(path, 'r', encoding='utf-8') as f:
+      state = json.load(f)
+  except (OSError, ValueError):
+    state = None
+  if (
+      not state
+      or state.get('version') != _STATE_VERSION
+      or state.get('options') != options
+  ):
+    return {'version': _STATE_VERSION, 'options': options, 'task_groups': {}}
+  return state
+
+
+_report_locks: dict[str, threading.Lock] = {}
+_report_locks_lock = threading.Lock()
+
+
+def write_report(
+    checkpoint_dir: str,
+    output_dir: str,
+    title: str = 'AndroidWorld run',
+    page_size: int = DEFAULT_PAGE_SIZE,
+    fail_only: bool = False,
+    num_workers: int | None = None,
+    refresh_seconds: int | None = None,
+) -> str:
+  """Writes or refreshes the HTML report of a run.
+
+  Args:
+    checkpoint_dir: Directory of an `IncrementalCheckpointer`, possibly of a
+      run in progress.
+    output_dir: Directory of the report. Task groups already rendered there,
+      and not saved again since, are not rendered again.
+    title: Title of the report.
+    page_size: Number of episodes per index page.
+    fail_only: Whether to leave out successful episodes.
+    num_workers: Processes encoding screenshots; the number of CPUs if None,
+      or encode in this process if 0.
+    refresh_seconds: If set, index pages reload themselves at this interval,
+      e.g. while the report is refreshed during a run.
+
+  Returns:
+    The path of the first index page.
+  """
+  key = os.path.abspath(output_dir)
+  with _report_locks_lock:
+    lock = _report_locks.setdefault(key, threading.Lock())
+  with lock:
+    episodes_dir = os.path.join(output_dir, EPISODES_DIRECTORY)
+    os.makedirs(episodes_dir, exist_ok=True)
+    state_path = os.path.join(output_dir, STATE_FILENAME)
+    state = _load_state(state_path, {'fail_only': fail_only})
+    checkpointer = checkpointer_lib.IncrementalCheckpointer(
+        checkpoint_dir, store_frames=False
+    )
+    entries = checkpointer.task_group_entries()
+    changed = [
+        entry
+        for entry in entries
+        if state['task_groups'].get(entry['task_name'], {}).get('entry')
+        != entry
+    ]
+    images = _ImageWriter(
+        os.path.join(output_dir, IMAGES_DIRECTORY), num_workers
+    )
+    renderer = _EpisodeRenderer(images)
+    try:
+      for entry, episodes in checkpointer.iter_task_groups(changed):
+        task_name = entry['task_name']
+        old_rows = state['task_groups'].get(task_name, {}).get('rows', [])
+        rows = []
+        for index, episode in enumerate(episodes):
+          status = _status(episode)
+          if fail_only and status == 'success':
+            continue
+          page = _episode_filename(task_name, index)
+          _write_text_atomic(
+              os.path.join(episodes_dir, page),
+              renderer.render(episode, f'{task_name} #{index}'),
+          )
+          rows.append({
+              'page': page,
+              'task': str(
+                  episode.get(constants.EpisodeConstants.TASK_TEMPLATE)
+              ),
+              'goal': str(episode.get(constants.EpisodeConstants.GOAL, '')),
+              'status': status,
+              'steps': _format_number(
+                  episode.get(constants.EpisodeConstants.EPISODE_LENGTH),
+                  '.0f',
+              ),
+              'runtime': _format_number(
+                  episode.get(constants.EpisodeConstants.RUN_TIME), '.1f'
+              ),
+          })
+        # Pages of episodes no longer in the task group.
+        pages = {row['page'] for row in rows}
+        for row in old_rows:
+          if row['page'] not in pages:
+            path = os.path.join(episodes_dir, row['page'])
+            if os.path.exists(path):
+              os.remove(path)
+        state['task_groups'][task_name] = {'entry': entry, 'rows': rows}
+        logging.info('Rendered %d episodes of %s', len(rows), task_name)
+    finally:
+      # Pages are only indexed once their screenshots are written.
+      images.close()
+
+    rows = []
+    for entry in entries:
+      rows.extend(
+          state['task_groups'].get(entry['task_name'], {}).get('rows', [])
+      )
+    index_pages = _render_index(rows, page_size, title, refresh_seconds)
+    for filename, page in index_pages.items():
+      _write_text_atomic(os.path.join(output_dir, filename), page)
+    for filename in os.listdir(output_dir):
+      if filename.startswith('index_') and filename not in index_pages:
+        os.remove(os.path.join(output_dir, filename))
+    _write_text_atomic(state_path, json.dumps(state))
+  return os.path.join(output_dir, INDEX_FILENAME)
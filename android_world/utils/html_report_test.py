@@ -0,0 +1,158 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+
+from absl.testing import absltest
+from android_world import checkpointer as checkpointer_lib
+from android_world import constants
+from android_world.utils import html_report
+import numpy as np
+
+
+def _frame(value: int) -> np.ndarray:
+  frame = np.zeros((48, 32, 3), dtype=np.uint8)
+  frame[:, :, 1] = value
+  return frame
+
+
+def _episode(
+    template: str,
+    success: float,
+    frames: list[int],
+    exception_info: str | None = None,
+):
+  return {
+      constants.EpisodeConstants.TASK_TEMPLATE: template,
+      constants.EpisodeConstants.GOAL: f'Goal of {template} <b>',
+      constants.EpisodeConstants.IS_SUCCESSFUL: success,
+      constants.EpisodeConstants.EPISODE_LENGTH: len(frames),
+      constants.EpisodeConstants.RUN_TIME: 12.34,
+      constants.EpisodeConstants.EXCEPTION_INFO: exception_info,
+      constants.EpisodeConstants.EPISODE_DATA: {
+          'raw_screenshot': [_frame(v) for v in frames],
+          'summary': [f'Step {i} summary' for i in range(len(frames))],
+          'ui_elements': [object() for _ in frames],
+      },
+  }
+
+
+class WriteReportTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.run_dir = tempfile.mkdtemp()
+    self.report_dir = os.path.join(tempfile.mkdtemp(), 'report')
+    self.checkpointer = checkpointer_lib.IncrementalCheckpointer(self.run_dir)
+
+  def _read(self, *path: str) -> str:
+    with open(os.path.join(self.report_dir, *path), encoding='utf-8') as f:
+      return f.read()
+
+  def test_report(self):
+    self.checkpointer.save_episodes([_episode('TaskA', 1.0, [1, 2, 1])], 'A_0')
+    self.checkpointer.save_episodes([_episode('TaskB', 0.0, [2, 3])], 'B_0')
+
+    index = html_report.write_report(
+        self.run_dir, self.report_dir, num_workers=0
+    )
+
+    self.assertEqual(index, os.path.join(self.report_dir, 'index.html'))
+    index_html = self._read('index.html')
+    self.assertIn('2 episodes: 1/2 successful (50.0%)', index_html)
+    self.assertIn('episodes/A_0_0.html', index_html)
+    self.assertIn('Goal of TaskA &lt;b&gt;', index_html)
+    page = self._read('episodes', 'B_0_0.html')
+    self.assertIn('Step 1 summary', page)
+    self.assertNotIn('base64', page)
+    self.assertNotIn('object at', page)
+    self.assertIn('<img src="../images/', page)
+    # Three distinct frames across both episodes.
+    self.assertLen(os.listdir(os.path.join(self.report_dir, 'images')), 3)
+
+  def test_refresh_only_renders_new_task_groups(self):
+    self.checkpointer.save_episodes([_episode('TaskA', 1.0, [1])], 'A_0')
+    html_report.write_report(self.run_dir, self.report_dir, num_workers=0)
+    os.remove(os.path.join(self.report_dir, 'episodes', 'A_0_0.html'))
+
+    self.checkpointer.save_episodes(
+        [_episode('TaskB', np.nan, [], 'Traceback: boom')], 'B_0'
+    )
+    html_report.write_report(self.run_dir, self.report_dir, num_workers=0)
+
+    self.assertFalse(
+        os.path.exists(os.path.join(self.report_dir, 'episodes', 'A_0_0.html'))
+    )
+    self.assertIn('Traceback: boom', self._read('episodes', 'B_0_0.html'))
+    self.assertIn(
+        '2 episodes: 1/1 successful (100.0%), 1 with errors',
+        self._read('index.html'),
+    )
+
+  def test_task_group_saved_again_is_rendered_again(self):
+    self.checkpointer.save_episodes(
+        [_episode('TaskA', np.nan, [], 'Traceback')], 'A_0'
+    )
+    html_report.write_report(self.run_dir, self.report_dir, num_workers=0)
+
+    self.checkpointer.save_episodes([_episode('TaskA', 1.0, [1])], 'A_0')
+    html_report.write_report(self.run_dir, self.report_dir, num_workers=0)
+
+    self.assertNotIn('Traceback', self._read('episodes', 'A_0_0.html'))
+    self.assertIn('1 episodes: 1/1 successful', self._read('index.html'))
+
+  def test_pagination_and_fail_only(self):
+    for i in range(5):
+      self.checkpointer.save_episodes(
+          [_episode('TaskA', float(i % 2), [i])], f'A_{i}'
+      )
+
+    html_report.write_report(
+        self.run_dir,
+        self.report_dir,
+        page_size=2,
+        fail_only=True,
+        num_workers=0,
+    )
+
+    self.assertIn('3 episodes', self._read('index.html'))
+    self.assertIn('Page 1 of 2', self._read('index.html'))
+    self.assertIn('A_4_0.html', self._read('index_2.html'))
+    self.assertNotIn('A_1_0.html', self._read('index.html'))
+
+  def test_process_pool(self):
+    self.checkpointer.save_episodes(
+        [_episode('TaskA', 1.0, list(range(6)))], 'A_0'
+    )
+    raw_checkpointer = checkpointer_lib.IncrementalCheckpointer(
+        tempfile.mkdtemp(), store_frames=False
+    )
+    raw_checkpointer.save_episodes([_episode('TaskA', 1.0, [0, 9])], 'A_0')
+
+    html_report.write_report(self.run_dir, self.report_dir, num_workers=2)
+    html_report.write_report(
+        raw_checkpointer.directory, self.report_dir + '_raw', num_workers=2
+    )
+
+    images = os.listdir(os.path.join(self.report_dir, 'images'))
+    self.assertLen(images, 6)
+    self.assertTrue(all(image.endswith('.jpg') for image in images))
+    self.assertLen(
+        os.listdir(os.path.join(self.report_dir + '_raw', 'images')), 2
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
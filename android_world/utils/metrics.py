@@ -0,0 +1,361 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Live throughput and health metrics in the Prometheus text format.
+
+The instruments below are updated by the code they measure, e.g.
+
+  with metrics.STEP_LATENCY.time():
+    agent.step(goal)
+
+and rendered by `REGISTRY.render()` in the Prometheus text exposition format,
+which OpenMetrics scrapers also accept. The FastAPI server serves them at
+`/metrics`; `serve` starts a sidecar HTTP server doing the same, e.g. for
+run.py. Only the standard library is used, so recording needs no extra
+dependency and is cheap enough to be always on.
+"""
+
+import bisect
+from collections.abc import Callable, Iterator, Sequence
+import contextlib
+import http.server
+import math
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Histogram buckets, as upper bounds.
+LATENCY_BUCKETS_SEC = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+BYTES_BUCKETS = tuple(2**i * 1024 for i in range(6, 15, 2))
+
+
+def _format_value(value: float) -> str:
+  if math.isinf(value):
+    return '+Inf' if value > 0 else '-Inf'
+  if value == int(value):
+    return str(int(value))
+  return repr(float(value))
+
+
+def _escape(value: str) -> str:
+  return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+  if not names:
+    return ''
+  pairs = ','.join(
+      f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+  )
+  return '{' + pairs + '}'
+
+
+class Registry:
+  """Collection of metrics rendered together."""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._metrics: dict[str, '_Metric'] = {}
+
+  def register(self, metric: '_Metric') -> None:
+    with self._lock:
+      if metric.name in self._metrics:
+        raise ValueError(f'Metric {metric.name} is already registered.')
+      self._metrics[metric.name] = metric
+
+  def render(self) -> str:
+    """Returns all metrics in the Prometheus text exposition format."""
+    with self._lock:
+      metrics = list(self._metrics.values())
+    return ''.join(metric.render() for metric in metrics)
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+  """Metric with a value per combination of label values."""
+
+  type_name = ''
+
+  def __init__(
+      self,
+      name: str,
+      documentation: str,
+      labelnames: Sequence[str] = (),
+      registry: Registry | None = REGISTRY,
+  ):
+    self.name = name
+    self.documentation = documentation
+    self.labelnames = tuple(labelnames)
+    self._lock = threading.Lock()
+    self._values = {}
+    if registry is not None:
+      registry.register(self)
+
+  def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+    if labels.keys() != set(self.labelnames):
+      raise ValueError(
+          f'{self.name} expects labels {self.labelnames}, got {list(labels)}.'
+      )
+    return tuple(str(labels[name]) for name in self.labelnames)
+
+  def _samples(self) -> Iterator[tuple[str, str, float]]:
+    """Yields (name suffix, formatted labels, value) tuples."""
+    with self._lock:
+      values = dict(self._values)
+    for key, value in sorted(values.items()):
+      yield '', _format_labels(self.labelnames, key), value
+
+  def render(self) -> str:
+    lines = [
+        f'# HELP {self.name} {self.documentation}'.replace('\n', r'\n'),
+        f'# TYPE {self.name} {self.type_name}',
+    ]
+    for suffix, labels, value in self._samples():
+      lines.append(f'{self.name}{suffix}{labels} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+class Counter(_Metric):
+  """Monotonically increasing count."""
+
+  type_name = 'counter'
+
+  def inc(self, amount: float = 1.0, **labels: str) -> None:
+    if amount < 0:
+      raise ValueError('Counters can only increase.')
+    key = self._key(labels)
+    with self._lock:
+      self._values[key] = self._values.get(key, 0.0) + amount
+
+  def value(self, **labels: str) -> float:
+    with self._lock:
+      return self._values.get(self._key(labels), 0.0)
+
+  def total(self) -> float:
+    """Returns the sum over all label values."""
+    with self._lock:
+      return sum(self._values.values())
+
+
+class Gauge(_Metric):
+  """Value that goes up and down, set directly or computed when rendered."""
+
+  type_name = 'gauge'
+
+  def __init__(
+      self,
+      name: str,
+      documentation: str,
+      labelnames: Sequence[str] = (),
+      registry: Registry | None = REGISTRY,
+      function: Callable[[], float] | None = None,
+  ):
+    """Initializes the gauge.
+
+    Args:
+      name: Metric name.
+      documentation: Help text.
+      labelnames: Names of the labels.
+      registry: Registry rendering the gauge; none if None.
+      function: If set, computes the value of an unlabeled gauge when
+        rendered.
+    """
+    super().__init__(name, documentation, labelnames, registry)
+    self._function = function
+
+  def set(self, value: float, **labels: str) -> None:
+    key = self._key(labels)
+    with self._lock:
+      self._values[key] = float(value)
+
+  def value(self, **labels: str) -> float:
+    if self._function is not None:
+      return self._function()
+    with self._lock:
+      return self._values.get(self._key(labels), 0.0)
+
+  def _samples(self) -> Iterator[tuple[str, str, float]]:
+    if self._function is not None:
+      yield '', '', self._function()
+      return
+    yield from super()._samples()
+
+
+class Histogram(_Metric):
+  """Distribution of observed values in cumulative buckets."""
+
+  type_name = 'histogram'
+
+  def __init__(
+      self,
+      name: str,
+      documentation: str,
+      labelnames: Sequence[str] = (),
+      registry: Registry | None = REGISTRY,
+      buckets: Sequence[float] = LATENCY_BUCKETS_SEC,
+  ):
+    super().__init__(name, documentation, labelnames, registry)
+    self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+  def observe(self, value: float, **labels: str) -> None:
+    key = self._key(labels)
+    index = bisect.bisect_left(self.buckets, value)
+    with self._lock:
+      state = self._values.get(key)
+      if state is None:
+        # Per-bucket counts, then the sum of the observed values.
+        state = self._values[key] = [0] * len(self.buckets) + [0.0]
+      state[index] += 1
+      state[-1] += value
+
+  @contextlib.contextmanager
+  def time(self, **labels: str) -> Iterator[None]:
+    """Observes the duration of the block, in seconds."""
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.observe(time.perf_counter() - start, **labels)
+
+  def count(self, **labels: str) -> int:
+    with self._lock:
+      state = self._values.get(self._key(labels))
+      return sum(state[:-1]) if state else 0
+
+  def sum(self, **labels: str) -> float:
+    with self._lock:
+      state = self._values.get(self._key(labels))
+      return state[-1] if state else 0.0
+
+  def _samples(self) -> Iterator[tuple[str, str, float]]:
+    with self._lock:
+      values = {key: list(state) for key, state in self._values.items()}
+    names = self.labelnames + ('le',)
+    for key, state in sorted(values.items()):
+      cumulative = 0
+      for bound, count in zip(self.buckets, state):
+        cumulative += count
+        yield (
+            '_bucket',
+            _format_labels(names, key + (_format_value(bound),)),
+            cumulative,
+        )
+      labels = _format_labels(self.labelnames, key)
+      yield '_sum', labels, state[-1]
+      yield '_count', labels, cumulative
+
+
+_start_time = time.monotonic()
+
+EPISODES = Counter(
+    'android_world_episodes_total',
+    'Episodes run, by task template and outcome (success, failure, error).',
+    ('template', 'outcome'),
+)
+EPISODES_PER_HOUR = Gauge(
+    'android_world_episodes_per_hour',
+    'Episodes run per hour since the process started.',
+    function=lambda: EPISODES.total()
+    / max((time.monotonic() - _start_time) / 3600, 1e-9),
+)
+STEP_LATENCY = Histogram(
+    'android_world_agent_step_seconds', 'Duration of agent steps.'
+)
+LLM_LATENCY = Histogram(
+    'android_world_llm_request_seconds',
+    'Duration of LLM request attempts, by outcome (ok, error).',
+    ('outcome',),
+)
+ADB_LATENCY = Histogram(
+    'android_world_adb_call_seconds',
+    'Duration of adb and gRPC calls to the device, by command.',
+    ('command',),
+)
+SCREENSHOT_BYTES = Histogram(
+    'android_world_screenshot_bytes',
+    'Size of the screenshots taken, in bytes.',
+    buckets=BYTES_BUCKETS,
+)
+STABILIZATION_WAIT = Histogram(
+    'android_world_stabilization_wait_seconds',
+    'Time spent waiting for the UI to stabilize.',
+)
+SNAPSHOT_RESTORE = Histogram(
+    'android_world_snapshot_restore_seconds',
+    'Duration of app snapshot restores, by app.',
+    ('app',),
+)
+QUEUE_DEPTH = Gauge(
+    'android_world_queue_depth',
+    'Number of items waiting in a queue, e.g. LLM requests or checkpoints.',
+    ('queue',),
+)
+
+
+def record_episode(template: str, is_successful: float | None, error: bool):
+  """Counts a finished episode of a task template."""
+  if error:
+    outcome = 'error'
+  elif is_successful is not None and is_successful > 0.5:
+    outcome = 'success'
+  else:
+    outcome = 'failure'
+  EPISODES.inc(template=template, outcome=outcome)
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+  """Serves the metrics of `registry` at /metrics."""
+
+  registry = REGISTRY
+
+  def do_GET(self):  # pylint: disable=invalid-name
+    if self.path.split('?')[0] != '/metrics':
+      self.send_error(404)
+      return
+    body = self.registry.render().encode('utf-8')
+    self.send_response(200)
+    self.send_header('Content-Type', CONTENT_TYPE)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    del args  # Scrapes are not worth logging.
+
+
+def serve(
+    port: int, host: str = '', registry: Registry = REGISTRY
+) -> http.server.ThreadingHTTPServer:
+  """Serves the metrics at /metrics from a daemon thread.
+
+  Args:
+    port: Port to listen on; 0 picks a free one, see `server.server_port`.
+    host: Address to listen on; all interfaces by default.
+    registry: The metrics served.
+
+  Returns:
+    The running server; `shutdown` stops it.
+  """
+  handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+  server = http.server.ThreadingHTTPServer((host, port), handler)
+  server.daemon_threads = True
+  threading.Thread(
+      target=server.serve_forever, name='metrics_server', daemon=True
+  ).start()
+  return server
@@ -0,0 +1,123 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import urllib.error
+import urllib.request
+
+from absl.testing import absltest
+from android_world.utils import metrics
+
+
+class MetricsTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.registry = metrics.Registry()
+
+  def test_counter(self):
+    counter = metrics.Counter(
+        'episodes_total', 'Episodes.', ('template', 'outcome'), self.registry
+    )
+    counter.inc(template='A', outcome='success')
+    counter.inc(2, template='B "quoted"', outcome='failure')
+
+    self.assertEqual(counter.value(template='A', outcome='success'), 1)
+    self.assertEqual(counter.total(), 3)
+    self.assertEqual(
+        self.registry.render(),
+        '# HELP episodes_total Episodes.\n'
+        '# TYPE episodes_total counter\n'
+        'episodes_total{template="A",outcome="success"} 1\n'
+        'episodes_total{template="B \\"quoted\\"",outcome="failure"} 2\n',
+    )
+    with self.assertRaises(ValueError):
+      counter.inc(-1, template='A', outcome='success')
+    with self.assertRaises(ValueError):
+      counter.inc(template='A')
+
+  def test_gauge(self):
+    gauge = metrics.Gauge('depth', 'Depth.', ('queue',), self.registry)
+    computed = metrics.Gauge(
+        'computed', 'Computed.', registry=self.registry, function=lambda: 1.5
+    )
+    gauge.set(3, queue='llm')
+    gauge.set(1, queue='llm')
+
+    self.assertEqual(gauge.value(queue='llm'), 1)
+    self.assertEqual(computed.value(), 1.5)
+    rendered = self.registry.render()
+    self.assertIn('depth{queue="llm"} 1\n', rendered)
+    self.assertIn('computed 1.5\n', rendered)
+
+  def test_histogram(self):
+    histogram = metrics.Histogram(
+        'latency_seconds', 'Latency.', registry=self.registry, buckets=(0.1, 1)
+    )
+    for value in (0.05, 0.1, 0.5, 2.0):
+      histogram.observe(value)
+    with histogram.time():
+      pass
+
+    self.assertEqual(histogram.count(), 5)
+    lines = self.registry.render().splitlines()
+    self.assertEqual(
+        lines[2:],
+        [
+            'latency_seconds_bucket{le="0.1"} 3',
+            'latency_seconds_bucket{le="1"} 4',
+            'latency_seconds_bucket{le="+Inf"} 5',
+            f'latency_seconds_sum {metrics._format_value(histogram.sum())}',
+            'latency_seconds_count 5',
+        ],
+    )
+    self.assertAlmostEqual(histogram.sum(), 2.65, places=3)
+
+  def test_duplicate_name(self):
+    metrics.Counter('a_total', 'A.', registry=self.registry)
+    with self.assertRaises(ValueError):
+      metrics.Counter('a_total', 'A.', registry=self.registry)
+
+  def test_record_episode(self):
+    before = {
+        outcome: metrics.EPISODES.value(template='MetricsTest', outcome=outcome)
+        for outcome in ('success', 'failure', 'error')
+    }
+
+    metrics.record_episode('MetricsTest', 1.0, error=False)
+    metrics.record_episode('MetricsTest', 0.0, error=False)
+    metrics.record_episode('MetricsTest', None, error=True)
+
+    for outcome in ('success', 'failure', 'error'):
+      self.assertEqual(
+          metrics.EPISODES.value(template='MetricsTest', outcome=outcome),
+          before[outcome] + 1,
+      )
+    self.assertGreater(metrics.EPISODES_PER_HOUR.value(), 0)
+
+  def test_serve(self):
+    metrics.Counter('served_total', 'Served.', registry=self.registry).inc()
+    server = metrics.serve(0, host='127.0.0.1', registry=self.registry)
+    self.addCleanup(server.server_close)
+    self.addCleanup(server.shutdown)
+    url = f'http://127.0.0.1:{server.server_port}'
+
+    with urllib.request.urlopen(f'{url}/metrics', timeout=10) as response:
+      self.assertEqual(response.headers['Content-Type'], metrics.CONTENT_TYPE)
+      self.assertIn('served_total 1\n', response.read().decode())
+    with self.assertRaises(urllib.error.HTTPError):
+      urllib.request.urlopen(f'{url}/other', timeout=10)
+
+
+if __name__ == '__main__':
+  absltest.main()
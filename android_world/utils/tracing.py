@@ -0,0 +1,250 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Timing of the phases of a task: setup, agent steps, LLM calls, env calls.
+
+Code marks phases with `span`:
+
+  with tracing.span('initialize_task'):
+    task.initialize_task(env)
+
+Spans are recorded by the `Tracer` installed in the current thread by `trace`,
+e.g. by `suite_utils` around each task. Without a tracer, e.g. while tracing is
+disabled, which is the default, `span` returns a shared no-op context manager.
+
+Recorded spans can be summed per phase, and appended to a Chrome trace file
+(JSON array format), which chrome://tracing and Perfetto open.
+"""
+
+from collections.abc import Iterator
+import contextlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, TypeVar
+
+# Key of the per-phase durations in an episode's auxiliary data.
+AUX_DATA_KEY = 'phase_durations_sec'
+
+_T = TypeVar('_T')
+
+_context = threading.local()
+_config_lock = threading.Lock()
+_enabled = False
+_chrome_trace_path = None
+
+
+class _NullSpan:
+  """Span that records nothing."""
+
+  __slots__ = ()
+
+  def __enter__(self) -> '_NullSpan':
+    return self
+
+  def __exit__(self, *exc_info) -> bool:
+    return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+  """Span that records its duration in a tracer when it exits."""
+
+  __slots__ = ('_tracer', '_name', '_start')
+
+  def __init__(self, tracer: 'Tracer', name: str):
+    self._tracer = tracer
+    self._name = name
+    self._start = 0.0
+
+  def __enter__(self) -> '_Span':
+    self._start = time.perf_counter()
+    return self
+
+  def __exit__(self, *exc_info) -> bool:
+    self._tracer.add(self._name, self._start, time.perf_counter())
+    return False
+
+
+class Tracer:
+  """Records the spans of a task, from any thread."""
+
+  def __init__(self):
+    # Maps perf_counter readings to wall clock time for trace timestamps.
+    self._origin_wall = time.time()
+    self._origin_perf = time.perf_counter()
+    self._lock = threading.Lock()
+    self.spans: list[tuple[str, float, float, int]] = []
+
+  def span(self, name: str) -> _Span:
+    """Returns a context manager recording a span in this tracer."""
+    return _Span(self, name)
+
+  def add(self, name: str, start: float, end: float) -> None:
+    """Records a span, given its `time.perf_counter` start and end."""
+    with self._lock:
+      self.spans.append((name, start, end, threading.get_ident()))
+
+  def durations(self) -> dict[str, float]:
+    """Returns the total duration of each phase, in seconds.
+
+    Nested spans are counted in their own phase and in the enclosing ones.
+    """
+    totals = {}
+    with self._lock:
+      for name, start, end, _ in self.spans:
+        totals[name] = totals.get(name, 0.0) + end - start
+    return {name: round(total, 4) for name, total in totals.items()}
+
+  def chrome_trace_events(
+      self, args: dict[str, Any] | None = None
+  ) -> list[dict[str, Any]]:
+    """Returns the spans as Chrome trace events.
+
+    Args:
+      args: Arguments shown with every event, e.g. the task name.
+
+    Returns:
+      Complete events, timestamped in microseconds of wall clock time.
+    """
+    pid = os.getpid()
+    with self._lock:
+      spans = list(self.spans)
+    events = []
+    for name, start, end, tid in spans:
+      event = {
+          'name': name,
+          'ph': 'X',
+          'ts': round((self._origin_wall + start - self._origin_perf) * 1e6),
+          'dur': round((end - start) * 1e6),
+          'pid': pid,
+          'tid': tid,
+      }
+      if args:
+        event['args'] = args
+      events.append(event)
+    return events
+
+
+def configure(enabled: bool = True, chrome_trace_path: str | None = None):
+  """Enables or disables tracing of tasks.
+
+  Args:
+    enabled: Whether `trace` installs tracers.
+    chrome_trace_path: If set, `export` appends the spans of each task to this
+      Chrome trace file.
+  """
+  global _enabled, _chrome_trace_path
+  with _config_lock:
+    _enabled = enabled
+    _chrome_trace_path = chrome_trace_path
+
+
+def is_enabled() -> bool:
+  return _enabled
+
+
+@contextlib.contextmanager
+def trace() -> Iterator[Tracer | None]:
+  """Installs a tracer in the current thread, if tracing is enabled.
+
+  Yields:
+    The tracer, or None if tracing is disabled.
+  """
+  if not _enabled:
+    yield None
+    return
+  previous = getattr(_context, 'tracer', None)
+  tracer = Tracer()
+  _context.tracer = tracer
+  try:
+    yield tracer
+  finally:
+    _context.tracer = previous
+
+
+def current_tracer() -> Tracer | None:
+  """Returns the tracer of the current thread, if any."""
+  return getattr(_context, 'tracer', None)
+
+
+def propagate(fn: Callable[..., _T]) -> Callable[..., _T]:
+  """Returns `fn` recording its spans in the current thread's tracer.
+
+  Use it for work handed to another thread, e.g. a thread pool.
+
+  Args:
+    fn: The function.
+
+  Returns:
+    A function that calls `fn` with the tracer installed in the thread it runs
+    in.
+  """
+  tracer = getattr(_context, 'tracer', None)
+  if tracer is None:
+    return fn
+
+  def traced(*args, **kwargs) -> _T:
+    previous = getattr(_context, 'tracer', None)
+    _context.tracer = tracer
+    try:
+      return fn(*args, **kwargs)
+    finally:
+      _context.tracer = previous
+
+  return traced
+
+
+def span(name: str) -> _Span | _NullSpan:
+  """Returns a context manager recording a span in the thread's tracer."""
+  tracer = getattr(_context, 'tracer', None)
+  if tracer is None:
+    return _NULL_SPAN
+  return _Span(tracer, name)
+
+
+def append_chrome_trace(path: str, events: list[dict[str, Any]]) -> None:
+  """Appends events to a Chrome trace file in JSON array format.
+
+  The array is left open, as the format allows, so each append is O(events).
+
+  Args:
+    path: The trace file; created if it does not exist.
+    events: Chrome trace events.
+  """
+  lines = ''.join(json.dumps(event) + ',\n' for event in events)
+  with _config_lock:
+    with open(path, 'a', encoding='utf-8') as f:
+      if f.tell() == 0:
+        f.write('[\n')
+      f.write(lines)
+
+
+def export(tracer: Tracer, args: dict[str, Any] | None = None) -> None:
+  """Appends the spans of a tracer to the configured Chrome trace file."""
+  path = _chrome_trace_path
+  if path is not None:
+    append_chrome_trace(path, tracer.chrome_trace_events(args))
+
+
+def read_chrome_trace(path: str) -> list[dict[str, Any]]:
+  """Reads the events of a Chrome trace file written by `export`."""
+  with open(path, 'r', encoding='utf-8') as f:
+    text = f.read().rstrip().rstrip(',')
+  if not text.endswith(']'):
+    text += ']'
+  return json.loads(text)
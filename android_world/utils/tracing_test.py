@@ -0,0 +1,101 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import concurrent.futures
+import os
+import tempfile
+import threading
+
+from absl.testing import absltest
+from android_world.utils import tracing
+
+
+class TracingTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.addCleanup(tracing.configure, enabled=False)
+
+  def test_disabled_records_nothing(self):
+    with tracing.trace() as tracer:
+      span = tracing.span('phase')
+      with span:
+        pass
+
+    self.assertIsNone(tracer)
+    self.assertIs(span, tracing.span('other'))
+
+  def test_durations_by_phase(self):
+    tracing.configure()
+
+    with tracing.trace() as tracer:
+      for _ in range(3):
+        with tracing.span('step'):
+          with tracing.span('llm'):
+            pass
+    with tracing.span('outside'):
+      pass
+
+    durations = tracer.durations()
+    self.assertCountEqual(['step', 'llm'], durations)
+    self.assertGreaterEqual(durations['step'], durations['llm'])
+    self.assertLen(tracer.spans, 6)
+    self.assertIsNone(tracing.current_tracer())
+
+  def test_span_records_on_exception(self):
+    tracing.configure()
+
+    with tracing.trace() as tracer:
+      with self.assertRaises(ValueError):
+        with tracing.span('failing'):
+          raise ValueError()
+
+    self.assertIn('failing', tracer.durations())
+
+  def test_propagate_to_worker_thread(self):
+    tracing.configure()
+
+    def work():
+      with tracing.span('worker'):
+        return threading.get_ident()
+
+    with tracing.trace() as tracer:
+      with concurrent.futures.ThreadPoolExecutor(1) as pool:
+        worker_thread = pool.submit(tracing.propagate(work)).result()
+        pool.submit(work).result()
+
+    self.assertLen(tracer.spans, 1)
+    self.assertEqual(tracer.spans[0][3], worker_thread)
+
+  def test_chrome_trace(self):
+    path = os.path.join(tempfile.mkdtemp(), 'trace.json')
+    tracing.configure(chrome_trace_path=path)
+
+    for task in ('A', 'B'):
+      with tracing.trace() as tracer:
+        with tracing.span('phase'):
+          pass
+      tracing.export(tracer, {'task': task})
+
+    events = tracing.read_chrome_trace(path)
+    self.assertLen(events, 2)
+    self.assertEqual(events[1]['args'], {'task': 'B'})
+    self.assertEqual(events[0]['ph'], 'X')
+    self.assertLessEqual(events[0]['ts'], events[1]['ts'])
+    with open(path) as f:
+      self.assertTrue(f.read().startswith('[\n'))
+
+
+if __name__ == '__main__':
+  absltest.main()
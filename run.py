@@ -32,13 +32,19 @@ from android_world import suite_utils
 from android_world.agents import base_agent
 from android_world.agents import human_agent
 from android_world.agents import infer
+from android_world.agents import llm_scheduler
 from android_world.agents import m3a
+from android_world.agents import prompt_utils
 from android_world.agents import random_agent
 from android_world.agents import seeact
 from android_world.agents import t3a
 from android_world.agents import ruyi_agent
+from android_world.agents import ruyi_device_bridge
+from android_world.env import adb_profiler
 from android_world.env import env_launcher
 from android_world.env import interface
+from android_world.utils import metrics
+from android_world.utils import tracing
 
 logging.set_verbosity(logging.WARNING)
 
@@ -131,6 +137,72 @@ _OUTPUT_PATH = flags.DEFINE_string(
 # Agent specific.
 _AGENT_NAME = flags.DEFINE_string('agent_name', 'm3a_gpt4v', help='Agent name.')
 
+_LLM_REQUESTS_PER_MINUTE = flags.DEFINE_float(
+    'llm_requests_per_minute',
+    0,
+    'If positive, OpenAI requests are scheduled to stay under this rate.'
+    ' Useful when other processes share the same quota.',
+)
+_LLM_TOKENS_PER_MINUTE = flags.DEFINE_float(
+    'llm_tokens_per_minute',
+    0,
+    'If positive, OpenAI requests are scheduled to stay under this many'
+    ' (estimated) tokens per minute.',
+)
+
+_STEP_DEADLINE_SEC = flags.DEFINE_float(
+    'step_deadline_sec',
+    None,
+    'If set, LLM calls of an agent step stop retrying once the step has run'
+    ' for this many seconds, so that a step fails fast instead of stalling'
+    ' the run.',
+)
+
+_COMPACT_PROMPTS = flags.DEFINE_boolean(
+    'compact_prompts',
+    False,
+    'For M3A and T3A, whether to compact the UI element lists in prompts'
+    ' (omit False flags, drop duplicate elements).',
+)
+_PROMPT_MAX_TOKENS = flags.DEFINE_integer(
+    'prompt_max_tokens',
+    None,
+    'For M3A and T3A, if set, compacts prompts like --compact_prompts and'
+    ' truncates action selection prompts to about this many tokens.',
+)
+_PROMPT_HISTORY_ENTRIES = flags.DEFINE_integer(
+    'prompt_history_entries',
+    None,
+    'For M3A and T3A, if set, compacts prompts like --compact_prompts and keeps'
+    ' only this many recent history entries verbatim; older ones are'
+    ' shortened.',
+)
+_CACHE_FRIENDLY_PROMPTS = flags.DEFINE_boolean(
+    'cache_friendly_prompts',
+    False,
+    'For M3A and T3A, whether to lay out action selection prompts so that'
+    ' consecutive steps share a long prefix for provider prompt caching.',
+)
+
+_RUYI_PLAN_CACHE = flags.DEFINE_boolean(
+    'ruyi_plan_cache',
+    False,
+    'For ruyi_agent, whether to reuse the workflow and script of earlier runs'
+    ' of the same goal or task template whose task evaluation succeeded.',
+)
+_RUYI_PLAN_CACHE_PATH = flags.DEFINE_string(
+    'ruyi_plan_cache_path',
+    'ruyi_plan_cache.json',
+    'With --ruyi_plan_cache, the file the plan cache is persisted in.',
+)
+_RUYI_HOST_PORT = flags.DEFINE_integer(
+    'ruyi_host_port',
+    None,
+    'For ruyi_agent, the host port forwarded to the Ruyi service on the'
+    ' device. Defaults to a port derived from --console_port, so that runs on'
+    ' several emulators do not collide.',
+)
+
 _FIXED_TASK_SEED = flags.DEFINE_boolean(
     'fixed_task_seed',
     False,
@@ -138,6 +210,32 @@ _FIXED_TASK_SEED = flags.DEFINE_boolean(
     ' (n_task_combinations > 1).',
 )
 
+_TRACE_PHASES = flags.DEFINE_boolean(
+    'trace_phases',
+    False,
+    'Whether to time the phases of each task (setup, agent steps, LLM and env'
+    ' calls, validation, tear down) and store them in the episode aux data.',
+)
+_CHROME_TRACE = flags.DEFINE_boolean(
+    'chrome_trace',
+    False,
+    'With --trace_phases, whether to also write the phases of all tasks to'
+    ' trace.json in the run directory, for chrome://tracing or Perfetto.',
+)
+_PROFILE_ADB = flags.DEFINE_boolean(
+    'profile_adb',
+    False,
+    'Whether to profile the adb and gRPC calls to the device per call site,'
+    ' print the most expensive call sites and write adb_profile.json in the'
+    ' run directory.',
+)
+_METRICS_PORT = flags.DEFINE_integer(
+    'metrics_port',
+    None,
+    'If set, serves live throughput and health metrics in the Prometheus'
+    ' format at http://localhost:<port>/metrics during the run.',
+)
+
 
 # MiniWoB is very lightweight and new screens/View Hierarchy load quickly.
 _MINIWOB_TRANSITION_PAUSE = 0.2
@@ -151,13 +249,49 @@ _MINIWOB_ADDITIONAL_GUIDELINES = [
 ]
 
 
+def _get_scheduler() -> llm_scheduler.LlmScheduler | None:
+  """Gets the LLM scheduler, if rate limits are set.
+
+  Episodes run one after another here, so at most one request waits at a time
+  and only the rate limits take effect; request priorities and deduplication
+  only matter to callers that run agents concurrently.
+  """
+  if _LLM_REQUESTS_PER_MINUTE.value <= 0 and _LLM_TOKENS_PER_MINUTE.value <= 0:
+    return None
+  return llm_scheduler.LlmScheduler(
+      llm_scheduler.RateLimits(
+          requests_per_minute=_LLM_REQUESTS_PER_MINUTE.value or None,
+          tokens_per_minute=_LLM_TOKENS_PER_MINUTE.value or None,
+      )
+  )
+
+
+def _get_prompt_budget() -> prompt_utils.PromptBudget | None:
+  """Gets the prompt budget of M3A and T3A from the flags."""
+  if not (
+      _COMPACT_PROMPTS.value
+      or _PROMPT_MAX_TOKENS.value is not None
+      or _PROMPT_HISTORY_ENTRIES.value is not None
+  ):
+    return None
+  return prompt_utils.PromptBudget(
+      max_tokens=_PROMPT_MAX_TOKENS.value,
+      max_history_entries=_PROMPT_HISTORY_ENTRIES.value,
+  )
+
+
 def _get_agent(
     env: interface.AsyncEnv,
     family: str | None = None,
+    scheduler: llm_scheduler.LlmScheduler | None = None,
 ) -> base_agent.EnvironmentInteractingAgent:
   """Gets agent."""
   print('Initializing agent...')
   agent = None
+  prompt_options = {
+      'prompt_budget': _get_prompt_budget(),
+      'cache_friendly_prompts': _CACHE_FRIENDLY_PROMPTS.value,
+  }
   if _AGENT_NAME.value == 'human_agent':
     agent = human_agent.HumanAgent(env)
   elif _AGENT_NAME.value == 'random_agent':
@@ -165,24 +299,46 @@ def _get_agent(
   # Gemini.
   elif _AGENT_NAME.value == 'm3a_gemini_gcp':
     agent = m3a.M3A(
-        env, infer.GeminiGcpWrapper(model_name='gemini-1.5-pro-latest')
+        env,
+        infer.GeminiGcpWrapper(model_name='gemini-1.5-pro-latest'),
+        **prompt_options,
     )
   elif _AGENT_NAME.value == 't3a_gemini_gcp':
     agent = t3a.T3A(
-        env, infer.GeminiGcpWrapper(model_name='gemini-1.5-pro-latest')
+        env,
+        infer.GeminiGcpWrapper(model_name='gemini-1.5-pro-latest'),
+        **prompt_options,
     )
   # GPT.
   elif _AGENT_NAME.value == 't3a_gpt4':
-    agent = t3a.T3A(env, infer.Gpt4Wrapper('gpt-5-chat'))
+    agent = t3a.T3A(
+        env,
+        infer.Gpt4Wrapper('gpt-5-chat', scheduler=scheduler),
+        **prompt_options,
+    )
     # agent = t3a.T3A(env, infer.Gpt4Wrapper('gpt-4-turbo-2024-04-09'))
   elif _AGENT_NAME.value == 'm3a_gpt4v':
-    agent = m3a.M3A(env, infer.Gpt4Wrapper('gpt-4-turbo-2024-04-09'))
+    agent = m3a.M3A(
+        env,
+        infer.Gpt4Wrapper('gpt-4-turbo-2024-04-09', scheduler=scheduler),
+        **prompt_options,
+    )
   # SeeAct.
   elif _AGENT_NAME.value == 'seeact':
-    agent = seeact.SeeAct(env)
+    agent = seeact.SeeAct(env, scheduler=scheduler)
   # RuyiAgent.
   elif _AGENT_NAME.value == 'ruyi_agent':
-    agent = ruyi_agent.RuyiAgent(env)
+    agent = ruyi_agent.RuyiAgent(
+        env,
+        use_plan_cache=_RUYI_PLAN_CACHE.value,
+        plan_cache_path=_RUYI_PLAN_CACHE_PATH.value,
+        host_port=(
+            _RUYI_HOST_PORT.value
+            or ruyi_device_bridge.host_port_for_console_port(
+                _DEVICE_CONSOLE_PORT.value
+            )
+        ),
+    )
 
   if not agent:
     raise ValueError(f'Unknown agent: {_AGENT_NAME.value}')
@@ -218,7 +374,22 @@ def _main() -> None:
   )
   suite.suite_family = _SUITE_FAMILY.value
 
-  agent = _get_agent(env, _SUITE_FAMILY.value)
+  scheduler = _get_scheduler()
+  try:
+    _run(env, suite, scheduler)
+  finally:
+    if scheduler is not None:
+      scheduler.close()
+    env.close()
+
+
+def _run(
+    env: interface.AsyncEnv,
+    suite: suite_utils.Suite,
+    scheduler: llm_scheduler.LlmScheduler | None,
+) -> None:
+  """Runs the agent on the suite and writes the results."""
+  agent = _get_agent(env, _SUITE_FAMILY.value, scheduler)
 
   if _SUITE_FAMILY.value.startswith('miniwob'):
     # MiniWoB pages change quickly, don't need to wait for screen to stabilize.
@@ -231,21 +402,49 @@ def _main() -> None:
   else:
     checkpoint_dir = checkpointer_lib.create_run_directory(_OUTPUT_PATH.value)
 
+  if _TRACE_PHASES.value:
+    tracing.configure(
+        chrome_trace_path=(
+            os.path.join(checkpoint_dir, 'trace.json')
+            if _CHROME_TRACE.value
+            else None
+        )
+    )
+
+  if _METRICS_PORT.value is not None:
+    env.controller.enable_profiling(adb_profiler.MetricsRecorder())
+    metrics.serve(_METRICS_PORT.value)
+    print(f'Serving metrics at http://localhost:{_METRICS_PORT.value}/metrics')
+
+  profiler = None
+  if _PROFILE_ADB.value:
+    profiler = adb_profiler.AdbProfiler()
+    env.controller.enable_profiling(profiler)
+
   print(
       f'Starting eval with agent {_AGENT_NAME.value} and writing to'
       f' {checkpoint_dir}'
   )
-  suite_utils.run(
-      suite,
-      agent,
-      checkpointer=checkpointer_lib.IncrementalCheckpointer(checkpoint_dir),
-      demo_mode=False,
+  checkpointer = checkpointer_lib.AsyncCheckpointer(
+      checkpointer_lib.IncrementalCheckpointer(checkpoint_dir)
   )
+  try:
+    suite_utils.run(
+        suite,
+        agent,
+        checkpointer=checkpointer,
+        demo_mode=False,
+        step_deadline_sec=_STEP_DEADLINE_SEC.value,
+    )
+  finally:
+    checkpointer.close()
+  if profiler is not None:
+    print(profiler.report())
+    profiler.write_json(os.path.join(checkpoint_dir, 'adb_profile.json'))
   print(
       f'Finished running agent {_AGENT_NAME.value} on {_SUITE_FAMILY.value}'
       f' family. Wrote to {checkpoint_dir}.'
   )
-  env.close()
 
 
 def main(argv: Sequence[str]) -> None:
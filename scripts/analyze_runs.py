@@ -0,0 +1,92 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Prints the metrics of one or more runs from their checkpoint directories.
+
+For each run: success rates per template and per tag and difficulty, run time
+percentiles and the distribution of step counts. Only metadata is read, and it
+is indexed in each directory, so analyzing a run again is fast.
+
+Usage:
+
+python scripts/analyze_runs.py --checkpoint_dirs=/tmp/run_dir
+
+# Compare two runs side by side.
+python scripts/analyze_runs.py --checkpoint_dirs=/tmp/run_a,/tmp/run_b \
+  --compare
+"""
+
+from collections.abc import Sequence
+
+from absl import app
+from absl import flags
+from android_world import run_analysis
+import pandas as pd
+
+_CHECKPOINT_DIRS = flags.DEFINE_list(
+    'checkpoint_dirs',
+    None,
+    'Directories with the episodes of runs, as written by run.py.',
+    required=True,
+)
+_COMPARE = flags.DEFINE_boolean(
+    'compare',
+    False,
+    'Whether to compare the success rates of two runs, per template.',
+)
+_NUM_WORKERS = flags.DEFINE_integer(
+    'num_workers', None, 'Processes reading checkpoints; all CPUs if unset.'
+)
+_NO_INDEX = flags.DEFINE_boolean(
+    'no_index', False, 'Whether to ignore and not write the sidecar indexes.'
+)
+
+
+def _print_table(title: str, table: pd.DataFrame) -> None:
+  print(f'\n{title}\n{table.to_string(float_format="{:.2f}".format)}')
+
+
+def main(argv: Sequence[str]) -> None:
+  if len(argv) > 1:
+    raise app.UsageError('Too many command-line arguments.')
+  if _COMPARE.value and len(_CHECKPOINT_DIRS.value) != 2:
+    raise app.UsageError('--compare needs exactly two checkpoint directories.')
+
+  runs = run_analysis.load_runs(
+      _CHECKPOINT_DIRS.value,
+      num_workers=_NUM_WORKERS.value,
+      use_index=not _NO_INDEX.value,
+  )
+  for checkpoint_dir, episodes in runs.items():
+    metrics = run_analysis.metrics_of(episodes)
+    print(f'\n===== {checkpoint_dir}: {metrics.summary_line()}')
+    if not episodes:
+      continue
+    _print_table('Success by template', metrics.results_table())
+    _print_table('Mean success rate by tag', metrics.tags_table())
+    _print_table(
+        'Run time (s)', run_analysis.runtime_percentiles(episodes)
+    )
+    _print_table('Steps', run_analysis.step_distribution(episodes))
+
+  if _COMPARE.value:
+    run_a, run_b = _CHECKPOINT_DIRS.value
+    _print_table(
+        f'Comparison: a = {run_a}, b = {run_b}',
+        run_analysis.compare_runs(runs[run_a], runs[run_b]),
+    )
+
+
+if __name__ == '__main__':
+  app.run(main)
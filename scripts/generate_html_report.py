@@ -0,0 +1,84 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Writes the HTML report of a run, optionally refreshing it during the run.
+
+Usage:
+
+python scripts/generate_html_report.py --checkpoint_dir=/tmp/run_dir \
+  --output_dir=/tmp/run_dir_report
+
+# Refresh the report every minute while the run is in progress.
+python scripts/generate_html_report.py --checkpoint_dir=/tmp/run_dir \
+  --output_dir=/tmp/run_dir_report --watch_seconds=60
+"""
+
+from collections.abc import Sequence
+import time
+
+from absl import app
+from absl import flags
+from android_world.utils import html_report
+
+_CHECKPOINT_DIR = flags.DEFINE_string(
+    'checkpoint_dir',
+    None,
+    'Directory with the episodes of a run, as written by run.py.',
+    required=True,
+)
+_OUTPUT_DIR = flags.DEFINE_string(
+    'output_dir', None, 'Directory of the report.', required=True
+)
+_TITLE = flags.DEFINE_string('title', None, 'Title; the checkpoint directory.')
+_PAGE_SIZE = flags.DEFINE_integer(
+    'page_size', html_report.DEFAULT_PAGE_SIZE, 'Episodes per index page.'
+)
+_FAIL_ONLY = flags.DEFINE_boolean(
+    'fail_only', False, 'Whether to leave out successful episodes.'
+)
+_NUM_WORKERS = flags.DEFINE_integer(
+    'num_workers', None, 'Processes encoding screenshots; all CPUs if unset.'
+)
+_WATCH_SECONDS = flags.DEFINE_integer(
+    'watch_seconds',
+    0,
+    'If set, refreshes the report at this interval until interrupted.',
+)
+
+
+def main(argv: Sequence[str]) -> None:
+  if len(argv) > 1:
+    raise app.UsageError('Too many command-line arguments.')
+
+  while True:
+    index = html_report.write_report(
+        _CHECKPOINT_DIR.value,
+        _OUTPUT_DIR.value,
+        title=_TITLE.value or _CHECKPOINT_DIR.value,
+        page_size=_PAGE_SIZE.value,
+        fail_only=_FAIL_ONLY.value,
+        num_workers=_NUM_WORKERS.value,
+        refresh_seconds=_WATCH_SECONDS.value or None,
+    )
+    print(f'Wrote {index}')
+    if not _WATCH_SECONDS.value:
+      return
+    try:
+      time.sleep(_WATCH_SECONDS.value)
+    except KeyboardInterrupt:
+      return
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -0,0 +1,86 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Reports how much consecutive agent prompts share a common prefix.
+
+Provider-side prompt caches only match on exact prefixes, so the reuse ratio is
+an upper bound on the fraction of prompt tokens that can be served from cache.
+Use it to compare prompt layouts (e.g. run.py with and without
+--cache_friendly_prompts) on recorded runs.
+
+Usage:
+
+python scripts/measure_prefix_reuse.py --checkpoint_dir=/tmp/run_dir
+"""
+
+from collections.abc import Sequence
+
+from absl import app
+from absl import flags
+from android_world import checkpointer as checkpointer_lib
+from android_world import constants
+from android_world.agents import prompt_utils
+
+_CHECKPOINT_DIR = flags.DEFINE_string(
+    'checkpoint_dir',
+    None,
+    'Directory with the episodes of a run, as written by run.py.',
+    required=True,
+)
+
+
+def main(argv: Sequence[str]) -> None:
+  if len(argv) > 1:
+    raise app.UsageError('Too many command-line arguments.')
+
+  checkpointer = checkpointer_lib.IncrementalCheckpointer(
+      _CHECKPOINT_DIR.value
+  )
+  episodes = checkpointer.load(
+      fields=[
+          constants.EpisodeConstants.TASK_TEMPLATE,
+          constants.EpisodeConstants.INSTANCE_ID,
+          constants.EpisodeConstants.EPISODE_DATA,
+      ]
+  )
+  num_prompts, total_chars, reused_chars = 0, 0, 0
+  for episode in episodes:
+    episode_data = episode.get(constants.EpisodeConstants.EPISODE_DATA)
+    # Episodes that failed with an exception have no step data.
+    if not isinstance(episode_data, dict):
+      continue
+    stats = prompt_utils.prefix_reuse_stats(
+        prompt_utils.episode_prompts(episode_data)
+    )
+    if stats.num_prompts < 2:
+      continue
+    num_prompts += stats.num_prompts
+    total_chars += stats.total_chars
+    reused_chars += stats.reused_chars
+    print(
+        f'{episode[constants.EpisodeConstants.TASK_TEMPLATE]}'
+        f'_{episode[constants.EpisodeConstants.INSTANCE_ID]}:'
+        f' {stats.num_prompts} prompts, reuse ratio {stats.reuse_ratio:.1%}'
+    )
+  overall = prompt_utils.PrefixReuseStats(
+      num_prompts, total_chars, reused_chars
+  )
+  print(
+      f'Overall: {overall.num_prompts} prompts, reuse ratio'
+      f' {overall.reuse_ratio:.1%}'
+  )
+
+
+if __name__ == '__main__':
+  app.run(main)
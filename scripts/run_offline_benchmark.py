@@ -0,0 +1,189 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runs agent episodes against a local fake LLM and a replayed environment.
+
+No device or network is needed, so this measures the agent-side overhead
+(prompt building, image encoding, parsing) and can run on CI machines. States
+and LLM responses are either synthetic or taken from a recorded run.
+
+Usage:
+
+# Synthetic states, a wait action at every step, 500ms LLM latency.
+python scripts/run_offline_benchmark.py --agent_name=m3a --latency_ms=500
+
+# Replay the first episode of a recorded run.
+python scripts/run_offline_benchmark.py --agent_name=t3a \
+  --replay_checkpoint_dir=/tmp/run_dir
+
+# Only serve the fake LLM, e.g. for the Ruyi agent.
+python scripts/run_offline_benchmark.py --serve_only --port=8000
+"""
+
+from collections.abc import Sequence
+import os
+import time
+from typing import Any
+
+from absl import app
+from absl import flags
+from android_world import checkpointer as checkpointer_lib
+from android_world import constants
+from android_world import episode_runner
+from android_world.agents import base_agent
+from android_world.agents import fake_llm_server
+from android_world.agents import infer
+from android_world.agents import m3a
+from android_world.agents import t3a
+from android_world.env import interface
+from android_world.env import replay_env
+import numpy as np
+
+_AGENT_NAME = flags.DEFINE_enum(
+    'agent_name', 'm3a', ['m3a', 't3a'], 'Agent to benchmark.'
+)
+_NUM_EPISODES = flags.DEFINE_integer('num_episodes', 3, 'Episodes to run.')
+_MAX_STEPS = flags.DEFINE_integer('max_steps', 10, 'Steps per episode.')
+_GOAL = flags.DEFINE_string(
+    'goal', 'Open the settings app.', 'Goal, unless replaying an episode.'
+)
+_LATENCY_MS = flags.DEFINE_float('latency_ms', 0.0, 'Fixed LLM latency.')
+_JITTER_MS = flags.DEFINE_float('jitter_ms', 0.0, 'Random extra latency.')
+_JITTER_DISTRIBUTION = flags.DEFINE_enum(
+    'jitter_distribution',
+    'uniform',
+    ['uniform', 'exponential'],
+    'Distribution of the random extra latency.',
+)
+_RESPONSES_FILE = flags.DEFINE_string(
+    'responses_file',
+    None,
+    'JSON list or JSON-lines file with the LLM responses to serve. Defaults to'
+    ' the responses of the replayed episode, or a wait action.',
+)
+_REPLAY_CHECKPOINT_DIR = flags.DEFINE_string(
+    'replay_checkpoint_dir',
+    None,
+    'Run directory to take states (and responses) from. The first episode'
+    ' with recorded steps is used. If not set, blank states are used.',
+)
+_SERVE_ONLY = flags.DEFINE_boolean(
+    'serve_only', False, 'Only run the fake LLM server, until interrupted.'
+)
+_PORT = flags.DEFINE_integer(
+    'port', 0, 'Port for the fake LLM server; 0 picks a free one.'
+)
+
+
+def _load_replayed_episode() -> dict[str, Any]:
+  checkpointer = checkpointer_lib.IncrementalCheckpointer(
+      _REPLAY_CHECKPOINT_DIR.value
+  )
+  for episode in checkpointer.load(
+      fields=[
+          constants.EpisodeConstants.GOAL,
+          constants.EpisodeConstants.EPISODE_DATA,
+      ]
+  ):
+    episode_data = episode[constants.EpisodeConstants.EPISODE_DATA]
+    if isinstance(episode_data, dict) and replay_env.states_from_episode(
+        episode_data
+    ):
+      return episode
+  raise ValueError(
+      f'No replayable episode found in {_REPLAY_CHECKPOINT_DIR.value}.'
+  )
+
+
+def _create_agent(
+    env: interface.AsyncEnv,
+) -> base_agent.EnvironmentInteractingAgent:
+  # Gpt4Wrapper reads the endpoint from OPENAI_API_URL, set in main().
+  if _AGENT_NAME.value == 'm3a':
+    return m3a.M3A(
+        env, infer.Gpt4Wrapper('fake-model'), wait_after_action_seconds=0.0
+    )
+  return t3a.T3A(env, infer.Gpt4Wrapper('fake-model'))
+
+
+def main(argv: Sequence[str]) -> None:
+  if len(argv) > 1:
+    raise app.UsageError('Too many command-line arguments.')
+
+  goal = _GOAL.value
+  states = replay_env.synthetic_states()
+  responses = [fake_llm_server.DEFAULT_RESPONSE]
+  if _REPLAY_CHECKPOINT_DIR.value:
+    episode = _load_replayed_episode()
+    goal = episode[constants.EpisodeConstants.GOAL]
+    episode_data = episode[constants.EpisodeConstants.EPISODE_DATA]
+    states = replay_env.states_from_episode(episode_data)
+    responses = (
+        fake_llm_server.responses_from_episode(episode_data) or responses
+    )
+  if _RESPONSES_FILE.value:
+    responses = fake_llm_server.load_responses(_RESPONSES_FILE.value)
+
+  server = fake_llm_server.FakeLlmServer(
+      responses,
+      fake_llm_server.LatencyModel(
+          _LATENCY_MS.value / 1000,
+          _JITTER_MS.value / 1000,
+          _JITTER_DISTRIBUTION.value,
+      ),
+      host='0.0.0.0' if _SERVE_ONLY.value else '127.0.0.1',
+      port=_PORT.value,
+  )
+  with server:
+    print(f'Serving {len(responses)} responses at {server.url}')
+    if _SERVE_ONLY.value:
+      try:
+        while True:
+          time.sleep(3600)
+      except KeyboardInterrupt:
+        return
+
+    os.environ['OPENAI_API_URL'] = server.url
+    os.environ.setdefault('OPENAI_API_KEY', 'fake_api_key')
+    env = replay_env.ReplayEnv(states)
+    agent = _create_agent(env)
+    # Replayed states do not change after an action, no need to wait.
+    agent.transition_pause = 0.0
+
+    wall_times, llm_times, steps = [], [], []
+    for _ in range(_NUM_EPISODES.value):
+      llm_time_before = server.total_latency_sec
+      start = time.perf_counter()
+      result = episode_runner.run_episode(
+          goal, agent, max_n_steps=_MAX_STEPS.value, print_fn=lambda _: None
+      )
+      wall_times.append(time.perf_counter() - start)
+      llm_times.append(server.total_latency_sec - llm_time_before)
+      steps.append(len(result.step_data.get('action_prompt', [])))
+
+  wall_times, llm_times = np.array(wall_times), np.array(llm_times)
+  overhead_per_step = (wall_times - llm_times) / np.maximum(steps, 1)
+  print(f'Episodes: {len(wall_times)}, steps: {sum(steps)}')
+  print(f'LLM requests: {server.num_requests}')
+  print(f'Mean episode wall time: {wall_times.mean():.3f}s')
+  print(f'Mean simulated LLM time: {llm_times.mean():.3f}s')
+  print(
+      'Agent-side overhead per step: mean'
+      f' {overhead_per_step.mean() * 1000:.1f}ms, p90'
+      f' {np.percentile(overhead_per_step, 90) * 1000:.1f}ms'
+  )
+
+
+if __name__ == '__main__':
+  app.run(main)
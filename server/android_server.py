@@ -24,9 +24,11 @@ from typing import Any
 
 from android_world import registry as aw_registry_module
 from android_world import suite_utils
+from android_world.env import adb_profiler
 from android_world.env import env_launcher
 from android_world.env import interface
 from android_world.env import json_action
+from android_world.utils import metrics
 import fastapi
 import pydantic
 import uvicorn
@@ -48,6 +50,9 @@ async def lifespan(fast_api_app: fastapi.FastAPI):
       freeze_datetime=True,
       adb_path="/opt/android/platform-tools/adb",
   )
+  fast_api_app.state.app_android_env.controller.enable_profiling(
+      adb_profiler.MetricsRecorder()
+  )
   task_registry = aw_registry_module.TaskRegistry()
   aw_registry = task_registry.get_registry(task_registry.ANDROID_WORLD_FAMILY)
   initial_suite = suite_utils.create_suite(
@@ -231,6 +236,14 @@ async def health(app_android_env: AndroidEnv):
   )
 
 
+@app.get("/metrics", response_class=fastapi.responses.PlainTextResponse)
+async def get_metrics():
+  """Returns the throughput and health metrics in the Prometheus format."""
+  return fastapi.responses.PlainTextResponse(
+      metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE
+  )
+
+
 app.include_router(suite_router)
 app.include_router(task_router)
 